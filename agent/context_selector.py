@@ -0,0 +1,240 @@
+"""
+论文上下文选择模块
+
+原先每次请求都把会话中全部已检索论文的标题和作者附加到用户输入后，
+检索过50篇论文的会话每个提示词都会因此膨胀。该模块只选取与当前输入相关的前k篇论文：
+显式引用（"这篇论文"、arXiv ID、"论文N"、出现在输入中的标题）直接命中，
+其余按词法相关性（BM25）、可选的向量相似度和最近程度打分，注入文本有token上限。
+"""
+
+import re
+import math
+import logging
+import threading
+from collections import Counter
+from typing import List, Dict, Optional, Callable, Tuple
+
+from services.search import PaperInfo
+from services.tokens import estimate_tokens
+from .paper_registry import PaperRegistry, normalize_arxiv_id
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 指代会话当前论文的说法
+THIS_PAPER_WORDS = ("这篇论文", "该论文", "这篇文章", "此论文", "本文", "这篇")
+_INDEX_REFERENCE = re.compile(r'(?:论文|#)\s*(\d+)')
+_ARXIV_ID = re.compile(r'(\d{4}\.\d{4,5}(?:v\d+)?|[a-z\-]+(?:\.[A-Z]{2})?/\d{7}(?:v\d+)?)', re.IGNORECASE)
+_WORD = re.compile(r'[a-z0-9]+(?:[-.][a-z0-9]+)*')
+_CJK_RUN = re.compile(r'[一-鿿]+')
+_STOPWORDS = {"the", "a", "an", "of", "for", "and", "or", "in", "on", "to", "with", "via", "by", "is", "are",
+              "we", "our", "this", "that", "from", "as", "at", "be", "it", "its", "using", "based"}
+
+# 向量化函数：输入文本列表，返回等长的向量列表
+Embedder = Callable[[List[str]], List[List[float]]]
+
+def _terms(text: str) -> List[str]:
+    """词法检索的词项：英文单词（去停用词）与中文二元组"""
+    text = text.lower()
+    terms = [word for word in _WORD.findall(text) if len(word) > 1 and word not in _STOPWORDS]
+    for run in _CJK_RUN.findall(text):
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    """余弦相似度"""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+class PaperContextSelector:
+    """为当前输入选取相关的会话论文"""
+
+    def __init__(
+        self,
+        registry: PaperRegistry,
+        top_k: int = 5,
+        max_tokens: int = 300,
+        recency_weight: float = 0.3,
+        embedder: Optional[Embedder] = None,
+        vector_weight: float = 0.5
+    ):
+        """
+        初始化上下文选择器
+
+        Args:
+            registry: 会话论文注册表
+            top_k: 最多注入的论文数
+            max_tokens: 注入文本的token上限
+            recency_weight: 最近程度在得分中的权重（0~1）
+            embedder: 可选的向量化函数，提供时按向量相似度参与打分
+            vector_weight: 向量相似度在相关性中的权重（0~1）
+        """
+        self.registry = registry
+        self.top_k = top_k
+        self.max_tokens = max_tokens
+        self.recency_weight = recency_weight
+        self.embedder = embedder
+        self.vector_weight = vector_weight
+        self._terms_cache: Dict[str, Counter] = {}
+        self._vector_cache: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _paper_terms(self, paper: PaperInfo) -> Counter:
+        """论文的词频（标题权重加倍），按句柄缓存"""
+        handle = self.registry.handle_of(paper)
+        with self._lock:
+            cached = self._terms_cache.get(handle)
+        if cached is None:
+            cached = Counter(_terms(paper.title) * 2 + _terms(" ".join(paper.authors)) + _terms(paper.abstract[:600]))
+            with self._lock:
+                self._terms_cache[handle] = cached
+        return cached
+
+    def _explicit(self, user_input: str, papers: List[PaperInfo]) -> List[PaperInfo]:
+        """输入中显式引用的论文（按引用方式的确定程度排序）"""
+        found: List[PaperInfo] = []
+
+        def add(paper: Optional[PaperInfo]):
+            if paper is not None and all(paper is not other for other in found):
+                found.append(paper)
+
+        # 选择上下文不算作使用论文，查找时不改变注册表的最近使用顺序（不影响LRU淘汰）
+        if any(word in user_input for word in THIS_PAPER_WORDS):
+            add(self.registry.current())
+        for arxiv_id in _ARXIV_ID.findall(user_input):
+            add(self.registry.lookup(normalize_arxiv_id(arxiv_id) or arxiv_id, touch=False))
+        for index in _INDEX_REFERENCE.findall(user_input):
+            add(self.registry.lookup(f"论文{index}", touch=False))
+        lowered = user_input.lower()
+        for paper in papers:
+            if paper.title and len(paper.title) > 3 and paper.title.lower() in lowered:
+                add(paper)
+        return found
+
+    def _lexical_scores(self, user_input: str, papers: List[PaperInfo]) -> List[float]:
+        """BM25得分（归一化到0~1）"""
+        query = set(_terms(user_input))
+        if not query:
+            return [0.0] * len(papers)
+        docs = [self._paper_terms(paper) for paper in papers]
+        average_length = sum(sum(doc.values()) for doc in docs) / len(docs) or 1.0
+        # 每个查询词的文档频率只计算一次
+        idf = {}
+        for term in query:
+            containing = sum(1 for doc in docs if term in doc)
+            if containing:
+                idf[term] = math.log(1 + (len(docs) - containing + 0.5) / (containing + 0.5))
+        scores = []
+        for doc in docs:
+            length = sum(doc.values())
+            score = 0.0
+            for term, weight in idf.items():
+                frequency = doc.get(term, 0)
+                if frequency:
+                    score += weight * frequency * 2.2 / (frequency + 1.2 * (0.25 + 0.75 * length / average_length))
+            scores.append(score)
+        top = max(scores)
+        return [score / top if top else 0.0 for score in scores]
+
+    def _vector_scores(self, user_input: str, papers: List[PaperInfo]) -> Optional[List[float]]:
+        """向量相似度（未配置向量化函数或调用失败时返回None）"""
+        if self.embedder is None:
+            return None
+        try:
+            missing = [paper for paper in papers if self.registry.handle_of(paper) not in self._vector_cache]
+            texts = [user_input] + [f"{paper.title}\n{paper.abstract[:600]}" for paper in missing]
+            vectors = self.embedder(texts)
+            with self._lock:
+                for paper, vector in zip(missing, vectors[1:]):
+                    self._vector_cache[self.registry.handle_of(paper)] = vector
+            return [max(_cosine(vectors[0], self._vector_cache[self.registry.handle_of(paper)]), 0.0) for paper in papers]
+        except Exception as e:
+            logger.warning(f"向量打分失败，仅使用词法相关性: {e}")
+            return None
+
+    def select(self, user_input: str) -> Tuple[List[PaperInfo], int]:
+        """
+        选取与输入相关的论文
+
+        Args:
+            user_input: 用户输入
+
+        Returns:
+            Tuple[List[PaperInfo], int]: 选中的论文（显式引用在前，其余按得分排序）与会话论文总数
+        """
+        papers = self.registry.papers()
+        if not papers:
+            return [], 0
+        self._prune(papers)
+
+        selected = self._explicit(user_input, papers)
+        if len(selected) >= self.top_k:
+            return selected, len(papers)
+
+        relevance = self._lexical_scores(user_input, papers)
+        vectors = self._vector_scores(user_input, papers)
+        if vectors is not None:
+            relevance = [(1 - self.vector_weight) * lex + self.vector_weight * vec for lex, vec in zip(relevance, vectors)]
+        count = len(papers)
+        scored = []
+        for position, (paper, score) in enumerate(zip(papers, relevance)):
+            recency = (position + 1) / count
+            scored.append(((1 - self.recency_weight) * score + self.recency_weight * recency, score, paper))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        # 有相关论文时只注入相关的；既无显式引用又完全不相关时（如"继续"）注入最近的几篇供指代消解
+        relevant = [item for item in scored if item[1] > 0]
+        candidates = relevant or ([] if selected else scored[:min(3, self.top_k)])
+        for _, _, paper in candidates:
+            if len(selected) >= self.top_k:
+                break
+            if all(paper is not other for other in selected):
+                selected.append(paper)
+        return selected, count
+
+    def render(self, user_input: str) -> str:
+        """
+        生成注入到用户输入后的上下文文本
+
+        Args:
+            user_input: 用户输入
+
+        Returns:
+            str: 上下文文本（不超过token上限，至少包含一篇论文），会话中没有论文时为空字符串
+        """
+        selected, total = self.select(user_input)
+        if not selected:
+            return ""
+
+        header = "当前会话中与问题相关的论文（调用工具时使用方括号中的arXiv ID）：\n"
+        lines = []
+        used = estimate_tokens(header)
+        for paper in selected:
+            authors = ", ".join(paper.authors[:3]) + (" 等" if len(paper.authors) > 3 else "")
+            line = f"- [{self.registry.handle_of(paper)}] {paper.title or '未知标题'} (作者: {authors or '未知作者'})\n"
+            cost = estimate_tokens(line)
+            if lines and used + cost > self.max_tokens:
+                break
+            lines.append(line)
+            used += cost
+        text = header + "".join(lines)
+        if total > len(lines):
+            text += f"（会话中共检索过 {total} 篇论文，其余论文可通过arXiv ID或search_arxiv引用）\n"
+        return text
+
+    def _prune(self, papers: List[PaperInfo]):
+        """注册表淘汰论文后，丢弃对应的词频与向量缓存"""
+        with self._lock:
+            if len(self._terms_cache) <= 2 * len(papers) and len(self._vector_cache) <= 2 * len(papers):
+                return
+            handles = {self.registry.handle_of(paper) for paper in papers}
+            self._terms_cache = {h: c for h, c in self._terms_cache.items() if h in handles}
+            self._vector_cache = {h: v for h, v in self._vector_cache.items() if h in handles}
+
+    def clear(self):
+        """清空词频与向量缓存"""
+        with self._lock:
+            self._terms_cache.clear()
+            self._vector_cache.clear()
@@ -3,58 +3,159 @@ ReAct Agent控制器模块
 
 该模块实现了ScholarAgent的核心逻辑，基于LangChain的ReAct Agent框架。
 支持多轮对话、工具调用、任务规划等功能。
+LLM、工具与Agent执行器由进程内共享的AgentEngine持有，每个ScholarAgent只持有一个会话的状态。
 """
 
 import logging
 import os
-from typing import List, Dict, Any, Optional
+import time
+import threading
+import uuid
+from typing import List, Dict, Any, Optional, Tuple
 from langchain.agents import AgentExecutor, create_react_agent
-from langchain_community.chat_models import ChatOpenAI
 from langchain.schema import BaseMessage, HumanMessage, AIMessage
-from langchain.memory import ConversationBufferMemory
+from langchain_core.callbacks import BaseCallbackHandler
 
-from ..config import config
-from .tools import scholar_tools
+from services.chat_model import PooledChatModel
+from services.prompt_cache import cached_prompt_tokens
+from services.deadline import Deadline, DeadlineExceeded, use_deadline
+from services.tracing import tracer, breakdown, KIND_AGENT
+from services.metering import usage_meter, meter_scope
+from .tools import ScholarTools, use_tool_state, _UNCACHEABLE_PREFIXES
+from .function_agent import FunctionCallingAgent
+from .intent_router import IntentRouter
+from .planner import PlanAndExecuteAgent, PlanError
+from .memory import SummarizingMemory
+from .context_selector import PaperContextSelector
+from .prefetch import SpeculativePrefetcher
+from .session_store import write_snapshot, read_snapshot
 from .prompts import REACT_SYSTEM_PROMPT
+from config import (AGENT_FAST_PATH_CONFIG, AGENT_MEMORY_CONFIG, AGENT_CONTEXT_CONFIG, AGENT_DEADLINE_CONFIG,
+                    AGENT_PREFETCH_CONFIG)
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class ScholarAgent:
-    """ScholarAgent主控制器类"""
+# 部分回答中略去的失败类工具输出
+_FAILED_PREFIXES = _UNCACHEABLE_PREFIXES + ("执行中止", "执行失败", "工具参数错误", "未知工具")
+
+# 用户明确要求刷新时绕过工具备忘录
+REFRESH_KEYWORDS = ("刷新", "重新检索", "重新搜索", "重新总结", "重新生成", "最新", "refresh")
+
+class IterationUsageTracker(BaseCallbackHandler):
+    """记录一次Agent运行中每轮ReAct迭代的token用量"""
+    
+    def __init__(self):
+        self.iterations: List[Dict[str, int]] = []
+    
+    def on_llm_end(self, response, **kwargs):
+        """每次LLM调用结束时记录用量"""
+        usage = (response.llm_output or {}).get("token_usage")
+        if not usage and response.generations and response.generations[0]:
+            message = getattr(response.generations[0][0], "message", None)
+            usage = getattr(message, "response_metadata", {}).get("token_usage")
+        usage = usage or {}
+        self.iterations.append({
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "cached_tokens": cached_prompt_tokens(usage)
+        })
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        汇总用量
+        
+        Returns:
+            Dict[str, Any]: 迭代次数、每轮输入token数与总计
+        """
+        return {
+            "iterations": len(self.iterations),
+            "prompt_tokens_per_iteration": [it["prompt_tokens"] for it in self.iterations],
+            "prompt_tokens": sum(it["prompt_tokens"] for it in self.iterations),
+            "completion_tokens": sum(it["completion_tokens"] for it in self.iterations),
+            "cached_tokens": sum(it["cached_tokens"] for it in self.iterations)
+        }
+
+class StepRecorder(BaseCallbackHandler):
+    """记录ReAct运行中已完成的工具调用（超出截止时间时据此给出部分回答）"""
+    
+    def __init__(self):
+        self.steps: List[tuple] = []
+        self._pending: List[Any] = []
+    
+    def on_agent_action(self, action, **kwargs):
+        """Agent决定调用工具时记录动作"""
+        self._pending.append(action)
+    
+    def on_tool_end(self, output, **kwargs):
+        """工具返回时记录（动作, 输出）"""
+        if self._pending:
+            self.steps.append((self._pending.pop(0), str(output)))
+
+class AgentEngine:
+    """
+    进程内共享的Agent基础设施
     
-    def __init__(self, model_name: str = "deepseek-chat", temperature: float = 0.3):
+    LLM、工具集合、提示词模板以及各模式的Agent与执行器创建一次后不再修改，
+    会话相关的状态（论文注册表、备忘录、对话记忆、对话历史）由ScholarAgent持有，
+    调用工具时经use_tool_state绑定，同一引擎可同时服务大量会话。
+    """
+    
+    def __init__(self, model_name: Optional[str] = None, temperature: float = 0.3,
+                 compact_observations: bool = True):
         """
-        初始化ScholarAgent
+        初始化Agent引擎
         
         Args:
-            model_name: 使用的LLM模型名称
+            model_name: 使用的LLM模型名称，None表示按路由表选择
             temperature: 生成温度参数
+            compact_observations: 检索结果是否以紧凑摘要返回（减少每轮迭代的输入token）
         """
         self.model_name = model_name
         self.temperature = temperature
         
-        # 初始化LLM
-        llm_config = config.get_llm_config("deepseek")
-        self.llm = ChatOpenAI(
-            model=model_name,
-            temperature=temperature,
-            base_url=llm_config["base_url"],
-            api_key=llm_config["api_key"]
+        # 初始化LLM（经由端点池负载均衡）
+        self.llm = PooledChatModel(model_name=model_name, temperature=temperature)
+        
+        # 获取工具（会话状态在调用时绑定）
+        self.scholar_tools = ScholarTools(
+            model_name=model_name,
+            compact_observations=compact_observations
         )
+        self.tools = self.scholar_tools.get_available_tools()
+        tool_funcs = {tool.name: tool.func for tool in self.tools}
         
-        # 获取工具
-        self.tools = scholar_tools.get_available_tools()
+        # 意图快速通道（与Agent共用带备忘录的工具）
+        self.intent_router = IntentRouter(
+            self.scholar_tools,
+            tool_funcs=tool_funcs,
+            min_confidence=AGENT_FAST_PATH_CONFIG["min_confidence"]
+        )
         
-        # 初始化记忆
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
+        # 检索后的推测预取（由会话决定是否启用）
+        self.prefetcher = SpeculativePrefetcher(
+            self.scholar_tools,
+            facets=AGENT_PREFETCH_CONFIG["facets"],
+            top_n=AGENT_PREFETCH_CONFIG["top_n"],
+            max_calls_per_session=AGENT_PREFETCH_CONFIG["max_calls_per_session"],
+            max_workers=AGENT_PREFETCH_CONFIG["max_workers"],
+            busy_threshold=AGENT_PREFETCH_CONFIG["busy_threshold"]
+        )
+        
+        # 函数调用Agent（与ReAct模式共用工具、注册表和备忘录）
+        self.function_agent = FunctionCallingAgent(
+            self.scholar_tools,
+            model_name=model_name,
+            temperature=temperature,
+            max_iterations=10
         )
         
-        # 存储搜索到的论文信息
-        self.paper_cache: Dict[str, Dict[str, Any]] = {}
+        # 规划-执行Agent（规划无效时退回ReAct）
+        self.planner = PlanAndExecuteAgent(
+            self.scholar_tools,
+            tool_funcs=tool_funcs
+        )
         
         # 创建ReAct Agent
         self.agent = create_react_agent(
@@ -63,25 +164,28 @@ class ScholarAgent:
             prompt=self._create_agent_prompt()
         )
         
-        # 创建Agent执行器
+        # 创建Agent执行器（对话历史由会话的对话记忆在每次调用时传入）
         self.agent_executor = AgentExecutor(
             agent=self.agent,
             tools=self.tools,
-            memory=self.memory,
             verbose=True,
             handle_parsing_errors=True,
-            max_iterations=10
+            max_iterations=10,
+            return_intermediate_steps=True
         )
-        
-        # 对话历史
-        self.conversation_history: List[Dict[str, Any]] = []
     
     def _create_agent_prompt(self):
-        """创建Agent提示词"""
+        """
+        创建Agent提示词
+        
+        按变化频率从低到高排列：系统提示词与工具说明（进程内不变）、对话历史（逐轮追加）、
+        本轮问题、推理草稿（每步追加）。同一会话的后续请求共享最长的前缀，可命中服务商的前缀缓存。
+        """
         from langchain.prompts import PromptTemplate
         
         template = f"""{REACT_SYSTEM_PROMPT}
 
+对话历史：
 {{chat_history}}
 
 问题: {{input}}
@@ -91,17 +195,161 @@ class ScholarAgent:
             input_variables=["tools", "tool_names", "chat_history", "input", "agent_scratchpad"],
             template=template
         )
+
+# 进程内的Agent引擎（按模型、温度和输出格式各创建一个）
+_engines: Dict[Tuple[Optional[str], float, bool], AgentEngine] = {}
+_engines_lock = threading.Lock()
+
+def get_engine(model_name: Optional[str] = None, temperature: float = 0.3,
+               compact_observations: bool = True) -> AgentEngine:
+    """
+    获取共享的Agent引擎，首次调用时创建
+    
+    Args:
+        model_name: 使用的LLM模型名称，None表示按路由表选择
+        temperature: 生成温度参数
+        compact_observations: 检索结果是否以紧凑摘要返回
+        
+    Returns:
+        AgentEngine: Agent引擎
+    """
+    key = (model_name, temperature, compact_observations)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = AgentEngine(model_name, temperature, compact_observations)
+            _engines[key] = engine
+        return engine
+
+class ScholarAgent:
+    """
+    ScholarAgent会话
+    
+    只持有会话状态（论文注册表、工具备忘录、对话记忆、对话历史），
+    LLM、工具和Agent执行器来自共享的AgentEngine，创建会话几乎没有开销。
+    """
+    
+    # 支持的Agent模式：react（文本ReAct解析）、function（服务商原生工具调用）、plan（规划依赖图后并发执行）
+    MODES = ("react", "function", "plan")
     
-    def run(self, user_input: str) -> Dict[str, Any]:
+    def __init__(self, model_name: Optional[str] = None, temperature: float = 0.3,
+                 compact_observations: bool = True, mode: str = "react", fast_path: Optional[bool] = None,
+                 engine: Optional[AgentEngine] = None, prefetch: Optional[bool] = None):
+        """
+        初始化ScholarAgent会话
+        
+        Args:
+            model_name: 使用的LLM模型名称，None表示按路由表选择
+            temperature: 生成温度参数
+            compact_observations: 检索结果是否以紧凑摘要返回（减少每轮迭代的输入token）
+            mode: Agent模式，react、function或plan
+            fast_path: 是否让意图明确的请求绕过Agent直接调用工具，None表示使用配置
+            engine: 使用的Agent引擎，默认按前三个参数获取共享引擎
+            prefetch: 检索后是否在后台推测预取前几篇结果的分析，None表示使用配置
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的Agent模式: {mode}，可选: {', '.join(self.MODES)}")
+        self.engine = engine or get_engine(model_name, temperature, compact_observations)
+        self.model_name = self.engine.model_name
+        self.temperature = self.engine.temperature
+        self.mode = mode
+        self.session_id = uuid.uuid4().hex[:12]
+        self.fast_path = AGENT_FAST_PATH_CONFIG["enabled"] if fast_path is None else fast_path
+        self.prefetch = AGENT_PREFETCH_CONFIG["enabled"] if prefetch is None else prefetch
+        
+        # 会话工具状态：工具之间通过arXiv ID传递论文，相同的工具调用由备忘录直接返回
+        self.tool_state = self.engine.scholar_tools.new_state()
+        self.papers = self.tool_state.registry
+        
+        # 每次请求只注入与输入相关的会话论文
+        self.context_selector = PaperContextSelector(
+            self.papers,
+            top_k=AGENT_CONTEXT_CONFIG["top_k"],
+            max_tokens=AGENT_CONTEXT_CONFIG["max_tokens"],
+            recency_weight=AGENT_CONTEXT_CONFIG["recency_weight"]
+        )
+        
+        # 初始化记忆（最近几轮保留原文，更早的轮次分批合并为滚动摘要，历史区域有硬性token预算；
+        # 两次合并之间历史文本只在末尾追加，便于命中前缀缓存）
+        self.memory = SummarizingMemory(
+            keep_turns=AGENT_MEMORY_CONFIG["keep_turns"],
+            max_tokens=AGENT_MEMORY_CONFIG["max_tokens"],
+            summary_tokens=AGENT_MEMORY_CONFIG["summary_tokens"],
+            background=AGENT_MEMORY_CONFIG["background"],
+            human_prefix="用户",
+            ai_prefix="ScholarAgent"
+        )
+        
+        # 对话历史
+        self.conversation_history: List[Dict[str, Any]] = []
+        
+        # 每轮的输入token统计（用于验证提示词大小不随会话增长）
+        self.turn_usage: List[Dict[str, int]] = []
+    
+    @property
+    def llm(self):
+        """共享的LLM"""
+        return self.engine.llm
+    
+    @property
+    def scholar_tools(self) -> ScholarTools:
+        """共享的工具集合"""
+        return self.engine.scholar_tools
+    
+    @property
+    def tools(self):
+        """共享的工具列表"""
+        return self.engine.tools
+    
+    @property
+    def agent_executor(self) -> AgentExecutor:
+        """共享的ReAct执行器"""
+        return self.engine.agent_executor
+    
+    @property
+    def intent_router(self) -> Optional[IntentRouter]:
+        """意图快速通道，会话未启用时为None"""
+        return self.engine.intent_router if self.fast_path else None
+    
+    def run(self, user_input: str, refresh: Optional[bool] = None,
+            deadline: Optional[float] = None) -> Dict[str, Any]:
         """
         运行Agent处理用户输入
         
+        每次LLM调用和工具调用只获得剩余的时间预算，超出截止时间后不再发起新的调用，
+        返回已完成的工具结果作为部分回答（结果中partial为True）。
+        
         Args:
             user_input: 用户输入的问题或指令
+            refresh: 是否绕过工具备忘录重新调用，None表示根据输入中的刷新关键词判断
+            deadline: 本次请求的墙钟时间上限（秒），None表示使用配置，0表示不限时
             
         Returns:
-            Dict[str, Any]: 包含回答和元信息的字典
+            Dict[str, Any]: 包含回答和元信息的字典（启用追踪时trace给出追踪ID与各类步骤的次数和耗时）
         """
+        if deadline is None:
+            deadline = AGENT_DEADLINE_CONFIG["seconds"]
+        # 共享工具在本次运行中使用该会话的注册表与备忘录，所有调用共享同一截止时间，用量计入该会话，并记录在同一条追踪下
+        with use_tool_state(self.tool_state), use_deadline(Deadline(deadline) if deadline > 0 else None), \
+                meter_scope(session=self.session_id), tracer.span("agent.run", KIND_AGENT, mode=self.mode, input_chars=len(user_input),
+                            deadline=deadline or None) as span:
+            result = self._run(user_input, refresh)
+            span.set(success=result["success"], partial=result.get("partial"), route=result.get("mode"),
+                     tools_used=",".join(result.get("tools_used", [])) or None)
+            if tracer.enabled:
+                result["trace"] = {"trace_id": span.trace_id, "breakdown": breakdown(tracer.trace_spans())}
+            return result
+    
+    def _run(self, user_input: str, refresh: Optional[bool]) -> Dict[str, Any]:
+        """run的实现（已绑定会话工具状态与截止时间）"""
+        start = time.perf_counter()
+        memo = self.tool_state.memo
+        memo_before = memo.get_stats() if memo is not None else None
+        if refresh is None:
+            refresh = any(keyword in user_input.lower() for keyword in REFRESH_KEYWORDS)
+        if memo is not None:
+            memo.bypass = refresh
+        
         try:
             logger.info(f"处理用户输入: {user_input}")
             
@@ -115,26 +363,53 @@ class ScholarAgent:
             # 增强用户输入，添加上下文信息
             enhanced_input = self._enhance_input_with_context(user_input)
             
-            # 执行Agent
-            result = self.agent_executor.invoke({
-                "input": enhanced_input
-            })
+            # 意图明确的请求直接调用工具，否则执行Agent（记录每轮迭代的token用量）
+            try:
+                result = self.intent_router.route(user_input) if self.intent_router is not None else None
+                if result is not None:
+                    token_usage = IterationUsageTracker().summary()
+                elif self.mode == "function":
+                    result = self.engine.function_agent.run(enhanced_input, self._function_history())
+                    token_usage = result["token_usage"]
+                elif self.mode == "plan":
+                    try:
+                        result = self.engine.planner.run(enhanced_input, self._function_history())
+                        token_usage = result["token_usage"]
+                    except PlanError as e:
+                        logger.warning(f"规划失败，退回ReAct模式: {e}")
+                        result, token_usage = self._run_react(enhanced_input)
+                else:
+                    result, token_usage = self._run_react(enhanced_input)
+            except DeadlineExceeded as e:
+                logger.warning(f"请求超出截止时间: {e}")
+                result, token_usage = {"output": None, "partial": True}, IterationUsageTracker().summary()
             
-            # 提取回答
-            answer = result.get("output", "抱歉，我无法处理您的请求。")
+            # 提取回答（超出截止时间时由已完成的工具结果组成部分回答）
+            partial = bool(result.get("partial"))
+            if partial:
+                answer = self._partial_answer(result.get("intermediate_steps", []))
+            else:
+                answer = result.get("output", "抱歉，我无法处理您的请求。")
             
-            # 缓存论文信息（如果搜索结果包含论文信息）
-            self._cache_paper_info(result)
-            
-            # 自动补全论文arXiv ID和PDF链接
+            # 自动补全当前论文的arXiv ID和PDF链接
             if any(x in user_input for x in ["论文", "这篇论文", "该论文"]):
-                if self.paper_cache:
-                    last_paper = list(self.paper_cache.values())[-1]
-                    arxiv_id = last_paper.get('arxiv_id', '')
-                    pdf_url = last_paper.get('pdf_url', '')
+                current = self.papers.current()
+                if current is not None:
+                    arxiv_id = current.arxiv_id
+                    pdf_url = current.pdf_url or (f"http://arxiv.org/pdf/{arxiv_id}" if arxiv_id else "")
                     if arxiv_id or pdf_url:
                         answer += f"\n\narXiv ID: {arxiv_id}\nPDF链接: {pdf_url}"
             
+            # 写入对话记忆（需要时在后台合并摘要，不阻塞本次返回）
+            history_tokens = self.memory.token_count()
+            self.memory.save_turn(user_input, answer)
+            self.turn_usage.append({
+                "history_tokens": history_tokens,
+                "first_prompt_tokens": (token_usage["prompt_tokens_per_iteration"] or [0])[0],
+                "prompt_tokens": token_usage["prompt_tokens"]
+            })
+            token_usage["history_tokens"] = history_tokens
+            
             # 记录Agent回答
             self.conversation_history.append({
                 "role": "assistant",
@@ -142,15 +417,32 @@ class ScholarAgent:
                 "timestamp": self._get_timestamp()
             })
             
+            # 检索轮次返回后，在后台为前几篇结果预取下一轮可能需要的分析
+            tools_used = self._extract_tools_used(result)
+            if self.prefetch and "search_arxiv" in tools_used:
+                prefetcher = self.engine.prefetcher
+                prefetcher.schedule(self.tool_state, self.papers.last_results(prefetcher.top_n))
+            
             return {
                 "answer": answer,
                 "success": True,
                 "conversation_history": self.conversation_history,
-                "tools_used": self._extract_tools_used(result)
+                "tools_used": tools_used,
+                "mode": "fast_path" if result.get("intent") else self.mode,
+                "intent": result.get("intent"),
+                "token_usage": token_usage,
+                "observation_stats": dict(self.tool_state.observation_stats),
+                "tool_memo": self._memo_usage(memo_before),
+                "memory": self.memory.get_stats(),
+                "plan": result.get("plan"),
+                "partial": partial,
+                "elapsed": time.perf_counter() - start
             }
             
         except Exception as e:
             logger.error(f"Agent执行时发生错误: {e}")
+            if memo is not None:
+                memo.bypass = False
             error_message = f"处理您的请求时遇到错误: {str(e)}"
             
             # 记录错误
@@ -168,6 +460,88 @@ class ScholarAgent:
                 "error": str(e)
             }
     
+    def _run_react(self, enhanced_input: str):
+        """
+        以ReAct模式执行Agent
+        
+        Args:
+            enhanced_input: 增强后的用户输入
+            
+        Returns:
+            Tuple[Dict[str, Any], Dict[str, Any]]: 执行结果与每轮迭代的token用量
+        """
+        usage_tracker = IterationUsageTracker()
+        step_recorder = StepRecorder()
+        try:
+            result = self.engine.agent_executor.invoke(
+                {"input": enhanced_input, "chat_history": self.memory.load()},
+                config={"callbacks": [usage_tracker, step_recorder]}
+            )
+        except DeadlineExceeded as e:
+            logger.warning(f"ReAct Agent超出截止时间，返回部分结果: {e}")
+            result = {"output": None, "partial": True, "intermediate_steps": step_recorder.steps}
+        # 执行器未返回中间步骤时使用回调记录的步骤（工具统计和检索后的预取依赖它）
+        if not result.get("intermediate_steps"):
+            result = dict(result, intermediate_steps=step_recorder.steps)
+        return result, usage_tracker.summary()
+    
+    def _partial_answer(self, steps: List[tuple]) -> str:
+        """
+        超出截止时间时，由已成功的工具结果组成部分回答
+        
+        Args:
+            steps: 已完成的（动作, 输出）列表
+            
+        Returns:
+            str: 标明为部分结果的回答
+        """
+        limit = AGENT_DEADLINE_CONFIG["partial_chars"]
+        sections = []
+        for action, observation in steps:
+            observation = str(observation).strip()
+            if not observation or observation.lstrip("• ").startswith(_FAILED_PREFIXES):
+                continue
+            if len(observation) > limit:
+                observation = observation[:limit] + "..."
+            tool_name = action.tool if hasattr(action, "tool") else str(action)
+            sections.append(f"【{tool_name}】\n{observation}")
+        if not sections:
+            return "⏱️ 未能在时间上限内完成处理，请稍后重试或缩小问题范围。"
+        return "⏱️ 已达到响应时间上限，以下是目前已获得的部分结果：\n\n" + "\n\n".join(sections)
+    
+    def _function_history(self) -> List[Dict[str, str]]:
+        """
+        获取函数调用/规划模式的对话历史消息（来自对话记忆，不含本轮输入和出错的回答）
+        
+        Returns:
+            List[Dict[str, str]]: OpenAI格式的消息列表
+        """
+        return self.memory.messages()
+    
+    def _memo_usage(self, before: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        统计本次运行的工具备忘录命中情况，并退出刷新模式
+        
+        Args:
+            before: 运行前的备忘录统计
+            
+        Returns:
+            Dict[str, Any]: 本次运行的命中/未命中/绕过/预取命中次数与会话累计统计（含预取命中率）
+        """
+        memo = self.tool_state.memo
+        if memo is None or before is None:
+            return {"enabled": False}
+        memo.bypass = False
+        after = memo.get_stats()
+        return {
+            "enabled": True,
+            "hits": after["hits"] - before["hits"],
+            "misses": after["misses"] - before["misses"],
+            "bypassed": after["bypassed"] - before["bypassed"],
+            "prefetch_hits": after["speculative_hits"] - before["speculative_hits"],
+            "session": after
+        }
+    
     def search_paper(self, query: str) -> Dict[str, Any]:
         """
         搜索论文的便捷方法
@@ -233,7 +607,68 @@ class ScholarAgent:
     def clear_conversation_history(self):
         """清空对话历史"""
         self.conversation_history = []
+        self.turn_usage = []
         self.memory.clear()
+        if self.tool_state.memo is not None:
+            self.tool_state.memo.clear()
+    
+    def save_session(self, path: str) -> Dict[str, Any]:
+        """
+        保存会话快照（对话历史、对话记忆及其滚动摘要、已检索论文、工具备忘录）
+        
+        Args:
+            path: 快照文件路径，以 .gz 结尾时压缩
+            
+        Returns:
+            Dict[str, Any]: 快照路径、字节数、文本块数与耗时
+        """
+        start = time.perf_counter()
+        memo = self.tool_state.memo
+        state = {
+            "agent": {"model_name": self.model_name, "temperature": self.temperature, "mode": self.mode,
+                      "session_id": self.session_id},
+            "conversation_history": self.conversation_history,
+            "turn_usage": self.turn_usage,
+            "memory": self.memory.export_state(),
+            "papers": self.papers.export_state(),
+            "tool_memo": memo.export_state() if memo is not None else []
+        }
+        size, blobs = write_snapshot(state, path)
+        logger.info(f"会话已保存到 {path}（{size} 字节）")
+        return {"path": path, "bytes": size, "blobs": blobs, "seconds": time.perf_counter() - start}
+    
+    def load_session(self, path: str) -> Dict[str, Any]:
+        """
+        从快照恢复会话（替换当前会话状态，Agent的模型与模式保持不变）
+        
+        Args:
+            path: save_session保存的快照文件路径
+            
+        Returns:
+            Dict[str, Any]: 恢复的对话轮数、论文数、备忘录条目数与耗时
+            
+        Raises:
+            SnapshotError: 文件不是有效的会话快照或版本不受支持
+        """
+        start = time.perf_counter()
+        state = read_snapshot(path)
+        self.session_id = state.get("agent", {}).get("session_id", self.session_id)
+        self.conversation_history = state.get("conversation_history", [])
+        self.turn_usage = state.get("turn_usage", [])
+        self.memory.import_state(state.get("memory", {}))
+        self.papers.import_state(state.get("papers", {}))
+        self.context_selector.clear()
+        memo = self.tool_state.memo
+        if memo is not None:
+            memo.import_state(state.get("tool_memo", []))
+        logger.info(f"已从 {path} 恢复会话")
+        return {
+            "path": path,
+            "turns": sum(1 for turn in self.conversation_history if turn.get("role") == "user"),
+            "papers": len(self.papers),
+            "tool_memo_entries": len(state.get("tool_memo", [])),
+            "seconds": time.perf_counter() - start
+        }
     
     def _extract_tools_used(self, result: Dict[str, Any]) -> List[str]:
         """
@@ -268,73 +703,17 @@ class ScholarAgent:
         Returns:
             str: 增强后的输入
         """
-        # 如果缓存中有论文信息，添加到上下文中
-        if self.paper_cache:
-            context_info = "\n\n当前会话中已搜索的论文信息：\n"
-            for paper_id, paper_info in self.paper_cache.items():
-                context_info += f"- {paper_info.get('title', '未知标题')} (作者: {paper_info.get('authors', '未知作者')})\n"
-            
-            enhanced_input = f"{user_input}\n{context_info}"
-            return enhanced_input
+        # 只添加与输入相关的论文句柄和标题（显式引用优先，其余按相关性与最近程度选取，有token上限）
+        context_info = self.context_selector.render(user_input)
+        if context_info:
+            return f"{user_input}\n\n\n{context_info}"
         
         return user_input
     
-    def _cache_paper_info(self, result: Dict[str, Any]):
-        """
-        缓存搜索结果中的论文信息
-        
-        Args:
-            result: Agent执行结果
-        """
-        try:
-            # 检查是否有中间步骤包含搜索结果
-            if "intermediate_steps" in result:
-                for step in result["intermediate_steps"]:
-                    if len(step) >= 2:
-                        tool_name = step[0].tool if hasattr(step[0], 'tool') else str(step[0])
-                        tool_output = step[1]
-                        
-                        # 如果是Arxiv搜索工具的输出，解析并缓存论文信息
-                        if "search_arxiv" in tool_name and tool_output:
-                            self._parse_and_cache_papers(tool_output)
-        except Exception as e:
-            logger.warning(f"缓存论文信息时出错: {e}")
-    
-    def _parse_and_cache_papers(self, search_output: str):
-        """
-        解析搜索结果并缓存论文信息
-        
-        Args:
-            search_output: 搜索输出文本
-        """
-        try:
-            # 简单的解析逻辑，提取论文标题和作者
-            lines = search_output.split('\n')
-            current_paper = {}
-            
-            for line in lines:
-                line = line.strip()
-                if line.startswith('标题:'):
-                    if current_paper:
-                        # 保存前一篇论文
-                        paper_id = current_paper.get('title', 'unknown')
-                        self.paper_cache[paper_id] = current_paper.copy()
-                    # 开始新论文
-                    current_paper = {'title': line.replace('标题:', '').strip()}
-                elif line.startswith('作者:') and current_paper:
-                    current_paper['authors'] = line.replace('作者:', '').strip()
-                elif line.startswith('Arxiv ID:') and current_paper:
-                    arxiv_id = line.replace('Arxiv ID:', '').strip()
-                    current_paper['arxiv_id'] = arxiv_id
-                    current_paper['pdf_url'] = f"http://arxiv.org/pdf/{arxiv_id}"
-                elif line.startswith('摘要:') and current_paper:
-                    current_paper['abstract'] = line.replace('摘要:', '').strip()
-            # 保存最后一篇论文
-            if current_paper:
-                paper_id = current_paper.get('title', 'unknown')
-                self.paper_cache[paper_id] = current_paper.copy()
-        except Exception as e:
-            logger.warning(f"解析论文信息时出错: {e}")
+    @property
+    def paper_cache(self) -> Dict[str, Dict[str, Any]]:
+        """已检索论文的信息（以标题为键，由会话论文注册表导出，用于展示；内部查找请使用self.papers）"""
+        return self.papers.to_dict()
     
     def get_cached_papers(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -343,11 +722,12 @@ class ScholarAgent:
         Returns:
             Dict[str, Dict[str, Any]]: 缓存的论文信息
         """
-        return self.paper_cache.copy()
+        return self.paper_cache
     
     def clear_paper_cache(self):
         """清空论文缓存"""
-        self.paper_cache.clear()
+        self.papers.clear()
+        self.context_selector.clear()
     
     def get_agent_info(self) -> Dict[str, Any]:
         """
@@ -359,32 +739,41 @@ class ScholarAgent:
         return {
             "model_name": self.model_name,
             "temperature": self.temperature,
+            "mode": self.mode,
+            "fast_path": self.intent_router is not None,
+            "prefetch": self.prefetch,
+            "prefetch_stats": self.engine.prefetcher.get_stats(),
             "available_tools": [tool.name for tool in self.tools],
-            "conversation_count": len(self.conversation_history)
+            "conversation_count": len(self.conversation_history),
+            "memory": self.memory.get_stats(),
+            "session_id": self.session_id,
+            "usage": usage_meter.get_totals("session").get(self.session_id, {})
         }
 
 # 创建全局Agent实例
-def create_scholar_agent(model_name: str = "deepseek-chat", temperature: float = 0.3) -> ScholarAgent:
+def create_scholar_agent(model_name: Optional[str] = None, temperature: float = 0.3,
+                         mode: str = "react") -> ScholarAgent:
     """
-    创建ScholarAgent实例
+    创建ScholarAgent会话（共享的Agent引擎只在首次调用时创建）
     
     Args:
-        model_name: 使用的LLM模型名称
+        model_name: 使用的LLM模型名称，None表示按路由表选择
         temperature: 生成温度参数
+        mode: Agent模式，react（文本ReAct）、function（原生工具调用）或plan（规划-执行）
         
     Returns:
         ScholarAgent: Agent实例
     """
-    return ScholarAgent(model_name=model_name, temperature=temperature)
+    return ScholarAgent(model_name=model_name, temperature=temperature, mode=mode)
 
 # 便捷函数
-def run_agent(user_input: str, model_name: str = "deepseek-chat") -> str:
+def run_agent(user_input: str, model_name: Optional[str] = None) -> str:
     """
-    便捷函数：运行Agent并返回回答
+    便捷函数：在新会话中运行Agent并返回回答
     
     Args:
         user_input: 用户输入
-        model_name: 使用的模型名称
+        model_name: 使用的模型名称，None表示按路由表选择
         
     Returns:
         str: Agent回答
@@ -0,0 +1,236 @@
+"""
+函数调用Agent模块
+
+该模块实现基于服务商原生工具调用（function calling）的Agent模式：
+每个ScholarTools工具以JSON Schema描述参数，模型直接返回结构化的工具调用，
+无需解析自由文本的Thought/Action/Action Input，格式错误不会额外消耗一轮LLM调用。
+同一步中的多个工具调用并发执行。
+"""
+
+import json
+import logging
+import time
+from collections import namedtuple
+from concurrent import futures
+from typing import List, Dict, Any, Optional, Callable
+
+from services.routing import ModelRouter, model_router
+from services.prompt_cache import cached_prompt_tokens
+from services.deadline import DeadlineExceeded
+from .tools import ScholarTools, carry_tool_state
+from .prompts import FUNCTION_AGENT_SYSTEM_PROMPT
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 与ReAct模式的AgentAction兼容的工具调用记录（step[0].tool）
+ToolStep = namedtuple("ToolStep", ["tool", "tool_input"])
+
+_PAPER_ID = {"type": "string", "description": "论文的arXiv ID（来自search_arxiv结果，如 2304.02643v4），也可用'论文N'表示最近检索结果的第N篇"}
+
+# 各工具的JSON Schema描述
+TOOL_SCHEMAS = [
+    {
+        "name": "search_arxiv",
+        "description": "搜索Arxiv论文，返回论文的arXiv ID、标题、年份和一句话要点",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "search_type": {"type": "string", "enum": ["title", "author", "keywords"], "description": "按标题、作者或关键词搜索"},
+                "query": {"type": "string", "description": "搜索内容"}
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "get_paper_details",
+        "description": "获取论文的完整信息（作者、分类、完整摘要、PDF链接）",
+        "parameters": {"type": "object", "properties": {"arxiv_id": _PAPER_ID}, "required": ["arxiv_id"]}
+    },
+    {
+        "name": "summarize_contributions",
+        "description": "总结论文的研究贡献",
+        "parameters": {"type": "object", "properties": {"arxiv_id": _PAPER_ID}, "required": ["arxiv_id"]}
+    },
+    {
+        "name": "summarize_methods",
+        "description": "总结论文的技术方法",
+        "parameters": {"type": "object", "properties": {"arxiv_id": _PAPER_ID}, "required": ["arxiv_id"]}
+    },
+    {
+        "name": "answer_question",
+        "description": "基于论文信息回答用户问题，省略arxiv_id时使用最近检索的论文",
+        "parameters": {
+            "type": "object",
+            "properties": {"question": {"type": "string", "description": "用户问题"}, "arxiv_id": _PAPER_ID},
+            "required": ["question"]
+        }
+    },
+    {
+        "name": "generate_key_points",
+        "description": "生成论文的关键信息点",
+        "parameters": {"type": "object", "properties": {"arxiv_id": _PAPER_ID}, "required": ["arxiv_id"]}
+    },
+    {
+        "name": "batch_analyze",
+        "description": "一次并发分析多篇论文（需要对多篇论文做同类分析时使用）",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "arxiv_ids": {"type": "array", "items": _PAPER_ID, "description": "论文列表"},
+                "facets": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": ["contributions", "methods", "key_points"]},
+                    "description": "分析维度，默认contributions"
+                }
+            },
+            "required": ["arxiv_ids"]
+        }
+    },
+    {
+        "name": "compare_papers",
+        "description": "比较两篇论文的异同点",
+        "parameters": {
+            "type": "object",
+            "properties": {"arxiv_id_1": _PAPER_ID, "arxiv_id_2": _PAPER_ID},
+            "required": ["arxiv_id_1", "arxiv_id_2"]
+        }
+    }
+]
+
+# 结构化参数到ScholarTools工具输入字符串的转换
+_TOOL_INPUTS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "search_arxiv": lambda args: f"{args.get('search_type') or 'keywords'}:{args['query']}",
+    "get_paper_details": lambda args: args["arxiv_id"],
+    "summarize_contributions": lambda args: args["arxiv_id"],
+    "summarize_methods": lambda args: args["arxiv_id"],
+    "answer_question": lambda args: f"{args['question']}|{args.get('arxiv_id') or ''}",
+    "generate_key_points": lambda args: args["arxiv_id"],
+    "batch_analyze": lambda args: f"{','.join(args['arxiv_ids'])}|{','.join(args.get('facets') or [])}",
+    "compare_papers": lambda args: f"{args['arxiv_id_1']}|{args['arxiv_id_2']}"
+}
+
+class FunctionCallingAgent:
+    """基于原生工具调用的Agent"""
+
+    def __init__(
+        self,
+        tools: ScholarTools,
+        router: Optional[ModelRouter] = None,
+        model_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_iterations: int = 10,
+        max_parallel_tools: int = 8,
+        task: str = "agent.function"
+    ):
+        """
+        初始化函数调用Agent
+
+        Args:
+            tools: 工具集合（与ReAct模式共用会话论文注册表和备忘录）
+            router: 模型路由，默认使用全局实例
+            model_name: 使用的LLM模型名称，None表示按路由表选择
+            temperature: 生成温度参数，None表示使用路由表中的温度
+            max_iterations: 最大迭代次数（每次迭代为一次LLM调用）
+            max_parallel_tools: 同一步中并发执行的最大工具数
+            task: 模型路由任务名称
+        """
+        self.tools = tools
+        self.router = router or model_router
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_iterations = max_iterations
+        self.max_parallel_tools = max_parallel_tools
+        self.task = task
+        self.tool_funcs = {tool.name: tool.func for tool in tools.get_available_tools()}
+        self.tool_specs = [
+            {"type": "function", "function": schema}
+            for schema in TOOL_SCHEMAS if schema["name"] in self.tool_funcs
+        ]
+
+    def _execute_call(self, call: Dict[str, Any]) -> str:
+        """执行单个工具调用，参数错误以工具输出的形式返回给模型"""
+        name = call["function"]["name"]
+        if name not in self.tool_funcs:
+            return f"未知工具: {name}"
+        try:
+            args = json.loads(call["function"].get("arguments") or "{}")
+            tool_input = _TOOL_INPUTS[name](args)
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            return f"工具参数错误: {e}，请按参数说明重新调用。"
+        return self.tool_funcs[name](tool_input)
+
+    def _execute_calls(self, calls: List[Dict[str, Any]]) -> List[str]:
+        """并发执行同一步中的多个工具调用"""
+        if len(calls) == 1:
+            return [self._execute_call(calls[0])]
+        workers = min(len(calls), self.max_parallel_tools)
+        with futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="function-tool") as executor:
+            return list(executor.map(carry_tool_state(self._execute_call), calls))
+
+    def run(self, user_input: str, history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """
+        运行Agent
+
+        Args:
+            user_input: 用户输入（可包含会话上下文）
+            history: 之前的对话消息（OpenAI格式）
+
+        Returns:
+            Dict[str, Any]: 包含output、intermediate_steps、iterations、latency和token_usage的字典，
+                超出截止时间时output为None、partial为True，intermediate_steps为已完成的工具调用
+
+        Raises:
+            CircuitOpenError: LLM端点全部熔断
+        """
+        start = time.perf_counter()
+        messages: List[Dict[str, Any]] = [{"role": "system", "content": FUNCTION_AGENT_SYSTEM_PROMPT}]
+        messages.extend(history or [])
+        messages.append({"role": "user", "content": user_input})
+        steps = []
+        usages = []
+        output = None
+        partial = False
+
+        try:
+            for _ in range(self.max_iterations):
+                response = self.router.complete(self.task, messages, model=self.model_name,
+                                                temperature=self.temperature, tools=self.tool_specs)
+                usages.append(response.usage)
+                if not response.tool_calls:
+                    output = response.content
+                    break
+
+                messages.append({"role": "assistant", "content": response.content, "tool_calls": response.tool_calls})
+                observations = self._execute_calls(response.tool_calls)
+                for call, observation in zip(response.tool_calls, observations):
+                    messages.append({"role": "tool", "tool_call_id": call["id"], "content": observation})
+                    steps.append((ToolStep(call["function"]["name"], call["function"].get("arguments", "")), observation))
+
+            if output is None:
+                # 达到最大迭代次数：不再提供工具，要求模型基于已有结果作答
+                logger.warning(f"函数调用Agent达到最大迭代次数 {self.max_iterations}")
+                messages.append({"role": "user", "content": "请根据以上工具结果直接给出最终回答。"})
+                response = self.router.complete(self.task, messages, model=self.model_name,
+                                                temperature=self.temperature)
+                usages.append(response.usage)
+                output = response.content
+        except DeadlineExceeded as e:
+            logger.warning(f"函数调用Agent超出截止时间，返回部分结果: {e}")
+            output, partial = None, True
+
+        return {
+            "output": output,
+            "partial": partial,
+            "intermediate_steps": steps,
+            "iterations": len(usages),
+            "latency": time.perf_counter() - start,
+            "token_usage": {
+                "iterations": len(usages),
+                "prompt_tokens_per_iteration": [usage.get("prompt_tokens", 0) for usage in usages],
+                "prompt_tokens": sum(usage.get("prompt_tokens", 0) for usage in usages),
+                "completion_tokens": sum(usage.get("completion_tokens", 0) for usage in usages),
+                "cached_tokens": sum(cached_prompt_tokens(usage) for usage in usages)
+            }
+        }
@@ -0,0 +1,272 @@
+"""
+意图快速通道模块
+
+许多请求的意图是明确的（"请搜索论文 X"、"总结这篇论文"），但经过ReAct循环时，
+第一个工具运行前至少要进行两次LLM调用。该模块在Agent之前用规则和关键词分类器识别这类请求，
+直接调用检索和总结工具（即ArxivSearchService与SummarizeService）；
+"这篇论文"解析为会话的当前论文，开放式请求（比较、解释、多步任务等）仍交给Agent处理。
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Callable
+
+from services.search import PaperInfo
+from services.circuit_breaker import CircuitOpenError
+from .tools import ScholarTools
+from .paper_registry import normalize_arxiv_id
+from .function_agent import ToolStep
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 请求开头的礼貌用语
+_POLITE_PREFIX = re.compile(r'^(?:请你?|帮我|麻烦你?|可以|能不能|给我)+\s*')
+# 请求末尾的标点
+_TRAILING_PUNCT = re.compile(r'[\s。？?！!.，,；;]+$')
+
+# 检索请求：(模式, 搜索类型)，按顺序匹配
+_SEARCH_VERB = r'(?:搜索|检索|查找|查询|搜一下|找一下|搜|找)(?:一下)?\s*'
+_SEARCH_PATTERNS = [
+    (re.compile(_SEARCH_VERB + r'作者\s*[:：]?\s*(?P<query>.+?)\s*(?:发表|写)?的?(?:论文|文章)?$'), "author"),
+    (re.compile(_SEARCH_VERB + r'(?:关于|有关)\s*(?P<query>.+?)\s*的?(?:论文|文章|研究)?$'), "keywords"),
+    (re.compile(_SEARCH_VERB + r'(?P<query>.+?)\s*(?:相关|方面)的?(?:论文|文章|研究)$'), "keywords"),
+    (re.compile(_SEARCH_VERB + r'(?:论文|文章|标题为)\s*[:：]?\s*(?P<query>.+)$'), "title")
+]
+# 检索请求中出现这些词说明是多步任务
+_SEARCH_COMPOUND = ("并", "然后", "再", "总结", "比较", "对比", "分析", "回答")
+
+# 单篇论文请求的关键词分类器：意图 -> {关键词: 权重}
+_INTENT_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "contributions": {"研究贡献": 1.0, "主要贡献": 1.0, "贡献": 0.9, "创新点": 0.9, "总结": 0.6, "概括": 0.6, "归纳": 0.6},
+    "methods": {"技术方法": 1.0, "主要方法": 1.0, "技术路线": 0.9, "方法": 0.8},
+    "key_points": {"关键信息点": 1.0, "关键信息": 1.0, "关键点": 1.0, "要点": 0.9},
+    "details": {"详细信息": 1.0, "详情": 1.0, "PDF链接": 1.0, "pdf链接": 1.0, "基本信息": 0.9}
+}
+# 意图到工具名称的映射
+_INTENT_TOOLS = {
+    "search": "search_arxiv",
+    "contributions": "summarize_contributions",
+    "methods": "summarize_methods",
+    "key_points": "generate_key_points",
+    "details": "get_paper_details"
+}
+_INTENT_TITLES = {
+    "contributions": "研究贡献",
+    "methods": "技术方法",
+    "key_points": "关键信息点",
+    "details": "详细信息"
+}
+# 单篇论文请求中出现这些词说明是开放式问题
+_OPEN_ENDED = ("比较", "对比", "异同", "区别", "差异", "为什么", "如何", "怎么", "怎样", "是否", "能否",
+               "哪篇", "推荐", "解释", "评价", "局限", "优缺点", "和", "与", "以及", "分别", "每篇")
+
+# 单篇论文请求的动词与问句结尾
+_PAPER_VERB = re.compile(r'^(?:总结|概括|归纳|生成|给出|列出|提取|获取|查看|显示|介绍|说明)(?:一下)?\s*')
+_QUESTION_SUFFIX = re.compile(r'\s*(?:是什么|有哪些|有什么|是啥|是哪些)$')
+_FACET_MODIFIER = re.compile(r'\s*的?\s*(?:主要|核心)?$')
+# 指代会话当前论文的说法
+_THIS_PAPER = ("这篇论文", "这篇文章", "该论文", "此论文", "本文", "这篇", "它")
+_QUOTED = re.compile(r'^["\'“‘《](?P<title>.+?)["\'”’》]$')
+_INDEX_REFERENCE = re.compile(r'^(?:论文|#)\s*\d+$')
+_CJK = re.compile(r'[一-鿿]')
+
+@dataclass
+class Intent:
+    """识别出的请求意图"""
+    name: str                   # search、contributions、methods、key_points或details
+    target: str                 # 检索内容或论文引用（空字符串表示会话当前论文）
+    confidence: float
+    search_type: str = "keywords"
+
+class IntentRouter:
+    """Agent前的意图快速通道"""
+
+    def __init__(self, tools: ScholarTools, tool_funcs: Optional[Dict[str, Callable[[str], str]]] = None,
+                 min_confidence: float = 0.6):
+        """
+        初始化意图路由
+
+        Args:
+            tools: 工具集合（与Agent共用会话论文注册表和备忘录）
+            tool_funcs: 工具名称到工具函数的映射（使用Agent的带备忘录版本），默认从tools获取
+            min_confidence: 意图分类置信度低于该值时交给Agent处理
+        """
+        self.tools = tools
+        self.tool_funcs = tool_funcs or {tool.name: tool.func for tool in tools.get_available_tools()}
+        self.min_confidence = min_confidence
+        self.stats = {"routed": 0, "fallback": 0}
+
+    @property
+    def registry(self):
+        """当前会话的论文注册表"""
+        return self.tools.registry
+
+    def classify(self, user_input: str) -> Optional[Intent]:
+        """
+        识别请求意图
+
+        Args:
+            user_input: 用户输入
+
+        Returns:
+            Optional[Intent]: 识别出的意图，开放式请求或置信度不足时返回None
+        """
+        text = _TRAILING_PUNCT.sub("", _POLITE_PREFIX.sub("", user_input.strip()))
+        if not text or "\n" in text:
+            return None
+
+        intent = self._classify_search(text) or self._classify_paper(text)
+        if intent is None or intent.confidence < self.min_confidence:
+            return None
+        return intent
+
+    def _classify_search(self, text: str) -> Optional[Intent]:
+        """识别检索请求"""
+        for pattern, search_type in _SEARCH_PATTERNS:
+            match = pattern.match(text)
+            if not match:
+                continue
+            query = match.group("query").strip().strip("'\"“”‘’《》")
+            if not query or any(word in query for word in _SEARCH_COMPOUND):
+                return None
+            confidence = 0.9 if search_type == "keywords" else 1.0
+            return Intent("search", query, confidence, search_type)
+        return None
+
+    def _classify_paper(self, text: str) -> Optional[Intent]:
+        """识别单篇论文的总结、方法、关键点、详情请求"""
+        if any(word in text for word in _OPEN_ENDED):
+            return None
+
+        # 关键词分类：取各意图命中的最高权重，多个意图同时命中时降低置信度（需要多个工具，交给Agent）
+        scores = {}
+        for name, keywords in _INTENT_KEYWORDS.items():
+            hits = [weight for keyword, weight in keywords.items() if keyword in text]
+            if hits:
+                scores[name] = max(hits)
+        if not scores:
+            return None
+        # "总结这篇论文的方法"中"总结"只是动词，以具体维度为准
+        if len(scores) > 1 and scores.get("contributions", 1.0) <= 0.6:
+            del scores["contributions"]
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        name, confidence = ranked[0]
+        if len(ranked) > 1:
+            confidence -= 0.5 * ranked[1][1]
+
+        # 去掉动词、问句结尾和维度关键词，剩余部分为论文引用
+        rest = _QUESTION_SUFFIX.sub("", _PAPER_VERB.sub("", text))
+        for keyword in sorted(_INTENT_KEYWORDS[name], key=len, reverse=True):
+            if rest.endswith(keyword):
+                rest = rest[:-len(keyword)]
+                break
+        else:
+            if name != "contributions":
+                return None
+        rest = _FACET_MODIFIER.sub("", rest).strip()
+
+        target = self._parse_reference(rest)
+        if target is None:
+            return None
+        return Intent(name, target, confidence)
+
+    def _parse_reference(self, text: str) -> Optional[str]:
+        """
+        解析论文引用
+
+        只接受明确的引用："这篇论文"等指代（返回空字符串）、以"论文"开头或加引号的标题、
+        arXiv ID、"论文N"序号或会话中已有的论文标题；其余内容交给Agent判断。
+
+        Args:
+            text: 去掉意图关键词后的文本
+
+        Returns:
+            Optional[str]: 论文引用，无法确定时返回None
+        """
+        if not text or text in _THIS_PAPER:
+            return ""
+        if _INDEX_REFERENCE.match(text):
+            return text
+
+        explicit = False
+        for prefix in ("论文", "文章"):
+            if text.startswith(prefix):
+                text, explicit = text[len(prefix):].strip(" :："), True
+                break
+        quoted = _QUOTED.match(text)
+        if quoted:
+            text, explicit = quoted.group("title").strip(), True
+        # arXiv标题为英文，包含中文的剩余文本说明请求并非单纯的"维度+论文"
+        if not text or _CJK.search(text):
+            return None
+        if explicit or normalize_arxiv_id(text) or self.registry.resolve(text) is not None:
+            return text
+        return None
+
+    def _resolve_target(self, target: str) -> Optional[PaperInfo]:
+        """
+        将论文引用解析为论文信息，会话中没有时按标题检索
+
+        Args:
+            target: 论文引用（空字符串表示会话当前论文）
+
+        Returns:
+            Optional[PaperInfo]: 论文信息，无法解析时返回None
+
+        Raises:
+            CircuitOpenError: Arxiv API处于熔断状态
+        """
+        if not target:
+            return self.registry.current()
+        paper = self.registry.resolve(target)
+        if paper is None and not normalize_arxiv_id(target):
+            results = self.tools.search_papers("title", target)
+            lowered = target.lower()
+            paper = next((p for p in results if p.title.lower() == lowered), results[0] if results else None)
+        return paper
+
+    def route(self, user_input: str) -> Optional[Dict[str, Any]]:
+        """
+        尝试通过快速通道处理请求
+
+        Args:
+            user_input: 用户输入
+
+        Returns:
+            Optional[Dict[str, Any]]: 包含output、intermediate_steps和intent的结果（与Agent执行结果兼容），
+                不适合快速通道时返回None
+        """
+        intent = self.classify(user_input)
+        if intent is None:
+            return None
+
+        tool_name = _INTENT_TOOLS[intent.name]
+        try:
+            if intent.name == "search":
+                tool_input = f"{intent.search_type}:{intent.target}"
+                observation = self.tool_funcs[tool_name](tool_input)
+                output = f"为您找到以下论文：\n{observation}" if observation.startswith("论文1") else observation
+            else:
+                paper = self._resolve_target(intent.target)
+                if paper is None:
+                    logger.info(f"快速通道无法确定论文'{intent.target or '这篇论文'}'，交给Agent处理")
+                    self.stats["fallback"] += 1
+                    return None
+                self.registry.focus(paper)
+                tool_input = self.registry.handle_of(paper)
+                observation = self.tool_funcs[tool_name](tool_input)
+                output = f"《{paper.title}》的{_INTENT_TITLES[intent.name]}：\n{observation}"
+        except CircuitOpenError as e:
+            observation = output = self.tools._circuit_open_message(e)
+            tool_input = intent.target
+
+        self.stats["routed"] += 1
+        logger.info(f"快速通道处理: {intent.name} -> {tool_name}({tool_input})")
+        return {
+            "output": output,
+            "intermediate_steps": [(ToolStep(tool_name, tool_input), observation)],
+            "intent": intent.name
+        }
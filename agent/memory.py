@@ -0,0 +1,251 @@
+"""
+对话记忆模块
+
+ConversationBufferMemory会逐轮无限增长，长会话的每次请求越来越慢、越来越贵。
+该模块保留最近若干轮对话的原文，把更早的轮次合并进增量更新的滚动摘要，
+摘要在回答返回后于后台生成，对话历史区域始终不超过硬性token预算。
+
+为了让前缀缓存在多轮之间保持有效，较早的轮次按批（每批keep_turns轮）合并进摘要，
+而不是每轮都改写摘要：两次合并之间，历史文本只在末尾追加。
+"""
+
+import logging
+import threading
+from concurrent import futures
+from typing import List, Dict, Any, Optional, Tuple
+
+from services.routing import ModelRouter, model_router
+from services.tokens import estimate_tokens, truncate_to_tokens
+from services.metering import carry_labels
+from .prompts import MEMORY_SUMMARY_PROMPT
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 所有会话共用的后台摘要线程池（同一会话同时最多只有一个合并任务，用量计入提交摘要的会话）
+_summary_executor = futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="memory-summary")
+
+class SummarizingMemory:
+    """带滚动摘要和token预算的对话记忆"""
+
+    def __init__(
+        self,
+        router: Optional[ModelRouter] = None,
+        keep_turns: int = 4,
+        max_tokens: int = 2000,
+        summary_tokens: int = 600,
+        background: bool = True,
+        human_prefix: str = "用户",
+        ai_prefix: str = "ScholarAgent"
+    ):
+        """
+        初始化对话记忆
+
+        Args:
+            router: 模型路由，默认使用全局实例
+            keep_turns: 至少保留原文的最近轮数（原文超过2倍该值时，最早的keep_turns轮合并进摘要）
+            max_tokens: 对话历史区域的硬性token预算
+            summary_tokens: 滚动摘要的token上限
+            background: 是否在后台生成摘要（否则在save_turn中同步生成）
+            human_prefix: 用户发言前缀
+            ai_prefix: 助手发言前缀
+        """
+        self.router = router or model_router
+        self.keep_turns = max(1, keep_turns)
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.background = background
+        self.human_prefix = human_prefix
+        self.ai_prefix = ai_prefix
+
+        self.summary = ""
+        self.turns: List[Tuple[str, str]] = []
+        self.summarized_turns = 0
+        self.summary_calls = 0
+        self.summary_failures = 0
+        self._folding = 0               # 正在合并进摘要的轮数（位于turns开头）
+        self._future: Optional[futures.Future] = None
+        self._lock = threading.Lock()
+
+    def save_turn(self, user_input: str, answer: str):
+        """
+        记录一轮对话，必要时在后台把较早的轮次合并进摘要
+
+        Args:
+            user_input: 用户输入
+            answer: 助手回答
+        """
+        with self._lock:
+            self.turns.append((user_input, answer))
+            should_fold = not self._folding and len(self.turns) > 2 * self.keep_turns
+            if should_fold:
+                self._folding = self.keep_turns
+        if should_fold:
+            if self.background:
+                self._future = _summary_executor.submit(carry_labels(self._fold))
+            else:
+                self._fold()
+
+    def _format_turns(self, turns: List[Tuple[str, str]]) -> str:
+        """对话轮次的文本形式"""
+        return "\n".join(f"{self.human_prefix}: {user}\n{self.ai_prefix}: {answer}" for user, answer in turns)
+
+    def _fold(self):
+        """把最早的一批轮次合并进摘要（失败时保留原文，下次再试）"""
+        with self._lock:
+            batch = self.turns[:self._folding]
+            summary = self.summary
+        max_chars = self.summary_tokens  # 中文约每字一个token
+        prompt = MEMORY_SUMMARY_PROMPT.format(
+            summary=summary or "（无）",
+            turns=self._format_turns(batch),
+            max_chars=max_chars
+        )
+        try:
+            response = self.router.complete("memory.summarize", [{"role": "user", "content": prompt}])
+            new_summary = truncate_to_tokens(response.content.strip(), self.summary_tokens)
+        except Exception as e:
+            logger.warning(f"生成对话摘要失败，保留原文: {e}")
+            with self._lock:
+                self.summary_failures += 1
+                self._folding = 0
+            return
+
+        with self._lock:
+            self.summary = new_summary
+            del self.turns[:len(batch)]
+            self.summarized_turns += len(batch)
+            self.summary_calls += 1
+            self._folding = 0
+            should_fold = len(self.turns) > 2 * self.keep_turns
+            if should_fold:
+                self._folding = self.keep_turns
+        if should_fold:
+            self._fold()
+
+    def wait(self, timeout: Optional[float] = None):
+        """等待后台摘要完成"""
+        future = self._future
+        if future is not None:
+            futures.wait([future], timeout=timeout)
+
+    def load(self) -> str:
+        """
+        获取对话历史文本（不超过token预算）
+
+        超出预算时依次丢弃：最早的原文轮次（至少保留最近一轮）、摘要的后半部分、最近一轮的较早内容。
+
+        Returns:
+            str: 对话历史文本
+        """
+        summary, turns = self._budgeted()
+        parts = []
+        if summary:
+            parts.append(f"此前对话摘要：{summary}")
+        if turns:
+            parts.append(self._format_turns(turns))
+        return "\n".join(parts)
+
+    def messages(self) -> List[Dict[str, str]]:
+        """
+        获取OpenAI格式的对话历史消息（预算与load相同）
+
+        Returns:
+            List[Dict[str, str]]: 消息列表，摘要作为第一条system消息
+        """
+        summary, turns = self._budgeted()
+        result = [{"role": "system", "content": f"此前对话摘要：{summary}"}] if summary else []
+        for user, answer in turns:
+            result.append({"role": "user", "content": user})
+            result.append({"role": "assistant", "content": answer})
+        return result
+
+    def _budgeted(self) -> Tuple[str, List[Tuple[str, str]]]:
+        """在token预算内选取摘要与原文轮次"""
+        with self._lock:
+            summary, turns = self.summary, list(self.turns)
+
+        budget = self.max_tokens
+        summary_cost = estimate_tokens(summary) + 8 if summary else 0
+        costs = [estimate_tokens(self._format_turns([turn])) for turn in turns]
+        while len(turns) > 1 and summary_cost + sum(costs) > budget:
+            turns.pop(0)
+            costs.pop(0)
+        if summary and summary_cost + sum(costs) > budget:
+            summary = truncate_to_tokens(summary, max(budget - sum(costs) - 8, 0))
+            summary_cost = estimate_tokens(summary) + 8 if summary else 0
+        if turns and summary_cost + costs[0] > budget:
+            # 单轮对话本身超出预算：保留问题，截断回答的开头
+            user, answer = turns[0]
+            user = truncate_to_tokens(user, budget // 4)
+            remaining = budget - summary_cost - estimate_tokens(self._format_turns([(user, "")]))
+            turns = [(user, truncate_to_tokens(answer, max(remaining, 0), keep="tail"))]
+        return summary, turns
+
+    def token_count(self) -> int:
+        """当前对话历史文本的估算token数"""
+        return estimate_tokens(self.load())
+
+    def clear(self):
+        """清空记忆（先等待进行中的后台摘要完成）"""
+        self.wait()
+        with self._lock:
+            self.summary = ""
+            self.turns = []
+            self._folding = 0
+
+    def export_state(self, timeout: Optional[float] = 30.0) -> Dict[str, Any]:
+        """
+        导出记忆状态（先等待进行中的后台摘要，恢复后无需重新生成）
+
+        Args:
+            timeout: 等待后台摘要的最长秒数
+
+        Returns:
+            Dict[str, Any]: 可JSON序列化的状态
+        """
+        self.wait(timeout)
+        with self._lock:
+            return {
+                "summary": self.summary,
+                "turns": [list(turn) for turn in self.turns],
+                "summarized_turns": self.summarized_turns,
+                "summary_calls": self.summary_calls
+            }
+
+    def import_state(self, state: Dict[str, Any]):
+        """
+        导入export_state导出的状态（替换现有记忆）
+
+        Args:
+            state: 记忆状态
+        """
+        self.wait()
+        with self._lock:
+            self.summary = state.get("summary", "")
+            self.turns = [tuple(turn) for turn in state.get("turns", [])]
+            self.summarized_turns = state.get("summarized_turns", 0)
+            self.summary_calls = state.get("summary_calls", 0)
+            self._folding = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取记忆统计
+
+        Returns:
+            Dict[str, Any]: 原文轮数、已摘要轮数、摘要与历史的token数、摘要调用次数
+        """
+        with self._lock:
+            verbatim, summarized = len(self.turns), self.summarized_turns
+            calls, failures = self.summary_calls, self.summary_failures
+            summary_tokens = estimate_tokens(self.summary)
+        return {
+            "verbatim_turns": verbatim,
+            "summarized_turns": summarized,
+            "summary_tokens": summary_tokens,
+            "history_tokens": self.token_count(),
+            "max_tokens": self.max_tokens,
+            "summary_calls": calls,
+            "summary_failures": failures
+        }
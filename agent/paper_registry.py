@@ -0,0 +1,362 @@
+"""
+会话论文注册表模块
+
+该模块保存当前会话中检索到的论文（PaperInfo），工具之间通过简短的句柄（arXiv ID）
+传递论文，在服务端解析为完整的论文信息，而不是让Agent在Action Input中复制标题和摘要。
+注册表以不含版本号的arXiv ID为键、按最近使用顺序排列，超出容量时淘汰最久未使用的论文，
+并维护标题和作者的二级索引，按ID、标题、作者查找以及获取最近论文都是O(1)。
+"""
+
+import re
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import List, Dict, Any, Optional, Set
+
+from services.search import arxiv_service, PaperInfo
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 新格式（2304.02643v4）与旧格式（cs/0101001v1）的arXiv ID
+_ARXIV_ID_PATTERN = re.compile(r'(\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(v\d+)?', re.IGNORECASE)
+# 按检索结果序号引用论文，如 "论文2"、"#2"
+_INDEX_PATTERN = re.compile(r'^(?:论文|#)\s*(\d+)$')
+
+def normalize_arxiv_id(text: str) -> Optional[str]:
+    """
+    从文本中提取不含版本号的arXiv ID
+
+    Args:
+        text: 包含arXiv ID的文本（如 "arXiv:2304.02643v4"）
+
+    Returns:
+        Optional[str]: arXiv ID（如 "2304.02643"），未找到时返回None
+    """
+    match = _ARXIV_ID_PATTERN.search(text)
+    return match.group(1) if match else None
+
+def parse_paper_text(text: str) -> Optional[PaperInfo]:
+    """
+    解析format_paper_info格式的论文文本（兼容Agent直接传入论文信息的情况）
+
+    摘要可以跨多行，直到下一个字段（如 "PDF链接:"）为止。
+
+    Args:
+        text: 论文信息文本
+
+    Returns:
+        Optional[PaperInfo]: 论文信息，缺少摘要时返回None
+    """
+    fields = {"标题": "", "作者": "", "Arxiv ID": "", "发布日期": "", "分类": "", "摘要": "", "PDF链接": ""}
+    current = None
+    for line in text.split('\n'):
+        stripped = line.strip()
+        key = next((k for k in fields if stripped.startswith(f"{k}:")), None)
+        if key is not None:
+            current = key
+            fields[key] = stripped[len(key) + 1:].strip()
+        elif current == "摘要" and stripped:
+            fields["摘要"] += " " + stripped
+
+    if not fields["摘要"]:
+        return None
+    return PaperInfo(
+        title=fields["标题"],
+        authors=[a.strip() for a in fields["作者"].split(",") if a.strip()],
+        abstract=fields["摘要"],
+        arxiv_id=fields["Arxiv ID"],
+        published_date=fields["发布日期"],
+        categories=[c.strip() for c in fields["分类"].split(",") if c.strip()],
+        pdf_url=fields["PDF链接"]
+    )
+
+class PaperRegistry:
+    """会话论文注册表"""
+
+    def __init__(self, fetch_missing: bool = True, max_papers: int = 200):
+        """
+        初始化注册表
+
+        Args:
+            fetch_missing: 句柄未注册但形如arXiv ID时，是否从Arxiv API按ID获取
+            max_papers: 最多保存的论文数，超出时淘汰最久未使用的论文
+        """
+        self.fetch_missing = fetch_missing
+        self.max_papers = max_papers
+        self._papers: "OrderedDict[str, PaperInfo]" = OrderedDict()
+        self._by_title: Dict[str, str] = {}
+        self._by_author: Dict[str, Set[str]] = {}
+        self._last_results: List[str] = []
+        self._current: Optional[str] = None
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._papers)
+
+    def register(self, paper: PaperInfo) -> str:
+        """
+        注册论文
+
+        Args:
+            paper: 论文信息
+
+        Returns:
+            str: 论文句柄（arXiv ID）
+        """
+        key = self._key_of(paper)
+        with self._lock:
+            self._remove(key)
+            self._papers[key] = paper
+            self._by_title[paper.title.lower()] = key
+            for author in paper.authors:
+                self._by_author.setdefault(author.lower(), set()).add(key)
+            while len(self._papers) > self.max_papers:
+                self._remove(next(iter(self._papers)))
+                self.evictions += 1
+        return self.handle_of(paper)
+
+    def _remove(self, key: str):
+        """删除论文及其索引（调用方持有锁）"""
+        paper = self._papers.pop(key, None)
+        if paper is None:
+            return
+        if self._by_title.get(paper.title.lower()) == key:
+            del self._by_title[paper.title.lower()]
+        for author in paper.authors:
+            keys = self._by_author.get(author.lower())
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_author[author.lower()]
+
+    def _touch(self, key: str) -> Optional[PaperInfo]:
+        """按键取出论文并标记为最近使用（调用方持有锁）"""
+        paper = self._papers.get(key)
+        if paper is not None:
+            self._papers.move_to_end(key)
+        return paper
+
+    def register_results(self, papers: List[PaperInfo]) -> List[str]:
+        """
+        注册一次检索的结果，并记录顺序以支持"论文N"形式的引用
+
+        Args:
+            papers: 检索结果
+
+        Returns:
+            List[str]: 各论文的句柄
+        """
+        handles = [self.register(paper) for paper in papers]
+        with self._lock:
+            self._last_results = [normalize_arxiv_id(h) or h for h in handles]
+            if self._last_results:
+                self._current = self._last_results[0]
+        return handles
+
+    def _key_of(self, paper: PaperInfo) -> str:
+        """注册表中论文的键"""
+        return normalize_arxiv_id(paper.arxiv_id) or paper.arxiv_id or paper.title
+
+    def focus(self, paper: PaperInfo):
+        """将论文设为会话的当前论文（"这篇论文"所指的论文）"""
+        key = self._key_of(paper)
+        with self._lock:
+            if key in self._papers:
+                self._current = key
+
+    def current(self) -> Optional[PaperInfo]:
+        """
+        获取会话的当前论文
+
+        当前论文为最近一次检索的第一篇结果或最近一次单独引用的论文，
+        没有记录时返回最近注册的论文。
+
+        Returns:
+            Optional[PaperInfo]: 当前论文，注册表为空时返回None
+        """
+        with self._lock:
+            if self._current in self._papers:
+                return self._papers[self._current]
+            return self._latest()
+
+    def _latest(self) -> Optional[PaperInfo]:
+        """最近使用的论文（调用方持有锁）"""
+        return self._papers[next(reversed(self._papers))] if self._papers else None
+
+    def latest(self) -> Optional[PaperInfo]:
+        """
+        获取最近注册或使用的论文
+
+        Returns:
+            Optional[PaperInfo]: 论文信息，注册表为空时返回None
+        """
+        with self._lock:
+            return self._latest()
+
+    def last_results(self, limit: Optional[int] = None) -> List[PaperInfo]:
+        """
+        获取最近一次检索的结果（不改变最近使用顺序）
+
+        Args:
+            limit: 最多返回的篇数，None表示全部
+
+        Returns:
+            List[PaperInfo]: 论文列表（已被淘汰的论文除外）
+        """
+        with self._lock:
+            keys = self._last_results if limit is None else self._last_results[:limit]
+            return [self._papers[key] for key in keys if key in self._papers]
+
+    def by_author(self, author: str) -> List[PaperInfo]:
+        """
+        按作者查找已注册的论文
+
+        Args:
+            author: 作者姓名（不区分大小写）
+
+        Returns:
+            List[PaperInfo]: 该作者的论文（按arXiv ID排序）
+        """
+        with self._lock:
+            return [self._papers[key] for key in sorted(self._by_author.get(author.strip().lower(), ()))]
+
+    @staticmethod
+    def handle_of(paper: PaperInfo) -> str:
+        """论文句柄（arXiv ID，没有ID时使用标题）"""
+        return paper.arxiv_id or paper.title
+
+    def lookup(self, ref: str, touch: bool = True) -> Optional[PaperInfo]:
+        """
+        只在已注册的论文中查找（不访问网络）
+
+        依次尝试：最近检索结果的序号（"论文2"）、arXiv ID、已注册论文的标题。
+
+        Args:
+            ref: 论文句柄或引用
+            touch: 是否把找到的论文标记为最近使用（只用于打分等不算作使用的查找时传False）
+
+        Returns:
+            Optional[PaperInfo]: 论文信息，未注册时返回None
+        """
+        ref = ref.strip().strip("'\"`")
+        if not ref or "摘要:" in ref:
+            return None
+
+        with self._lock:
+            get = self._touch if touch else self._papers.get
+            index_match = _INDEX_PATTERN.match(ref)
+            if index_match:
+                position = int(index_match.group(1)) - 1
+                if 0 <= position < len(self._last_results):
+                    return get(self._last_results[position])
+
+            arxiv_id = normalize_arxiv_id(ref)
+            if arxiv_id and arxiv_id in self._papers:
+                return get(arxiv_id)
+            key = self._by_title.get(ref.lower())
+            return get(key) if key is not None else None
+
+    def resolve(self, ref: str) -> Optional[PaperInfo]:
+        """
+        将句柄解析为论文信息
+
+        先在已注册的论文中查找（见lookup），再尝试解析Agent直接传入的论文文本、
+        按ID从Arxiv API获取。
+
+        Args:
+            ref: 论文句柄或引用
+
+        Returns:
+            Optional[PaperInfo]: 论文信息，无法解析时返回None
+
+        Raises:
+            CircuitOpenError: 需要按ID获取论文但Arxiv API处于熔断状态
+        """
+        ref = ref.strip().strip("'\"`")
+        if not ref:
+            return None
+
+        paper = self.lookup(ref)
+        if paper is not None:
+            return paper
+
+        if "摘要:" in ref:
+            return parse_paper_text(ref)
+
+        arxiv_id = normalize_arxiv_id(ref)
+        if arxiv_id and self.fetch_missing:
+            paper = arxiv_service.get_paper_by_id(arxiv_id)
+            if paper is not None:
+                self.register(paper)
+                return paper
+        return None
+
+    def papers(self) -> List[PaperInfo]:
+        """
+        获取已注册的论文（按最近使用顺序，最近的在最后）
+
+        Returns:
+            List[PaperInfo]: 论文列表
+        """
+        with self._lock:
+            return list(self._papers.values())
+
+    def clear(self):
+        """清空注册表"""
+        with self._lock:
+            self._papers.clear()
+            self._by_title.clear()
+            self._by_author.clear()
+            self._last_results = []
+            self._current = None
+
+    def export_state(self) -> Dict[str, Any]:
+        """
+        导出注册表状态（论文按最近使用顺序）
+
+        Returns:
+            Dict[str, Any]: 可JSON序列化的状态
+        """
+        with self._lock:
+            return {
+                "papers": [asdict(paper) for paper in self._papers.values()],
+                "last_results": list(self._last_results),
+                "current": self._current
+            }
+
+    def import_state(self, state: Dict[str, Any]):
+        """
+        导入export_state导出的状态（替换现有论文）
+
+        Args:
+            state: 注册表状态
+        """
+        self.clear()
+        for paper in state.get("papers", []):
+            self.register(PaperInfo(**paper))
+        with self._lock:
+            self._last_results = [key for key in state.get("last_results", []) if key in self._papers]
+            current = state.get("current")
+            self._current = current if current in self._papers else None
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """
+        导出为以标题为键的论文信息字典（与原paper_cache格式一致）
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 论文信息
+        """
+        return {
+            paper.title: {
+                "title": paper.title,
+                "authors": ", ".join(paper.authors),
+                "arxiv_id": paper.arxiv_id,
+                "pdf_url": paper.pdf_url or (f"http://arxiv.org/pdf/{paper.arxiv_id}" if paper.arxiv_id else ""),
+                "abstract": paper.abstract
+            }
+            for paper in self.papers()
+        }
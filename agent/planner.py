@@ -0,0 +1,374 @@
+"""
+任务规划模块
+
+该模块实现规划-执行（plan-and-execute）模式：一次LLM调用生成工具调用的依赖图
+（如并发检索论文A和论文B，再比较两者），执行器并发运行互不依赖的步骤，
+只有步骤失败时才重新规划。多论文问题只需一次规划调用加上并行的工具耗时，
+而不是冗长的串行ReAct链。
+"""
+
+import re
+import json
+import time
+import logging
+from concurrent import futures
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable, Iterable, Tuple
+
+from services.routing import ModelRouter, model_router
+from services.prompt_cache import cached_prompt_tokens
+from services.circuit_breaker import CircuitOpenError
+from services.deadline import DeadlineExceeded
+from services.packing import strip_code_fence
+from .tools import ScholarTools, carry_tool_state, _is_uncacheable
+from .function_agent import ToolStep
+from .prompts import PLANNER_SYSTEM_PROMPT, REPLAN_PROMPT, PLAN_ANSWER_PROMPT
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 步骤输入中对其他步骤的引用，如 "{s1}"、"{s1.2}"
+_PLACEHOLDER = re.compile(r'\{(\w+)(?:\.(\d+))?\}')
+# 汇总时每个步骤输出的最大字符数
+_RESULT_CHARS = 3000
+
+class PlanError(ValueError):
+    """规划结果无法解析或不合法"""
+
+@dataclass
+class PlanStep:
+    """依赖图中的一个工具调用"""
+    id: str
+    tool: str
+    input: str
+    depends_on: List[str] = field(default_factory=list)
+
+@dataclass
+class Plan:
+    """工具调用依赖图"""
+    steps: List[PlanStep]
+    final: Optional[str] = None     # 输出即为最终回答的步骤
+    answer: Optional[str] = None    # 无需工具时的直接回答
+
+@dataclass
+class StepResult:
+    """步骤执行结果"""
+    output: str
+    ok: bool
+    handles: List[str] = field(default_factory=list)   # 检索步骤的结果论文句柄
+    skipped: bool = False
+    signature: Tuple[str, str] = ("", "")              # (工具, 代入引用前的输入)，判断重新规划的同ID步骤是否相同
+
+def parse_plan(content: str, tool_names: Iterable[str], known_ids: Iterable[str] = ()) -> Plan:
+    """
+    解析并校验规划结果
+
+    Args:
+        content: 模型输出的JSON
+        tool_names: 可用工具名称
+        known_ids: 已成功执行、可被引用的步骤ID（重新规划时）
+
+    Returns:
+        Plan: 依赖图，步骤的depends_on包含显式依赖和输入中引用的步骤
+
+    Raises:
+        PlanError: JSON无效、工具未知、依赖不存在或存在环
+    """
+    try:
+        data = json.loads(strip_code_fence(content))
+    except json.JSONDecodeError as e:
+        raise PlanError(f"规划结果不是有效的JSON: {e}")
+    if not isinstance(data, dict) or not isinstance(data.get("steps", []), list):
+        raise PlanError("规划结果缺少steps列表")
+
+    tool_names, known_ids = set(tool_names), set(known_ids)
+    steps: List[PlanStep] = []
+    for raw in data.get("steps", []):
+        if not isinstance(raw, dict) or not raw.get("id") or not raw.get("tool"):
+            raise PlanError(f"步骤格式错误: {raw}")
+        step_id, tool = str(raw["id"]), str(raw["tool"])
+        if tool not in tool_names:
+            raise PlanError(f"未知工具: {tool}")
+        tool_input = raw.get("input", "")
+        if not isinstance(tool_input, str):
+            tool_input = json.dumps(tool_input, ensure_ascii=False)
+        depends = [str(dep) for dep in raw.get("depends_on") or []]
+        depends += [ref for ref, _ in _PLACEHOLDER.findall(tool_input) if ref not in depends]
+        steps.append(PlanStep(step_id, tool, tool_input, depends))
+
+    ids = [step.id for step in steps]
+    if len(set(ids)) != len(ids):
+        raise PlanError("步骤ID重复")
+    for step in steps:
+        for dep in step.depends_on:
+            if dep not in ids and dep not in known_ids:
+                raise PlanError(f"步骤{step.id}依赖不存在的步骤{dep}")
+
+    # 拓扑检查：依赖图不能有环
+    remaining = {step.id: set(dep for dep in step.depends_on if dep in ids) for step in steps}
+    while remaining:
+        ready = [step_id for step_id, deps in remaining.items() if not deps]
+        if not ready:
+            raise PlanError(f"步骤依赖存在环: {', '.join(remaining)}")
+        for step_id in ready:
+            del remaining[step_id]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+    final = data.get("final")
+    if final is not None and str(final) not in ids:
+        raise PlanError(f"final指定的步骤{final}不存在")
+    answer = data.get("answer")
+    if not steps and not answer:
+        raise PlanError("规划结果既没有步骤也没有回答")
+    return Plan(steps, str(final) if final is not None else None, answer)
+
+class PlanAndExecuteAgent:
+    """规划-执行Agent"""
+
+    def __init__(
+        self,
+        tools: ScholarTools,
+        tool_funcs: Optional[Dict[str, Callable[[str], str]]] = None,
+        router: Optional[ModelRouter] = None,
+        model_name: Optional[str] = None,
+        max_parallel_steps: int = 8,
+        max_replans: int = 1
+    ):
+        """
+        初始化规划-执行Agent
+
+        Args:
+            tools: 工具集合（与其他模式共用会话论文注册表和备忘录）
+            tool_funcs: 工具名称到工具函数的映射（使用带备忘录的版本），默认从tools获取
+            router: 模型路由，默认使用全局实例
+            model_name: 使用的LLM模型名称，None表示按路由表选择
+            max_parallel_steps: 并发执行的最大步骤数
+            max_replans: 步骤失败后最多重新规划的次数
+        """
+        self.tools = tools
+        available = tools.get_available_tools()
+        self.tool_funcs = tool_funcs or {tool.name: tool.func for tool in available}
+        self.tool_descriptions = "\n".join(f"- {tool.name}: {tool.description}" for tool in available)
+        self.router = router or model_router
+        self.model_name = model_name
+        self.max_parallel_steps = max_parallel_steps
+        self.max_replans = max_replans
+
+    def _valid_plan(self, content: str, known_ids: Iterable[str] = ()) -> bool:
+        """规划结果校验（失败时由模型路由升级到更强的档位重试）"""
+        try:
+            parse_plan(content, self.tool_funcs, known_ids)
+            return True
+        except PlanError as e:
+            logger.warning(f"规划结果无效: {e}")
+            return False
+
+    def _substitute(self, step: PlanStep, results: Dict[str, StepResult]) -> str:
+        """
+        代入步骤输入中对其他步骤的引用
+
+        Raises:
+            PlanError: 引用的检索步骤没有第N篇结果
+        """
+        def replace(match):
+            result = results[match.group(1)]
+            if not result.handles:
+                return result.output
+            position = int(match.group(2) or 1)
+            if not 1 <= position <= len(result.handles):
+                raise PlanError(f"步骤{match.group(1)}只有{len(result.handles)}篇结果，无法引用第{position}篇")
+            return result.handles[position - 1]
+        return _PLACEHOLDER.sub(replace, step.input)
+
+    def _run_step(self, step: PlanStep, results: Dict[str, StepResult]) -> StepResult:
+        """执行单个步骤"""
+        try:
+            tool_input = self._substitute(step, results)
+            step.input = tool_input
+            if step.tool == "search_arxiv":
+                # 检索步骤直接获取结果列表，供后续步骤按 {步骤ID.N} 引用（并发检索时"论文N"的顺序不确定）
+                search_type, keywords = self.tools.parse_search_query(tool_input)
+                papers = self.tools.search_papers(search_type, keywords)
+                if not papers:
+                    return StepResult(f"未找到与'{keywords}'相关的论文。", ok=False)
+                return StepResult(
+                    self.tools.format_search_results(papers), ok=True,
+                    handles=[self.tools.registry.handle_of(paper) for paper in papers]
+                )
+            output = self.tool_funcs[step.tool](tool_input)
+            return StepResult(output, ok=not _is_uncacheable(output))
+        except CircuitOpenError as e:
+            return StepResult(self.tools._circuit_open_message(e), ok=False)
+        except DeadlineExceeded as e:
+            return StepResult(f"执行中止: {e}", ok=False)
+        except Exception as e:
+            logger.error(f"执行步骤{step.id}时发生错误: {e}")
+            return StepResult(f"执行失败: {e}", ok=False)
+
+    def execute(self, plan: Plan, results: Dict[str, StepResult]) -> List[PlanStep]:
+        """
+        按依赖关系并发执行依赖图
+
+        依赖全部成功的步骤立即提交执行；依赖失败的步骤标记为跳过。
+        重新规划时，ID、工具和输入都与已成功步骤相同的步骤直接沿用结果；
+        复用了ID但工具或输入不同的步骤（及依赖它的步骤）重新执行，执行前丢弃该ID的旧结果。
+
+        Args:
+            plan: 依赖图
+            results: 步骤结果（原地更新）
+
+        Returns:
+            List[PlanStep]: 本次执行的步骤（按完成顺序）
+        """
+        def reusable(step: PlanStep) -> bool:
+            previous = results.get(step.id)
+            return previous is not None and previous.ok and previous.signature == (step.tool, step.input)
+
+        pending = {step.id: step for step in plan.steps if not reusable(step)}
+        # 依赖（直接或间接）需要重新执行的步骤也要重新执行
+        changed = True
+        while changed:
+            changed = False
+            for step in plan.steps:
+                if step.id not in pending and any(dep in pending for dep in step.depends_on):
+                    pending[step.id] = step
+                    changed = True
+        for step_id in pending:
+            results.pop(step_id, None)
+        executed: List[PlanStep] = []
+        running: Dict[futures.Future, Tuple[PlanStep, Tuple[str, str]]] = {}
+        with futures.ThreadPoolExecutor(max_workers=self.max_parallel_steps, thread_name_prefix="plan-step") as executor:
+            while pending or running:
+                for step in list(pending.values()):
+                    deps = [results.get(dep) for dep in step.depends_on]
+                    if any(dep is not None and not dep.ok for dep in deps):
+                        results[step.id] = StepResult("依赖的步骤失败，未执行", ok=False, skipped=True)
+                        del pending[step.id]
+                    elif all(dep is not None for dep in deps):
+                        # 执行时输入会被代入引用，提交前记录原始输入
+                        signature = (step.tool, step.input)
+                        running[executor.submit(carry_tool_state(self._run_step), step, results)] = (step, signature)
+                        del pending[step.id]
+                if not running:
+                    break
+                done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    step, signature = running.pop(future)
+                    results[step.id] = future.result()
+                    results[step.id].signature = signature
+                    executed.append(step)
+        return executed
+
+    def _plan(self, messages: List[Dict[str, str]], known_ids: Iterable[str], usages: List[Dict[str, Any]]) -> Plan:
+        """调用LLM生成依赖图"""
+        known_ids = list(known_ids)
+        response = self.router.complete(
+            "agent.plan", messages, model=self.model_name,
+            validate=lambda content: self._valid_plan(content, known_ids)
+        )
+        usages.append(response.usage)
+        messages.append({"role": "assistant", "content": response.content})
+        return parse_plan(response.content, self.tool_funcs, known_ids)
+
+    @staticmethod
+    def _describe(steps: List[PlanStep], results: Dict[str, StepResult]) -> str:
+        """步骤及其输出的文本描述（用于重新规划和汇总）"""
+        lines = []
+        for step in steps:
+            output = results[step.id].output
+            if len(output) > _RESULT_CHARS:
+                output = output[:_RESULT_CHARS] + "..."
+            lines.append(f"[{step.id}] {step.tool}({step.input})\n{output}")
+        return "\n\n".join(lines) or "无"
+
+    def run(self, user_input: str, history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """
+        运行规划-执行Agent
+
+        Args:
+            user_input: 用户输入（可包含会话上下文）
+            history: 之前的对话消息（OpenAI格式）
+
+        Returns:
+            Dict[str, Any]: 包含output、intermediate_steps、plan、replans、latency和token_usage的字典，
+                超出截止时间时output为None、partial为True
+
+        Raises:
+            PlanError: 规划结果在升级重试后仍无效
+            CircuitOpenError: LLM端点全部熔断
+        """
+        start = time.perf_counter()
+        messages = [{"role": "system", "content": PLANNER_SYSTEM_PROMPT.format(tools=self.tool_descriptions)}]
+        messages.extend(history or [])
+        messages.append({"role": "user", "content": user_input})
+        usages: List[Dict[str, Any]] = []
+        results: Dict[str, StepResult] = {}
+        steps: Dict[str, PlanStep] = {}
+
+        replans = 0
+        output = None
+        partial = False
+        try:
+            plan = self._plan(messages, (), usages)
+            output = plan.answer if not plan.steps else None
+            while plan.steps:
+                steps.update((step.id, step) for step in plan.steps)
+                self.execute(plan, results)
+                failed = [step for step in plan.steps if not results[step.id].ok]
+                if not failed:
+                    break
+                retryable = not any(results[step.id].output.startswith(("服务暂时不可用", "执行中止")) for step in failed)
+                if replans >= self.max_replans or not retryable:
+                    break
+                replans += 1
+                logger.info(f"{len(failed)} 个步骤失败，重新规划（第 {replans} 次）")
+                succeeded = [step for step in steps.values() if results[step.id].ok]
+                messages.append({"role": "user", "content": REPLAN_PROMPT.format(
+                    completed=self._describe(succeeded, results),
+                    failed=self._describe(failed, results)
+                )})
+                plan = self._plan(messages, [step.id for step in succeeded], usages)
+                if not plan.steps:
+                    output = plan.answer
+                    break
+
+            if output is None:
+                final = results.get(plan.final) if plan.final else None
+                if final is not None and final.ok:
+                    output = final.output
+                else:
+                    response = self.router.complete("agent.plan.answer", [{"role": "user", "content": PLAN_ANSWER_PROMPT.format(
+                        question=user_input,
+                        results=self._describe([step for step in steps.values() if not results[step.id].skipped], results)
+                    )}], model=self.model_name)
+                    usages.append(response.usage)
+                    output = response.content
+        except DeadlineExceeded as e:
+            logger.warning(f"规划-执行Agent超出截止时间，返回部分结果: {e}")
+            output, partial = None, True
+
+        return {
+            "output": output,
+            "partial": partial,
+            "intermediate_steps": [
+                (ToolStep(step.tool, step.input), results[step.id].output)
+                for step in steps.values() if not results[step.id].skipped
+            ],
+            "plan": [
+                {"id": step.id, "tool": step.tool, "input": step.input, "depends_on": step.depends_on,
+                 "ok": results[step.id].ok}
+                for step in steps.values()
+            ],
+            "replans": replans,
+            "iterations": len(usages),
+            "latency": time.perf_counter() - start,
+            "token_usage": {
+                "iterations": len(usages),
+                "prompt_tokens_per_iteration": [usage.get("prompt_tokens", 0) for usage in usages],
+                "prompt_tokens": sum(usage.get("prompt_tokens", 0) for usage in usages),
+                "completion_tokens": sum(usage.get("completion_tokens", 0) for usage in usages),
+                "cached_tokens": sum(cached_prompt_tokens(usage) for usage in usages)
+            }
+        }
@@ -0,0 +1,143 @@
+"""
+推测预取模块
+
+检索论文之后，用户的下一轮请求多半是"总结这篇论文"或"主要方法是什么"。
+启用推测预取后，检索轮次的回答返回之后，在后台以低优先级为排名靠前的检索结果
+预先生成研究贡献、技术方法等分析，写入会话的工具备忘录；下一轮命中时直接返回。
+预取只在LLM端点空闲时进行，每个会话的预取调用数有上限，预取的用量计入发起检索的会话；
+正式请求到达时若同一结果仍在预取，会等待预取完成而不是重复调用。
+"""
+
+import logging
+import threading
+from concurrent import futures
+from typing import List, Dict, Any, Optional, Callable
+
+from services.llm_client import llm_client
+from services.search import PaperInfo
+from services.metering import carry_labels
+from .tools import ScholarTools, ToolState, use_tool_state, _is_uncacheable
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SpeculativePrefetcher:
+    """检索后的推测预取器（进程内共享，按会话计算预取上限）"""
+
+    def __init__(
+        self,
+        tools: ScholarTools,
+        facets: Optional[List[str]] = None,
+        top_n: int = 1,
+        max_calls_per_session: int = 6,
+        max_workers: int = 2,
+        busy_threshold: int = 4,
+        busy_fn: Optional[Callable[[], int]] = None
+    ):
+        """
+        初始化推测预取器
+
+        Args:
+            tools: 共享的工具集合
+            facets: 预取的分析工具名称，默认为研究贡献与技术方法
+            top_n: 为检索结果的前几篇预取
+            max_calls_per_session: 每个会话最多发起的预取调用数
+            max_workers: 预取线程数（低于前台并发，避免挤占正式请求）
+            busy_threshold: LLM端点池在途请求数达到该值时跳过预取
+            busy_fn: 返回当前在途请求数的函数，默认统计全局LLM端点池
+        """
+        self.tools = tools
+        self.facets = facets or ["summarize_contributions", "summarize_methods"]
+        self.top_n = top_n
+        self.max_calls_per_session = max_calls_per_session
+        self.busy_threshold = busy_threshold
+        self.busy_fn = busy_fn or self._outstanding_requests
+        self._methods = {
+            "summarize_contributions": tools.summarize_contributions_tool,
+            "summarize_methods": tools.summarize_methods_tool,
+            "generate_key_points": tools.generate_key_points_tool
+        }
+        unknown = [facet for facet in self.facets if facet not in self._methods]
+        if unknown:
+            raise ValueError(f"不支持预取的工具: {', '.join(unknown)}")
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self.stats = {"scheduled": 0, "completed": 0, "failed": 0, "skipped_budget": 0, "skipped_busy": 0}
+
+    @staticmethod
+    def _outstanding_requests() -> int:
+        """全局LLM端点池的在途请求数"""
+        return sum(endpoint["outstanding"] for endpoint in llm_client.pool.get_stats())
+
+    def _count(self, name: str, amount: int = 1):
+        """更新统计"""
+        with self._lock:
+            self.stats[name] += amount
+
+    def schedule(self, state: ToolState, papers: List[PaperInfo]) -> int:
+        """
+        为检索结果安排预取（立即返回）
+
+        Args:
+            state: 会话的工具状态（预取结果写入其备忘录）
+            papers: 最近一次检索的结果
+
+        Returns:
+            int: 本次安排的预取调用数
+        """
+        memo = state.memo
+        if memo is None or not papers:
+            return 0
+        if self.busy_fn() >= self.busy_threshold:
+            self._count("skipped_busy")
+            return 0
+
+        scheduled = 0
+        for paper in papers[:self.top_n]:
+            handle = self.tools.registry.handle_of(paper)
+            for facet in self.facets:
+                with use_tool_state(state):
+                    key = self.tools._memo_key(facet, handle)
+                # 检查上限与占用预取名额在会话状态的锁内完成，同一会话并发检索时不会超出上限
+                with state.lock:
+                    over_budget = state.speculative_calls >= self.max_calls_per_session
+                    claimed = not over_budget and memo.claim(key)
+                    if claimed:
+                        state.speculative_calls += 1
+                if over_budget:
+                    self._count("skipped_budget")
+                    self._count("scheduled", scheduled)
+                    return scheduled
+                if not claimed:
+                    continue
+                scheduled += 1
+                self._executor.submit(carry_labels(self._prefetch), state, facet, handle, key)
+        self._count("scheduled", scheduled)
+        return scheduled
+
+    def _prefetch(self, state: ToolState, facet: str, handle: str, key: tuple):
+        """在后台执行一次预取（不受前台请求的截止时间约束）"""
+        try:
+            with use_tool_state(state):
+                result = self._methods[facet](handle)
+            if _is_uncacheable(result):
+                self._count("failed")
+            else:
+                state.memo.put(key, result, speculative=True)
+                self._count("completed")
+        except Exception as e:
+            logger.warning(f"推测预取 {facet}({handle}) 失败: {e}")
+            self._count("failed")
+        finally:
+            state.memo.release(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取预取统计（各会话的命中率见工具备忘录统计）
+
+        Returns:
+            Dict[str, Any]: 安排、完成、失败与跳过的次数
+        """
+        with self._lock:
+            return dict(self.stats)
@@ -0,0 +1,151 @@
+"""
+会话快照模块
+
+重启命令行或Streamlit后，对话历史、对话记忆和已检索的论文都会丢失，用户只能重新检索、
+重新总结并再次付费。该模块把会话状态保存为紧凑、带版本号的快照：
+较长的文本（论文摘要、回答、工具结果）按内容哈希存放在blobs表中，
+同一段文本在对话历史、对话记忆和工具备忘录中只保存一次；
+快照包含滚动摘要和工具备忘录，恢复后无需重新计算。
+文件名以 .gz 结尾时使用gzip压缩。
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Any, Tuple
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "scholar-agent-session"
+SNAPSHOT_VERSION = 1
+
+# 超过该长度的字符串按内容哈希存放
+_BLOB_MIN_CHARS = 200
+_BLOB_KEY = "$blob"
+
+class SnapshotError(ValueError):
+    """快照格式不正确或版本不受支持"""
+
+def _intern(value: Any, blobs: Dict[str, str]) -> Any:
+    """把较长的字符串替换为blobs表中的引用"""
+    if isinstance(value, str):
+        if len(value) < _BLOB_MIN_CHARS:
+            return value
+        digest = hashlib.sha1(value.encode("utf-8")).hexdigest()[:16]
+        blobs.setdefault(digest, value)
+        return {_BLOB_KEY: digest}
+    if isinstance(value, dict):
+        return {key: _intern(item, blobs) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_intern(item, blobs) for item in value]
+    return value
+
+def _expand(value: Any, blobs: Dict[str, str]) -> Any:
+    """把blobs表中的引用还原为字符串"""
+    if isinstance(value, dict):
+        if len(value) == 1 and _BLOB_KEY in value:
+            try:
+                return blobs[value[_BLOB_KEY]]
+            except KeyError:
+                raise SnapshotError(f"快照缺少文本块 {value[_BLOB_KEY]}")
+        return {key: _expand(item, blobs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_expand(item, blobs) for item in value]
+    return value
+
+def pack_snapshot(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把会话状态打包为快照
+
+    Args:
+        state: 会话状态（可JSON序列化）
+
+    Returns:
+        Dict[str, Any]: 带格式名、版本号和文本块表的快照
+    """
+    blobs: Dict[str, str] = {}
+    packed = _intern(state, blobs)
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "state": packed,
+        "blobs": blobs
+    }
+
+def unpack_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    从快照中还原会话状态
+
+    Args:
+        snapshot: pack_snapshot生成的快照
+
+    Returns:
+        Dict[str, Any]: 会话状态
+
+    Raises:
+        SnapshotError: 格式不正确、版本过新或缺少文本块
+    """
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError("不是ScholarAgent会话快照")
+    version = snapshot.get("version")
+    if not isinstance(version, int) or version > SNAPSHOT_VERSION:
+        raise SnapshotError(f"不支持的快照版本: {version}（当前支持 {SNAPSHOT_VERSION}）")
+    return _expand(snapshot.get("state", {}), snapshot.get("blobs", {}))
+
+def write_snapshot(state: Dict[str, Any], path: str) -> Tuple[int, int]:
+    """
+    保存会话状态到文件（原子替换，不会留下写了一半的快照）
+
+    Args:
+        state: 会话状态
+        path: 文件路径，以 .gz 结尾时压缩
+
+    Returns:
+        Tuple[int, int]: 写入的字节数与文本块数
+    """
+    snapshot = pack_snapshot(state)
+    data = json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if path.endswith(".gz"):
+        data = gzip.compress(data)
+    # 先写入同目录的临时文件再原子替换，写入中途中断时保留上一次的完整快照
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return len(data), len(snapshot["blobs"])
+
+def read_snapshot(path: str) -> Dict[str, Any]:
+    """
+    从文件读取会话状态
+
+    Args:
+        path: 文件路径（gzip压缩的快照按文件头自动识别）
+
+    Returns:
+        Dict[str, Any]: 会话状态
+
+    Raises:
+        SnapshotError: 文件不是有效的会话快照
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    try:
+        snapshot = json.loads(data.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise SnapshotError(f"快照文件无法解析: {e}")
+    return unpack_snapshot(snapshot)
@@ -3,63 +3,435 @@ LangChain工具模块
 
 该模块定义了ScholarAgent可以使用的各种工具，
 包括论文搜索、总结、问答等功能。
+工具之间通过论文句柄（arXiv ID）传递论文，由会话论文注册表解析为完整的论文信息。
+检索结果以紧凑摘要（ID、标题、年份、一句话要点）返回，避免ReAct草稿随迭代膨胀，
+完整信息可通过get_paper_details按需获取。
+同一会话内相同（或仅有细微差异）的工具调用由会话级备忘录直接返回结果。
+
+工具集合在进程内共享，会话相关的状态（论文注册表、备忘录、输出统计）保存在ToolState中，
+由use_tool_state绑定到当前调用上下文，同一组工具可同时服务多个会话。
+每次工具调用记录一个追踪跨度（耗时、是否命中备忘录、输入输出大小）。
 """
 
+import re
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent import futures
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from langchain.tools import Tool
-from langchain_community.chat_models import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
 
-from ..config import config
-
+from services.chat_model import PooledChatModel
 from services.search import arxiv_service, PaperInfo
+from services.circuit_breaker import CircuitOpenError
+from services.deadline import DeadlineExceeded, current_deadline
+from services.tracing import tracer, KIND_TOOL
 from services.summarize import summarize_service
+from .paper_registry import PaperRegistry, normalize_arxiv_id
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 失败或提示类输出不写入备忘录
+_UNCACHEABLE_PREFIXES = ("服务暂时不可用", "未找到", "请提供", "无法", "搜索失败", "总结失败",
+                         "回答失败", "生成失败", "比较失败", "获取失败")
+
+# 批量分析工具支持的分析维度（含中文别名）到单篇工具名称的映射
+BATCH_FACETS = {
+    "contributions": "summarize_contributions", "贡献": "summarize_contributions", "研究贡献": "summarize_contributions",
+    "methods": "summarize_methods", "方法": "summarize_methods", "技术方法": "summarize_methods",
+    "key_points": "generate_key_points", "关键点": "generate_key_points", "要点": "generate_key_points"
+}
+FACET_TITLES = {
+    "summarize_contributions": "研究贡献",
+    "summarize_methods": "技术方法",
+    "generate_key_points": "关键点"
+}
+# 论文序号范围，如 "论文1-3"、"#1~3"
+_RANGE_PATTERN = re.compile(r'^(?:论文|#)\s*(\d+)\s*[-~到]\s*(\d+)$')
+
+def _is_uncacheable(result: str) -> bool:
+    """工具输出是否为失败或提示信息（含关键点工具以 "• " 开头的失败列表），这类输出不写入备忘录"""
+    return result.lstrip("• ").startswith(_UNCACHEABLE_PREFIXES)
+
+def _normalize_text(text: str) -> str:
+    """归一化工具输入：去除首尾引号、合并空白、统一小写"""
+    return " ".join(text.strip().strip("'\"`").split()).lower()
+
+# 推测预取正在计算某个结果时，正式调用最多等待的秒数（有截止时间时以剩余时间为准）
+_PENDING_WAIT = 60.0
+
+class ToolMemo:
+    """会话级工具结果备忘录（LRU，容量有限），并记录推测预取结果的命中情况"""
+    
+    def __init__(self, max_entries: int = 128):
+        """
+        初始化备忘录
+        
+        Args:
+            max_entries: 最多保留的结果数，超出时淘汰最久未使用的结果
+        """
+        self.max_entries = max_entries
+        self.bypass = False
+        self._entries: "OrderedDict[Tuple[str, ...], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._speculative: set = set()
+        self._pending: Dict[Tuple[str, ...], futures.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.speculative_puts = 0
+        self.speculative_hits = 0
+    
+    def get(self, key: Tuple[str, ...], wait: float = 0.0) -> Optional[Any]:
+        """
+        查找结果，处于刷新模式或未命中时返回None
+        
+        Args:
+            key: 备忘录键
+            wait: 该结果正在被推测预取时最多等待的秒数（0表示不等待）
+        """
+        with self._lock:
+            if self.bypass:
+                self.bypassed += 1
+                return None
+            pending = None if key in self._entries else self._pending.get(key)
+        if pending is not None and wait > 0:
+            # 推测预取正在计算该结果：等待其完成，而不是重复调用
+            futures.wait([pending], timeout=wait)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if key in self._speculative:
+                    self._speculative.discard(key)
+                    self.speculative_hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key: Tuple[str, ...], value: Any, speculative: bool = False):
+        """写入结果（刷新模式下同样写入，覆盖旧结果），speculative表示由推测预取写入"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if speculative:
+                self._speculative.add(key)
+                self.speculative_puts += 1
+            else:
+                self._speculative.discard(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._speculative.discard(evicted)
+    
+    def claim(self, key: Tuple[str, ...]) -> bool:
+        """
+        为推测预取占用一个键（已有结果或已在预取时返回False）
+        
+        Args:
+            key: 备忘录键
+            
+        Returns:
+            bool: 是否占用成功，成功后须调用release
+        """
+        with self._lock:
+            if key in self._entries or key in self._pending:
+                return False
+            self._pending[key] = futures.Future()
+            return True
+    
+    def release(self, key: Tuple[str, ...]):
+        """推测预取结束（无论成功与否），唤醒等待该结果的调用"""
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is not None:
+            pending.set_result(None)
+    
+    def clear(self):
+        """清空备忘录"""
+        with self._lock:
+            self._entries.clear()
+            self._speculative.clear()
+    
+    def export_state(self) -> List[Dict[str, Any]]:
+        """
+        导出备忘录条目（按最近使用顺序），检索结果列表导出为论文字典
+        
+        Returns:
+            List[Dict[str, Any]]: 可JSON序列化的条目列表
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        state = []
+        for key, value in entries:
+            if isinstance(value, list):
+                state.append({"key": list(key), "papers": [asdict(paper) for paper in value]})
+            else:
+                state.append({"key": list(key), "value": value})
+        return state
+    
+    def import_state(self, state: List[Dict[str, Any]]):
+        """
+        导入export_state导出的条目（替换现有条目）
+        
+        Args:
+            state: 条目列表
+        """
+        with self._lock:
+            self._entries.clear()
+            # 导入的条目不是本会话的推测预取结果，不再计入预取命中
+            self._speculative.clear()
+            for entry in state[-self.max_entries:]:
+                if "papers" in entry:
+                    value = [PaperInfo(**paper) for paper in entry["papers"]]
+                else:
+                    value = entry["value"]
+                self._entries[tuple(entry["key"])] = value
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取备忘录统计
+        
+        Returns:
+            Dict[str, Any]: 命中、未命中、绕过次数、当前条目数与推测预取结果的命中率
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "speculative_puts": self.speculative_puts,
+                "speculative_hits": self.speculative_hits,
+                "prefetch_hit_rate": self.speculative_hits / self.speculative_puts if self.speculative_puts else 0.0
+            }
+
+@dataclass
+class ToolState:
+    """工具调用的会话级状态"""
+    registry: PaperRegistry
+    memo: Optional[ToolMemo] = None
+    observation_stats: Dict[str, int] = field(default_factory=lambda: {"full_chars": 0, "returned_chars": 0})
+    speculative_calls: int = 0      # 推测预取已发起的工具调用数（受每会话上限约束）
+    # 保护上面两项计数（批量工具、规划步骤与推测预取在线程池中并发更新）
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+# 当前调用上下文绑定的会话状态，未绑定时使用工具集合自带的默认状态
+_tool_state: contextvars.ContextVar = contextvars.ContextVar("scholar_tool_state", default=None)
+
+@contextmanager
+def use_tool_state(state: ToolState):
+    """
+    在with块内把工具调用绑定到指定的会话状态
+    
+    Args:
+        state: 会话状态
+    """
+    token = _tool_state.set(state)
+    try:
+        yield state
+    finally:
+        _tool_state.reset(token)
+
+def carry_tool_state(func: Callable) -> Callable:
+    """
+    包装提交到线程池的任务，使其在提交方的调用上下文（会话状态、截止时间）中执行（线程池不会继承调用上下文）
+    
+    Args:
+        func: 任务函数
+        
+    Returns:
+        Callable: 包装后的函数
+    """
+    context = contextvars.copy_context()
+    
+    def run(*args, **kwargs):
+        # 同一个上下文不能被多个线程同时进入，每个任务使用一份副本
+        return context.copy().run(func, *args, **kwargs)
+    
+    return run
+
 class ScholarTools:
     """ScholarAgent工具集合类"""
     
-    def __init__(self, model_name: str = "deepseek-chat"):
+    def __init__(self, model_name: Optional[str] = None, registry: Optional[PaperRegistry] = None,
+                 compact_observations: bool = True, gist_chars: int = 150, memo_size: int = 128,
+                 batch_workers: int = 8):
         """
         初始化工具集合
         
         Args:
-            model_name: 使用的LLM模型名称
+            model_name: 使用的LLM模型名称，None表示按路由表选择
+            registry: 未绑定会话状态时使用的论文注册表，默认新建
+            compact_observations: 检索结果是否只返回紧凑摘要（完整信息经get_paper_details获取）
+            gist_chars: 一句话要点的最大字符数
+            memo_size: 每个会话的工具结果备忘录容量，0表示不启用
+            batch_workers: 批量分析工具的最大并发数
         """
         self.model_name = model_name
-        llm_config = config.get_llm_config("deepseek")
-        self.llm = ChatOpenAI(
-            model=model_name, 
-            temperature=0.3,
-            base_url=llm_config["base_url"],
-            api_key=llm_config["api_key"]
-        )
+        self.llm = PooledChatModel(model_name=model_name, temperature=0.3)
+        self.compact_observations = compact_observations
+        self.gist_chars = gist_chars
+        self.memo_size = memo_size
+        self.batch_workers = batch_workers
+        self.default_state = self.new_state(registry)
     
-    def search_arxiv_tool(self, query: str) -> str:
+    def new_state(self, registry: Optional[PaperRegistry] = None) -> ToolState:
         """
-        Arxiv论文搜索工具
+        为新会话创建工具状态
         
         Args:
-            query: 搜索查询，格式为 "类型:关键词"
+            registry: 会话论文注册表，默认新建
             
         Returns:
-            str: 搜索结果
+            ToolState: 会话状态
         """
+        return ToolState(
+            registry=registry or PaperRegistry(),
+            memo=ToolMemo(self.memo_size) if self.memo_size > 0 else None
+        )
+    
+    @property
+    def state(self) -> ToolState:
+        """当前调用上下文的会话状态"""
+        return _tool_state.get() or self.default_state
+    
+    @property
+    def registry(self) -> PaperRegistry:
+        """当前会话的论文注册表"""
+        return self.state.registry
+    
+    @property
+    def memo(self) -> Optional[ToolMemo]:
+        """当前会话的工具结果备忘录"""
+        return self.state.memo
+    
+    @property
+    def observation_stats(self) -> Dict[str, int]:
+        """当前会话的工具输出长度统计"""
+        return self.state.observation_stats
+    
+    def _paper_key(self, paper_ref: str) -> str:
+        """论文引用的备忘录键：能解析时使用arXiv ID，否则使用归一化文本"""
         try:
-            # 解析查询格式
-            if ":" in query:
-                search_type, keywords = query.split(":", 1)
-                search_type = search_type.strip().lower()
-                keywords = keywords.strip()
-            else:
-                # 默认按关键词搜索
-                search_type = "keywords"
-                keywords = query.strip()
+            paper = self._resolve_paper(paper_ref)
+        except CircuitOpenError:
+            paper = None
+        if paper is not None:
+            handle = self.registry.handle_of(paper)
+            return normalize_arxiv_id(handle) or _normalize_text(handle)
+        return _normalize_text(paper_ref)
+    
+    def _memo_key(self, tool_name: str, tool_input: str) -> Tuple[str, ...]:
+        """按工具类型归一化输入，生成备忘录键"""
+        if tool_name == "answer_question":
+            question, _, paper_ref = tool_input.partition("|")
+            return (tool_name, _normalize_text(question), self._paper_key(paper_ref))
+        if tool_name == "compare_papers":
+            return (tool_name,) + tuple(self._paper_key(ref) for ref in tool_input.split("|"))
+        return (tool_name, self._paper_key(tool_input))
+    
+    def _memoized(self, tool_name: str, func: Callable[[str], str]) -> Callable[[str], str]:
+        """为论文类工具包装会话级备忘录"""
+        if self.memo_size <= 0:
+            return func
+        
+        def wrapper(tool_input: str) -> str:
+            memo = self.memo
+            if memo is None:
+                return func(tool_input)
+            key = self._memo_key(tool_name, tool_input)
+            deadline = current_deadline()
+            cached = memo.get(key, wait=deadline.remaining() if deadline is not None else _PENDING_WAIT)
+            tracer.current_span().set(cache_hit=cached is not None)
+            if cached is not None:
+                logger.info(f"工具 {tool_name} 命中会话备忘录")
+                return cached
+            result = func(tool_input)
+            if not _is_uncacheable(result):
+                memo.put(key, result)
+            return result
+        
+        return wrapper
+    
+    def _traced(self, tool_name: str, func: Callable[[str], str]) -> Callable[[str], str]:
+        """为工具包装追踪跨度（耗时、输入输出大小，备忘录命中由_memoized补充）"""
+        def wrapper(tool_input: str) -> str:
+            with tracer.span(f"tool:{tool_name}", KIND_TOOL, tool=tool_name, input=tool_input[:120],
+                             input_chars=len(tool_input)) as span:
+                result = func(tool_input)
+                span.set(output_chars=len(result))
+                return result
+        
+        return wrapper
+    
+    def _paper_gist(self, abstract: str) -> str:
+        """提取摘要的第一句作为一句话要点"""
+        text = " ".join(abstract.split())
+        for separator in (". ", "。"):
+            if separator in text:
+                text = text.split(separator, 1)[0] + separator.strip()
+                break
+        if len(text) > self.gist_chars:
+            text = text[:self.gist_chars].rstrip() + "..."
+        return text
+    
+    def _paper_digest(self, index: int, paper: PaperInfo, handle: str) -> str:
+        """
+        生成单篇论文的紧凑摘要
+        
+        Args:
+            index: 检索结果序号
+            paper: 论文信息
+            handle: 论文句柄
+            
+        Returns:
+            str: 形如 "论文1 [2304.02643v4] 标题 (2023, 作者等) - 要点" 的单行文本
+        """
+        year = paper.published_date[:4] or "未知年份"
+        authors = ", ".join(paper.authors[:3]) + (" 等" if len(paper.authors) > 3 else "")
+        return f"论文{index} [{handle}] {paper.title} ({year}, {authors or '未知作者'})\n  要点: {self._paper_gist(paper.abstract)}"
+    
+    def _resolve_paper(self, paper_ref: str) -> Optional[PaperInfo]:
+        """将论文句柄解析为论文信息，未提供句柄时使用会话的当前论文"""
+        if not paper_ref.strip():
+            return self.registry.current()
+        return self.registry.resolve(paper_ref)
+    
+    def _paper_not_found(self, paper_ref: str) -> str:
+        """论文句柄无法解析时返回给Agent的提示"""
+        return f"未找到论文'{paper_ref.strip()}'，请先使用search_arxiv检索，并传入检索结果中的arXiv ID。"
+    
+    def _circuit_open_message(self, error: CircuitOpenError) -> str:
+        """依赖服务熔断时返回给Agent的提示"""
+        logger.warning(f"依赖服务熔断，快速失败: {error}")
+        return f"服务暂时不可用（{error.name} 熔断中），请约 {error.retry_after:.0f} 秒后重试，无需重复调用该工具。"
+    
+    def search_papers(self, search_type: str, keywords: str) -> List[PaperInfo]:
+        """
+        检索论文并注册到会话论文注册表
+        
+        Args:
+            search_type: 搜索类型，title、author或keywords
+            keywords: 搜索内容
             
+        Returns:
+            List[PaperInfo]: 检索结果
+            
+        Raises:
+            CircuitOpenError: Arxiv API处于熔断状态
+        """
+        # 备忘录缓存检索结果（而非输出文本），命中时仍重新注册以更新"论文N"的引用顺序
+        memo = self.memo
+        memo_key = ("search_arxiv", search_type, _normalize_text(keywords))
+        results = memo.get(memo_key) if memo is not None else None
+        if results is None:
             # 根据搜索类型调用相应方法
             if search_type == "title":
                 results = arxiv_service.search_by_title(keywords)
@@ -67,185 +439,334 @@ class ScholarTools:
                 results = arxiv_service.search_by_author(keywords)
             else:
                 results = arxiv_service.search_by_keywords(keywords)
+            if results and memo is not None:
+                memo.put(memo_key, results)
+        
+        # 注册到会话论文注册表，后续工具通过arXiv ID引用
+        if results:
+            self.registry.register_results(results)
+        return results or []
+    
+    @staticmethod
+    def parse_search_query(query: str) -> Tuple[str, str]:
+        """
+        解析 "类型:关键词" 格式的搜索查询
+        
+        Args:
+            query: 搜索查询，未指定类型或类型无效时按关键词搜索
             
-            if not results:
-                return f"未找到与'{keywords}'相关的论文。"
+        Returns:
+            Tuple[str, str]: 搜索类型（title、author或keywords）与搜索内容
+        """
+        if ":" in query:
+            search_type, keywords = query.split(":", 1)
+            search_type = search_type.strip().lower()
+            keywords = keywords.strip()
+        else:
+            # 默认按关键词搜索
+            search_type = "keywords"
+            keywords = query.strip()
+        
+        if search_type not in ("title", "author"):
+            search_type = "keywords"
+        return search_type, keywords
+    
+    def format_search_results(self, results: List[PaperInfo]) -> str:
+        """
+        将检索结果格式化为工具输出（紧凑摘要或完整信息），并更新输出长度统计
+        
+        Args:
+            results: 检索结果（已注册到会话论文注册表）
             
-            # 格式化结果
-            formatted_results = []
-            for i, paper in enumerate(results, 1):
-                formatted_results.append(f"论文{i}:\n{arxiv_service.format_paper_info(paper)}")
+        Returns:
+            str: 工具输出
+        """
+        handles = [self.registry.handle_of(paper) for paper in results]
+        full_results = [
+            f"论文{i} [arXiv ID: {handle}]:\n{arxiv_service.format_paper_info(paper)}"
+            for i, (paper, handle) in enumerate(zip(results, handles), 1)
+        ]
+        full_text = "\n\n".join(full_results)
+        if not self.compact_observations:
+            observation = full_text
+        else:
+            digests = [
+                self._paper_digest(i, paper, handle)
+                for i, (paper, handle) in enumerate(zip(results, handles), 1)
+            ]
+            observation = "\n".join(digests) + "\n（方括号中为arXiv ID，完整摘要可用get_paper_details获取）"
+        
+        state = self.state
+        with state.lock:
+            state.observation_stats["full_chars"] += len(full_text)
+            state.observation_stats["returned_chars"] += len(observation)
+        return observation
+    
+    def search_arxiv_tool(self, query: str) -> str:
+        """
+        Arxiv论文搜索工具
+        
+        Args:
+            query: 搜索查询，格式为 "类型:关键词"
             
-            return "\n\n".join(formatted_results)
+        Returns:
+            str: 搜索结果
+        """
+        try:
+            search_type, keywords = self.parse_search_query(query)
+            results = self.search_papers(search_type, keywords)
+            if not results:
+                return f"未找到与'{keywords}'相关的论文。"
+            return self.format_search_results(results)
             
+        except DeadlineExceeded:
+            raise
+        except CircuitOpenError as e:
+            return self._circuit_open_message(e)
         except Exception as e:
             logger.error(f"搜索论文时发生错误: {e}")
             return f"搜索失败: {str(e)}"
     
-    def summarize_contributions_tool(self, paper_info: str) -> str:
+    def get_paper_details_tool(self, paper_ref: str) -> str:
         """
-        总结论文研究贡献工具
+        获取论文完整信息工具
         
         Args:
-            paper_info: 论文信息（包含标题和摘要）
+            paper_ref: 论文句柄（arXiv ID）
             
         Returns:
-            str: 研究贡献总结
+            str: 论文完整信息（标题、作者、分类、完整摘要、PDF链接）
         """
         try:
-            # 从论文信息中提取标题和摘要
-            lines = paper_info.split('\n')
-            title = ""
-            abstract = ""
+            paper = self._resolve_paper(paper_ref)
+            if paper is None:
+                return self._paper_not_found(paper_ref)
+            return arxiv_service.format_paper_info(paper).strip()
             
-            for line in lines:
-                if line.startswith("标题:"):
-                    title = line.replace("标题:", "").strip()
-                elif line.startswith("摘要:"):
-                    abstract = line.replace("摘要:", "").strip()
+        except DeadlineExceeded:
+            raise
+        except CircuitOpenError as e:
+            return self._circuit_open_message(e)
+        except Exception as e:
+            logger.error(f"获取论文详情时发生错误: {e}")
+            return f"获取失败: {str(e)}"
+    
+    def summarize_contributions_tool(self, paper_ref: str) -> str:
+        """
+        总结论文研究贡献工具
+        
+        Args:
+            paper_ref: 论文句柄（arXiv ID）
             
-            if not abstract:
-                return "无法从提供的论文信息中提取摘要。"
+        Returns:
+            str: 研究贡献总结
+        """
+        try:
+            paper = self._resolve_paper(paper_ref)
+            if paper is None:
+                return self._paper_not_found(paper_ref)
             
-            return summarize_service.summarize_research_contributions(abstract, title)
+            return summarize_service.summarize_research_contributions(paper.abstract, paper.title)
             
+        except DeadlineExceeded:
+            raise
+        except CircuitOpenError as e:
+            return self._circuit_open_message(e)
         except Exception as e:
             logger.error(f"总结研究贡献时发生错误: {e}")
             return f"总结失败: {str(e)}"
     
-    def summarize_methods_tool(self, paper_info: str) -> str:
+    def summarize_methods_tool(self, paper_ref: str) -> str:
         """
         总结论文技术方法工具
         
         Args:
-            paper_info: 论文信息（包含标题和摘要）
+            paper_ref: 论文句柄（arXiv ID）
             
         Returns:
             str: 技术方法总结
         """
         try:
-            # 从论文信息中提取标题和摘要
-            lines = paper_info.split('\n')
-            title = ""
-            abstract = ""
-            
-            for line in lines:
-                if line.startswith("标题:"):
-                    title = line.replace("标题:", "").strip()
-                elif line.startswith("摘要:"):
-                    abstract = line.replace("摘要:", "").strip()
-            
-            if not abstract:
-                return "无法从提供的论文信息中提取摘要。"
+            paper = self._resolve_paper(paper_ref)
+            if paper is None:
+                return self._paper_not_found(paper_ref)
             
-            return summarize_service.summarize_technical_methods(abstract, title)
+            return summarize_service.summarize_technical_methods(paper.abstract, paper.title)
             
+        except DeadlineExceeded:
+            raise
+        except CircuitOpenError as e:
+            return self._circuit_open_message(e)
         except Exception as e:
             logger.error(f"总结技术方法时发生错误: {e}")
             return f"总结失败: {str(e)}"
     
-    def answer_question_tool(self, question: str, paper_info: str) -> str:
+    def answer_question_tool(self, tool_input: str) -> str:
         """
         基于论文信息回答问题工具
         
         Args:
-            question: 用户问题
-            paper_info: 论文信息
+            tool_input: "问题|论文句柄"，省略句柄时使用最近检索的论文
             
         Returns:
             str: 问题回答
         """
         try:
-            # 从论文信息中提取标题和摘要
-            lines = paper_info.split('\n')
-            title = ""
-            abstract = ""
+            question, _, paper_ref = tool_input.partition("|")
+            question = question.strip()
+            if not question:
+                return "请提供问题，输入格式：'问题|arXiv ID'。"
             
-            for line in lines:
-                if line.startswith("标题:"):
-                    title = line.replace("标题:", "").strip()
-                elif line.startswith("摘要:"):
-                    abstract = line.replace("摘要:", "").strip()
+            paper = self._resolve_paper(paper_ref)
+            if paper is None:
+                return self._paper_not_found(paper_ref)
             
-            if not abstract:
-                return "无法从提供的论文信息中提取摘要。"
-            
-            return summarize_service.answer_research_question(question, abstract, title)
+            return summarize_service.answer_research_question(question, paper.abstract, paper.title)
             
+        except DeadlineExceeded:
+            raise
+        except CircuitOpenError as e:
+            return self._circuit_open_message(e)
         except Exception as e:
             logger.error(f"回答问题时发生错误: {e}")
             return f"回答失败: {str(e)}"
     
-    def generate_key_points_tool(self, paper_info: str) -> str:
+    def generate_key_points_tool(self, paper_ref: str) -> str:
         """
         生成论文关键点工具
         
         Args:
-            paper_info: 论文信息
+            paper_ref: 论文句柄（arXiv ID）
             
         Returns:
             str: 关键点列表
         """
         try:
-            # 从论文信息中提取标题和摘要
-            lines = paper_info.split('\n')
-            title = ""
-            abstract = ""
-            
-            for line in lines:
-                if line.startswith("标题:"):
-                    title = line.replace("标题:", "").strip()
-                elif line.startswith("摘要:"):
-                    abstract = line.replace("摘要:", "").strip()
-            
-            if not abstract:
-                return "无法从提供的论文信息中提取摘要。"
+            paper = self._resolve_paper(paper_ref)
+            if paper is None:
+                return self._paper_not_found(paper_ref)
             
-            key_points = summarize_service.generate_key_points(abstract, title)
+            key_points = summarize_service.generate_key_points(paper.abstract, paper.title)
             return "\n".join([f"• {point}" for point in key_points])
             
+        except DeadlineExceeded:
+            raise
+        except CircuitOpenError as e:
+            return self._circuit_open_message(e)
         except Exception as e:
             logger.error(f"生成关键点时发生错误: {e}")
             return f"生成失败: {str(e)}"
     
-    def compare_papers_tool(self, paper1_info: str, paper2_info: str) -> str:
+    def compare_papers_tool(self, tool_input: str) -> str:
         """
         比较两篇论文工具
         
         Args:
-            paper1_info: 第一篇论文信息
-            paper2_info: 第二篇论文信息
+            tool_input: "论文1句柄|论文2句柄"
             
         Returns:
             str: 比较分析结果
         """
         try:
-            # 从论文信息中提取摘要
-            def extract_abstract(paper_info: str) -> tuple:
-                lines = paper_info.split('\n')
-                title = ""
-                abstract = ""
-                
-                for line in lines:
-                    if line.startswith("标题:"):
-                        title = line.replace("标题:", "").strip()
-                    elif line.startswith("摘要:"):
-                        abstract = line.replace("摘要:", "").strip()
-                
-                return title, abstract
+            refs = tool_input.split("|")
+            if len(refs) != 2:
+                return "请提供两篇论文，输入格式：'arXiv ID 1|arXiv ID 2'。"
             
-            title1, abstract1 = extract_abstract(paper1_info)
-            title2, abstract2 = extract_abstract(paper2_info)
+            paper1 = self.registry.resolve(refs[0])
+            paper2 = self.registry.resolve(refs[1])
+            if paper1 is None:
+                return self._paper_not_found(refs[0])
+            if paper2 is None:
+                return self._paper_not_found(refs[1])
             
-            if not abstract1 or not abstract2:
-                return "无法从提供的论文信息中提取摘要。"
-            
-            return summarize_service.compare_papers(abstract1, abstract2, title1, title2)
+            return summarize_service.compare_papers(paper1.abstract, paper2.abstract, paper1.title, paper2.title)
             
+        except DeadlineExceeded:
+            raise
+        except CircuitOpenError as e:
+            return self._circuit_open_message(e)
         except Exception as e:
             logger.error(f"比较论文时发生错误: {e}")
             return f"比较失败: {str(e)}"
     
+    def _split_paper_refs(self, refs_text: str) -> List[str]:
+        """拆分批量工具的论文引用列表，并展开 "论文1-3" 形式的序号范围"""
+        refs = []
+        for ref in re.split(r'[,，、;；\n]', refs_text):
+            ref = ref.strip().strip("'\"`")
+            if not ref:
+                continue
+            range_match = _RANGE_PATTERN.match(ref)
+            if range_match:
+                start, end = int(range_match.group(1)), int(range_match.group(2))
+                refs.extend(f"论文{i}" for i in range(start, end + 1))
+            else:
+                refs.append(ref)
+        return refs
+    
+    def batch_analyze_tool(self, tool_input: str) -> str:
+        """
+        批量分析多篇论文工具
+        
+        在一次Agent动作中对多篇论文的多个维度并发调用单篇工具，
+        耗时约等于最慢的一次调用；单篇结果同样经过会话备忘录。
+        
+        Args:
+            tool_input: "论文句柄列表|维度列表"，句柄用逗号分隔（支持 "论文1-3"），
+                维度可选contributions、methods、key_points，省略时为contributions
+            
+        Returns:
+            str: 按论文和维度分节的分析结果
+        """
+        refs_text, _, facets_text = tool_input.partition("|")
+        refs = self._split_paper_refs(refs_text)
+        if not refs:
+            return "请提供论文，输入格式：'arXiv ID 1, arXiv ID 2|contributions,key_points'。"
+        
+        facets = []
+        for facet in re.split(r'[,，、\s]+', facets_text.strip().lower()):
+            if not facet:
+                continue
+            if facet not in BATCH_FACETS:
+                return f"不支持的分析维度'{facet}'，可选：contributions、methods、key_points。"
+            if BATCH_FACETS[facet] not in facets:
+                facets.append(BATCH_FACETS[facet])
+        facets = facets or ["summarize_contributions"]
+        
+        single_tools = {
+            name: self._traced(name, self._memoized(name, method)) for name, method in (
+                ("summarize_contributions", self.summarize_contributions_tool),
+                ("summarize_methods", self.summarize_methods_tool),
+                ("generate_key_points", self.generate_key_points_tool)
+            )
+        }
+        
+        # 先解析论文（可能按ID从Arxiv获取），保证各任务使用一致的句柄
+        papers = []
+        for ref in refs:
+            try:
+                paper = self._resolve_paper(ref)
+            except CircuitOpenError as e:
+                return self._circuit_open_message(e)
+            if paper is None:
+                return self._paper_not_found(ref)
+            papers.append(paper)
+        
+        tasks = [(paper, facet) for paper in papers for facet in facets]
+        workers = min(len(tasks), self.batch_workers)
+        with futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-tool") as executor:
+            outputs = list(executor.map(
+                carry_tool_state(lambda task: single_tools[task[1]](self.registry.handle_of(task[0]))), tasks
+            ))
+        
+        sections = []
+        for index, paper in enumerate(papers):
+            parts = [f"## [{self.registry.handle_of(paper)}] {paper.title}"]
+            for offset, facet in enumerate(facets):
+                parts.append(f"### {FACET_TITLES[facet]}\n{outputs[index * len(facets) + offset]}")
+            sections.append("\n".join(parts))
+        return "\n\n".join(sections)
+    
     def get_available_tools(self) -> List[Tool]:
         """
         获取所有可用工具
@@ -256,37 +777,44 @@ class ScholarTools:
         tools = [
             Tool(
                 name="search_arxiv",
-                func=self.search_arxiv_tool,
+                func=self._traced("search_arxiv", self.search_arxiv_tool),
                 description="搜索Arxiv论文。输入格式：'类型:关键词'，其中类型可以是title（按标题）、author（按作者）、keywords（按关键词）。例如：'title:Segment Anything'"
             ),
+            Tool(
+                name="get_paper_details",
+                func=self._traced("get_paper_details", self.get_paper_details_tool),
+                description="获取论文的完整信息（作者、分类、完整摘要、PDF链接）。输入：论文的arXiv ID"
+            ),
             Tool(
                 name="summarize_contributions",
-                func=self.summarize_contributions_tool,
-                description="总结论文的研究贡献。输入：包含标题和摘要的论文信息"
+                func=self._traced("summarize_contributions", self._memoized("summarize_contributions", self.summarize_contributions_tool)),
+                description="总结论文的研究贡献。输入：论文的arXiv ID（来自search_arxiv结果，如 2304.02643v4）"
             ),
             Tool(
                 name="summarize_methods",
-                func=self.summarize_methods_tool,
-                description="总结论文的技术方法。输入：包含标题和摘要的论文信息"
+                func=self._traced("summarize_methods", self._memoized("summarize_methods", self.summarize_methods_tool)),
+                description="总结论文的技术方法。输入：论文的arXiv ID"
             ),
             Tool(
                 name="answer_question",
-                func=self.answer_question_tool,
-                description="基于论文信息回答用户问题。输入：'问题|论文信息'，用|分隔问题和论文信息"
+                func=self._traced("answer_question", self._memoized("answer_question", self.answer_question_tool)),
+                description="基于论文信息回答用户问题。输入：'问题|arXiv ID'，用|分隔问题和论文的arXiv ID"
             ),
             Tool(
                 name="generate_key_points",
-                func=self.generate_key_points_tool,
-                description="生成论文的关键信息点。输入：包含标题和摘要的论文信息"
+                func=self._traced("generate_key_points", self._memoized("generate_key_points", self.generate_key_points_tool)),
+                description="生成论文的关键信息点。输入：论文的arXiv ID"
+            ),
+            Tool(
+                name="batch_analyze",
+                func=self._traced("batch_analyze", self.batch_analyze_tool),
+                description="一次并发分析多篇论文（需要对多篇论文做同类分析时优先使用，只需一步）。输入：'arXiv ID列表|维度列表'，ID用逗号分隔，也可用'论文1-3'表示检索结果的前三篇；维度可选contributions（研究贡献）、methods（技术方法）、key_points（关键点），多个用逗号分隔，省略时为contributions。例如：'论文1-3|contributions'"
             ),
             Tool(
                 name="compare_papers",
-                func=self.compare_papers_tool,
-                description="比较两篇论文的异同点。输入：'论文1信息|论文2信息'，用|分隔两篇论文信息"
+                func=self._traced("compare_papers", self._memoized("compare_papers", self.compare_papers_tool)),
+                description="比较两篇论文的异同点。输入：'arXiv ID 1|arXiv ID 2'，用|分隔两篇论文的arXiv ID"
             )
         ]
         
         return tools
-
-# 创建全局工具实例
-scholar_tools = ScholarTools() 
\ No newline at end of file
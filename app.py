@@ -18,6 +18,8 @@ load_dotenv()
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from agent.controller import create_scholar_agent, run_agent
+from agent.session_store import SnapshotError
+from config import AGENT_SESSION_CONFIG
 
 # 配置日志
 logging.basicConfig(
@@ -46,6 +48,15 @@ def interactive_mode():
     
     agent = create_scholar_agent()
     
+    # 设置SCHOLAR_SESSION_FILE时恢复上次的会话
+    session_file = AGENT_SESSION_CONFIG['path']
+    if session_file and os.path.exists(session_file):
+        try:
+            restored = agent.load_session(session_file)
+            print(f"📂 已恢复会话：{restored['turns']} 轮对话，{restored['papers']} 篇论文")
+        except (OSError, SnapshotError) as e:
+            logger.warning(f"恢复会话失败，开始新会话: {e}")
+    
     while True:
         try:
             user_input = input("\n🔍 请输入您的问题: ").strip()
@@ -67,6 +78,12 @@ def interactive_mode():
                     print(f"\n🔧 使用的工具：{', '.join(result['tools_used'])}")
             else:
                 print(f"\n❌ 错误：{result['answer']}")
+            
+            if session_file:
+                try:
+                    agent.save_session(session_file)
+                except OSError as e:
+                    logger.warning(f"保存会话失败: {e}")
                 
         except KeyboardInterrupt:
             print("\n\n👋 感谢使用ScholarAgent，再见！")
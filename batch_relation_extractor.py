@@ -8,28 +8,55 @@
 2. 指定数据文件: py -u batch_relation_extractor.py my_data.json
 3. 指定保存间隔: py -u batch_relation_extractor.py my_data.json 10
 4. 从中间结果恢复: py -u batch_relation_extractor.py my_data.json batch_results_partial_15_of_50.json
+5. 指定任务名称与预算: py -u batch_relation_extractor.py my_data.json --job weekly --max-tokens 2000000 --max-cost 5
 
 功能特点:
 - 每处理N个文本自动保存中间结果
 - 支持从中间结果恢复处理
 - 实时显示处理进度
 - 生成详细的处理报告
+- 多密钥/多端点负载均衡，并发数随端点数增长（DEEPSEEK_API_KEYS=key1,key2）
+- LLM服务熔断时立即暂停并保存进度，而不是逐条等待超时
+- 用量按任务与文本序号计量，可设置任务的token/成本预算（LLM_JOB_MAX_TOKENS、LLM_JOB_MAX_COST），用完后暂停并保存进度；
+  中间结果记录任务名称与已用量，恢复处理时沿用同一任务并继续累计预算
 """
 
+import argparse
 import asyncio
 import json
 import os
 import sys
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Optional
 from standalone_relation_extractor import StandaloneRelationExtractor
+from services.llm_client import LLMClient
+from services.metering import usage_meter, meter_scope
+from config import METERING_CONFIG
 
 class BatchRelationExtractor:
     """批量关系抽取器"""
     
-    def __init__(self, api_key: str, api_type: str = "deepseek"):
-        """初始化批量抽取器"""
-        self.extractor = StandaloneRelationExtractor(api_key, api_type)
+    def __init__(self, api_key: str, api_type: str = "deepseek",
+                 client: Optional[LLMClient] = None, concurrency_per_endpoint: int = 2,
+                 job: Optional[str] = None, max_tokens: Optional[int] = None, max_cost: Optional[float] = None):
+        """
+        初始化批量抽取器
+        api_key: API密钥，多个密钥用逗号分隔时自动组成端点池
+        client: 共享的LLM调用客户端（多端点池）
+        concurrency_per_endpoint: 每个端点同时处理的文本数，总并发随端点数线性增长
+        job: 用量计量的任务名称，默认按启动时间生成
+        max_tokens: 任务的token预算，None表示使用config.METERING_CONFIG（0表示不限）
+        max_cost: 任务的成本预算（美元），None表示使用config.METERING_CONFIG（0表示不限）
+        """
+        self.extractor = StandaloneRelationExtractor(api_key, api_type, client=client)
+        self.concurrency = max(1, len(self.extractor.client.pool) * concurrency_per_endpoint)
         self.results = []
+        self.job = job or time.strftime("batch_relation-%Y%m%d-%H%M%S")
+        max_tokens = METERING_CONFIG["job_max_tokens"] if max_tokens is None else max_tokens
+        max_cost = METERING_CONFIG["job_max_cost"] if max_cost is None else max_cost
+        self.max_tokens = max_tokens or None
+        self.max_cost = max_cost or None
+        usage_meter.set_budget(self.job, self.max_tokens, self.max_cost)
     
     async def process_single_text(self, text: str, index: int) -> Dict[str, Any]:
         """处理单个文本"""
@@ -38,7 +65,9 @@ class BatchRelationExtractor:
         print(f"文本预览: {text[:100]}...")
         
         try:
-            result = await self.extractor.extract_and_describe_relations(text)
+            # 该文本的所有LLM调用计入本任务与该文本序号
+            with meter_scope(job=self.job, item=index):
+                result = await self.extractor.extract_and_describe_relations(text)
             result["text_index"] = index
             result["text_preview"] = text[:200] + "..." if len(text) > 200 else text
             
@@ -61,18 +90,32 @@ class BatchRelationExtractor:
                 "text_preview": text[:200] + "..." if len(text) > 200 else text
             }
     
-    async def process_batch(self, data: List[Dict[str, str]], save_interval: int = 5) -> Dict[str, Any]:
-        """批量处理数据"""
-        print(f"🚀 开始批量处理 {len(data)} 个文本...")
-        print(f"💾 每处理 {save_interval} 个文本保存一次结果")
-        
-        results = []
-        success_count = 0
-        total_entities = 0
-        total_relations = 0
-        total_descriptions = 0
-        
-        for i, item in enumerate(data):
+    def _build_summary(self, data: List[Dict[str, str]], results: List[Dict[str, Any]], progress: str) -> Dict[str, Any]:
+        """根据已有结果生成汇总信息"""
+        succeeded = [r for r in results if r.get("success", False)]
+        return {
+            "total_texts": len(data),
+            "processed_texts": len(results),
+            "success_count": len(succeeded),
+            "failure_count": len(results) - len(succeeded),
+            "total_entities": sum(r.get('metadata', {}).get('total_entities', 0) for r in succeeded),
+            "total_relations": sum(r.get('metadata', {}).get('total_relations', 0) for r in succeeded),
+            "total_descriptions": sum(r.get('metadata', {}).get('descriptions_generated', 0) for r in succeeded),
+            "success_rate": len(succeeded) / len(results) if results else 0,
+            "progress": progress,
+            "job": self.job,
+            "usage": usage_meter.get_job_usage(self.job)
+        }
+    
+    async def _process_range(self, data: List[Dict[str, str]], start: int,
+                             results: List[Dict[str, Any]], save_interval: int) -> Dict[str, Any]:
+        """
+        并发处理 data[start:]，结果按原始顺序追加到results
+        每轮最多并发 self.concurrency 个文本，跨过保存间隔时保存中间结果
+        """
+        pending = []
+        for i in range(start, len(data)):
+            item = data[i]
             if "text" not in item:
                 print(f"⚠️ 第 {i + 1} 个数据项缺少 'text' 字段，跳过")
                 continue
@@ -81,61 +124,64 @@ class BatchRelationExtractor:
             if not text or not text.strip():
                 print(f"⚠️ 第 {i + 1} 个文本为空，跳过")
                 continue
+            pending.append((i, text))
+        
+        for offset in range(0, len(pending), self.concurrency):
+            chunk = pending[offset:offset + self.concurrency]
+            chunk_results = await asyncio.gather(
+                *(self.process_single_text(text, i) for i, text in chunk)
+            )
             
-            result = await self.process_single_text(text, i)
-            results.append(result)
+            # LLM服务熔断或任务用完预算：保留此前的结果并暂停，避免剩余文本全部快速失败
+            open_at = next((k for k, r in enumerate(chunk_results)
+                            if r.get("circuit_open") or r.get("budget_exceeded")), None)
+            if open_at is not None:
+                reason = "LLM服务熔断" if chunk_results[open_at].get("circuit_open") else "任务用量超出预算"
+                results.extend(chunk_results[:open_at])
+                print(f"\n⛔ {reason}，暂停批处理并保存进度（已完成 {len(results)} 个）...")
+                partial_result = {
+                    "summary": self._build_summary(data, results, f"{len(results)}/{len(data)}"),
+                    "results": results,
+                    "is_partial": True
+                }
+                partial_filename = f"batch_results_partial_{len(results)}_of_{len(data)}.json"
+                self.save_results(partial_result, partial_filename)
+                print(f"💡 服务恢复（或提高预算）后可使用 {partial_filename} 继续处理")
+                return partial_result
             
-            if result["success"]:
-                success_count += 1
-                total_entities += result['metadata']['total_entities']
-                total_relations += result['metadata']['total_relations']
-                total_descriptions += result['metadata']['descriptions_generated']
+            results.extend(chunk_results)
             
             # 每处理指定数量的文本就保存一次
-            if (i + 1) % save_interval == 0:
-                print(f"\n💾 已处理 {i + 1} 个文本，保存中间结果...")
-                temp_summary = {
-                    "total_texts": len(data),
-                    "processed_texts": len(results),
-                    "success_count": success_count,
-                    "failure_count": len(results) - success_count,
-                    "total_entities": total_entities,
-                    "total_relations": total_relations,
-                    "total_descriptions": total_descriptions,
-                    "success_rate": success_count / len(results) if results else 0,
-                    "progress": f"{i + 1}/{len(data)}"
-                }
-                
+            boundaries = [i for i, _ in chunk if (i + 1) % save_interval == 0]
+            if boundaries:
+                last = boundaries[-1]
+                print(f"\n💾 已处理 {last + 1} 个文本，保存中间结果...")
                 temp_result = {
-                    "summary": temp_summary,
+                    "summary": self._build_summary(data, results, f"{last + 1}/{len(data)}"),
                     "results": results,
                     "is_partial": True
                 }
                 
                 # 保存中间结果
-                temp_filename = f"batch_results_partial_{i + 1}_of_{len(data)}.json"
+                temp_filename = f"batch_results_partial_{last + 1}_of_{len(data)}.json"
                 self.save_results(temp_result, temp_filename)
                 print(f"✅ 中间结果已保存到 {temp_filename}")
         
         # 生成最终汇总报告
-        summary = {
-            "total_texts": len(data),
-            "processed_texts": len(results),
-            "success_count": success_count,
-            "failure_count": len(results) - success_count,
-            "total_entities": total_entities,
-            "total_relations": total_relations,
-            "total_descriptions": total_descriptions,
-            "success_rate": success_count / len(results) if results else 0,
-            "progress": f"{len(data)}/{len(data)}"
-        }
-        
         return {
-            "summary": summary,
+            "summary": self._build_summary(data, results, f"{len(data)}/{len(data)}"),
             "results": results,
             "is_partial": False
         }
     
+    async def process_batch(self, data: List[Dict[str, str]], save_interval: int = 5) -> Dict[str, Any]:
+        """批量处理数据"""
+        print(f"🚀 开始批量处理 {len(data)} 个文本...")
+        print(f"💾 每处理 {save_interval} 个文本保存一次结果")
+        print(f"⚡ 并发数: {self.concurrency}（{len(self.extractor.client.pool)} 个端点）")
+        
+        return await self._process_range(data, 0, [], save_interval)
+    
     def save_results(self, batch_result: Dict[str, Any], output_file: str = "batch_relation_results.json"):
         """保存结果到文件"""
         try:
@@ -145,8 +191,22 @@ class BatchRelationExtractor:
         except Exception as e:
             print(f"❌ 保存结果失败: {e}")
 
+    def restore_job(self, summary: Dict[str, Any]):
+        """沿用中间结果中的任务名称，并恢复该任务已使用的用量，使预算跨中断继续累计"""
+        job = summary.get("job")
+        if not job:
+            return
+        if job != self.job:
+            usage_meter.set_budget(self.job)
+            self.job = job
+            usage_meter.set_budget(self.job, self.max_tokens, self.max_cost)
+        usage = summary.get("usage")
+        if usage:
+            usage_meter.restore_job_usage(self.job, usage)
+        print(f"📊 沿用任务 {self.job}，此前已使用 {(usage or {}).get('total_tokens', 0)} token")
+    
     def load_partial_results(self, partial_file: str) -> tuple:
-        """加载部分结果，用于恢复处理"""
+        """加载部分结果，用于恢复处理（同时恢复任务名称与已用量）"""
         try:
             with open(partial_file, "r", encoding="utf-8") as f:
                 partial_data = json.load(f)
@@ -155,6 +215,7 @@ class BatchRelationExtractor:
                 results = partial_data.get("results", [])
                 processed_count = len(results)
                 print(f"✅ 从 {partial_file} 加载了 {processed_count} 个已处理的结果")
+                self.restore_job(partial_data.get("summary", {}))
                 return results, processed_count
             else:
                 print("❌ 该文件不是部分结果文件")
@@ -178,76 +239,7 @@ class BatchRelationExtractor:
         print(f"📊 已处理: {processed_count}/{len(data)} 个文本")
         
         # 继续处理剩余文本
-        results = existing_results.copy()
-        success_count = sum(1 for r in results if r.get("success", False))
-        total_entities = sum(r.get('metadata', {}).get('total_entities', 0) for r in results if r.get("success", False))
-        total_relations = sum(r.get('metadata', {}).get('total_relations', 0) for r in results if r.get("success", False))
-        total_descriptions = sum(r.get('metadata', {}).get('descriptions_generated', 0) for r in results if r.get("success", False))
-        
-        for i in range(processed_count, len(data)):
-            item = data[i]
-            if "text" not in item:
-                print(f"⚠️ 第 {i + 1} 个数据项缺少 'text' 字段，跳过")
-                continue
-            
-            text = item["text"]
-            if not text or not text.strip():
-                print(f"⚠️ 第 {i + 1} 个文本为空，跳过")
-                continue
-            
-            result = await self.process_single_text(text, i)
-            results.append(result)
-            
-            if result["success"]:
-                success_count += 1
-                total_entities += result['metadata']['total_entities']
-                total_relations += result['metadata']['total_relations']
-                total_descriptions += result['metadata']['descriptions_generated']
-            
-            # 每处理指定数量的文本就保存一次
-            if (i + 1) % save_interval == 0:
-                print(f"\n💾 已处理 {i + 1} 个文本，保存中间结果...")
-                temp_summary = {
-                    "total_texts": len(data),
-                    "processed_texts": len(results),
-                    "success_count": success_count,
-                    "failure_count": len(results) - success_count,
-                    "total_entities": total_entities,
-                    "total_relations": total_relations,
-                    "total_descriptions": total_descriptions,
-                    "success_rate": success_count / len(results) if results else 0,
-                    "progress": f"{i + 1}/{len(data)}"
-                }
-                
-                temp_result = {
-                    "summary": temp_summary,
-                    "results": results,
-                    "is_partial": True
-                }
-                
-                # 保存中间结果
-                temp_filename = f"batch_results_partial_{i + 1}_of_{len(data)}.json"
-                self.save_results(temp_result, temp_filename)
-                print(f"✅ 中间结果已保存到 {temp_filename}")
-        
-        # 生成最终汇总报告
-        summary = {
-            "total_texts": len(data),
-            "processed_texts": len(results),
-            "success_count": success_count,
-            "failure_count": len(results) - success_count,
-            "total_entities": total_entities,
-            "total_relations": total_relations,
-            "total_descriptions": total_descriptions,
-            "success_rate": success_count / len(results) if results else 0,
-            "progress": f"{len(data)}/{len(data)}"
-        }
-        
-        return {
-            "summary": summary,
-            "results": results,
-            "is_partial": False
-        }
+        return await self._process_range(data, processed_count, existing_results.copy(), save_interval)
 
 async def load_data_from_file(file_path: str) -> List[Dict[str, str]]:
     """从文件加载数据"""
@@ -277,23 +269,29 @@ async def main():
     """主函数"""
     print("🔧 批量关系抽取脚本启动...")
     
-    # 检查命令行参数
+    # 检查命令行参数（任务名称与预算为可选参数，其余按位置解析）
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--job", help="用量计量的任务名称，默认按启动时间生成（恢复处理时沿用中间结果中的名称）")
+    parser.add_argument("--max-tokens", type=int, help="任务的token预算，0表示不限，默认使用LLM_JOB_MAX_TOKENS")
+    parser.add_argument("--max-cost", type=float, help="任务的成本预算（美元），0表示不限，默认使用LLM_JOB_MAX_COST")
+    options, args = parser.parse_known_args()
+    
     input_file = "input_data.json"  # 默认文件名
     save_interval = 5  # 默认每5个文本保存一次
     resume_file = None  # 恢复文件
     
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-    if len(sys.argv) > 2:
+    if len(args) > 0:
+        input_file = args[0]
+    if len(args) > 1:
         try:
-            save_interval = int(sys.argv[2])
+            save_interval = int(args[1])
         except ValueError:
             # 如果第二个参数不是数字，可能是恢复文件
-            resume_file = sys.argv[2]
+            resume_file = args[1]
             save_interval = 5
-    if len(sys.argv) > 3 and resume_file is None:
+    if len(args) > 2 and resume_file is None:
         try:
-            save_interval = int(sys.argv[3])
+            save_interval = int(args[2])
         except ValueError:
             print("⚠️ 保存间隔参数必须是数字，使用默认值5")
     
@@ -325,16 +323,20 @@ async def main():
     
     print(f"✅ 成功加载 {len(data)} 个数据项")
     
-    # 设置API密钥
-    api_key = os.getenv("DEEPSEEK_API_KEY", "sk-5783900819b04bee9bc177f7db24edac")
+    # 设置API密钥（DEEPSEEK_API_KEYS可用逗号分隔多个密钥）
+    api_key = os.getenv("DEEPSEEK_API_KEYS") or os.getenv("DEEPSEEK_API_KEY")
     if not api_key:
-        print("❌ 请设置DEEPSEEK_API_KEY环境变量")
-        return
+        print("❌ 请设置DEEPSEEK_API_KEYS或DEEPSEEK_API_KEY环境变量")
+        sys.exit(1)
     
     print(f"✅ API密钥已设置: {api_key[:10]}...")
     
+    # 配置了LLM_ENDPOINTS时使用config中的多供应商端点池
+    client = LLMClient() if os.getenv("LLM_ENDPOINTS") else None
+    
     # 创建批量处理器
-    batch_processor = BatchRelationExtractor(api_key, api_type="deepseek")
+    batch_processor = BatchRelationExtractor(api_key, api_type="deepseek", client=client, job=options.job,
+                                             max_tokens=options.max_tokens, max_cost=options.max_cost)
     
     # 批量处理
     if resume_file and os.path.exists(resume_file):
@@ -355,6 +357,8 @@ async def main():
     print(f"总实体数: {summary['total_entities']}")
     print(f"总关系数: {summary['total_relations']}")
     print(f"总描述数: {summary['total_descriptions']}")
+    usage = summary["usage"]
+    print(f"LLM用量: {usage['calls']} 次调用，{usage['total_tokens']} token，${usage['cost_usd']:.4f}")
     
     # 保存结果
     output_file = f"batch_results_{len(data)}_texts.json"
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Agent模式基准测试脚本
+
+对比ReAct模式（文本解析）与函数调用模式在同一问题集上的每个问题迭代次数、延迟与输入token数。
+LLM与Arxiv响应经录制文件（services/replay.py）回放，重复运行时两种模式看到完全相同的工具数据；
+录制文件中没有的请求实时发出并写入录制文件（--record时全部重新录制，--offline时只回放、不访问网络）。
+
+用法：
+    python benchmark_agent_modes.py
+    python benchmark_agent_modes.py --modes function --output report.json
+    python benchmark_agent_modes.py --record
+    python benchmark_agent_modes.py --offline
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import List, Dict, Any
+
+from dotenv import load_dotenv
+
+from services.hedging import percentile
+from services.replay import Replay
+
+# 加载环境变量
+load_dotenv()
+
+DEFAULT_QUESTIONS = os.path.join("fixtures", "agent_questions.json")
+DEFAULT_CASSETTE = os.path.join("fixtures", "agent_cassette.json")
+
+def run_mode(mode: str, conversations: List[List[str]]) -> Dict[str, Any]:
+    """
+    在指定模式下运行全部对话
+
+    Args:
+        mode: Agent模式
+        conversations: 对话列表
+
+    Returns:
+        Dict[str, Any]: 每个问题的结果与汇总
+    """
+    from agent.controller import ScholarAgent
+
+    questions = []
+    for turns in conversations:
+        agent = ScholarAgent(mode=mode)
+        for turn in turns:
+            start = time.perf_counter()
+            result = agent.run(turn)
+            latency = time.perf_counter() - start
+            usage = result.get("token_usage", {})
+            questions.append({
+                "input": turn,
+                "success": result["success"],
+                "iterations": usage.get("iterations", 0),
+                "latency": latency,
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+                "tools_used": result.get("tools_used", [])
+            })
+            print(f"[{mode}] {turn[:30]:<30} 迭代 {questions[-1]['iterations']:>2}  延迟 {latency:6.2f}s")
+
+    latencies = sorted(q["latency"] for q in questions)
+    return {
+        "questions": questions,
+        "summary": {
+            "questions": len(questions),
+            "success_rate": sum(q["success"] for q in questions) / len(questions) if questions else 0.0,
+            "iterations_per_question": statistics.mean(q["iterations"] for q in questions) if questions else 0.0,
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p95": percentile(latencies, 0.95),
+            "prompt_tokens_per_question": statistics.mean(q["prompt_tokens"] for q in questions) if questions else 0.0
+        }
+    }
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="对比ReAct与函数调用两种Agent模式")
+    parser.add_argument("--modes", default="react,function", help="要测试的模式，逗号分隔")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="问题集fixture")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE, help="LLM与Arxiv响应的录制文件")
+    parser.add_argument("--record", action="store_true", help="重新录制全部响应")
+    parser.add_argument("--offline", action="store_true", help="只回放录制文件，不访问网络")
+    parser.add_argument("--output", help="将完整结果写入JSON文件")
+    args = parser.parse_args()
+
+    with open(args.questions, 'r', encoding='utf-8') as f:
+        conversations = json.load(f)["conversations"]
+
+    replay_mode = "record" if args.record else "replay" if args.offline else "auto"
+    report = {}
+    with Replay.from_config(mode=replay_mode, cassette=args.cassette) as replay:
+        for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+            report[mode] = run_mode(mode, conversations)
+
+    print("\n" + "=" * 72)
+    print(f"{'模式':<10}{'成功率':>8}{'迭代/问题':>12}{'p50延迟':>10}{'p95延迟':>10}{'输入token/问题':>18}")
+    print("-" * 72)
+    for mode, data in report.items():
+        s = data["summary"]
+        print(f"{mode:<10}{s['success_rate']:>8.0%}{s['iterations_per_question']:>12.2f}"
+              f"{s['latency_p50']:>9.2f}s{s['latency_p95']:>9.2f}s{s['prompt_tokens_per_question']:>18.0f}")
+    for kind, stats in replay.get_stats().items():
+        print(f"{kind}：回放 {stats['replayed']} 次，实时请求 {stats['recorded']} 次")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"完整结果已保存到: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+负载基准测试脚本
+
+在本地模拟LLM服务器（mock_llm_server.py）上，以逐级升高的并发驱动批量关系抽取（BatchRelationExtractor）、
+幻觉检测器（HallucinationDetector）与Agent（ScholarAgent），报告每个并发级别的吞吐、p50/p95/p99延迟与错误率，
+以及服务器侧的请求数、429次数与并发峰值，用于在上线前发现并发相关的性能退化。
+Agent的Arxiv检索由合成结果代替（固定延迟），不访问网络。
+
+用法：
+    python benchmark_load.py
+    python benchmark_load.py --concurrency 1,8,32,128 --requests 64 --workloads detector,agent
+    python benchmark_load.py --latency lognormal:800:0.6:20 --rate-limit 0.05 --max-concurrency 48
+    python benchmark_load.py --base-url http://127.0.0.1:8900/v1 --output load_report.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+import urllib.request
+from concurrent import futures
+from types import SimpleNamespace
+from typing import List, Dict, Any, Callable, Tuple
+
+from mock_llm_server import MockLLMServer, LatencyDistribution
+from services.hedging import percentile
+
+DEFAULT_QUESTIONS = os.path.join("fixtures", "agent_questions.json")
+DEFAULT_INPUTS = os.path.join("fixtures", "offline_workloads.json")
+WORKLOADS = ("batch", "detector", "agent")
+
+class SyntheticArxiv:
+    """Arxiv传输层：按固定延迟返回合成的检索结果（search.set_arxiv_transport接口）"""
+
+    def __init__(self, latency_ms: float = 200.0, results: int = 3):
+        self.latency_ms = latency_ms
+        self.results = results
+
+    def fetch(self, search: Any, live: Callable[[], list]) -> list:
+        time.sleep(self.latency_ms / 1000)
+        query = getattr(search, "query", "") or "paper"
+        return [SimpleNamespace(
+            title=f"Synthetic Paper {i} on {query[:40]}",
+            authors=[SimpleNamespace(name="A. Author"), SimpleNamespace(name="B. Author")],
+            summary=f"We propose a synthetic method {i}. Experiments show consistent improvements on benchmarks.",
+            entry_id=f"http://arxiv.org/abs/2401.{i:05d}v1",
+            published=None,
+            categories=["cs.CL"],
+            pdf_url=f"http://arxiv.org/pdf/2401.{i:05d}v1"
+        ) for i in range(1, self.results + 1)]
+
+def _server_stats(base_url: str) -> Dict[str, Any]:
+    """读取模拟服务器的累计统计（不是模拟服务器时返回空字典）"""
+    try:
+        with urllib.request.urlopen(base_url.rsplit("/v1", 1)[0] + "/stats", timeout=5) as response:
+            return json.loads(response.read())
+    except Exception:
+        return {}
+
+def _wait_healthy(pool: Any, timeout: float = 60.0):
+    """等待端点从摘除或熔断中恢复，避免上一并发级别的错误影响下一级别"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = pool.get_stats()
+        if not any(s["ejected"] or s["breaker"]["state"] == "open" for s in stats):
+            return
+        time.sleep(0.5)
+
+def _run_threads(task: Callable[[int], bool], requests: int, concurrency: int) -> List[Tuple[float, bool]]:
+    """在线程池中以指定并发执行requests个任务，返回每个任务的 (延迟, 是否成功)"""
+    def timed(index: int) -> Tuple[float, bool]:
+        start = time.perf_counter()
+        try:
+            success = task(index)
+        except Exception:
+            success = False
+        return time.perf_counter() - start, bool(success)
+
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(timed, range(requests)))
+
+def batch_workload(texts: List[str], requests: int, concurrency: int) -> List[Tuple[float, bool]]:
+    """批量关系抽取：一个批处理任务处理requests个文本，批处理并发数设为concurrency"""
+    from services.llm_client import llm_client
+    from batch_relation_extractor import BatchRelationExtractor
+
+    batch = BatchRelationExtractor("", client=llm_client,
+                                   concurrency_per_endpoint=max(1, concurrency // len(llm_client.pool)),
+                                   job=f"load-{concurrency}", max_tokens=0, max_cost=0)
+    samples: List[Tuple[float, bool]] = []
+    process_single_text = batch.process_single_text
+
+    async def timed(text: str, index: int) -> Dict[str, Any]:
+        start = time.perf_counter()
+        result = await process_single_text(text, index)
+        samples.append((time.perf_counter() - start, bool(result.get("success"))))
+        return result
+
+    batch.process_single_text = timed
+    data = [{"text": texts[i % len(texts)]} for i in range(requests)]
+    # 批处理逐条打印进度，这里不输出；保存间隔大于文本数，不写中间结果文件
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(batch.process_batch(data, save_interval=requests + 1))
+    # 熔断时批处理会暂停，未处理的文本按失败计
+    wall = time.perf_counter() - start
+    return samples + [(wall, False)] * (requests - len(samples))
+
+def detector_workload(cases: List[Dict[str, str]], requests: int, concurrency: int) -> List[Tuple[float, bool]]:
+    """幻觉检测：concurrency个线程并发检测，共requests个案例"""
+    from hallucination_detector import HallucinationDetector
+
+    detector = HallucinationDetector()
+
+    def task(index: int) -> bool:
+        case = cases[index % len(cases)]
+        result = detector.detect_hallucination(case["original_text"], case["generated_knowledge"])
+        return not any(str(analysis).startswith("检测异常") for analysis in result["detailed_analysis"].values())
+
+    return _run_threads(task, requests, concurrency)
+
+def agent_workload(questions: List[str], requests: int, concurrency: int, mode: str) -> List[Tuple[float, bool]]:
+    """Agent：concurrency个线程并发，每个问题在新会话中执行"""
+    from agent.controller import ScholarAgent
+
+    def task(index: int) -> bool:
+        return ScholarAgent(mode=mode).run(questions[index % len(questions)])["success"]
+
+    return _run_threads(task, requests, concurrency)
+
+def summarize(samples: List[Tuple[float, bool]], wall: float, before: Dict[str, Any],
+              after: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    汇总一个并发级别的结果
+
+    Args:
+        samples: 每个任务的 (延迟, 是否成功)
+        wall: 总耗时（秒）
+        before: 运行前的服务器统计
+        after: 运行后的服务器统计
+
+    Returns:
+        Dict[str, Any]: 吞吐、延迟分位数、错误率与服务器侧统计
+    """
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(not success for _, success in samples)
+    report = {
+        "requests": len(samples),
+        "wall_seconds": wall,
+        "throughput": len(samples) / wall if wall else 0.0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "latency_mean": statistics.mean(latencies) if latencies else 0.0,
+        "error_rate": errors / len(samples) if samples else 0.0
+    }
+    if after:
+        report["server"] = {
+            "llm_requests": after["requests"] - before.get("requests", 0),
+            "rate_limited": after["rate_limited"] - before.get("rate_limited", 0),
+            "peak_in_flight": after["peak_in_flight"],  # 外部服务器为累计峰值
+            "prompt_tokens": after["prompt_tokens"] - before.get("prompt_tokens", 0),
+            "completion_tokens": after["completion_tokens"] - before.get("completion_tokens", 0)
+        }
+    return report
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="以逐级升高的并发对各流程做负载测试")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="并发级别，逗号分隔")
+    parser.add_argument("--requests", type=int, default=32, help="每个并发级别的任务数")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="要测试的工作负载，逗号分隔")
+    parser.add_argument("--agent-mode", default="function", help="Agent模式")
+    parser.add_argument("--base-url", help="使用已启动的OpenAI兼容服务，不启动内置模拟服务器")
+    parser.add_argument("--endpoints", type=int, default=1, help="端点池中的端点数（指向同一服务器）")
+    parser.add_argument("--latency", default="lognormal:300:0.5:5", help="模拟服务器的延迟分布，见mock_llm_server.py")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="模拟服务器随机返回429的概率")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="模拟服务器同时处理的请求数上限")
+    parser.add_argument("--arxiv-latency-ms", type=float, default=200.0, help="合成Arxiv检索的延迟")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = set(selected) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"未知的工作负载: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = MockLLMServer(generator="scholar", latency=LatencyDistribution.parse(args.latency, args.seed),
+                               rate_limit=args.rate_limit, max_concurrency=args.max_concurrency, seed=args.seed)
+        base_url = server.start_in_thread()
+
+    # 端点池在首次导入config时创建，必须在导入各流程之前指向模拟服务器
+    os.environ["LLM_ENDPOINTS"] = json.dumps([
+        {"name": f"mock-{i}", "provider": "mock", "base_url": base_url, "api_key": "mock",
+         "models": ["deepseek-chat", "deepseek-reasoner"]}
+        for i in range(1, args.endpoints + 1)
+    ])
+    from services.llm_client import llm_client
+    from services.search import set_arxiv_transport
+    set_arxiv_transport(SyntheticArxiv(args.arxiv_latency_ms))
+
+    with open(DEFAULT_INPUTS, 'r', encoding='utf-8') as f:
+        inputs = json.load(f)
+    with open(DEFAULT_QUESTIONS, 'r', encoding='utf-8') as f:
+        questions = [turns[0] for turns in json.load(f)["conversations"]]
+
+    report: Dict[str, Dict[str, Any]] = {}
+    try:
+        for name in selected:
+            report[name] = {}
+            for level in levels:
+                _wait_healthy(llm_client.pool)
+                if server is not None:
+                    # 并发峰值按级别统计
+                    server.reset_stats()
+                before = _server_stats(base_url)
+                start = time.perf_counter()
+                if name == "batch":
+                    samples = batch_workload(inputs["relation_texts"], args.requests, level)
+                elif name == "detector":
+                    samples = detector_workload(inputs["detector_cases"], args.requests, level)
+                else:
+                    samples = agent_workload(questions, args.requests, level, args.agent_mode)
+                report[name][str(level)] = summarize(samples, time.perf_counter() - start, before,
+                                                     _server_stats(base_url))
+                s = report[name][str(level)]
+                print(f"[{name}] 并发 {level:>4}  吞吐 {s['throughput']:7.2f}/s  p50 {s['latency_p50']:6.2f}s  "
+                      f"p99 {s['latency_p99']:6.2f}s  错误率 {s['error_rate']:.0%}")
+    finally:
+        if server is not None:
+            server.stop_in_thread()
+
+    print("\n" + "=" * 96)
+    print(f"{'工作负载':<10}{'并发':>6}{'吞吐/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'错误率':>8}"
+          f"{'LLM请求':>9}{'429':>6}{'并发峰值':>10}")
+    print("-" * 96)
+    for name, by_level in report.items():
+        for level, s in by_level.items():
+            server_stats = s.get("server", {})
+            print(f"{name:<10}{level:>6}{s['throughput']:>9.2f}{s['latency_p50']:>8.2f}s{s['latency_p95']:>8.2f}s"
+                  f"{s['latency_p99']:>8.2f}s{s['error_rate']:>8.0%}{server_stats.get('llm_requests', '-'):>9}"
+                  f"{server_stats.get('rate_limited', '-'):>6}{server_stats.get('peak_in_flight', '-'):>10}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"完整结果已保存到: {args.output}")
+
+if __name__ == "__main__":
+    main()
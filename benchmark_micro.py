@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+CPU热点微基准测试脚本
+
+测量每个条目都会执行的纯Python路径：幻觉检测的评分提取正则、实体/关系抽取的代码块清理与JSON解析、
+论文信息的格式化与解析、检索结果注册，以及关系描述输出的去重。用例基于 fixtures/micro_fixtures.json
+中的真实样本，并包含拼接生成的超长输出。
+结果与保存的基线（fixtures/micro_baseline.json）比较，任一用例变慢超过阈值时以非零状态退出，可直接用于CI。
+基线与机器相关，比较前按与用例交替测量的校准负载耗时换算到当前机器。
+
+用法：
+    python benchmark_micro.py
+    python benchmark_micro.py --threshold 15 --filter score
+    python benchmark_micro.py --update          # 确认性能变化符合预期后重写基线
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import sys
+import timeit
+from typing import Dict, Any, Callable, List, Tuple
+
+DEFAULT_FIXTURES = os.path.join("fixtures", "micro_fixtures.json")
+DEFAULT_BASELINE = os.path.join("fixtures", "micro_baseline.json")
+
+def calibration_workload():
+    """校准负载：字符串、正则与JSON的混合操作，用于换算不同机器间的速度差异"""
+    text = " ".join(f"token{i}" for i in range(200))
+    re.findall(r'token(\d+)', text)
+    json.loads(json.dumps({"items": text.split()}))
+
+def build_cases(fixtures: Dict[str, Any]) -> List[Tuple[str, Callable[[], Any]]]:
+    """
+    根据样本构建微基准用例
+
+    Args:
+        fixtures: micro_fixtures.json 的内容
+
+    Returns:
+        List[Tuple[str, Callable[[], Any]]]: (用例名称, 无参函数) 列表
+    """
+    from services.llm_client import llm_client
+    from services.search import arxiv_service, PaperInfo
+    from hallucination_detector import HallucinationDetector
+    from standalone_relation_extractor import StandaloneRelationExtractor
+    from services.packing import strip_code_fence
+    from agent.paper_registry import PaperRegistry, parse_paper_text
+
+    detector = HallucinationDetector()
+    extractor = StandaloneRelationExtractor(client=llm_client, packing=False)
+
+    # 评分提取：正常响应、超长分析后给出评分、只能走备用模式、完全找不到评分（两个正则都扫描全文）
+    response = fixtures["detector_response"]
+    long_analysis = fixtures["detector_analysis_paragraph"] * 200
+    score_inputs = {
+        "score.short": response,
+        "score.long": "### 分析：\n" + long_analysis + "\n### 评分：\n0.85",
+        "score.long_fallback": "### 分析：\n" + long_analysis + "\n综合评分为 0.7",
+        "score.long_missing": "### 分析：\n" + long_analysis
+    }
+
+    # 代码块清理与JSON解析：实体字典、超长关系列表（带与不带代码块标记）
+    relations = [dict(fixtures["relation"], source=f'{fixtures["relation"]["source"]}{i}') for i in range(2000)]
+    relations_json = json.dumps(relations, ensure_ascii=False, indent=4)
+    json_inputs = {
+        "json.entities": fixtures["entities_response"],
+        "json.relations_long": f"```json\n{relations_json}\n```",
+        "json.relations_long_unfenced": relations_json
+    }
+
+    # 论文：格式化、从格式化文本解析（长摘要跨多行），以及容量已满时注册检索结果（触发LRU淘汰）
+    paper = PaperInfo(**fixtures["paper"])
+    long_paper = PaperInfo(**dict(fixtures["paper"], abstract="\n".join([paper.abstract] * 40)))
+    paper_text = arxiv_service.format_paper_info(paper)
+    long_paper_text = arxiv_service.format_paper_info(long_paper)
+    batches = [
+        [PaperInfo(**dict(fixtures["paper"], title=f"{paper.title} {batch}-{i}", arxiv_id=f"2304.{batch:03d}{i:02d}v1"))
+         for i in range(10)]
+        for batch in range(30)
+    ]
+    registry = PaperRegistry(fetch_missing=False, max_papers=200)
+    for batch in batches:
+        registry.register_results(batch)
+    cursor = iter(range(sys.maxsize))
+
+    # 关系描述去重：典型的一个文档，以及含大量重复句子的长文档
+    description = fixtures["description"]
+    descriptions = [
+        dict(description, source=f"实体{i}", target=f"实体{i + 1}", relation_type=relation_type,
+             detailed_description=f"{description['detailed_description']}（{i}）")
+        for i, relation_type in enumerate(["CAUSES", "TRIGGERS", "DETECTS", "PERFORMS", "USES"] * 4)
+    ]
+    long_descriptions = descriptions * 100
+
+    cases = [(name, lambda text=text: detector._extract_score_from_response(text)) for name, text in score_inputs.items()]
+    cases += [(name, lambda text=text: json.loads(strip_code_fence(text))) for name, text in json_inputs.items()]
+    cases += [
+        ("paper.format", lambda: arxiv_service.format_paper_info(paper)),
+        ("paper.format_long", lambda: arxiv_service.format_paper_info(long_paper)),
+        ("paper.parse", lambda: parse_paper_text(paper_text)),
+        ("paper.parse_long", lambda: parse_paper_text(long_paper_text)),
+        ("paper.register_results", lambda: registry.register_results(batches[next(cursor) % len(batches)])),
+        ("descriptions.format", lambda: extractor.format_descriptions_for_output(descriptions)),
+        ("descriptions.format_long", lambda: extractor.format_descriptions_for_output(long_descriptions))
+    ]
+    return cases
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> Tuple[float, float]:
+    """
+    测量单次调用耗时，每轮之前测量一次校准负载
+
+    校准与用例交替测量，机器负载在运行过程中变化时两者同步变化，换算后的比较不受影响。
+
+    Args:
+        func: 被测函数
+        repeat: 重复测量的轮数，取最快一轮以减少调度噪声
+        min_time: 每轮的最短时长（秒），据此确定每轮的调用次数
+
+    Returns:
+        Tuple[float, float]: 用例与校准负载的单次耗时（纳秒）
+    """
+    def calibrated(target: Callable[[], Any], seconds: float) -> Tuple[timeit.Timer, int]:
+        timer = timeit.Timer(target)
+        number, elapsed = timer.autorange()
+        return timer, max(1, int(number * seconds / max(elapsed, 1e-9)))
+
+    # 校准负载每轮只需较短的时间窗口
+    calibration_timer, calibration_number = calibrated(calibration_workload, min_time / 4)
+    case_timer, case_number = calibrated(func, min_time)
+    calibration, case = [], []
+    for _ in range(repeat):
+        calibration.append(calibration_timer.timeit(calibration_number) / calibration_number * 1e9)
+        case.append(case_timer.timeit(case_number) / case_number * 1e9)
+    return min(case), min(calibration)
+
+def compare(results: Dict[str, Tuple[float, float]], baseline: Dict[str, Any],
+            threshold: float) -> Dict[str, Dict[str, Any]]:
+    """
+    与基线比较
+
+    Args:
+        results: 当前各用例与其校准负载的单次耗时（纳秒）
+        baseline: 基线文件内容
+        threshold: 允许变慢的百分比
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 各用例的当前耗时、换算到当前机器的基线耗时、比值与状态（ok、regressed、new）
+    """
+    report = {}
+    for name, (ns, calibration_ns) in results.items():
+        expected = baseline.get("cases", {}).get(name)
+        if expected is None:
+            report[name] = {"ns": ns, "baseline_ns": None, "ratio": None, "status": "new"}
+            continue
+        expected *= calibration_ns / baseline["calibration_ns"]
+        ratio = ns / expected
+        report[name] = {
+            "ns": ns,
+            "baseline_ns": expected,
+            "ratio": ratio,
+            "status": "regressed" if ratio > 1 + threshold / 100 else "ok"
+        }
+    return report
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="CPU热点微基准测试，与基线比较并在性能退化时失败")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="输入样本")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件")
+    parser.add_argument("--threshold", type=float, default=25.0, help="允许变慢的百分比，超过即判定为退化")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeat", type=int, default=5, help="每个用例重复测量的轮数")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每轮的最短时长（秒）")
+    parser.add_argument("--update", action="store_true", help="用本次结果重写基线（只更新运行的用例）")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    with open(args.fixtures, 'r', encoding='utf-8') as f:
+        fixtures = json.load(f)
+    cases = [(name, func) for name, func in build_cases(fixtures) if not args.filter or args.filter in name]
+    if not cases:
+        parser.error(f"没有名称包含 {args.filter} 的用例")
+
+    # 评分提取的备用模式与默认值会逐次写日志，测量时关闭日志，避免测到的是终端输出
+    logging.disable(logging.CRITICAL)
+    try:
+        results = {}
+        for name, func in cases:
+            results[name] = measure(func, args.repeat, args.min_time)
+            print(f"{name:<32}{results[name][0] / 1000:>12.2f} µs")
+    finally:
+        logging.disable(logging.NOTSET)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.update:
+        # 各用例按各自的校准耗时换算到同一校准基准；只更新部分用例时沿用原基线的校准基准
+        calibration_ns = baseline.get("calibration_ns") or statistics.median(c for _, c in results.values())
+        cases_ns = dict(baseline.get("cases", {}))
+        cases_ns.update({name: ns * calibration_ns / c for name, (ns, c) in results.items()})
+        baseline = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "calibration_ns": calibration_ns,
+            "cases": dict(sorted(cases_ns.items()))
+        }
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"基线已更新: {args.baseline}")
+        return
+
+    if not baseline:
+        print(f"基线文件 {args.baseline} 不存在，请先运行 --update 生成")
+        sys.exit(1)
+    report = compare(results, baseline, args.threshold)
+    print("\n" + "=" * 76)
+    print(f"{'用例':<32}{'当前(µs)':>12}{'基线(µs)':>12}{'比值':>8}{'状态':>10}")
+    print("-" * 76)
+    for name, s in report.items():
+        expected = f"{s['baseline_ns'] / 1000:.2f}" if s["baseline_ns"] else "-"
+        ratio = f"{s['ratio']:.2f}" if s["ratio"] else "-"
+        print(f"{name:<32}{s['ns'] / 1000:>12.2f}{expected:>12}{ratio:>8}{s['status']:>10}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"threshold": args.threshold, "cases": report},
+                      f, ensure_ascii=False, indent=2)
+        print(f"完整结果已保存到: {args.output}")
+
+    regressed = [name for name, s in report.items() if s["status"] == "regressed"]
+    if regressed:
+        print(f"\n❌ {len(regressed)} 个用例变慢超过 {args.threshold:.0f}%: {', '.join(regressed)}")
+        sys.exit(1)
+    print(f"\n✅ 所有用例均在基线的 {args.threshold:.0f}% 以内")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+离线基准测试脚本
+
+回放录制文件（services/replay.py）中的LLM与Arxiv响应，在没有网络和API密钥的环境下
+确定性地测量Agent、关系抽取流程与幻觉检测器的端到端延迟。
+先用 --mode record（或auto）在有网络的环境下录制一次，之后即可反复离线运行；
+回放延迟默认等于录制延迟，可用REPLAY_LATENCY_SCALE、REPLAY_LLM_LATENCY_MS、REPLAY_JITTER_MS等环境变量调整。
+
+用法：
+    python benchmark_offline.py --mode record
+    python benchmark_offline.py
+    python benchmark_offline.py --workloads relation,detector --repeat 3 --output report.json
+    REPLAY_LATENCY_SCALE=0 python benchmark_offline.py --workloads agent
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import List, Dict, Any, Callable
+
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 回放不访问网络：未配置任何API密钥时使用占位端点（需在导入services之前设置，录制仍需真实密钥）
+if not any(os.getenv(name) for name in ("LLM_ENDPOINTS", "DEEPSEEK_API_KEYS", "DEEPSEEK_API_KEY",
+                                        "OPENAI_API_KEY", "LOCAL_LLM_BASE_URL")):
+    os.environ["LLM_ENDPOINTS"] = json.dumps([{"name": "replay", "base_url": "https://api.deepseek.com/v1",
+                                               "api_key": "replay", "models": ["deepseek-chat", "deepseek-reasoner"]}])
+
+from services.hedging import percentile
+from services.replay import Replay
+
+DEFAULT_CASSETTE = os.path.join("fixtures", "offline_cassette.json")
+DEFAULT_WORKLOADS = os.path.join("fixtures", "offline_workloads.json")
+DEFAULT_QUESTIONS = os.path.join("fixtures", "agent_questions.json")
+WORKLOADS = ("agent", "relation", "detector")
+
+def _measure(name: str, runs: List[Callable[[], bool]], repeat: int) -> Dict[str, Any]:
+    """
+    依次执行每个运行并计时
+
+    Args:
+        name: 工作负载名称
+        runs: 运行函数列表，返回是否成功
+        repeat: 重复次数
+
+    Returns:
+        Dict[str, Any]: 延迟分位数与成功率
+    """
+    latencies, successes = [], 0
+    for round_index in range(repeat):
+        for index, run in enumerate(runs, 1):
+            start = time.perf_counter()
+            try:
+                success = run()
+            except Exception as e:
+                print(f"[{name}] 第{index}个运行失败: {e}")
+                success = False
+            latencies.append(time.perf_counter() - start)
+            successes += bool(success)
+            print(f"[{name}] 轮次 {round_index + 1} #{index:<3} 延迟 {latencies[-1]:6.2f}s  {'成功' if success else '失败'}")
+
+    latencies.sort()
+    return {
+        "runs": len(latencies),
+        "success_rate": successes / len(latencies) if latencies else 0.0,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_mean": statistics.mean(latencies) if latencies else 0.0
+    }
+
+def agent_runs(questions_path: str, mode: str) -> List[Callable[[], bool]]:
+    """Agent工作负载：每个对话在新会话中按顺序执行"""
+    from agent.controller import ScholarAgent
+
+    with open(questions_path, 'r', encoding='utf-8') as f:
+        conversations = json.load(f)["conversations"]
+
+    def run_conversation(turns: List[str]) -> bool:
+        agent = ScholarAgent(mode=mode)
+        return all(agent.run(turn)["success"] for turn in turns)
+
+    return [lambda turns=turns: run_conversation(turns) for turns in conversations]
+
+def relation_runs(texts: List[str]) -> List[Callable[[], bool]]:
+    """关系抽取工作负载：实体抽取、关系识别与描述生成的完整流程"""
+    from services.llm_client import llm_client
+    from standalone_relation_extractor import StandaloneRelationExtractor
+
+    extractor = StandaloneRelationExtractor(client=llm_client)
+    return [lambda text=text: asyncio.run(extractor.extract_and_describe_relations(text))["success"]
+            for text in texts]
+
+def detector_runs(cases: List[Dict[str, str]]) -> List[Callable[[], bool]]:
+    """幻觉检测工作负载：三个维度的检测与综合评估"""
+    from hallucination_detector import HallucinationDetector
+
+    detector = HallucinationDetector()
+
+    def run_case(case: Dict[str, str]) -> bool:
+        # 单个维度调用失败时检测器给出默认评分，这里按失败计
+        result = detector.detect_hallucination(case["original_text"], case["generated_knowledge"])
+        return not any(str(analysis).startswith("检测异常") for analysis in result["detailed_analysis"].values())
+
+    return [lambda case=case: run_case(case) for case in cases]
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="回放录制的LLM与Arxiv响应，离线测量各流程延迟")
+    parser.add_argument("--mode", choices=("replay", "record", "auto"), default="replay",
+                        help="replay只回放；record实时请求并重新录制；auto缺少的请求实时录制")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE, help="录制文件")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="要测试的工作负载，逗号分隔")
+    parser.add_argument("--inputs", default=DEFAULT_WORKLOADS, help="关系抽取文本与幻觉检测案例fixture")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="Agent问题集fixture")
+    parser.add_argument("--agent-mode", default="function", help="Agent模式")
+    parser.add_argument("--repeat", type=int, default=1, help="每个工作负载重复的轮数")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    with open(args.inputs, 'r', encoding='utf-8') as f:
+        inputs = json.load(f)
+    selected = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = set(selected) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"未知的工作负载: {', '.join(sorted(unknown))}")
+
+    report = {}
+    with Replay.from_config(mode=args.mode, cassette=args.cassette) as replay:
+        for name in selected:
+            if name == "agent":
+                runs = agent_runs(args.questions, args.agent_mode)
+            elif name == "relation":
+                runs = relation_runs(inputs["relation_texts"])
+            else:
+                runs = detector_runs(inputs["detector_cases"])
+            report[name] = _measure(name, runs, args.repeat)
+        report["replay"] = replay.get_stats()
+
+    print("\n" + "=" * 64)
+    print(f"{'工作负载':<12}{'运行':>6}{'成功率':>8}{'p50延迟':>10}{'p95延迟':>10}{'平均延迟':>10}")
+    print("-" * 64)
+    for name in selected:
+        s = report[name]
+        print(f"{name:<12}{s['runs']:>6}{s['success_rate']:>8.0%}{s['latency_p50']:>9.2f}s"
+              f"{s['latency_p95']:>9.2f}s{s['latency_mean']:>9.2f}s")
+    for kind, stats in report["replay"].items():
+        print(f"{kind}: 回放 {stats['replayed']} 次，录制 {stats['recorded']} 次，未命中 {stats['missed']} 次")
+    if any(stats["missed"] for stats in report["replay"].values()) and args.mode == "replay":
+        print("存在未录制的请求，请先用 --mode auto 或 --mode record 补录")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"完整结果已保存到: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,210 @@
 配置文件
 """
 
+import os
+import json
+from typing import Dict, Any, List
+
 # DeepSeek API配置
-DEEPSEEK_API_KEY = "sk-d005b01ce325422eb59daa1cd5355144"
+# API密钥只从环境变量读取（见env_example.txt）
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "")
 DEEPSEEK_API_BASE = "https://api.deepseek.com/v1"
 DEEPSEEK_MODEL = "deepseek-chat"
 
+def _load_llm_endpoints() -> List[Dict[str, Any]]:
+    """
+    加载LLM端点池配置
+
+    优先读取环境变量 LLM_ENDPOINTS（JSON数组），否则根据
+    DEEPSEEK_API_KEYS（逗号分隔的多个密钥）或 DEEPSEEK_API_KEY、OPENAI_API_KEY、
+    LOCAL_LLM_BASE_URL 组装端点列表；未设置密钥的供应商不加入端点池。
+    """
+    raw = os.getenv("LLM_ENDPOINTS")
+    if raw:
+        return json.loads(raw)
+
+    endpoints = []
+    keys = [k.strip() for k in os.getenv("DEEPSEEK_API_KEYS", "").split(",") if k.strip()]
+    if not keys and DEEPSEEK_API_KEY:
+        keys = [DEEPSEEK_API_KEY]
+    for i, key in enumerate(keys, 1):
+        endpoints.append({
+            "name": f"deepseek-{i}",
+            "provider": "deepseek",
+            "base_url": os.getenv("DEEPSEEK_BASE_URL", DEEPSEEK_API_BASE),
+            "api_key": key,
+            "models": [os.getenv("DEEPSEEK_MODEL", DEEPSEEK_MODEL), "deepseek-reasoner"],
+            "weight": 1.0
+        })
+
+    if os.getenv("OPENAI_API_KEY"):
+        endpoints.append({
+            "name": "openai",
+            "provider": "openai",
+            "base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+            "api_key": os.getenv("OPENAI_API_KEY"),
+            "models": [os.getenv("OPENAI_MODEL", "gpt-4o-mini")],
+            "weight": 1.0
+        })
+
+    if os.getenv("LOCAL_LLM_BASE_URL"):
+        endpoints.append({
+            "name": "local",
+            "provider": "local",
+            "base_url": os.getenv("LOCAL_LLM_BASE_URL"),
+            "api_key": os.getenv("LOCAL_LLM_API_KEY", "EMPTY"),
+            "models": [os.getenv("LOCAL_LLM_MODEL", "local-model")],
+            "weight": float(os.getenv("LOCAL_LLM_WEIGHT", "1.0"))
+        })
+
+    return endpoints
+
+# LLM端点池（多密钥/多供应商负载均衡）
+LLM_ENDPOINTS = _load_llm_endpoints()
+
+# 端点健康检查与摘除配置
+LLM_POOL_CONFIG = {
+    'window_size': 20,             # 错误率统计窗口（最近N次请求）
+    'min_requests': 5,             # 窗口内最少请求数，达到后才计算错误率
+    'error_rate_threshold': 0.5,   # 错误率超过该值时摘除端点
+    'consecutive_failures': 3,     # 连续失败次数超过该值时摘除端点
+    'eject_seconds': 30.0,         # 摘除时长，到期后自动恢复
+    'probe_interval': 10.0,        # 后台探活间隔（秒）
+    'max_attempts': 2,             # 单次调用最多尝试的端点数
+    'request_timeout': 60.0        # 单次请求超时（秒）
+}
+
+# 请求对冲配置（降低尾延迟）
+LLM_HEDGING_CONFIG = {
+    'enabled': os.getenv("LLM_HEDGING", "false").lower() == "true",  # 是否默认对所有调用对冲
+    'quantile': 0.9,               # 超过该分位延迟仍未返回时发送对冲请求
+    'min_samples': 20,             # 延迟样本不足时不对冲
+    'min_delay': 0.5,              # 对冲等待时间下限（秒）
+    'max_hedge_ratio': 0.05,       # 对冲请求占比上限，限制额外成本
+    'burst': 5.0                   # 对冲预算可累积的上限
+}
+
+# 小任务打包配置（短时间窗口内的同类小任务合并为一次多条目请求）
+LLM_PACKING_CONFIG = {
+    'enabled': os.getenv("LLM_PACKING", "false").lower() == "true",  # 是否默认启用打包
+    'window_ms': 50,               # 收集窗口（毫秒），首个任务到达后开始计时
+    'max_items': 8,                # 单次打包的最大条目数，达到后立即发送
+    'max_workers': 8               # 并发发送打包请求的线程数
+}
+
+# 模型档位（可通过环境变量把简单任务切换到更小更快的模型，如 gpt-4o-mini 或本地模型）
+MODEL_TIERS = {
+    'small': os.getenv("LLM_SMALL_MODEL", DEEPSEEK_MODEL),
+    'standard': os.getenv("LLM_STANDARD_MODEL", DEEPSEEK_MODEL),
+    'strong': os.getenv("LLM_STRONG_MODEL", "deepseek-reasoner")
+}
+
+# 任务路由表：任务 -> 模型档位、max_tokens、温度、校验失败时升级的档位
+# 未列出的任务按前缀匹配（如 hallucination.xxx → hallucination），否则使用default
+MODEL_ROUTES = {
+    'default':                 {'tier': 'standard', 'max_tokens': None, 'temperature': 0.3},
+    'agent.react':             {'tier': 'standard', 'max_tokens': 1024, 'temperature': 0.3},
+    'agent.function':          {'tier': 'standard', 'max_tokens': 1024, 'temperature': 0.3},
+    'agent.plan':              {'tier': 'standard', 'max_tokens': 1024, 'temperature': 0.1, 'escalate_to': 'strong'},
+    'agent.plan.answer':       {'tier': 'standard', 'max_tokens': 1500, 'temperature': 0.3},
+    'memory.summarize':        {'tier': 'small', 'max_tokens': 800, 'temperature': 0.2},
+    'summarize.contributions': {'tier': 'standard', 'max_tokens': 1500, 'temperature': 0.3},
+    'summarize.methods':       {'tier': 'standard', 'max_tokens': 1500, 'temperature': 0.3},
+    'summarize.question':      {'tier': 'standard', 'max_tokens': 1000, 'temperature': 0.3},
+    'summarize.compare':       {'tier': 'standard', 'max_tokens': 2000, 'temperature': 0.3, 'escalate_to': 'strong'},
+    'summarize.key_points':    {'tier': 'small', 'max_tokens': 400, 'temperature': 0.3, 'escalate_to': 'standard'},
+    'relation.entities':       {'tier': 'small', 'max_tokens': 2000, 'temperature': 0.7, 'escalate_to': 'standard'},
+    'relation.relations':      {'tier': 'standard', 'max_tokens': 2000, 'temperature': 0.7, 'escalate_to': 'strong'},
+    'relation.description':    {'tier': 'small', 'max_tokens': 200, 'temperature': 0.7},
+    'relation.variations':     {'tier': 'small', 'max_tokens': 300, 'temperature': 0.8, 'escalate_to': 'standard'},
+    'hallucination':           {'tier': 'standard', 'max_tokens': 1000, 'temperature': 0.1, 'escalate_to': 'strong'}
+}
+
+# 模型价格（美元/百万token），用于按路由估算成本，请按实际价格调整
+# cached_input为命中服务商前缀缓存的输入token价格
+MODEL_PRICING = {
+    'deepseek-chat': {'input': 0.27, 'cached_input': 0.07, 'output': 1.10},
+    'deepseek-reasoner': {'input': 0.55, 'cached_input': 0.14, 'output': 2.19},
+    'gpt-4o-mini': {'input': 0.15, 'cached_input': 0.075, 'output': 0.60},
+    'gpt-4o': {'input': 2.50, 'cached_input': 1.25, 'output': 10.00},
+    'gpt-3.5-turbo': {'input': 0.50, 'output': 1.50}
+}
+
+# 模型路由配置
+MODEL_ROUTING_CONFIG = {
+    'escalate_on_validation_failure': os.getenv("LLM_ESCALATE", "true").lower() == "true"
+}
+
+# Agent快速通道配置（意图明确的请求直接调用检索/总结服务，不经过LLM Agent循环）
+AGENT_FAST_PATH_CONFIG = {
+    'enabled': os.getenv("AGENT_FAST_PATH", "true").lower() == "true",  # 是否默认启用快速通道
+    'min_confidence': 0.6          # 意图分类置信度低于该值时交给Agent处理
+}
+
+# Agent对话记忆配置（最近若干轮保留原文，更早的轮次在后台合并为滚动摘要）
+AGENT_MEMORY_CONFIG = {
+    'keep_turns': 4,               # 至少保留原文的最近轮数
+    'max_tokens': 2000,            # 对话历史区域的硬性token预算
+    'summary_tokens': 600,         # 滚动摘要的token上限
+    'background': True             # 是否在回答返回后于后台生成摘要
+}
+
+# 论文上下文注入配置（只注入与当前输入相关的会话论文）
+AGENT_CONTEXT_CONFIG = {
+    'top_k': 5,                    # 最多注入的论文数
+    'max_tokens': 300,             # 注入文本的token上限
+    'recency_weight': 0.3          # 最近程度在得分中的权重，其余为相关性
+}
+
+# Agent请求截止时间配置（超时后返回已完成的工具结果作为部分回答）
+AGENT_DEADLINE_CONFIG = {
+    'seconds': float(os.getenv("AGENT_DEADLINE_SECONDS", "60")),  # 每次请求的墙钟时间上限（秒），0表示不限时
+    'partial_chars': 800           # 部分回答中每个工具结果保留的最大字符数
+}
+
+# 推测预取配置（检索后在后台为前几篇结果预先生成分析，下一轮"总结这篇论文"等请求直接命中）
+AGENT_PREFETCH_CONFIG = {
+    'enabled': os.getenv("AGENT_PREFETCH", "false").lower() == "true",  # 是否默认启用（需主动开启）
+    'top_n': 1,                    # 为检索结果的前几篇预取
+    'facets': ['summarize_contributions', 'summarize_methods'],  # 预取的分析
+    'max_calls_per_session': 6,    # 每个会话最多发起的预取调用数
+    'max_workers': 2,              # 预取线程数
+    'busy_threshold': 4            # LLM端点池在途请求数达到该值时跳过预取
+}
+
+# 会话快照配置（设置后命令行交互模式启动时恢复会话、每轮对话后保存会话）
+AGENT_SESSION_CONFIG = {
+    'path': os.getenv("SCHOLAR_SESSION_FILE", "")   # 快照文件路径，以 .gz 结尾时压缩
+}
+
+# 用量计量配置（每次LLM调用的token与成本归属到调用点、会话、批处理任务与条目，汇总见 usage_report.py）
+METERING_CONFIG = {
+    'path': os.getenv("LLM_USAGE_FILE", ""),      # JSONL用量记录文件，为空时只在内存中统计
+    'window_seconds': 60,                          # 时间窗口长度（秒）
+    'max_windows': 1440,                           # 内存中保留的时间窗口数（默认24小时）
+    'job_max_tokens': int(os.getenv("LLM_JOB_MAX_TOKENS", "0")),     # 批处理任务的token预算，0表示不限
+    'job_max_cost': float(os.getenv("LLM_JOB_MAX_COST", "0"))        # 批处理任务的成本预算（美元），0表示不限
+}
+
+# 调用追踪配置（记录每次Agent运行中LLM、工具、Arxiv各步骤的耗时，汇总见 trace_report.py）
+TRACING_CONFIG = {
+    'enabled': os.getenv("AGENT_TRACE", "true").lower() == "true",  # 是否记录跨度（运行结果中的耗时分布依赖此项）
+    'jsonl_path': os.getenv("AGENT_TRACE_FILE", ""),       # JSONL输出文件，为空时不写文件
+    'otlp_path': os.getenv("AGENT_TRACE_OTLP_FILE", "")    # OpenTelemetry OTLP/JSON输出文件，为空时不写文件
+}
+
+# 录制回放配置（LLM与Arxiv请求录制为cassette文件后离线回放，用于基准测试，见 services/replay.py）
+REPLAY_CONFIG = {
+    'mode': os.getenv("SCHOLAR_REPLAY", "").lower(),             # record/replay/auto，为空时关闭
+    'cassette': os.getenv("SCHOLAR_CASSETTE", os.path.join("fixtures", "cassette.json")),  # cassette文件路径
+    'latency_scale': float(os.getenv("REPLAY_LATENCY_SCALE", "1.0")),   # 回放延迟为录制延迟乘以该系数，0表示不等待
+    'llm_latency_ms': os.getenv("REPLAY_LLM_LATENCY_MS", ""),     # LLM固定基础延迟（毫秒），为空时使用录制延迟
+    'llm_per_token_ms': float(os.getenv("REPLAY_LLM_PER_TOKEN_MS", "0")),  # 固定延迟时每个输出token追加的延迟（毫秒）
+    'arxiv_latency_ms': os.getenv("REPLAY_ARXIV_LATENCY_MS", ""), # Arxiv固定延迟（毫秒），为空时使用录制延迟
+    'jitter_ms': float(os.getenv("REPLAY_JITTER_MS", "0")),      # 延迟在±jitter_ms内均匀抖动
+    'seed': int(os.getenv("REPLAY_SEED", "0"))                    # 抖动随机数种子
+}
+
 # 幻觉检测配置
 DETECTION_THRESHOLDS = {
     'high_confidence': 0.8,
@@ -108,3 +307,34 @@ OUTPUT_CONFIG = {
     'output_format': 'json',
     'log_level': 'INFO'
 }
+
+class Config:
+    """配置访问对象"""
+
+    def get_llm_endpoints(self) -> List[Dict[str, Any]]:
+        """获取LLM端点池配置"""
+        return LLM_ENDPOINTS
+
+    def get_llm_config(self, provider: str = "deepseek") -> Dict[str, Any]:
+        """
+        获取指定供应商的首个端点配置
+
+        Args:
+            provider: 供应商名称
+
+        Returns:
+            Dict[str, Any]: 包含base_url、api_key、model的配置
+
+        Raises:
+            ValueError: 没有配置该供应商的端点（未设置对应的API密钥）
+        """
+        for endpoint in LLM_ENDPOINTS:
+            if endpoint.get("provider") == provider:
+                return {
+                    "base_url": endpoint["base_url"],
+                    "api_key": endpoint["api_key"],
+                    "model": endpoint["models"][0]
+                }
+        raise ValueError(f"未配置供应商 {provider} 的LLM端点，请设置对应的API密钥环境变量或LLM_ENDPOINTS")
+
+config = Config()
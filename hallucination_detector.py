@@ -6,8 +6,10 @@
 import re
 import json
 import logging
-from typing import Dict, Any
-from entity_extractor import EntityExtractor
+from typing import Dict, Any, Optional
+from services.routing import ModelRouter, model_router
+from services.circuit_breaker import CircuitOpenError
+from services.metering import BudgetExceeded
 from prompts import FACTUAL_CONSISTENCY_PROMPT, REASONING_QUALITY_PROMPT, FUNDAMENTAL_ERRORS_PROMPT
 
 logging.basicConfig(level=logging.INFO)
@@ -16,8 +18,19 @@ logger = logging.getLogger(__name__)
 class HallucinationDetector:
     """幻觉检测器"""
     
-    def __init__(self):
-        self.entity_extractor = EntityExtractor()
+    # 统一的评分格式
+    SCORE_PATTERN = r'### 评分：\s*\n([0-9]*\.?[0-9]+)'
+    
+    def __init__(self, router: Optional[ModelRouter] = None, hedge: Optional[bool] = None):
+        """
+        初始化检测器
+
+        Args:
+            router: 模型路由，默认使用全局实例
+            hedge: 是否对冲慢请求，None表示使用全局对冲配置
+        """
+        self.router = router or model_router
+        self.hedge = hedge
         
         # 检测维度权重（仅用于显示，不用于计算）
         self.weights = {
@@ -36,6 +49,10 @@ class HallucinationDetector:
             
         Returns:
             检测结果字典
+            
+        Raises:
+            CircuitOpenError: LLM端点全部熔断（快速失败，不产生默认评分）
+            BudgetExceeded: 调用方所在的批处理任务已用完用量预算
         """
         logger.info("开始幻觉检测...")
         
@@ -61,7 +78,7 @@ class HallucinationDetector:
                 generated_knowledge=generated_knowledge
             )
             
-            response = self.entity_extractor.call_deepseek_api(prompt)
+            response = self._call_llm(prompt, 'factual_consistency')
             score = self._extract_score_from_response(response)
             
             return {
@@ -70,6 +87,8 @@ class HallucinationDetector:
                 'dimension': 'factual_consistency'
             }
             
+        except (CircuitOpenError, BudgetExceeded):
+            raise
         except Exception as e:
             logger.error(f"事实一致性检测异常: {str(e)}")
             return {
@@ -86,7 +105,7 @@ class HallucinationDetector:
                 generated_knowledge=generated_knowledge
             )
             
-            response = self.entity_extractor.call_deepseek_api(prompt)
+            response = self._call_llm(prompt, 'reasoning_quality')
             score = self._extract_score_from_response(response)
             
             return {
@@ -95,6 +114,8 @@ class HallucinationDetector:
                 'dimension': 'reasoning_quality'
             }
             
+        except (CircuitOpenError, BudgetExceeded):
+            raise
         except Exception as e:
             logger.error(f"推理质量检测异常: {str(e)}")
             return {
@@ -111,7 +132,7 @@ class HallucinationDetector:
                 generated_knowledge=generated_knowledge
             )
             
-            response = self.entity_extractor.call_deepseek_api(prompt)
+            response = self._call_llm(prompt, 'fundamental_errors')
             score = self._extract_score_from_response(response)
             
             return {
@@ -120,6 +141,8 @@ class HallucinationDetector:
                 'dimension': 'fundamental_errors'
             }
             
+        except (CircuitOpenError, BudgetExceeded):
+            raise
         except Exception as e:
             logger.error(f"根本性错误检测异常: {str(e)}")
             return {
@@ -128,12 +151,21 @@ class HallucinationDetector:
                 'dimension': 'fundamental_errors'
             }
     
+    def _call_llm(self, prompt: str, dimension: str) -> str:
+        """经由模型路由发送检测请求，输出缺少评分格式时按路由升级模型重试"""
+        response = self.router.complete(
+            f"hallucination.{dimension}",
+            [{"role": "user", "content": prompt}],
+            validate=lambda content: re.search(self.SCORE_PATTERN, content) is not None,
+            hedge=self.hedge
+        )
+        return response.content
+    
     def _extract_score_from_response(self, response: str) -> float:
         """从API响应中提取评分"""
         try:
             # 使用统一的格式提取评分
-            score_pattern = r'### 评分：\s*\n([0-9]*\.?[0-9]+)'
-            match = re.search(score_pattern, response)
+            match = re.search(self.SCORE_PATTERN, response)
             
             if match:
                 score = float(match.group(1))
@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+OpenAI兼容的模拟LLM服务器
+
+基于asyncio的HTTP/1.1服务器（只依赖标准库），实现 POST /v1/chat/completions（含stream=true的SSE流式输出）
+与 GET /v1/models，用于在本地对Agent、关系抽取与幻觉检测做负载与吞吐测试，不消耗真实配额：
+- 响应生成器可替换：内置scholar（按本项目各类提示词返回格式正确的结果）与echo，也可用 "模块:函数" 指定自定义生成器，
+  生成器接收请求字典，返回文本或 {"content": 文本, "tool_calls": [{"name": 工具名, "arguments": 参数字典}]}
+- 延迟分布：首token延迟按fixed/uniform/normal/lognormal分布采样，之后每个输出token追加固定间隔
+- 429注入：按概率返回限流错误，或在同时处理的请求数超过上限时返回限流错误（带Retry-After）
+- token计量：按services.tokens估算输入/输出token，相同系统消息的后续请求计为前缀缓存命中（DeepSeek格式的usage字段），
+  GET /stats 返回累计请求数、限流次数、并发峰值与token数
+
+用法：
+    python mock_llm_server.py --port 8900
+    python mock_llm_server.py --port 8900 --latency lognormal:400:0.5:15 --rate-limit 0.05 --max-concurrency 32
+    LLM_ENDPOINTS='[{"name": "mock", "base_url": "http://127.0.0.1:8900/v1", "api_key": "mock", "models": ["deepseek-chat"]}]' python app.py
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional, List, Callable, Union
+
+from services.tokens import estimate_tokens
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_CJK_OR_CHUNK = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]|[^　-〿㐀-䶿一-鿿＀-￯]{1,3}', re.S)
+
+class LatencyDistribution:
+    """模拟响应的延迟：首token延迟分布与逐token输出间隔"""
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, kind: str = "lognormal", ttft_ms: float = 300.0, spread: float = 0.5,
+                 per_token_ms: float = 10.0, seed: Optional[int] = None):
+        """
+        初始化延迟分布
+
+        Args:
+            kind: 首token延迟的分布类型（fixed、uniform、normal、lognormal）
+            ttft_ms: 首token延迟的中位数（毫秒）
+            spread: 分散程度：uniform为±比例，normal为标准差与中位数之比，lognormal为对数标准差
+            per_token_ms: 每个输出token的间隔（毫秒）
+            seed: 随机数种子
+
+        Raises:
+            ValueError: 分布类型无效
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"无效的延迟分布: {kind}，可选 {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.ttft_ms = ttft_ms
+        self.spread = spread
+        self.per_token_ms = per_token_ms
+        self._random = random.Random(seed)
+
+    @classmethod
+    def parse(cls, spec: str, seed: Optional[int] = None) -> "LatencyDistribution":
+        """
+        解析 "分布:首token毫秒[:分散程度[:每token毫秒]]" 格式的描述，如 lognormal:400:0.5:15
+
+        Args:
+            spec: 延迟描述
+            seed: 随机数种子
+
+        Returns:
+            LatencyDistribution: 延迟分布
+        """
+        parts = spec.split(":")
+        values = [float(part) for part in parts[1:]]
+        return cls(parts[0], *values, seed=seed)
+
+    def ttft(self) -> float:
+        """采样一次首token延迟（秒）"""
+        if self.kind == "fixed":
+            value = self.ttft_ms
+        elif self.kind == "uniform":
+            value = self._random.uniform(self.ttft_ms * (1 - self.spread), self.ttft_ms * (1 + self.spread))
+        elif self.kind == "normal":
+            value = self._random.gauss(self.ttft_ms, self.ttft_ms * self.spread)
+        else:
+            value = self.ttft_ms * math.exp(self._random.gauss(0.0, self.spread))
+        return max(value, 0.0) / 1000
+
+    def describe(self) -> str:
+        """延迟分布的描述文本"""
+        return f"{self.kind}:{self.ttft_ms:g}:{self.spread:g}:{self.per_token_ms:g}"
+
+# ---- 响应生成器 ----
+
+_ENTITIES = {
+    "网络元素": ["UDM实例"], "告警": ["UDM服务不可用告警"], "人员": ["运维工程师"],
+    "工具": ["5G云管理平台"], "业务": [], "原因": ["数据库连接中断"], "动作": ["重启实例"], "状态": []
+}
+_RELATIONS = [
+    {"source": "UDM服务不可用告警", "target": "运维工程师", "relation_type": "TRIGGERS"},
+    {"source": "运维工程师", "target": "5G云管理平台", "relation_type": "USES"},
+    {"source": "数据库连接中断", "target": "UDM实例", "relation_type": "CAUSES"}
+]
+_VARIATIONS = ["模拟表达一：源实体与目标实体存在该关系。", "模拟表达二：目标实体受到源实体的作用。",
+               "模拟表达三：两者之间的关系在上下文中得到体现。"]
+
+def _last_user_content(messages: List[Dict[str, Any]]) -> str:
+    """最后一条用户消息的文本"""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return str(message.get("content") or "")
+    return ""
+
+def scholar_generator(request: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+    """
+    按本项目的提示词返回格式正确的模拟结果
+
+    覆盖实体抽取、关系识别、关系描述与表达变体（含打包请求）、幻觉检测评分、
+    ReAct（先检索后回答）与函数调用（先调用search_arxiv后回答）两种Agent模式，其余请求返回一段固定文本。
+
+    Args:
+        request: chat.completions请求
+
+    Returns:
+        Union[str, Dict[str, Any]]: 回复文本，或包含tool_calls的字典
+    """
+    messages = request.get("messages") or []
+    last = _last_user_content(messages)
+
+    packed = re.search(r"请以JSON数组返回全部(\d+)个结果", last)
+    if packed:
+        as_list = "JSON字符串数组" in last
+        return json.dumps([{"id": i, "result": _VARIATIONS if as_list else f"模拟关系描述句子{i}。"}
+                           for i in range(1, int(packed.group(1)) + 1)], ensure_ascii=False)
+    if "### 评分" in last:
+        return "### 分析：\n模拟评估：生成内容与原文基本一致。\n\n### 评分：\n0.85\n\n### 评分理由：\n模拟评分。"
+    if "抽取关键实体" in last:
+        return json.dumps(_ENTITIES, ensure_ascii=False)
+    if "识别实体间的关系" in last:
+        return json.dumps(_RELATIONS, ensure_ascii=False)
+    if "不同的自然语言表达方式" in last:
+        return json.dumps(_VARIATIONS, ensure_ascii=False)
+    if "自然语言描述句子" in last:
+        return "模拟关系描述：源实体通过该关系作用于目标实体，并在上下文中得到体现。"
+
+    if request.get("tools"):
+        if not any(message.get("role") == "tool" for message in messages):
+            return {"content": "", "tool_calls": [{"name": "search_arxiv",
+                                                   "arguments": {"search_type": "keywords", "query": last[-40:]}}]}
+        return "根据检索结果，这些论文的主要贡献是提出了新的方法并在基准上取得了提升。（模拟回答）"
+    if "Action Input" in last and "Final Answer" in last:
+        scratchpad = last.rsplit("\n问题:", 1)[-1]
+        if "Observation:" in scratchpad:
+            return "Thought: 已获得检索结果\nFinal Answer: 根据检索结果，相关论文提出了新的方法。（模拟回答）"
+        return "Thought: 需要先检索相关论文\nAction: search_arxiv\nAction Input: keywords:large language model"
+    return "这是模拟服务器生成的回答，用于负载测试。"
+
+def echo_generator(request: Dict[str, Any]) -> str:
+    """原样返回最后一条用户消息"""
+    return _last_user_content(request.get("messages") or [])
+
+GENERATORS: Dict[str, Callable[[Dict[str, Any]], Union[str, Dict[str, Any]]]] = {
+    "scholar": scholar_generator,
+    "echo": echo_generator
+}
+
+def load_generator(spec: str) -> Callable[[Dict[str, Any]], Union[str, Dict[str, Any]]]:
+    """
+    按名称（scholar、echo）或 "模块:函数" 加载响应生成器
+
+    Args:
+        spec: 生成器名称或路径
+
+    Returns:
+        Callable: 生成器函数
+    """
+    if spec in GENERATORS:
+        return GENERATORS[spec]
+    module_name, _, function_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+# ---- 服务器 ----
+
+@dataclass
+class MockStats:
+    """模拟服务器的累计统计"""
+    requests: int = 0
+    completed: int = 0
+    rate_limited: int = 0
+    errors: int = 0
+    streamed: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+
+class MockLLMServer:
+    """OpenAI兼容的模拟chat.completions服务器"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 generator: Union[str, Callable] = "scholar",
+                 latency: Optional[LatencyDistribution] = None,
+                 rate_limit: float = 0.0, max_concurrency: int = 0, retry_after: float = 1.0,
+                 seed: Optional[int] = None):
+        """
+        初始化模拟服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示随机分配
+            generator: 响应生成器，名称、"模块:函数" 或函数
+            latency: 延迟分布，默认lognormal、首token 300毫秒、每token 10毫秒
+            rate_limit: 随机返回429的概率
+            max_concurrency: 同时处理的请求数上限，超出时返回429，0表示不限
+            retry_after: 429响应的Retry-After（秒）
+            seed: 429注入的随机数种子
+        """
+        self.host = host
+        self.port = port
+        self.generator = load_generator(generator) if isinstance(generator, str) else generator
+        self.latency = latency or LatencyDistribution()
+        self.rate_limit = rate_limit
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.stats = MockStats()
+        self._random = random.Random(seed)
+        self._seen_prefixes: set = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """OpenAI客户端使用的base_url"""
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        """在当前事件循环中开始监听"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=2 ** 24)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"模拟LLM服务器已启动: {self.base_url}（延迟 {self.latency.describe()}）")
+
+    async def stop(self):
+        """停止监听"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def start_in_thread(self) -> str:
+        """
+        在后台线程的事件循环中启动（供同步代码使用）
+
+        Returns:
+            str: base_url
+        """
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+            # 关闭仍保持的长连接
+            self._loop.run_until_complete(self._cancel_connections())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.base_url
+
+    @staticmethod
+    async def _cancel_connections():
+        """取消仍在等待请求的连接处理任务"""
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def stop_in_thread(self):
+        """停止后台线程中的服务器"""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """累计统计"""
+        return asdict(self.stats)
+
+    def reset_stats(self):
+        """清零统计（不影响正在处理的请求数）"""
+        self.stats = MockStats(in_flight=self.stats.in_flight)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个连接上的请求（HTTP/1.1长连接）"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = request_line.split(" ", 2)
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0") or 0))
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._route(method, path.split("?", 1)[0], body, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # 客户端断开，或服务器停止时取消仍保持的长连接
+            pass
+        except Exception as e:
+            logger.warning(f"模拟服务器处理请求失败: {e}")
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        """按路径分发请求"""
+        if method == "POST" and path.endswith("/chat/completions"):
+            await self._chat_completions(json.loads(body or b"{}"), writer)
+        elif method == "GET" and path.endswith("/models"):
+            await self._send_json(writer, 200, {"object": "list", "data": [
+                {"id": "mock-model", "object": "model", "created": 0, "owned_by": "mock"}]})
+        elif method == "GET" and path == "/stats":
+            await self._send_json(writer, 200, self.get_stats())
+        else:
+            await self._send_json(writer, 404, {"error": {"message": f"未知路径: {path}", "type": "not_found"}})
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                         extra_headers: Optional[Dict[str, str]] = None):
+        """写出JSON响应"""
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error"}[status]
+        headers = {"Content-Type": "application/json", "Content-Length": str(len(data)), **(extra_headers or {})}
+        head = f"HTTP/1.1 {status} {reason}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+    def _should_rate_limit(self) -> bool:
+        """本次请求是否返回429"""
+        if self.max_concurrency and self.stats.in_flight >= self.max_concurrency:
+            return True
+        return self.rate_limit > 0 and self._random.random() < self.rate_limit
+
+    def _usage(self, request: Dict[str, Any], content: str, tool_calls: List[Dict[str, Any]]) -> Dict[str, int]:
+        """估算token用量；相同的首条消息（系统提示词）再次出现时计为前缀缓存命中"""
+        messages = request.get("messages") or []
+        prompt_tokens = sum(estimate_tokens(str(message.get("content") or "")) + 4 for message in messages)
+        if request.get("tools"):
+            prompt_tokens += estimate_tokens(json.dumps(request["tools"], ensure_ascii=False))
+        cached_tokens = 0
+        if messages:
+            first = str(messages[0].get("content") or "")
+            digest = hashlib.sha1(first.encode("utf-8")).hexdigest()
+            if digest in self._seen_prefixes:
+                cached_tokens = estimate_tokens(first)
+            else:
+                self._seen_prefixes.add(digest)
+        completion_tokens = max(estimate_tokens(content) + sum(
+            estimate_tokens(call["function"]["arguments"]) for call in tool_calls), 1)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_cache_hit_tokens": cached_tokens,
+            "prompt_cache_miss_tokens": prompt_tokens - cached_tokens
+        }
+
+    def _generate(self, request: Dict[str, Any]):
+        """调用生成器，返回 (文本, OpenAI格式的tool_calls)"""
+        output = self.generator(request)
+        if isinstance(output, str):
+            return output, []
+        tool_calls = [{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}), ensure_ascii=False)}
+        } for call in output.get("tool_calls", [])]
+        return output.get("content") or "", tool_calls
+
+    async def _chat_completions(self, request: Dict[str, Any], writer: asyncio.StreamWriter):
+        """处理chat.completions请求"""
+        self.stats.requests += 1
+        if self._should_rate_limit():
+            self.stats.rate_limited += 1
+            await self._send_json(writer, 429, {"error": {
+                "message": "Rate limit reached (mock)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                {"Retry-After": f"{self.retry_after:g}"})
+            return
+
+        self.stats.in_flight += 1
+        self.stats.peak_in_flight = max(self.stats.peak_in_flight, self.stats.in_flight)
+        try:
+            try:
+                content, tool_calls = self._generate(request)
+            except Exception as e:
+                self.stats.errors += 1
+                await self._send_json(writer, 500, {"error": {"message": f"生成器错误: {e}", "type": "server_error"}})
+                return
+            usage = self._usage(request, content, tool_calls)
+            response_id = f"chatcmpl-{uuid.uuid4().hex[:16]}"
+            model = request.get("model", "mock-model")
+            await asyncio.sleep(self.latency.ttft())
+            if request.get("stream"):
+                self.stats.streamed += 1
+                await self._stream(writer, request, response_id, model, content, tool_calls, usage)
+            else:
+                await asyncio.sleep(self.latency.per_token_ms * usage["completion_tokens"] / 1000)
+                message = {"role": "assistant", "content": content}
+                if tool_calls:
+                    message["tool_calls"] = tool_calls
+                await self._send_json(writer, 200, {
+                    "id": response_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": message,
+                                 "finish_reason": "tool_calls" if tool_calls else "stop"}],
+                    "usage": usage
+                })
+            self.stats.completed += 1
+            self.stats.prompt_tokens += usage["prompt_tokens"]
+            self.stats.cached_tokens += usage["prompt_cache_hit_tokens"]
+            self.stats.completion_tokens += usage["completion_tokens"]
+        finally:
+            self.stats.in_flight -= 1
+
+    async def _stream(self, writer: asyncio.StreamWriter, request: Dict[str, Any], response_id: str, model: str,
+                      content: str, tool_calls: List[Dict[str, Any]], usage: Dict[str, int]):
+        """以SSE分块写出流式响应（每个估算token一个分块）"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+
+        async def send(payload: Any):
+            data = f"data: {payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)}\n\n"
+            encoded = data.encode("utf-8")
+            writer.write(f"{len(encoded):x}\r\n".encode("latin-1") + encoded + b"\r\n")
+            await writer.drain()
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {"id": response_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        await send(chunk({"role": "assistant", "content": ""}))
+        interval = self.latency.per_token_ms / 1000
+        for piece in _CJK_OR_CHUNK.findall(content):
+            await send(chunk({"content": piece}))
+            await asyncio.sleep(interval)
+        if tool_calls:
+            await send(chunk({"tool_calls": [dict(call, index=i) for i, call in enumerate(tool_calls)]}))
+        await send(chunk({}, "tool_calls" if tool_calls else "stop"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            await send({"id": response_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model, "choices": [], "usage": usage})
+        await send("[DONE]")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="OpenAI兼容的模拟LLM服务器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8900, help="监听端口")
+    parser.add_argument("--generator", default="scholar", help="响应生成器：scholar、echo或 模块:函数")
+    parser.add_argument("--latency", default="lognormal:300:0.5:10",
+                        help="延迟分布 分布:首token毫秒[:分散程度[:每token毫秒]]，分布为fixed/uniform/normal/lognormal")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="随机返回429的概率")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="同时处理的请求数上限，超出返回429")
+    parser.add_argument("--seed", type=int, help="随机数种子")
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.host, args.port, args.generator, LatencyDistribution.parse(args.latency, args.seed),
+                           args.rate_limit, args.max_concurrency, seed=args.seed)
+
+    async def serve():
+        await server.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print(f"\n已停止，统计: {server.get_stats()}")
+
+if __name__ == "__main__":
+    main()
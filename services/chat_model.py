@@ -0,0 +1,59 @@
+"""
+LangChain聊天模型适配模块
+
+该模块将统一的LLM调用层（模型路由、端点池、故障转移）包装为LangChain的ChatModel，
+供ReAct Agent等依赖LangChain接口的组件使用。
+"""
+
+from typing import List, Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from services.routing import ModelRouter, model_router
+
+class PooledChatModel(BaseChatModel):
+    """基于端点池的LangChain聊天模型"""
+
+    router: Any = None
+    task: str = "agent.react"
+    model_name: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-openai-compatible"
+
+    def _get_router(self) -> ModelRouter:
+        """获取模型路由，默认使用全局实例"""
+        return self.router or model_router
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        """调用LLM并转换为LangChain的ChatResult"""
+        if stop:
+            kwargs["stop"] = stop
+        response = self._get_router().complete(
+            self.task,
+            messages,
+            model=self.model_name,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            **kwargs
+        )
+        message = AIMessage(
+            content=response.content,
+            response_metadata={"token_usage": response.usage, "model_name": response.model}
+        )
+        generation = ChatGeneration(message=message)
+        return ChatResult(
+            generations=[generation],
+            llm_output={"token_usage": response.usage, "model_name": response.model}
+        )
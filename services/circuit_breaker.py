@@ -0,0 +1,202 @@
+"""
+熔断器模块
+
+该模块为外部依赖（LLM端点、Arxiv API）提供熔断保护：
+连续失败达到阈值后进入打开状态，后续调用立即以CircuitOpenError失败，
+冷却期结束后进入半开状态放行少量试探请求，成功则关闭，失败则重新打开。
+"""
+
+import threading
+import time
+import weakref
+from typing import Dict, Any, List, Callable
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被快速拒绝"""
+
+    def __init__(self, name: str, retry_after: float = 0.0):
+        """
+        Args:
+            name: 熔断器（依赖）名称
+            retry_after: 预计多少秒后可以重试
+        """
+        super().__init__(f"{name} 熔断中，约 {retry_after:.1f} 秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+# 所有熔断器实例（用于统一导出状态指标）
+_registry: "weakref.WeakSet[CircuitBreaker]" = weakref.WeakSet()
+
+class CircuitBreaker:
+    """熔断器（closed/open/half_open三态）"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        """
+        初始化熔断器
+
+        Args:
+            name: 熔断器名称
+            failure_threshold: 连续失败多少次后打开
+            recovery_timeout: 打开后多少秒进入半开状态
+            half_open_max_calls: 半开状态下允许同时进行的试探请求数
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        self.open_count = 0
+        self.rejected_count = 0
+        self.success_count = 0
+        self.failure_count = 0
+        _registry.add(self)
+
+    def _current_state(self, now: float) -> str:
+        """计算当前状态（调用方持有锁），打开超时后转为半开"""
+        if self._state == self.OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    @property
+    def state(self) -> str:
+        """当前状态"""
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def retry_after(self) -> float:
+        """距离进入半开状态的剩余秒数"""
+        with self._lock:
+            if self._current_state(time.monotonic()) != self.OPEN:
+                return 0.0
+            return max(self._opened_at + self.recovery_timeout - time.monotonic(), 0.0)
+
+    def can_attempt(self) -> bool:
+        """当前是否允许发起调用（不占用半开试探名额）"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN:
+                return self._half_open_calls < self.half_open_max_calls
+            return False
+
+    def before_call(self):
+        """
+        登记一次调用，不允许时抛出CircuitOpenError
+
+        Raises:
+            CircuitOpenError: 熔断器打开或半开试探名额已满
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return
+            self.rejected_count += 1
+            retry_after = max(self._opened_at + self.recovery_timeout - now, 0.0)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        """记录调用成功"""
+        with self._lock:
+            self.success_count += 1
+            self._consecutive_failures = 0
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._half_open_calls = 0
+
+    def record_failure(self):
+        """记录调用失败"""
+        with self._lock:
+            self.failure_count += 1
+            self._consecutive_failures += 1
+            state = self._current_state(time.monotonic())
+            if state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def record_abandoned(self):
+        """记录调用被放弃（截止时间缩短的超时、被取消），不计成功或失败，只归还半开试探名额"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._half_open_calls = max(self._half_open_calls - 1, 0)
+
+    def trip(self):
+        """强制打开熔断器（如错误率激增）"""
+        with self._lock:
+            if self._current_state(time.monotonic()) != self.OPEN:
+                self._open()
+
+    def reset(self):
+        """强制关闭熔断器（如后台探活成功）"""
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._half_open_calls = 0
+
+    def _open(self):
+        """进入打开状态（调用方持有锁）"""
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._half_open_calls = 0
+        self.open_count += 1
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        在熔断保护下执行函数
+
+        Raises:
+            CircuitOpenError: 熔断器打开时立即抛出，不执行函数
+        """
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取熔断器状态指标
+
+        Returns:
+            Dict[str, Any]: 状态与计数
+        """
+        state = self.state
+        return {
+            "name": self.name,
+            "state": state,
+            "open_count": self.open_count,
+            "rejected_count": self.rejected_count,
+            "success_count": self.success_count,
+            "failure_count": self.failure_count,
+            "retry_after": self.retry_after()
+        }
+
+def get_all_breaker_stats() -> List[Dict[str, Any]]:
+    """
+    获取所有熔断器的状态指标
+
+    Returns:
+        List[Dict[str, Any]]: 各熔断器状态
+    """
+    return [breaker.get_stats() for breaker in list(_registry)]
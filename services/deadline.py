@@ -0,0 +1,88 @@
+"""
+请求截止时间模块
+
+为一次Agent请求设置墙钟时间上限。截止时间通过调用上下文传递：
+LLM调用以剩余时间作为请求超时，Arxiv检索超过剩余时间即放弃等待，
+截止时间已过时不再发起新的调用，直接抛出DeadlineExceeded，由Agent返回已有的部分结果。
+"""
+
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+class DeadlineExceeded(TimeoutError):
+    """请求超出截止时间"""
+
+class Deadline:
+    """请求截止时间"""
+
+    def __init__(self, seconds: float):
+        """
+        初始化截止时间
+
+        Args:
+            seconds: 从现在起的时间预算（秒）
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """剩余时间（秒），已过期时为0"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """是否已过截止时间"""
+        return time.monotonic() >= self.expires_at
+
+    def check(self, what: str = "请求"):
+        """
+        检查截止时间
+
+        Args:
+            what: 即将执行的操作，用于错误信息
+
+        Raises:
+            DeadlineExceeded: 已过截止时间
+        """
+        if self.expired():
+            raise DeadlineExceeded(f"{what}超出截止时间（{self.seconds:g}秒）")
+
+    def timeout(self, cap: Optional[float] = None, what: str = "请求") -> float:
+        """
+        下一次调用可用的超时时间
+
+        Args:
+            cap: 调用自身的超时上限
+            what: 即将执行的操作，用于错误信息
+
+        Returns:
+            float: 剩余时间与cap中的较小者
+
+        Raises:
+            DeadlineExceeded: 已过截止时间
+        """
+        self.check(what)
+        remaining = self.remaining()
+        return min(remaining, cap) if cap is not None else remaining
+
+# 当前调用上下文的截止时间
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None)
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]):
+    """
+    在with块内为调用设置截止时间（None表示不限时）
+
+    Args:
+        deadline: 截止时间
+    """
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+def current_deadline() -> Optional[Deadline]:
+    """当前调用上下文的截止时间，未设置时为None"""
+    return _current_deadline.get()
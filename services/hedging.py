@@ -0,0 +1,162 @@
+"""
+请求对冲模块
+
+该模块为LLM调用提供尾延迟优化：当请求在观测到的p90延迟内仍未返回时，
+向另一个端点（或密钥）发送重复请求，取先返回者。对冲率受预算限制，总成本可控。
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+def percentile(sorted_values, q: float) -> float:
+    """
+    计算已排序序列的分位数（线性插值）
+
+    Args:
+        sorted_values: 升序排列的数值序列
+        q: 分位点，取值0-1
+
+    Returns:
+        float: 分位数，序列为空时返回0.0
+    """
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+class LatencyTracker:
+    """滑动窗口延迟统计"""
+
+    def __init__(self, window_size: int = 200):
+        """
+        初始化延迟统计
+
+        Args:
+            window_size: 保留最近N次成功调用的延迟
+        """
+        self.samples: deque = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        """记录一次调用延迟（秒）"""
+        with self._lock:
+            self.samples.append(latency)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def quantile(self, q: float) -> float:
+        """获取指定分位数的延迟（秒）"""
+        with self._lock:
+            values = sorted(self.samples)
+        return percentile(values, q)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        导出延迟分位数
+
+        Returns:
+            Dict[str, Any]: 包含count、p50、p90、p95、p99（秒）
+        """
+        with self._lock:
+            values = sorted(self.samples)
+        return {
+            "count": len(values),
+            "p50": percentile(values, 0.50),
+            "p90": percentile(values, 0.90),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99)
+        }
+
+class HedgePolicy:
+    """对冲策略与预算"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        quantile: float = 0.9,
+        min_samples: int = 20,
+        min_delay: float = 0.5,
+        max_hedge_ratio: float = 0.05,
+        burst: float = 5.0
+    ):
+        """
+        初始化对冲策略
+
+        Args:
+            enabled: 是否默认对所有调用启用对冲（调用方也可单独开启）
+            quantile: 触发对冲的延迟分位点，默认p90
+            min_samples: 延迟样本不足时不对冲
+            min_delay: 对冲等待时间下限（秒）
+            max_hedge_ratio: 对冲请求占总请求的最大比例
+            burst: 预算可累积的最大对冲次数
+        """
+        self.enabled = enabled
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+    def hedge_delay(self, tracker: LatencyTracker) -> Optional[float]:
+        """
+        计算对冲等待时间
+
+        Args:
+            tracker: 该调用点的延迟统计
+
+        Returns:
+            Optional[float]: 等待秒数，样本不足时返回None（不对冲）
+        """
+        if len(tracker) < self.min_samples:
+            return None
+        return max(tracker.quantile(self.quantile), self.min_delay)
+
+    def on_request(self):
+        """登记一次主请求，按比例补充对冲预算"""
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self._tokens + self.max_hedge_ratio, self.burst)
+
+    def try_acquire(self) -> bool:
+        """尝试消耗一次对冲预算"""
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.hedges_sent += 1
+                return True
+            self.budget_denied += 1
+            return False
+
+    def on_hedge_win(self):
+        """登记一次对冲请求先于主请求返回"""
+        with self._lock:
+            self.hedge_wins += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取对冲统计
+
+        Returns:
+            Dict[str, Any]: 对冲统计信息
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "requests": self.requests,
+                "hedges_sent": self.hedges_sent,
+                "hedge_wins": self.hedge_wins,
+                "budget_denied": self.budget_denied,
+                "hedge_rate": self.hedges_sent / self.requests if self.requests else 0.0,
+                "max_hedge_ratio": self.max_hedge_ratio
+            }
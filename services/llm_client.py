@@ -0,0 +1,566 @@
+"""
+LLM调用层模块
+
+该模块是项目中所有LLM调用的统一入口，基于端点池进行负载均衡和故障转移，
+并支持可选的请求对冲以降低尾延迟，按调用点统计延迟与提示词前缀缓存命中率。端点全部熔断时抛出CircuitOpenError，
+调用方可据此快速失败而不必等待请求超时。
+调用上下文设置了截止时间（services.deadline）时，每次请求以剩余时间作为超时，截止时间已过时抛出DeadlineExceeded。
+每次请求尝试（含对冲请求）记录一个追踪跨度（services.tracing），包含token用量与延迟。
+每个返回的响应（含对冲请求与升级重试）的用量计入services.metering，当前批处理任务超出预算时抛出BudgetExceeded。
+同时提供同步（SummarizeService、幻觉检测器）与异步（关系抽取）两种调用方式。
+可通过set_chat_transport替换chat.completions传输层（services.replay的录制回放），上层的故障转移、截止时间与统计不变。
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent import futures
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Iterable, Union
+
+import openai
+
+from services.llm_pool import EndpointPool, Endpoint, EndpointConfig, NoAvailableEndpointError
+from services.circuit_breaker import CircuitOpenError
+from services.deadline import DeadlineExceeded, current_deadline
+from services.hedging import LatencyTracker, HedgePolicy
+from services.prompt_cache import PromptCacheStats, cached_prompt_tokens
+from services.tracing import tracer, KIND_LLM
+from services.metering import usage_meter
+from config import config, LLM_POOL_CONFIG, LLM_HEDGING_CONFIG
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# chat.completions传输层，None表示直接使用openai客户端（见set_chat_transport）
+_chat_transport = None
+
+def set_chat_transport(transport: Any) -> Any:
+    """
+    替换所有LLMClient使用的chat.completions传输层
+
+    Args:
+        transport: 提供wrap(client, is_async)的对象，返回与openai客户端接口相同的包装；None表示恢复直连
+
+    Returns:
+        Any: 之前的传输层
+    """
+    global _chat_transport
+    previous, _chat_transport = _chat_transport, transport
+    return previous
+
+def _wrap_client(client: Any, is_async: bool) -> Any:
+    """按当前传输层包装openai客户端"""
+    transport = _chat_transport
+    return transport.wrap(client, is_async) if transport is not None else client
+
+# LangChain消息类型到OpenAI角色的映射
+_ROLE_MAP = {"system": "system", "human": "user", "ai": "assistant", "tool": "tool"}
+
+@dataclass
+class LLMResponse:
+    """LLM响应数据类"""
+    content: str
+    model: str
+    endpoint: str
+    latency: float
+    usage: Dict[str, Any] = field(default_factory=dict)
+    raw: Any = None
+    tool_calls: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def cached_tokens(self) -> int:
+        """命中服务商前缀缓存的输入token数"""
+        return cached_prompt_tokens(self.usage)
+
+def to_openai_messages(messages: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    将消息统一转换为OpenAI格式
+
+    Args:
+        messages: 字典格式消息或LangChain消息对象
+
+    Returns:
+        List[Dict[str, Any]]: OpenAI格式的消息列表
+    """
+    converted = []
+    for message in messages:
+        if isinstance(message, dict):
+            converted.append(message)
+        else:
+            role = _ROLE_MAP.get(getattr(message, "type", "human"), "user")
+            converted.append({"role": role, "content": message.content})
+    return converted
+
+def _tool_calls_to_list(tool_calls: Any) -> List[Dict[str, Any]]:
+    """将响应中的tool_calls转换为OpenAI格式的字典列表"""
+    converted = []
+    for call in tool_calls or []:
+        if isinstance(call, dict):
+            converted.append(call)
+            continue
+        converted.append({
+            "id": call.id,
+            "type": "function",
+            "function": {"name": call.function.name, "arguments": call.function.arguments or "{}"}
+        })
+    return converted
+
+def _usage_to_dict(usage: Any) -> Dict[str, Any]:
+    """将响应中的usage对象转换为字典"""
+    if usage is None:
+        return {}
+    if isinstance(usage, dict):
+        return dict(usage)
+    if hasattr(usage, "model_dump"):
+        return usage.model_dump(exclude_none=True)
+    return dict(vars(usage))
+
+class LLMClient:
+    """统一的LLM调用客户端"""
+
+    def __init__(
+        self,
+        pool: Optional[EndpointPool] = None,
+        max_attempts: int = 2,
+        request_timeout: float = 60.0,
+        hedging: Optional[HedgePolicy] = None
+    ):
+        """
+        初始化LLM客户端
+
+        Args:
+            pool: 端点池，默认根据config.LLM_ENDPOINTS创建
+            max_attempts: 单次调用最多尝试的端点数（失败时切换到其他端点）
+            request_timeout: 单次请求超时（秒）
+            hedging: 对冲策略，默认根据config.LLM_HEDGING_CONFIG创建
+        """
+        self.pool = pool if pool is not None else EndpointPool.from_config(config.get_llm_endpoints(), **LLM_POOL_CONFIG)
+        if self.pool.probe_fn is None:
+            self.pool.probe_fn = self.probe
+        self.max_attempts = max_attempts
+        self.request_timeout = request_timeout
+        self._sync_clients: Dict[str, openai.OpenAI] = {}
+        self._async_clients: Dict[str, openai.AsyncOpenAI] = {}
+        self.hedging = hedging or HedgePolicy(**LLM_HEDGING_CONFIG)
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._prompt_cache: Dict[str, PromptCacheStats] = {}
+        self._executor = futures.ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+    @classmethod
+    def from_api_key(cls, api_key: str, base_url: str, model: Union[str, List[str]], **kwargs) -> "LLMClient":
+        """
+        根据单个（或逗号分隔的多个）API密钥创建客户端
+
+        Args:
+            api_key: API密钥，多个密钥用逗号分隔
+            base_url: API地址
+            model: 模型名称，或端点提供的模型列表（第一个为默认模型）
+
+        Returns:
+            LLMClient: 客户端实例
+        """
+        keys = [k.strip() for k in api_key.split(",") if k.strip()]
+        models = [model] if isinstance(model, str) else list(model)
+        endpoints = [
+            {"name": f"key-{i}", "base_url": base_url, "api_key": key, "models": models}
+            for i, key in enumerate(keys, 1)
+        ]
+        return cls(pool=EndpointPool.from_config(endpoints, **LLM_POOL_CONFIG), **kwargs)
+
+    def _sync_client(self, endpoint: Endpoint) -> openai.OpenAI:
+        """获取端点对应的同步客户端"""
+        client = self._sync_clients.get(endpoint.name)
+        if client is None:
+            client = openai.OpenAI(
+                api_key=endpoint.config.api_key,
+                base_url=endpoint.config.base_url,
+                timeout=self.request_timeout,
+                max_retries=0
+            )
+            self._sync_clients[endpoint.name] = client
+        return _wrap_client(client, is_async=False)
+
+    def _async_client(self, endpoint: Endpoint) -> openai.AsyncOpenAI:
+        """获取端点对应的异步客户端"""
+        client = self._async_clients.get(endpoint.name)
+        if client is None:
+            client = openai.AsyncOpenAI(
+                api_key=endpoint.config.api_key,
+                base_url=endpoint.config.base_url,
+                timeout=self.request_timeout,
+                max_retries=0
+            )
+            self._async_clients[endpoint.name] = client
+        return _wrap_client(client, is_async=True)
+
+    def _resolve_model(self, endpoint: Endpoint, model: Optional[str]) -> str:
+        """确定在该端点上使用的模型名称"""
+        return model if model and endpoint.serves(model) else endpoint.config.default_model
+
+    def _build_request(self, endpoint: Endpoint, messages: Any, model: Optional[str],
+                       temperature: Optional[float], max_tokens: Optional[int],
+                       extra: Dict[str, Any]) -> Dict[str, Any]:
+        """组装chat.completions请求参数"""
+        request = {
+            "model": self._resolve_model(endpoint, model),
+            "messages": to_openai_messages(messages)
+        }
+        if temperature is not None:
+            request["temperature"] = temperature
+        if max_tokens is not None:
+            request["max_tokens"] = max_tokens
+        request.update(extra)
+        return request
+
+    def _deadline_timeout(self) -> Optional[float]:
+        """
+        调用上下文设置了截止时间时，本次请求的超时时间（剩余时间与单次请求超时中的较小者）
+
+        Raises:
+            DeadlineExceeded: 已过截止时间
+        """
+        deadline = current_deadline()
+        return deadline.timeout(self.request_timeout, "LLM调用") if deadline is not None else None
+
+    def _cut_by_deadline(self, request: Dict[str, Any], error: Exception) -> bool:
+        """请求是否因截止时间缩短的超时而失败（不计入端点的成功或失败）"""
+        return isinstance(error, openai.APITimeoutError) and request.get("timeout", self.request_timeout) < self.request_timeout
+
+    def _to_response(self, endpoint: Endpoint, raw: Any, latency: float) -> LLMResponse:
+        """将原始响应转换为LLMResponse"""
+        message = raw.choices[0].message
+        return LLMResponse(
+            content=(message.content or "").strip(),
+            model=getattr(raw, "model", "") or "",
+            endpoint=endpoint.name,
+            latency=latency,
+            usage=_usage_to_dict(getattr(raw, "usage", None)),
+            raw=raw,
+            tool_calls=_tool_calls_to_list(getattr(message, "tool_calls", None))
+        )
+
+    def _span(self, endpoint: Endpoint, request: Dict[str, Any], call_site: str):
+        """一次请求尝试的追踪跨度"""
+        return tracer.span(f"llm:{call_site}", KIND_LLM, call_site=call_site, endpoint=endpoint.name,
+                           model=request["model"], timeout=request.get("timeout"))
+
+    def _attempt_sync(self, endpoint: Endpoint, request: Dict[str, Any], call_site: str) -> LLMResponse:
+        """在指定端点上执行一次同步调用，并归还端点、记录延迟"""
+        with self._span(endpoint, request, call_site) as span:
+            start = time.perf_counter()
+            try:
+                raw = self._sync_client(endpoint).chat.completions.create(**request)
+            except Exception as e:
+                self.pool.release(endpoint, success=None if self._cut_by_deadline(request, e) else False)
+                logger.warning(f"LLM端点 {endpoint.name} 调用失败: {e}")
+                raise
+            self.pool.release(endpoint, success=True)
+            return self._record_response(endpoint, request, raw, time.perf_counter() - start, call_site, span)
+
+    async def _attempt_async(self, endpoint: Endpoint, request: Dict[str, Any], call_site: str) -> LLMResponse:
+        """在指定端点上执行一次异步调用，并归还端点、记录延迟"""
+        with self._span(endpoint, request, call_site) as span:
+            start = time.perf_counter()
+            try:
+                raw = await self._async_client(endpoint).chat.completions.create(**request)
+            except asyncio.CancelledError:
+                # 被取消（如对冲失败方）不计入端点的成功或失败
+                self.pool.release(endpoint, success=None)
+                raise
+            except Exception as e:
+                self.pool.release(endpoint, success=None if self._cut_by_deadline(request, e) else False)
+                logger.warning(f"LLM端点 {endpoint.name} 调用失败: {e}")
+                raise
+            self.pool.release(endpoint, success=True)
+            return self._record_response(endpoint, request, raw, time.perf_counter() - start, call_site, span)
+
+    def _record_response(self, endpoint: Endpoint, request: Dict[str, Any], raw: Any, latency: float,
+                         call_site: str, span: Any) -> LLMResponse:
+        """记录调用点的延迟、前缀缓存命中与用量，写入追踪跨度，并转换为LLMResponse"""
+        self._tracker(call_site).record(latency)
+        response = self._to_response(endpoint, raw, latency)
+        usage_meter.record(call_site, response.model or request["model"], endpoint.name, response.usage)
+        stats = self._prompt_cache.get(call_site)
+        if stats is None:
+            stats = self._prompt_cache.setdefault(call_site, PromptCacheStats())
+        stats.record(response.usage)
+        # 非流式请求的首token时间即完整响应的返回时间
+        span.set(
+            response_model=response.model or None,
+            prompt_tokens=response.usage.get("prompt_tokens"),
+            completion_tokens=response.usage.get("completion_tokens"),
+            cached_tokens=response.cached_tokens,
+            ttft=round(latency, 4),
+            latency=round(latency, 4),
+            completion_chars=len(response.content),
+            tool_calls=len(response.tool_calls) or None
+        )
+        return response
+
+    def _tracker(self, call_site: str) -> LatencyTracker:
+        """获取调用点的延迟统计"""
+        tracker = self._latency.get(call_site)
+        if tracker is None:
+            tracker = self._latency.setdefault(call_site, LatencyTracker())
+        return tracker
+
+    def _hedge_delay(self, hedge: Optional[bool], call_site: str) -> Optional[float]:
+        """判断本次调用是否对冲，返回对冲等待时间"""
+        enabled = self.hedging.enabled if hedge is None else hedge
+        if not enabled or len(self.pool) == 0:
+            return None
+        return self.hedging.hedge_delay(self._tracker(call_site))
+
+    def _acquire_hedge_endpoint(self, model: Optional[str], primary: Endpoint) -> Endpoint:
+        """为对冲请求选择端点，优先选择与主请求不同的端点"""
+        try:
+            return self.pool.acquire(model, exclude=[primary.name])
+        except (NoAvailableEndpointError, CircuitOpenError):
+            return self.pool.acquire(model)
+
+    def complete(
+        self,
+        messages: Any,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        call_site: str = "default",
+        hedge: Optional[bool] = None,
+        **extra
+    ) -> LLMResponse:
+        """
+        同步调用chat.completions
+
+        Args:
+            messages: 消息列表（字典或LangChain消息对象）
+            model: 模型名称，None表示使用端点默认模型
+            temperature: 生成温度
+            max_tokens: 最大输出token数
+            call_site: 调用点标识，用于分别统计延迟
+            hedge: 是否对冲，None表示使用全局对冲配置
+            **extra: 透传给chat.completions的其他参数
+
+        Returns:
+            LLMResponse: 响应结果
+
+        Raises:
+            BudgetExceeded: 当前批处理任务已用完用量预算
+        """
+        self.hedging.on_request()
+        tried: List[str] = []
+        last_error: Optional[Exception] = None
+        delay = self._hedge_delay(hedge, call_site)
+        # 至少尝试一次：端点池为空时由acquire给出配置错误
+        for _ in range(max(min(self.max_attempts, len(self.pool)), 1)):
+            usage_meter.check()
+            timeout = self._deadline_timeout()
+            try:
+                endpoint = self.pool.acquire(model, exclude=tried)
+            except CircuitOpenError:
+                # 端点全部熔断：首次尝试直接快速失败，否则抛出上一次的真实错误
+                if last_error is None:
+                    raise
+                break
+            except NoAvailableEndpointError:
+                # 首次尝试就没有端点（如未配置API密钥）时保留原始错误信息
+                if last_error is None:
+                    raise
+                break
+            tried.append(endpoint.name)
+            request = self._build_request(endpoint, messages, model, temperature, max_tokens, extra)
+            if timeout is not None:
+                request["timeout"] = timeout
+            try:
+                if delay is None:
+                    return self._attempt_sync(endpoint, request, call_site)
+                return self._hedged_sync(endpoint, request, delay, model, call_site, tried)
+            except Exception as e:
+                if self._cut_by_deadline(request, e):
+                    # 以剩余时间为超时的请求超时，说明时间预算已用完，不再尝试其他端点
+                    raise DeadlineExceeded("LLM调用超出截止时间") from e
+                last_error = e
+                delay = None
+        raise last_error or NoAvailableEndpointError("没有可用的LLM端点")
+
+    def _hedged_sync(self, primary: Endpoint, request: Dict[str, Any], delay: float,
+                     model: Optional[str], call_site: str, tried: List[str]) -> LLMResponse:
+        """
+        同步对冲调用：主请求超过delay未返回时，向另一端点发送重复请求，取先成功者
+        同步请求无法中断，失败方在后台线程中自然结束并归还端点
+        """
+        # 在提交方的调用上下文中执行，追踪跨度挂在当前运行之下
+        primary_future = self._executor.submit(contextvars.copy_context().run, self._attempt_sync,
+                                               primary, request, call_site)
+        done, _ = futures.wait([primary_future], timeout=delay)
+        if done or not self.hedging.try_acquire():
+            return primary_future.result()
+
+        try:
+            hedge_endpoint = self._acquire_hedge_endpoint(model, primary)
+        except (NoAvailableEndpointError, CircuitOpenError):
+            return primary_future.result()
+        tried.append(hedge_endpoint.name)
+        hedge_request = dict(request, model=self._resolve_model(hedge_endpoint, model))
+        if "timeout" in request:
+            hedge_request["timeout"] = max(request["timeout"] - delay, 0.001)
+        hedge_future = self._executor.submit(contextvars.copy_context().run, self._attempt_sync,
+                                             hedge_endpoint, hedge_request, call_site)
+
+        pending = {primary_future, hedge_future}
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is hedge_future:
+                        self.hedging.on_hedge_win()
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    async def acomplete(
+        self,
+        messages: Any,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        call_site: str = "default",
+        hedge: Optional[bool] = None,
+        **extra
+    ) -> LLMResponse:
+        """
+        异步调用chat.completions，参数同complete
+        """
+        self.hedging.on_request()
+        tried: List[str] = []
+        last_error: Optional[Exception] = None
+        delay = self._hedge_delay(hedge, call_site)
+        # 至少尝试一次：端点池为空时由acquire给出配置错误
+        for _ in range(max(min(self.max_attempts, len(self.pool)), 1)):
+            usage_meter.check()
+            timeout = self._deadline_timeout()
+            try:
+                endpoint = self.pool.acquire(model, exclude=tried)
+            except CircuitOpenError:
+                # 端点全部熔断：首次尝试直接快速失败，否则抛出上一次的真实错误
+                if last_error is None:
+                    raise
+                break
+            except NoAvailableEndpointError:
+                # 首次尝试就没有端点（如未配置API密钥）时保留原始错误信息
+                if last_error is None:
+                    raise
+                break
+            tried.append(endpoint.name)
+            request = self._build_request(endpoint, messages, model, temperature, max_tokens, extra)
+            if timeout is not None:
+                request["timeout"] = timeout
+            try:
+                if delay is None:
+                    return await self._attempt_async(endpoint, request, call_site)
+                return await self._hedged_async(endpoint, request, delay, model, call_site, tried)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._cut_by_deadline(request, e):
+                    # 以剩余时间为超时的请求超时，说明时间预算已用完，不再尝试其他端点
+                    raise DeadlineExceeded("LLM调用超出截止时间") from e
+                last_error = e
+                delay = None
+        raise last_error or NoAvailableEndpointError("没有可用的LLM端点")
+
+    async def _hedged_async(self, primary: Endpoint, request: Dict[str, Any], delay: float,
+                            model: Optional[str], call_site: str, tried: List[str]) -> LLMResponse:
+        """异步对冲调用：取先成功者并取消失败方"""
+        primary_task = asyncio.ensure_future(self._attempt_async(primary, request, call_site))
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done or not self.hedging.try_acquire():
+            return await primary_task
+
+        try:
+            hedge_endpoint = self._acquire_hedge_endpoint(model, primary)
+        except (NoAvailableEndpointError, CircuitOpenError):
+            return await primary_task
+        tried.append(hedge_endpoint.name)
+        hedge_request = dict(request, model=self._resolve_model(hedge_endpoint, model))
+        if "timeout" in request:
+            hedge_request["timeout"] = max(request["timeout"] - delay, 0.001)
+        hedge_task = asyncio.ensure_future(self._attempt_async(hedge_endpoint, hedge_request, call_site))
+
+        pending = {primary_task, hedge_task}
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge_task:
+                            self.hedging.on_hedge_win()
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各调用点的延迟分位数（对冲依据的p50/p90/p95/p99）
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 调用点到延迟分位数的映射
+        """
+        return {site: tracker.snapshot() for site, tracker in list(self._latency.items())}
+
+    def get_prompt_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各调用点的提示词前缀缓存命中率
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 调用点到缓存统计的映射
+        """
+        return {site: stats.snapshot() for site, stats in list(self._prompt_cache.items())}
+
+    def probe(self, endpoint_config: EndpointConfig) -> bool:
+        """
+        探活：请求端点的模型列表接口
+
+        Args:
+            endpoint_config: 端点配置
+
+        Returns:
+            bool: 端点是否可用
+        """
+        client = openai.OpenAI(
+            api_key=endpoint_config.api_key,
+            base_url=endpoint_config.base_url,
+            timeout=5.0,
+            max_retries=0
+        )
+        _wrap_client(client, is_async=False).models.list()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取调用层统计信息
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {
+            "endpoints": self.pool.get_stats(),
+            "latency": self.get_latency_stats(),
+            "prompt_cache": self.get_prompt_cache_stats(),
+            "hedging": self.hedging.get_stats()
+        }
+
+# 创建全局实例
+llm_client = LLMClient(
+    max_attempts=LLM_POOL_CONFIG["max_attempts"],
+    request_timeout=LLM_POOL_CONFIG["request_timeout"]
+)
@@ -0,0 +1,291 @@
+"""
+LLM端点池模块
+
+该模块管理多个OpenAI兼容的LLM端点（多个密钥、DeepSeek、OpenAI或本地服务），
+按加权最少在途请求数进行路由，在错误激增时摘除不健康端点，并在后台重新探活。
+每个端点带有独立熔断器：全部端点熔断时调用立即以CircuitOpenError失败。
+"""
+
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable, Iterable
+
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class NoAvailableEndpointError(Exception):
+    """端点池中没有可用端点"""
+
+@dataclass
+class EndpointConfig:
+    """端点配置数据类"""
+    name: str
+    base_url: str
+    api_key: str
+    models: List[str] = field(default_factory=lambda: ["deepseek-chat"])
+    provider: str = "deepseek"
+    weight: float = 1.0
+
+    @property
+    def default_model(self) -> str:
+        """端点默认模型"""
+        return self.models[0]
+
+class Endpoint:
+    """单个端点的运行时状态"""
+
+    def __init__(self, endpoint_config: EndpointConfig, breaker: CircuitBreaker, window_size: int = 20):
+        """
+        初始化端点状态
+
+        Args:
+            endpoint_config: 端点配置
+            breaker: 端点熔断器
+            window_size: 错误率统计窗口大小
+        """
+        self.config = endpoint_config
+        self.breaker = breaker
+        self.outstanding = 0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.outcomes: deque = deque(maxlen=window_size)
+
+    @property
+    def name(self) -> str:
+        """端点名称"""
+        return self.config.name
+
+    def is_ejected(self) -> bool:
+        """端点当前是否处于摘除（熔断打开）状态"""
+        return self.breaker.state == CircuitBreaker.OPEN
+
+    def serves(self, model: Optional[str]) -> bool:
+        """端点是否提供指定模型"""
+        return model is None or model in self.config.models
+
+    def load_score(self) -> float:
+        """加权负载分数，越小越优先"""
+        return (self.outstanding + 1) / max(self.config.weight, 1e-6)
+
+    def error_rate(self) -> float:
+        """窗口内错误率"""
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出端点状态"""
+        return {
+            "name": self.name,
+            "provider": self.config.provider,
+            "base_url": self.config.base_url,
+            "models": list(self.config.models),
+            "weight": self.config.weight,
+            "outstanding": self.outstanding,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+            "error_rate": self.error_rate(),
+            "ejected": self.is_ejected(),
+            "breaker": self.breaker.get_stats()
+        }
+
+class EndpointPool:
+    """LLM端点池"""
+
+    def __init__(
+        self,
+        endpoints: Iterable[EndpointConfig],
+        window_size: int = 20,
+        min_requests: int = 5,
+        error_rate_threshold: float = 0.5,
+        consecutive_failures: int = 3,
+        eject_seconds: float = 30.0,
+        probe_interval: float = 10.0,
+        probe_fn: Optional[Callable[[EndpointConfig], bool]] = None
+    ):
+        """
+        初始化端点池
+
+        Args:
+            endpoints: 端点配置列表（为空时调用以NoAvailableEndpointError失败，提示设置API密钥）
+            window_size: 错误率统计窗口大小
+            min_requests: 窗口内最少请求数，达到后才按错误率摘除
+            error_rate_threshold: 摘除端点的错误率阈值
+            consecutive_failures: 连续失败多少次后熔断（摘除）端点
+            eject_seconds: 熔断时长，到期后进入半开状态放行试探请求
+            probe_interval: 后台探活间隔（秒）
+            probe_fn: 探活函数，返回True表示端点已恢复
+        """
+        self.endpoints = [
+            Endpoint(ep, CircuitBreaker(f"llm:{ep.name}", consecutive_failures, eject_seconds), window_size)
+            for ep in endpoints
+        ]
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate_threshold
+        self.eject_seconds = eject_seconds
+        self.probe_interval = probe_interval
+        self.probe_fn = probe_fn
+        self._lock = threading.Lock()
+        self._probe_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @classmethod
+    def from_config(cls, endpoints: List[Dict[str, Any]], **pool_config) -> "EndpointPool":
+        """
+        根据字典形式的配置创建端点池
+
+        Args:
+            endpoints: 端点配置字典列表（见config.LLM_ENDPOINTS）
+            **pool_config: 端点池参数（见config.LLM_POOL_CONFIG）
+
+        Returns:
+            EndpointPool: 端点池实例
+        """
+        configs = []
+        for i, ep in enumerate(endpoints, 1):
+            models = ep.get("models") or [ep.get("model", "deepseek-chat")]
+            configs.append(EndpointConfig(
+                name=ep.get("name", f"endpoint-{i}"),
+                base_url=ep["base_url"],
+                api_key=ep["api_key"],
+                models=list(models),
+                provider=ep.get("provider", "deepseek"),
+                weight=float(ep.get("weight", 1.0))
+            ))
+        keys = ("window_size", "min_requests", "error_rate_threshold",
+                "consecutive_failures", "eject_seconds", "probe_interval")
+        return cls(configs, **{k: v for k, v in pool_config.items() if k in keys})
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def acquire(self, model: Optional[str] = None, exclude: Iterable[str] = ()) -> Endpoint:
+        """
+        选择一个端点并登记在途请求
+
+        在熔断器允许调用的端点中按加权最少在途请求数选择；
+        若全部端点都已熔断，则立即抛出CircuitOpenError（快速失败）。
+
+        Args:
+            model: 需要的模型名称，None表示任意
+            exclude: 需要排除的端点名称（如本次调用已失败的端点）
+
+        Returns:
+            Endpoint: 选中的端点
+
+        Raises:
+            NoAvailableEndpointError: 没有满足条件的端点（或未配置任何端点）
+            CircuitOpenError: 满足条件的端点全部熔断
+        """
+        if not self.endpoints:
+            raise NoAvailableEndpointError(
+                "未配置LLM端点，请设置DEEPSEEK_API_KEYS、DEEPSEEK_API_KEY、OPENAI_API_KEY、"
+                "LOCAL_LLM_BASE_URL或LLM_ENDPOINTS环境变量"
+            )
+        excluded = set(exclude)
+        with self._lock:
+            candidates = [ep for ep in self.endpoints if ep.name not in excluded and ep.serves(model)]
+            if not candidates and model is not None:
+                # 没有端点声明该模型时，不按模型过滤，由端点自行处理
+                candidates = [ep for ep in self.endpoints if ep.name not in excluded]
+            if not candidates:
+                raise NoAvailableEndpointError("没有可用的LLM端点")
+
+            healthy = [ep for ep in candidates if ep.breaker.can_attempt()]
+            if not healthy:
+                retry_after = min(ep.breaker.retry_after() for ep in candidates)
+                raise CircuitOpenError("llm-pool", retry_after)
+            chosen = min(healthy, key=lambda ep: (ep.load_score(), ep.total_requests))
+            chosen.breaker.before_call()
+
+            chosen.outstanding += 1
+            chosen.total_requests += 1
+            return chosen
+
+    def release(self, endpoint: Endpoint, success: Optional[bool]):
+        """
+        归还端点并记录调用结果
+
+        Args:
+            endpoint: acquire返回的端点
+            success: 调用是否成功，None表示调用被放弃（截止时间、取消），不计入熔断器和错误率
+        """
+        with self._lock:
+            endpoint.outstanding = max(endpoint.outstanding - 1, 0)
+            if success is None:
+                endpoint.breaker.record_abandoned()
+                return
+            endpoint.outcomes.append(1 if success else 0)
+            if success:
+                endpoint.breaker.record_success()
+                return
+
+            endpoint.total_failures += 1
+            was_ejected = endpoint.is_ejected()
+            endpoint.breaker.record_failure()
+            spike = (
+                len(endpoint.outcomes) >= self.min_requests
+                and endpoint.error_rate() >= self.error_rate_threshold
+            )
+            if spike:
+                endpoint.breaker.trip()
+            if not was_ejected and endpoint.is_ejected():
+                logger.warning(f"LLM端点 {endpoint.name} 错误过多，熔断 {self.eject_seconds:.0f} 秒")
+
+        if self.probe_fn is not None:
+            self._ensure_prober()
+
+    def _reinstate(self, endpoint: Endpoint):
+        """恢复端点（调用方持有锁）"""
+        endpoint.breaker.reset()
+        endpoint.outcomes.clear()
+        logger.info(f"LLM端点 {endpoint.name} 探活成功，已恢复")
+
+    def _ensure_prober(self):
+        """按需启动后台探活线程"""
+        with self._lock:
+            if self._probe_thread is not None and self._probe_thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._probe_thread = threading.Thread(
+                target=self._probe_loop, name="llm-endpoint-prober", daemon=True
+            )
+            self._probe_thread.start()
+
+    def _probe_loop(self):
+        """后台探活循环：定期检查被熔断的端点，成功则提前恢复，失败则重新计时"""
+        while not self._stop_event.wait(self.probe_interval):
+            with self._lock:
+                ejected = [ep for ep in self.endpoints if ep.is_ejected()]
+            if not ejected:
+                continue
+            for endpoint in ejected:
+                try:
+                    healthy = bool(self.probe_fn(endpoint.config))
+                except Exception as e:
+                    logger.debug(f"探活端点 {endpoint.name} 失败: {e}")
+                    healthy = False
+                with self._lock:
+                    if healthy:
+                        self._reinstate(endpoint)
+                    else:
+                        endpoint.breaker.trip()
+
+    def stop(self):
+        """停止后台探活线程"""
+        self._stop_event.set()
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """
+        获取所有端点的状态
+
+        Returns:
+            List[Dict[str, Any]]: 端点状态列表
+        """
+        with self._lock:
+            return [ep.to_dict() for ep in self.endpoints]
@@ -0,0 +1,510 @@
+"""
+用量计量模块
+
+每次LLM响应的usage（输入、缓存命中、输出token）按价格表折算成本后，
+归属到调用点（任务名）、会话、批处理任务与条目。归属标签通过调用上下文传递（meter_scope），
+提交到线程池的任务可用carry_labels携带提交方的标签。
+
+打包请求（services/packing.py）的用量用split_usage按条目平均拆分到各提交方的标签。
+
+计量结果按调用点、模型、会话、任务在内存中累计，并按固定时间窗口汇总；
+设置输出文件后每次调用追加一行JSONL，供 usage_report.py 离线统计。
+批处理任务可设置硬性预算（token数或成本），超出后该任务后续的LLM调用直接抛出BudgetExceeded
+（预算在每次调用前检查，已在进行中的调用不会被中断，超出量不超过并发调用数次调用的用量）。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, Callable
+
+from services.prompt_cache import cached_prompt_tokens
+from config import MODEL_PRICING, METERING_CONFIG
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 归属标签
+LABELS = ("session", "job", "item")
+# 内存中累计的维度（条目数量可能很大，只写入文件）
+DIMENSIONS = ("call_site", "model", "session", "job")
+
+class BudgetExceeded(RuntimeError):
+    """批处理任务超出用量预算，后续调用被拒绝"""
+
+    def __init__(self, job: str, used: str, limit: str):
+        """
+        Args:
+            job: 任务名称
+            used: 已用量描述
+            limit: 预算描述
+        """
+        super().__init__(f"任务 {job} 已超出用量预算（已用 {used}，预算 {limit}）")
+        self.job = job
+
+def estimate_cost(model: str, usage: Dict[str, Any], pricing: Optional[Dict[str, Dict[str, float]]] = None) -> float:
+    """
+    按价格表估算一次调用的成本，命中前缀缓存的输入token按cached_input价格计费
+
+    Args:
+        model: 模型名称（未精确匹配时按前缀匹配）
+        usage: 响应中的usage字段
+        pricing: 价格表（美元/百万token），默认使用config.MODEL_PRICING
+
+    Returns:
+        float: 成本（美元），价格表中没有该模型时为0
+    """
+    pricing = pricing or MODEL_PRICING
+    price = pricing.get(model)
+    if price is None:
+        price = next((p for name, p in pricing.items() if model.startswith(name)), None)
+    if price is None:
+        return 0.0
+    cached = cached_prompt_tokens(usage)
+    uncached = usage.get("prompt_tokens", 0) - cached
+    return (
+        uncached * price.get("input", 0.0)
+        + cached * price.get("cached_input", price.get("input", 0.0))
+        + usage.get("completion_tokens", 0) * price.get("output", 0.0)
+    ) / 1_000_000
+
+@dataclass
+class UsageRecord:
+    """一次LLM调用的用量"""
+    timestamp: float
+    call_site: str
+    model: str
+    endpoint: str
+    prompt_tokens: int
+    cached_tokens: int
+    completion_tokens: int
+    cost: float
+    session: Optional[str] = None
+    job: Optional[str] = None
+    item: Optional[str] = None
+
+    @property
+    def total_tokens(self) -> int:
+        """输入与输出token总数"""
+        return self.prompt_tokens + self.completion_tokens
+
+class UsageTotals:
+    """用量累计"""
+
+    __slots__ = ("calls", "prompt_tokens", "cached_tokens", "completion_tokens", "cost")
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    def add(self, record: UsageRecord):
+        """累加一次调用"""
+        self.calls += 1
+        self.prompt_tokens += record.prompt_tokens
+        self.cached_tokens += record.cached_tokens
+        self.completion_tokens += record.completion_tokens
+        self.cost += record.cost
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UsageTotals":
+        """从to_dict导出的累计值恢复"""
+        totals = cls()
+        totals.calls = data.get("calls", 0)
+        totals.prompt_tokens = data.get("prompt_tokens", 0)
+        totals.cached_tokens = data.get("cached_tokens", 0)
+        totals.completion_tokens = data.get("completion_tokens", 0)
+        totals.cost = data.get("cost_usd", 0.0)
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出累计值"""
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cost_usd": round(self.cost, 6)
+        }
+
+@dataclass
+class JobBudget:
+    """批处理任务的用量预算（None表示不限）"""
+    max_tokens: Optional[int] = None
+    max_cost: Optional[float] = None
+
+# 当前调用上下文的归属标签
+_labels: contextvars.ContextVar = contextvars.ContextVar("usage_labels", default={})
+# 用量拆分的各组归属标签（打包请求的各条目），None表示不拆分
+_split: contextvars.ContextVar = contextvars.ContextVar("usage_split", default=None)
+
+@contextmanager
+def meter_scope(session: Optional[str] = None, job: Optional[str] = None, item: Optional[Any] = None):
+    """
+    在with块内为LLM调用设置归属标签（未指定的标签沿用外层）
+
+    Args:
+        session: 会话ID
+        job: 批处理任务名称
+        item: 条目编号
+    """
+    labels = dict(_labels.get())
+    for key, value in (("session", session), ("job", job), ("item", item)):
+        if value is not None:
+            labels[key] = str(value)
+    token = _labels.set(labels)
+    try:
+        yield labels
+    finally:
+        _labels.reset(token)
+
+@contextmanager
+def split_usage(shares: List[Dict[str, str]]):
+    """
+    在with块内把每次LLM调用的用量平均拆分到多组归属标签（如打包请求的各条目）
+
+    块内不沿用外层标签，拆分后的每份各记为一次调用；预算不在块内检查，由调用方对各组标签分别检查。
+
+    Args:
+        shares: 各组归属标签（见current_labels）
+    """
+    labels_token = _labels.set({})
+    split_token = _split.set([dict(labels) for labels in shares])
+    try:
+        yield
+    finally:
+        _split.reset(split_token)
+        _labels.reset(labels_token)
+
+def _split_count(total: int, index: int, count: int) -> int:
+    """把整数total平均拆成count份时第index份的大小（余数分给前几份）"""
+    return total // count + (1 if index < total % count else 0)
+
+def current_labels() -> Dict[str, str]:
+    """当前调用上下文的归属标签"""
+    return dict(_labels.get())
+
+def carry_labels(func: Callable) -> Callable:
+    """
+    包装提交到线程池的任务，使其LLM调用归属到提交方的会话与任务（只携带标签，不携带截止时间）
+
+    Args:
+        func: 任务函数
+
+    Returns:
+        Callable: 包装后的函数
+    """
+    labels = current_labels()
+
+    def run(*args, **kwargs):
+        with meter_scope(**labels):
+            return func(*args, **kwargs)
+
+    return run
+
+class UsageMeter:
+    """LLM用量计量、时间窗口汇总与任务预算"""
+
+    def __init__(
+        self,
+        pricing: Optional[Dict[str, Dict[str, float]]] = None,
+        window_seconds: float = 60.0,
+        max_windows: int = 1440,
+        max_keys: int = 1000,
+        path: str = ""
+    ):
+        """
+        初始化计量器
+
+        Args:
+            pricing: 模型价格表（美元/百万token），默认使用config.MODEL_PRICING
+            window_seconds: 时间窗口长度（秒）
+            max_windows: 保留的时间窗口数
+            max_keys: 最多累计的会话数（超出时淘汰最久未使用的会话）
+            path: JSONL输出文件，为空时不写文件
+        """
+        self.pricing = pricing or MODEL_PRICING
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.path = path
+        self.totals = UsageTotals()
+        self._by: Dict[str, "OrderedDict[str, UsageTotals]"] = {dim: OrderedDict() for dim in DIMENSIONS}
+        self._windows: deque = deque(maxlen=max_windows)
+        self._budgets: Dict[str, JobBudget] = {}
+        self.rejected = 0
+        self.write_errors = 0
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def set_budget(self, job: str, max_tokens: Optional[int] = None, max_cost: Optional[float] = None):
+        """
+        为批处理任务设置硬性预算（两项均为None时取消预算）
+
+        Args:
+            job: 任务名称
+            max_tokens: 最多使用的token数（输入加输出）
+            max_cost: 最多花费的成本（美元）
+        """
+        with self._lock:
+            if max_tokens is None and max_cost is None:
+                self._budgets.pop(job, None)
+            else:
+                self._budgets[job] = JobBudget(max_tokens, max_cost)
+
+    def restore_job_usage(self, job: str, usage: Dict[str, Any]):
+        """
+        恢复任务此前（如上一次运行）已使用的用量，使预算在中断恢复后继续累计
+
+        Args:
+            job: 任务名称
+            usage: get_job_usage导出的用量
+        """
+        with self._lock:
+            self._by["job"][job] = UsageTotals.from_dict(usage)
+
+    def check(self):
+        """
+        调用前检查当前任务的预算
+
+        Raises:
+            BudgetExceeded: 当前任务已用完预算
+        """
+        job = _labels.get().get("job")
+        if job is None:
+            return
+        with self._lock:
+            budget = self._budgets.get(job)
+            if budget is None:
+                return
+            used = self._by["job"].get(job) or UsageTotals()
+            if budget.max_tokens is not None and used.total_tokens >= budget.max_tokens:
+                self.rejected += 1
+                raise BudgetExceeded(job, f"{used.total_tokens} token", f"{budget.max_tokens} token")
+            if budget.max_cost is not None and used.cost >= budget.max_cost:
+                self.rejected += 1
+                raise BudgetExceeded(job, f"${used.cost:.4f}", f"${budget.max_cost:.4f}")
+
+    def record(self, call_site: str, model: str, endpoint: str, usage: Dict[str, Any]) -> List[UsageRecord]:
+        """
+        记录一次LLM响应的用量
+
+        Args:
+            call_site: 调用点（任务名）
+            model: 实际使用的模型
+            endpoint: 端点名称
+            usage: 响应中的usage字段
+
+        Returns:
+            List[UsageRecord]: 归属到当前标签的用量记录（在split_usage块内为拆分后的各份）
+        """
+        shares = _split.get() or [_labels.get()]
+        timestamp = time.time()
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        cached_tokens = cached_prompt_tokens(usage)
+        completion_tokens = usage.get("completion_tokens", 0)
+        cost = estimate_cost(model, usage, self.pricing)
+        records = [
+            UsageRecord(
+                timestamp=timestamp,
+                call_site=call_site,
+                model=model,
+                endpoint=endpoint,
+                prompt_tokens=_split_count(prompt_tokens, i, len(shares)),
+                cached_tokens=_split_count(cached_tokens, i, len(shares)),
+                completion_tokens=_split_count(completion_tokens, i, len(shares)),
+                cost=cost / len(shares),
+                **{key: labels.get(key) for key in LABELS}
+            )
+            for i, labels in enumerate(shares)
+        ]
+        for record in records:
+            self._add(record)
+            self._write(record)
+        return records
+
+    def _add(self, record: UsageRecord):
+        """把一条用量记录累加到各维度与时间窗口"""
+        window_start = record.timestamp - record.timestamp % self.window_seconds
+        with self._lock:
+            self.totals.add(record)
+            for dim in DIMENSIONS:
+                key = getattr(record, dim)
+                if key is None:
+                    continue
+                entries = self._by[dim]
+                totals = entries.get(key)
+                if totals is None:
+                    totals = entries[key] = UsageTotals()
+                    if dim == "session" and len(entries) > self.max_keys:
+                        entries.popitem(last=False)
+                elif dim == "session":
+                    entries.move_to_end(key)
+                totals.add(record)
+            if not self._windows or self._windows[-1][0] != window_start:
+                self._windows.append((window_start, UsageTotals(), {}))
+            _, window_totals, window_sites = self._windows[-1]
+            window_totals.add(record)
+            window_sites.setdefault(record.call_site, UsageTotals()).add(record)
+
+    def _write(self, record: UsageRecord):
+        """追加写入JSONL文件（写入失败只记录日志）"""
+        if self._file is None:
+            return
+        line = json.dumps(asdict(record), ensure_ascii=False, separators=(",", ":"))
+        try:
+            with self._lock:
+                self._file.write(line + "\n")
+                self._file.flush()
+        except (OSError, ValueError) as e:
+            self.write_errors += 1
+            logger.warning(f"写入用量记录失败: {e}")
+
+    def get_totals(self, by: str = "call_site") -> Dict[str, Dict[str, Any]]:
+        """
+        按维度获取累计用量
+
+        Args:
+            by: 维度，call_site、model、session或job
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 键到累计用量的映射
+        """
+        with self._lock:
+            return {key: totals.to_dict() for key, totals in self._by[by].items()}
+
+    def get_windows(self, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取按时间窗口汇总的用量
+
+        Args:
+            last: 只返回最近N个窗口，None表示全部保留的窗口
+
+        Returns:
+            List[Dict[str, Any]]: 每个窗口的开始时间、累计用量与各调用点用量
+        """
+        with self._lock:
+            windows = list(self._windows)[-last:] if last else list(self._windows)
+            return [
+                dict(totals.to_dict(), start=start,
+                     by_call_site={site: site_totals.to_dict() for site, site_totals in sites.items()})
+                for start, totals, sites in windows
+            ]
+
+    def get_job_usage(self, job: str) -> Dict[str, Any]:
+        """
+        获取任务的用量与预算
+
+        Args:
+            job: 任务名称
+
+        Returns:
+            Dict[str, Any]: 累计用量、预算与是否已超出
+        """
+        with self._lock:
+            used = self._by["job"].get(job) or UsageTotals()
+            budget = self._budgets.get(job)
+            result = used.to_dict()
+        if budget is not None:
+            result["budget"] = asdict(budget)
+            result["exceeded"] = (
+                (budget.max_tokens is not None and result["total_tokens"] >= budget.max_tokens)
+                or (budget.max_cost is not None and result["cost_usd"] >= budget.max_cost)
+            )
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取计量统计
+
+        Returns:
+            Dict[str, Any]: 总用量、按调用点和模型的用量、有预算的任务及被拒绝的调用数
+        """
+        with self._lock:
+            jobs = list(self._budgets)
+            stats = {
+                "totals": self.totals.to_dict(),
+                "by_call_site": {key: totals.to_dict() for key, totals in self._by["call_site"].items()},
+                "by_model": {key: totals.to_dict() for key, totals in self._by["model"].items()},
+                "rejected_calls": self.rejected,
+                "write_errors": self.write_errors
+            }
+        stats["budgets"] = {job: self.get_job_usage(job) for job in jobs}
+        return stats
+
+def load_usage(paths: List[str]) -> List[UsageRecord]:
+    """
+    读取JSONL用量记录
+
+    Args:
+        paths: 用量文件路径列表
+
+    Returns:
+        List[UsageRecord]: 用量记录（跳过无法解析的行）
+    """
+    records = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(UsageRecord(**json.loads(line)))
+                except (json.JSONDecodeError, TypeError):
+                    logger.warning(f"跳过无法解析的用量记录: {line[:80]}")
+    return records
+
+def aggregate(records: List[UsageRecord], by: str = "call_site",
+              window_seconds: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    汇总用量记录
+
+    Args:
+        records: 用量记录
+        by: 分组维度，call_site、model、endpoint、session、job或item
+        window_seconds: 按时间窗口再分组（键为"窗口开始时间 分组"），None表示不分窗口
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 分组到累计用量的映射，按成本降序
+    """
+    groups: Dict[str, UsageTotals] = {}
+    for record in records:
+        key = str(getattr(record, by) or "-")
+        if window_seconds:
+            start = record.timestamp - record.timestamp % window_seconds
+            key = f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(start))} {key}"
+        groups.setdefault(key, UsageTotals()).add(record)
+    ordered = sorted(groups.items(), key=lambda entry: entry[0] if window_seconds else -entry[1].cost)
+    return {key: totals.to_dict() for key, totals in ordered}
+
+def _create_meter() -> UsageMeter:
+    """按配置创建全局计量器"""
+    try:
+        return UsageMeter(window_seconds=METERING_CONFIG["window_seconds"],
+                          max_windows=METERING_CONFIG["max_windows"], path=METERING_CONFIG["path"])
+    except OSError as e:
+        logger.warning(f"无法打开用量输出文件 {METERING_CONFIG['path']}: {e}")
+        return UsageMeter(window_seconds=METERING_CONFIG["window_seconds"],
+                          max_windows=METERING_CONFIG["max_windows"])
+
+# 创建全局实例
+usage_meter = _create_meter()
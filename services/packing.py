@@ -0,0 +1,273 @@
+"""
+小任务打包模块
+
+许多LLM调用都很小（单篇摘要的关键点、单条关系描述），每次调用都要承担完整的请求开销
+和重复的任务说明。该模块在短时间窗口内（默认50毫秒或N个条目）收集任务说明相同的小任务，
+合并为一次带编号的多条目请求并要求JSON输出，再把结果分发给各个等待的调用方。
+打包结果无法解析（或缺少某些条目、条目结果未通过校验）时，对应条目退回为单独调用。
+打包请求的用量按条目平均拆分到各提交方的会话、任务与条目，发送前分别检查各条目所属任务的预算。
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+from concurrent import futures
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from services.routing import ModelRouter, model_router
+from services.circuit_breaker import CircuitOpenError
+from services.metering import BudgetExceeded, current_labels, split_usage, usage_meter
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PACKED_PROMPT = """{instruction}
+
+以下是{count}个相互独立的条目，请对每个条目分别完成上述任务，条目之间互不影响。
+
+{items}
+
+请以JSON数组返回全部{count}个结果，不要包含其他内容，格式如下：
+[{{"id": 1, "result": 条目1的结果}}, {{"id": 2, "result": 条目2的结果}}]
+其中result的格式与单独完成该任务时要求的格式相同（文本用字符串，列表用JSON数组）。"""
+
+@dataclass
+class PackedItem:
+    """等待打包的单个任务"""
+    item: str
+    single_prompt: str
+    validate: Optional[Callable[[str], bool]] = None
+    future: futures.Future = field(default_factory=futures.Future)
+    # 提交方的调用上下文（用量归属标签、截止时间、追踪跨度），发送线程中在其副本内调用
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+@dataclass
+class _Batch:
+    """收集中的一批任务"""
+    task: str
+    instruction: str
+    items: List[PackedItem] = field(default_factory=list)
+
+def strip_code_fence(text: str) -> str:
+    """清理Markdown代码块标记（JSON输出的各解析方共用）"""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+def parse_packed_results(content: str, count: int) -> Dict[int, str]:
+    """
+    解析打包响应
+
+    Args:
+        content: 模型输出
+        count: 条目数量
+
+    Returns:
+        Dict[int, str]: 条目序号（从1开始）到结果文本的映射，只包含成功解析的条目；
+            非字符串结果序列化为JSON文本，与单独调用时的输出形式一致
+    """
+    try:
+        data = json.loads(strip_code_fence(content))
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, list):
+        return {}
+
+    results = {}
+    for position, entry in enumerate(data, 1):
+        if isinstance(entry, dict) and "result" in entry:
+            index, value = entry.get("id", position), entry["result"]
+        else:
+            index, value = position, entry
+        if not isinstance(index, int) or not 1 <= index <= count or value is None:
+            continue
+        results[index] = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return results
+
+class PromptPacker:
+    """小任务打包器"""
+
+    def __init__(
+        self,
+        router: Optional[ModelRouter] = None,
+        window_ms: float = 50,
+        max_items: int = 8,
+        max_workers: int = 8
+    ):
+        """
+        初始化打包器
+
+        Args:
+            router: 模型路由，默认使用全局实例
+            window_ms: 收集窗口（毫秒）
+            max_items: 单次打包的最大条目数
+            max_workers: 并发发送打包请求的线程数
+        """
+        self.router = router or model_router
+        self.window = window_ms / 1000.0
+        self.max_items = max_items
+        self._pending: Dict[Tuple[str, str], _Batch] = {}
+        self._lock = threading.Lock()
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-packer")
+        self.batches = 0
+        self.packed_items = 0
+        self.single_calls = 0
+        self.fallback_items = 0
+        self.parse_failures = 0
+
+    def submit(self, task: str, instruction: str, item: str, single_prompt: Optional[str] = None,
+               validate: Optional[Callable[[str], bool]] = None) -> futures.Future:
+        """
+        提交一个小任务
+
+        任务说明相同（且任务名相同）的条目会被合并到同一批次。
+
+        Args:
+            task: 任务名称（用于模型路由）
+            instruction: 任务说明，同一批次共享
+            item: 条目内容
+            single_prompt: 退回单独调用时使用的完整提示词，默认为任务说明加条目内容
+            validate: 结果校验函数，打包结果未通过时退回单独调用，单独调用未通过时按路由升级模型
+
+        Returns:
+            futures.Future: 结果文本的Future
+        """
+        entry = PackedItem(item=item, single_prompt=single_prompt or f"{instruction}\n\n{item}", validate=validate)
+        key = (task, instruction)
+        ready: Optional[_Batch] = None
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = _Batch(task=task, instruction=instruction)
+                timer = threading.Timer(self.window, self._flush, args=(key, batch))
+                timer.daemon = True
+                timer.start()
+            batch.items.append(entry)
+            if len(batch.items) >= self.max_items:
+                ready = self._pending.pop(key)
+        if ready is not None:
+            self._executor.submit(self._run_batch, ready)
+        return entry.future
+
+    def complete(self, task: str, instruction: str, item: str, single_prompt: Optional[str] = None,
+                 validate: Optional[Callable[[str], bool]] = None) -> str:
+        """同步提交小任务并等待结果，参数同submit"""
+        return self.submit(task, instruction, item, single_prompt, validate).result()
+
+    async def acomplete(self, task: str, instruction: str, item: str, single_prompt: Optional[str] = None,
+                        validate: Optional[Callable[[str], bool]] = None) -> str:
+        """异步提交小任务并等待结果，参数同submit"""
+        return await asyncio.wrap_future(self.submit(task, instruction, item, single_prompt, validate))
+
+    def _flush(self, key: Tuple[str, str], batch: _Batch):
+        """收集窗口到期，发送该批次（批次已因条目数达到上限而发送时忽略）"""
+        with self._lock:
+            if self._pending.get(key) is not batch:
+                return
+            del self._pending[key]
+        self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: _Batch):
+        """发送一个批次并分发结果"""
+        # 打包请求内不检查预算，发送前按各条目所属任务分别检查，超出预算的条目直接失败
+        items = []
+        for entry in batch.items:
+            try:
+                entry.context.run(usage_meter.check)
+            except BudgetExceeded as e:
+                entry.future.set_exception(e)
+                continue
+            items.append(entry)
+        if not items:
+            return
+        if len(items) == 1:
+            self._run_single(batch.task, items[0])
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.packed_items += len(items)
+        route = self.router.resolve(batch.task)
+        max_tokens = route.max_tokens * len(items) if route.max_tokens else None
+        prompt = PACKED_PROMPT.format(
+            instruction=batch.instruction.strip(),
+            count=len(items),
+            items="\n\n".join(f"条目{i}:\n{entry.item.strip()}" for i, entry in enumerate(items, 1))
+        )
+        shares = [entry.context.run(current_labels) for entry in items]
+
+        def send():
+            # 用量平均拆分到各条目提交方的标签，不归属于任何单个条目
+            with split_usage(shares):
+                return self.router.complete(
+                    f"{batch.task}.packed",
+                    [{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens
+                )
+
+        try:
+            # 截止时间与追踪跨度沿用第一个条目提交方的上下文
+            response = items[0].context.copy().run(send)
+            results = parse_packed_results(response.content, len(items))
+        except (CircuitOpenError, BudgetExceeded) as e:
+            for entry in items:
+                entry.future.set_exception(e)
+            return
+        except Exception as e:
+            logger.warning(f"打包请求失败，退回单独调用: {e}")
+            results = {}
+
+        # 未通过校验的条目与缺少的条目一样退回单独调用（单独调用时按路由升级模型）
+        for i, entry in enumerate(items, 1):
+            if i in results and entry.validate is not None and not entry.validate(results[i]):
+                del results[i]
+        missing = [entry for i, entry in enumerate(items, 1) if i not in results]
+        for i, entry in enumerate(items, 1):
+            if i in results:
+                entry.future.set_result(results[i])
+        if missing:
+            with self._lock:
+                self.parse_failures += 1
+                self.fallback_items += len(missing)
+            logger.info(f"打包结果缺少 {len(missing)}/{len(items)} 个条目，退回单独调用")
+            for entry in missing:
+                self._executor.submit(self._run_single, batch.task, entry)
+
+    def _run_single(self, task: str, entry: PackedItem):
+        """单独调用一个条目"""
+        with self._lock:
+            self.single_calls += 1
+        try:
+            response = entry.context.copy().run(
+                self.router.complete, task, [{"role": "user", "content": entry.single_prompt}],
+                validate=entry.validate
+            )
+            entry.future.set_result(response.content)
+        except Exception as e:
+            entry.future.set_exception(e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取打包统计
+
+        Returns:
+            Dict[str, Any]: 打包统计信息
+        """
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "packed_items": self.packed_items,
+                "avg_batch_size": self.packed_items / self.batches if self.batches else 0.0,
+                "single_calls": self.single_calls,
+                "parse_failures": self.parse_failures,
+                "fallback_items": self.fallback_items
+            }
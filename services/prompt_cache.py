@@ -0,0 +1,65 @@
+"""
+提示词前缀缓存统计模块
+
+DeepSeek、OpenAI等服务商会缓存重复出现的提示词前缀，命中部分计费更低、首字延迟更短。
+该模块从响应的usage字段中解析缓存命中token数，并按调用点统计前缀缓存命中率，
+用于验证提示词是否把最长的稳定前缀放在了最前面。
+"""
+
+import threading
+from typing import Dict, Any
+
+def cached_prompt_tokens(usage: Dict[str, Any]) -> int:
+    """
+    从usage字段中解析命中前缀缓存的输入token数
+
+    兼容DeepSeek（prompt_cache_hit_tokens）与OpenAI（prompt_tokens_details.cached_tokens）两种格式。
+
+    Args:
+        usage: 响应中的usage字段
+
+    Returns:
+        int: 命中缓存的输入token数，服务商未返回时为0
+    """
+    if usage.get("prompt_cache_hit_tokens") is not None:
+        return int(usage["prompt_cache_hit_tokens"])
+    details = usage.get("prompt_tokens_details") or {}
+    if not isinstance(details, dict):
+        details = vars(details)
+    return int(details.get("cached_tokens") or 0)
+
+class PromptCacheStats:
+    """单个调用点的前缀缓存统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.calls_with_hit = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, usage: Dict[str, Any]):
+        """记录一次调用的usage"""
+        cached = cached_prompt_tokens(usage)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+            self.cached_tokens += cached
+            if cached:
+                self.calls_with_hit += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        导出缓存统计
+
+        Returns:
+            Dict[str, Any]: 包含调用次数、输入token数、命中token数与命中率
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "calls_with_hit": self.calls_with_hit,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "hit_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+            }
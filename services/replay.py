@@ -0,0 +1,426 @@
+"""
+录制回放模块
+
+把OpenAI兼容的chat.completions调用与Arxiv请求录制为cassette文件（JSON），之后离线回放，
+用于在没有网络和API密钥的环境下确定性地基准测试Agent、关系抽取流程与幻觉检测器。
+
+- LLM：通过llm_client.set_chat_transport包装每个端点的openai客户端。请求按消息、工具等内容取哈希匹配，
+  不含模型名、温度与超时，端点池选择不同端点或路由表调整参数时仍能命中；同一请求录制多次时按顺序回放。
+- Arxiv：通过search.set_arxiv_transport替换ArxivSearchService的请求执行（而不是截获HTTP），
+  回放时不经过arxiv客户端的分页与3秒请求间隔，熔断器与截止时间处理与真实请求一致。
+
+回放延迟默认为录制时的延迟乘以latency_scale，也可设为固定基础延迟加每个输出token的延迟，并叠加±jitter的均匀抖动。
+请求带超时（截止时间）且回放延迟超过超时时，等待到超时后抛出openai.APITimeoutError，与真实请求行为相同。
+
+模式：record 全部实时请求并重新录制；replay 只回放，没有录制的请求抛出CassetteMiss；auto 有录制时回放，否则实时请求并录制。
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Any, Optional, List, Callable
+
+import openai
+
+from services.llm_client import set_chat_transport, _tool_calls_to_list, _usage_to_dict
+from services.search import set_arxiv_transport
+from config import REPLAY_CONFIG
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODES = ("record", "replay", "auto")
+
+# 参与LLM请求匹配的字段
+_LLM_KEY_FIELDS = ("messages", "tools", "tool_choice", "response_format", "stop", "n")
+
+class CassetteMiss(LookupError):
+    """回放模式下请求没有对应的录制"""
+
+def llm_request_key(request: Dict[str, Any]) -> str:
+    """
+    LLM请求的匹配键
+
+    Args:
+        request: chat.completions请求参数
+
+    Returns:
+        str: 消息、工具等字段规范化JSON的SHA1
+    """
+    canonical = {name: request[name] for name in _LLM_KEY_FIELDS if name in request}
+    data = json.dumps(canonical, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+def arxiv_request_key(search: Any) -> str:
+    """
+    Arxiv检索的匹配键
+
+    Args:
+        search: arxiv.Search对象
+
+    Returns:
+        str: 查询、ID列表、结果数与排序方式组成的键
+    """
+    sort_by = getattr(search, "sort_by", None)
+    return "|".join([
+        getattr(search, "query", "") or "",
+        ",".join(getattr(search, "id_list", None) or []),
+        str(getattr(search, "max_results", "") or ""),
+        str(getattr(sort_by, "value", sort_by) or "")
+    ])
+
+def _result_to_dict(result: Any) -> Dict[str, Any]:
+    """把arxiv.Result转换为可录制的字典（只保留PaperInfo需要的字段）"""
+    published = getattr(result, "published", None)
+    return {
+        "title": result.title,
+        "authors": [author.name for author in result.authors],
+        "summary": result.summary,
+        "entry_id": result.entry_id,
+        "published": published.isoformat() if published else None,
+        "categories": list(result.categories),
+        "pdf_url": result.pdf_url
+    }
+
+def _result_from_dict(data: Dict[str, Any]) -> SimpleNamespace:
+    """还原与arxiv.Result接口相同的检索结果"""
+    return SimpleNamespace(
+        title=data["title"],
+        authors=[SimpleNamespace(name=name) for name in data["authors"]],
+        summary=data["summary"],
+        entry_id=data["entry_id"],
+        published=datetime.fromisoformat(data["published"]) if data.get("published") else None,
+        categories=list(data["categories"]),
+        pdf_url=data["pdf_url"]
+    )
+
+def _response_to_dict(raw: Any) -> Dict[str, Any]:
+    """把chat.completions响应转换为可录制的字典"""
+    message = raw.choices[0].message
+    return {
+        "model": getattr(raw, "model", "") or "",
+        "content": message.content,
+        "tool_calls": _tool_calls_to_list(getattr(message, "tool_calls", None)),
+        "usage": _usage_to_dict(getattr(raw, "usage", None))
+    }
+
+def _response_from_dict(data: Dict[str, Any]) -> SimpleNamespace:
+    """还原与chat.completions响应接口相同的对象"""
+    message = SimpleNamespace(content=data.get("content"), tool_calls=data.get("tool_calls") or None)
+    return SimpleNamespace(model=data.get("model", ""), choices=[SimpleNamespace(message=message)],
+                           usage=data.get("usage") or None)
+
+class SyntheticLatency:
+    """回放时的合成延迟"""
+
+    def __init__(self, base_ms: Optional[float] = None, per_token_ms: float = 0.0, jitter_ms: float = 0.0,
+                 scale: float = 1.0, seed: int = 0):
+        """
+        初始化延迟模型
+
+        Args:
+            base_ms: 固定基础延迟（毫秒），None表示使用录制时的延迟
+            per_token_ms: 使用固定基础延迟时，每个输出token追加的延迟（毫秒）
+            jitter_ms: 在±jitter_ms内均匀抖动
+            scale: 录制延迟的缩放系数（0表示不等待）
+            seed: 抖动随机数种子
+        """
+        self.base_ms = base_ms
+        self.per_token_ms = per_token_ms
+        self.jitter_ms = jitter_ms
+        self.scale = scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, recorded: float, tokens: int = 0) -> float:
+        """
+        计算一次回放的等待时间
+
+        Args:
+            recorded: 录制时的延迟（秒）
+            tokens: 输出token数
+
+        Returns:
+            float: 等待时间（秒）
+        """
+        if self.base_ms is None:
+            delay = recorded * self.scale
+        else:
+            delay = (self.base_ms + self.per_token_ms * tokens) / 1000
+        if self.jitter_ms:
+            with self._lock:
+                delay += self._random.uniform(-self.jitter_ms, self.jitter_ms) / 1000
+        return max(delay, 0.0)
+
+class Cassette:
+    """录制文件：LLM与Arxiv两类请求，每个匹配键对应按顺序录制的一组响应"""
+
+    FORMAT = "scholar-cassette"
+    VERSION = 1
+
+    def __init__(self, path: str, mode: str = "replay"):
+        """
+        初始化录制文件
+
+        Args:
+            path: 文件路径
+            mode: record/replay/auto，record模式忽略已有内容
+
+        Raises:
+            ValueError: 模式无效或文件格式不符
+        """
+        if mode not in MODES:
+            raise ValueError(f"无效的录制回放模式: {mode}，可选 {', '.join(MODES)}")
+        self.path = path
+        self.mode = mode
+        self.entries: Dict[str, Dict[str, List[Dict[str, Any]]]] = {"llm": {}, "arxiv": {}}
+        if mode != "record" and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("format") != self.FORMAT:
+                raise ValueError(f"{path} 不是录制文件")
+            for kind in self.entries:
+                self.entries[kind].update(data.get(kind, {}))
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {kind: {"replayed": 0, "recorded": 0, "missed": 0} for kind in self.entries}
+        self.dirty = False
+
+    def lookup(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        取下一条录制（同一请求按录制顺序返回，用完后重复最后一条）
+
+        Args:
+            kind: llm 或 arxiv
+            key: 匹配键
+
+        Returns:
+            Optional[Dict[str, Any]]: 录制条目，record模式或没有录制时返回None
+
+        Raises:
+            CassetteMiss: replay模式下没有录制
+        """
+        if self.mode == "record":
+            return None
+        with self._lock:
+            recorded = self.entries[kind].get(key)
+            if not recorded:
+                self.stats[kind]["missed"] += 1
+                if self.mode == "replay":
+                    raise CassetteMiss(f"录制文件 {self.path} 中没有匹配的{kind}请求: {key[:80]}")
+                return None
+            index = self._cursor.get(f"{kind}:{key}", 0)
+            self._cursor[f"{kind}:{key}"] = index + 1
+            self.stats[kind]["replayed"] += 1
+            return recorded[min(index, len(recorded) - 1)]
+
+    def add(self, kind: str, key: str, entry: Dict[str, Any]):
+        """追加一条录制"""
+        with self._lock:
+            self.entries[kind].setdefault(key, []).append(entry)
+            self.stats[kind]["recorded"] += 1
+            self.dirty = True
+
+    def save(self):
+        """写入文件（先写临时文件再替换）"""
+        with self._lock:
+            data = {"format": self.FORMAT, "version": self.VERSION, **self.entries}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+            self.dirty = False
+
+class _ReplayCompletions:
+    """录制或回放chat.completions.create（同步）"""
+
+    def __init__(self, replay: "Replay", client: Any):
+        self._replay = replay
+        self._client = client
+
+    def create(self, **request):
+        replayed = self._replay._replay_llm(request)
+        if replayed is not None:
+            raw, delay, timed_out = replayed
+            time.sleep(delay)
+            if timed_out:
+                raise openai.APITimeoutError(request=None)
+            return raw
+        start = time.perf_counter()
+        raw = self._client.chat.completions.create(**request)
+        self._replay._record_llm(request, raw, time.perf_counter() - start)
+        return raw
+
+class _AsyncReplayCompletions(_ReplayCompletions):
+    """录制或回放chat.completions.create（异步）"""
+
+    async def create(self, **request):
+        replayed = self._replay._replay_llm(request)
+        if replayed is not None:
+            raw, delay, timed_out = replayed
+            await asyncio.sleep(delay)
+            if timed_out:
+                raise openai.APITimeoutError(request=None)
+            return raw
+        start = time.perf_counter()
+        raw = await self._client.chat.completions.create(**request)
+        self._replay._record_llm(request, raw, time.perf_counter() - start)
+        return raw
+
+class _ReplayClient:
+    """与openai客户端接口相同的包装（chat.completions与models）"""
+
+    def __init__(self, replay: "Replay", client: Any, is_async: bool):
+        completions_class = _AsyncReplayCompletions if is_async else _ReplayCompletions
+        self.chat = SimpleNamespace(completions=completions_class(replay, client))
+        # 只回放时端点探活不访问网络
+        self.models = SimpleNamespace(list=(lambda: []) if replay.cassette.mode == "replay" else lambda: client.models.list())
+
+class Replay:
+    """LLM与Arxiv请求的录制回放"""
+
+    def __init__(self, cassette: Cassette, llm_latency: Optional[SyntheticLatency] = None,
+                 arxiv_latency: Optional[SyntheticLatency] = None):
+        """
+        初始化录制回放
+
+        Args:
+            cassette: 录制文件
+            llm_latency: LLM回放延迟，默认使用录制延迟
+            arxiv_latency: Arxiv回放延迟，默认使用录制延迟
+        """
+        self.cassette = cassette
+        self.llm_latency = llm_latency or SyntheticLatency()
+        self.arxiv_latency = arxiv_latency or SyntheticLatency()
+        self._previous: Optional[tuple] = None
+
+    @classmethod
+    def from_config(cls, mode: Optional[str] = None, cassette: Optional[str] = None) -> "Replay":
+        """
+        根据config.REPLAY_CONFIG创建
+
+        Args:
+            mode: 覆盖配置中的模式
+            cassette: 覆盖配置中的录制文件路径
+
+        Returns:
+            Replay: 录制回放实例
+        """
+        def fixed(value: str) -> Optional[float]:
+            return float(value) if value != "" else None
+
+        common = {"jitter_ms": REPLAY_CONFIG["jitter_ms"], "scale": REPLAY_CONFIG["latency_scale"]}
+        return cls(
+            Cassette(cassette or REPLAY_CONFIG["cassette"], mode or REPLAY_CONFIG["mode"] or "replay"),
+            llm_latency=SyntheticLatency(fixed(REPLAY_CONFIG["llm_latency_ms"]), REPLAY_CONFIG["llm_per_token_ms"],
+                                         seed=REPLAY_CONFIG["seed"], **common),
+            arxiv_latency=SyntheticLatency(fixed(REPLAY_CONFIG["arxiv_latency_ms"]),
+                                           seed=REPLAY_CONFIG["seed"] + 1, **common)
+        )
+
+    def wrap(self, client: Any, is_async: bool) -> _ReplayClient:
+        """包装端点的openai客户端（llm_client传输层接口）"""
+        return _ReplayClient(self, client, is_async)
+
+    def _replay_llm(self, request: Dict[str, Any]) -> Optional[tuple]:
+        """查找LLM录制，返回 (响应, 等待时间, 是否超时)，没有录制时返回None"""
+        entry = self.cassette.lookup("llm", llm_request_key(request))
+        if entry is None:
+            return None
+        response = entry["response"]
+        delay = self.llm_latency.sample(entry.get("latency", 0.0),
+                                        (response.get("usage") or {}).get("completion_tokens", 0))
+        timeout = request.get("timeout")
+        if timeout is not None and delay > timeout:
+            return None, timeout, True
+        return _response_from_dict(response), delay, False
+
+    def _record_llm(self, request: Dict[str, Any], raw: Any, latency: float):
+        """录制一次LLM调用"""
+        self.cassette.add("llm", llm_request_key(request), {
+            "request": {name: request[name] for name in ("model",) + _LLM_KEY_FIELDS if name in request},
+            "response": _response_to_dict(raw),
+            "latency": round(latency, 4)
+        })
+
+    def fetch(self, search: Any, live: Callable[[], list]) -> list:
+        """
+        录制或回放一次Arxiv请求（search传输层接口）
+
+        Args:
+            search: arxiv.Search对象
+            live: 执行真实请求的函数
+
+        Returns:
+            list: 检索结果
+
+        Raises:
+            CassetteMiss: replay模式下没有录制
+        """
+        key = arxiv_request_key(search)
+        entry = self.cassette.lookup("arxiv", key)
+        if entry is not None:
+            time.sleep(self.arxiv_latency.sample(entry.get("latency", 0.0)))
+            return [_result_from_dict(result) for result in entry["results"]]
+        start = time.perf_counter()
+        results = live()
+        self.cassette.add("arxiv", key, {
+            "results": [_result_to_dict(result) for result in results],
+            "latency": round(time.perf_counter() - start, 4)
+        })
+        return results
+
+    def install(self) -> "Replay":
+        """替换LLM与Arxiv的传输层"""
+        self._previous = (set_chat_transport(self), set_arxiv_transport(self))
+        logger.info(f"录制回放已启用: {self.cassette.mode} {self.cassette.path}")
+        return self
+
+    def uninstall(self):
+        """恢复之前的传输层，并保存新增的录制"""
+        if self._previous is not None:
+            set_chat_transport(self._previous[0])
+            set_arxiv_transport(self._previous[1])
+            self._previous = None
+        self.save()
+
+    def save(self):
+        """有新增录制时写入录制文件"""
+        if self.cassette.dirty:
+            self.cassette.save()
+            logger.info(f"录制已保存: {self.cassette.path}")
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """各类请求的回放、录制与未命中次数"""
+        return {kind: dict(stats) for kind, stats in self.cassette.stats.items()}
+
+    def __enter__(self) -> "Replay":
+        return self.install()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.uninstall()
+
+def install_from_config() -> Optional[Replay]:
+    """
+    按config.REPLAY_CONFIG启用录制回放（SCHOLAR_REPLAY为空时不启用），进程退出时保存新增的录制
+
+    Returns:
+        Optional[Replay]: 启用的录制回放实例
+    """
+    if not REPLAY_CONFIG["mode"]:
+        return None
+    replay = Replay.from_config().install()
+    atexit.register(replay.save)
+    return replay
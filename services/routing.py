@@ -0,0 +1,282 @@
+"""
+模型路由模块
+
+该模块根据任务类型（总结维度、实体抽取、关系描述、幻觉检测维度、Agent推理步骤）
+从路由表中选择模型、max_tokens和温度，使简单任务使用更小更快的模型。
+可选地在输出校验失败时升级到更强的模型重试，并按路由统计延迟与成本。
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Callable
+
+from services.llm_client import LLMClient, LLMResponse, llm_client
+from services.hedging import LatencyTracker
+from services.metering import estimate_cost
+from config import MODEL_TIERS, MODEL_ROUTES, MODEL_PRICING, MODEL_ROUTING_CONFIG
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Route:
+    """路由数据类"""
+    task: str
+    model: str
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    escalate_to: Optional[str] = None
+
+class RouteStats:
+    """单条路由的统计信息"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.validation_failures = 0
+        self.escalations = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.models: Dict[str, int] = {}
+        self.latency = LatencyTracker()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出统计信息"""
+        latency = self.latency.snapshot()
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "validation_failures": self.validation_failures,
+            "escalations": self.escalations,
+            "models": dict(self.models),
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "prompt_cache_hit_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost, 6),
+            "latency_p50": latency["p50"],
+            "latency_p95": latency["p95"]
+        }
+
+class ModelRouter:
+    """按任务类型路由模型"""
+
+    def __init__(
+        self,
+        client: Optional[LLMClient] = None,
+        routes: Optional[Dict[str, Dict[str, Any]]] = None,
+        tiers: Optional[Dict[str, str]] = None,
+        pricing: Optional[Dict[str, Dict[str, float]]] = None,
+        escalate: Optional[bool] = None
+    ):
+        """
+        初始化模型路由
+
+        Args:
+            client: LLM调用客户端，默认使用全局实例
+            routes: 路由表，默认使用config.MODEL_ROUTES
+            tiers: 模型档位到模型名称的映射，默认使用config.MODEL_TIERS
+            pricing: 模型价格表（美元/百万token），默认使用config.MODEL_PRICING
+            escalate: 校验失败时是否升级模型，默认读取config.MODEL_ROUTING_CONFIG
+        """
+        self.client = client or llm_client
+        self.tiers = tiers or MODEL_TIERS
+        self.pricing = pricing or MODEL_PRICING
+        self.escalate = MODEL_ROUTING_CONFIG["escalate_on_validation_failure"] if escalate is None else escalate
+        self.routes = {task: self._build_route(task, spec) for task, spec in (routes or MODEL_ROUTES).items()}
+        self._stats: Dict[str, RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def _build_route(self, task: str, spec: Dict[str, Any]) -> Route:
+        """根据路由表条目创建Route"""
+        escalate_tier = spec.get("escalate_to")
+        return Route(
+            task=task,
+            model=spec.get("model") or self.tiers[spec.get("tier", "standard")],
+            max_tokens=spec.get("max_tokens"),
+            temperature=spec.get("temperature"),
+            escalate_to=self.tiers.get(escalate_tier, escalate_tier) if escalate_tier else None
+        )
+
+    def resolve(self, task: str) -> Route:
+        """
+        查找任务对应的路由
+
+        依次尝试完整任务名和逐级前缀（如 hallucination.factual_consistency → hallucination），
+        都未命中时使用default路由。
+
+        Args:
+            task: 任务名称
+
+        Returns:
+            Route: 路由
+        """
+        name = task
+        while name:
+            if name in self.routes:
+                return self.routes[name]
+            name = name.rpartition(".")[0]
+        return self.routes["default"]
+
+    def estimate_cost(self, model: str, usage: Dict[str, Any]) -> float:
+        """
+        按价格表估算一次调用的成本，命中前缀缓存的输入token按cached_input价格计费
+
+        Args:
+            model: 模型名称
+            usage: 响应中的usage字段
+
+        Returns:
+            float: 成本（美元）
+        """
+        return estimate_cost(model, usage, self.pricing)
+
+    def _stats_for(self, task: str) -> RouteStats:
+        """获取路由统计对象"""
+        with self._lock:
+            stats = self._stats.get(task)
+            if stats is None:
+                stats = self._stats[task] = RouteStats()
+            return stats
+
+    def _record(self, task: str, response: LLMResponse, requested_model: str):
+        """记录一次成功调用"""
+        stats = self._stats_for(task)
+        model = response.model or requested_model
+        with self._lock:
+            stats.calls += 1
+            stats.models[model] = stats.models.get(model, 0) + 1
+            stats.prompt_tokens += response.usage.get("prompt_tokens", 0)
+            stats.cached_tokens += response.cached_tokens
+            stats.completion_tokens += response.usage.get("completion_tokens", 0)
+            stats.cost += self.estimate_cost(model, response.usage)
+        stats.latency.record(response.latency)
+
+    def _record_error(self, task: str):
+        """记录一次失败调用"""
+        stats = self._stats_for(task)
+        with self._lock:
+            stats.errors += 1
+
+    def _request_args(self, route: Route, model: Optional[str], temperature: Optional[float],
+                      max_tokens: Optional[int]) -> Dict[str, Any]:
+        """合并路由默认值与调用方显式参数"""
+        return {
+            "model": model or route.model,
+            "temperature": route.temperature if temperature is None else temperature,
+            "max_tokens": route.max_tokens if max_tokens is None else max_tokens
+        }
+
+    def _should_escalate(self, task: str, route: Route, response: LLMResponse, model: str,
+                         validate: Optional[Callable[[str], bool]]) -> bool:
+        """判断是否需要升级模型重试"""
+        if validate is None or validate(response.content):
+            return False
+        stats = self._stats_for(task)
+        with self._lock:
+            stats.validation_failures += 1
+        if not self.escalate or not route.escalate_to or route.escalate_to == model:
+            return False
+        with self._lock:
+            stats.escalations += 1
+        logger.info(f"任务 {task} 输出校验失败，升级到模型 {route.escalate_to} 重试")
+        return True
+
+    def complete(
+        self,
+        task: str,
+        messages: Any,
+        validate: Optional[Callable[[str], bool]] = None,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> LLMResponse:
+        """
+        按任务路由同步调用LLM
+
+        Args:
+            task: 任务名称（同时作为调用点标识）
+            messages: 消息列表
+            validate: 输出校验函数，返回False时可按路由升级模型重试
+            model: 显式指定模型，覆盖路由表
+            temperature: 显式指定温度，覆盖路由表
+            max_tokens: 显式指定最大输出token数，覆盖路由表
+            **kwargs: 透传给LLMClient.complete的其他参数（如hedge）
+
+        Returns:
+            LLMResponse: 响应结果
+        """
+        route = self.resolve(task)
+        args = self._request_args(route, model, temperature, max_tokens)
+        try:
+            response = self.client.complete(messages, call_site=task, **args, **kwargs)
+        except Exception:
+            self._record_error(task)
+            raise
+        self._record(task, response, args["model"])
+
+        if self._should_escalate(task, route, response, args["model"], validate):
+            args["model"] = route.escalate_to
+            try:
+                escalated = self.client.complete(messages, call_site=task, **args, **kwargs)
+            except Exception as e:
+                # 升级调用失败时保留原始结果，由调用方按原有逻辑处理
+                logger.warning(f"任务 {task} 升级模型调用失败: {e}")
+                self._record_error(task)
+                return response
+            self._record(task, escalated, args["model"])
+            response = escalated
+        return response
+
+    async def acomplete(
+        self,
+        task: str,
+        messages: Any,
+        validate: Optional[Callable[[str], bool]] = None,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> LLMResponse:
+        """
+        按任务路由异步调用LLM，参数同complete
+        """
+        route = self.resolve(task)
+        args = self._request_args(route, model, temperature, max_tokens)
+        try:
+            response = await self.client.acomplete(messages, call_site=task, **args, **kwargs)
+        except Exception:
+            self._record_error(task)
+            raise
+        self._record(task, response, args["model"])
+
+        if self._should_escalate(task, route, response, args["model"], validate):
+            args["model"] = route.escalate_to
+            try:
+                escalated = await self.client.acomplete(messages, call_site=task, **args, **kwargs)
+            except Exception as e:
+                logger.warning(f"任务 {task} 升级模型调用失败: {e}")
+                self._record_error(task)
+                return response
+            self._record(task, escalated, args["model"])
+            response = escalated
+        return response
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各路由的调用次数、延迟和成本
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 任务名称到统计信息的映射
+        """
+        with self._lock:
+            items = list(self._stats.items())
+        return {task: stats.to_dict() for task, stats in items}
+
+# 创建全局实例
+model_router = ModelRouter()
@@ -3,17 +3,43 @@ Arxiv搜索服务模块
 
 该模块封装了与Arxiv API的交互，提供论文检索功能。
 支持按标题、作者、关键词等条件搜索论文。
+Arxiv API不可用时由熔断器快速失败，抛出CircuitOpenError；
+调用上下文设置了截止时间时，检索超过剩余时间即放弃等待，抛出DeadlineExceeded。
+Arxiv请求与结果解析分别记录追踪跨度。
+可通过set_arxiv_transport替换Arxiv请求的执行方式（services.replay的录制回放），熔断与截止时间处理不变。
 """
 
 import arxiv
 import logging
+from concurrent import futures
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.deadline import DeadlineExceeded, current_deadline
+from services.tracing import tracer, KIND_ARXIV
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Arxiv请求传输层，None表示直接请求Arxiv API（见set_arxiv_transport）
+_arxiv_transport = None
+
+def set_arxiv_transport(transport) -> object:
+    """
+    替换所有ArxivSearchService的请求执行方式
+
+    Args:
+        transport: 提供fetch(search, live)的对象，live()执行真实请求并返回结果列表；None表示恢复直连
+
+    Returns:
+        object: 之前的传输层
+    """
+    global _arxiv_transport
+    previous, _arxiv_transport = _arxiv_transport, transport
+    return previous
+
 @dataclass
 class PaperInfo:
     """论文信息数据类"""
@@ -28,12 +54,14 @@ class PaperInfo:
 class ArxivSearchService:
     """Arxiv搜索服务类"""
     
-    def __init__(self, max_results: int = 5):
+    def __init__(self, max_results: int = 5, failure_threshold: int = 3, recovery_timeout: float = 60.0):
         """
         初始化Arxiv搜索服务
         
         Args:
             max_results: 最大返回结果数量，默认5篇
+            failure_threshold: 连续失败多少次后熔断
+            recovery_timeout: 熔断多少秒后放行试探请求
         """
         self.max_results = max_results
         self.client = arxiv.Client(
@@ -41,6 +69,45 @@ class ArxivSearchService:
             delay_seconds=3,
             num_retries=3
         )
+        self.breaker = CircuitBreaker("arxiv", failure_threshold, recovery_timeout)
+        # 有截止时间的检索在后台线程执行，超时后放弃等待（请求在后台自然结束并计入熔断统计）
+        self._executor = futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="arxiv-fetch")
+    
+    def _fetch(self, search: arxiv.Search) -> list:
+        """
+        在熔断保护下执行搜索
+        
+        Raises:
+            CircuitOpenError: Arxiv API处于熔断状态
+            DeadlineExceeded: 超出调用上下文的截止时间
+        """
+        with tracer.span("arxiv.request", KIND_ARXIV, query=search.query or None,
+                         id_list=",".join(search.id_list) or None) as span:
+            deadline = current_deadline()
+            if deadline is None:
+                results = self.breaker.call(lambda: self._request(search))
+            else:
+                timeout = deadline.timeout(what="Arxiv检索")
+                future = self._executor.submit(self.breaker.call, lambda: self._request(search))
+                try:
+                    results = future.result(timeout=timeout)
+                except futures.TimeoutError:
+                    future.cancel()
+                    raise DeadlineExceeded(f"Arxiv检索超出截止时间（{deadline.seconds:g}秒）")
+            span.set(results=len(results))
+            return results
+    
+    def _request(self, search: arxiv.Search) -> list:
+        """执行一次Arxiv请求（设置了传输层时由其执行）"""
+        transport = _arxiv_transport
+        if transport is not None:
+            return transport.fetch(search, lambda: list(self.client.results(search)))
+        return list(self.client.results(search))
+    
+    def _parse(self, results: list) -> List[PaperInfo]:
+        """将检索结果转换为PaperInfo列表（记录解析耗时）"""
+        with tracer.span("arxiv.parse", KIND_ARXIV, results=len(results)):
+            return [self._convert_to_paper_info(result) for result in results]
     
     def search_by_title(self, title: str) -> List[PaperInfo]:
         """
@@ -61,9 +128,11 @@ class ArxivSearchService:
                 sort_by=arxiv.SortCriterion.Relevance
             )
             
-            results = list(self.client.results(search))
-            return [self._convert_to_paper_info(result) for result in results]
+            results = self._fetch(search)
+            return self._parse(results)
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"搜索论文时发生错误: {e}")
             return []
@@ -85,9 +154,11 @@ class ArxivSearchService:
                 sort_by=arxiv.SortCriterion.Relevance
             )
             
-            results = list(self.client.results(search))
-            return [self._convert_to_paper_info(result) for result in results]
+            results = self._fetch(search)
+            return self._parse(results)
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"按关键词搜索时发生错误: {e}")
             return []
@@ -110,9 +181,11 @@ class ArxivSearchService:
                 sort_by=arxiv.SortCriterion.SubmittedDate
             )
             
-            results = list(self.client.results(search))
-            return [self._convert_to_paper_info(result) for result in results]
+            results = self._fetch(search)
+            return self._parse(results)
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"按作者搜索时发生错误: {e}")
             return []
@@ -129,12 +202,14 @@ class ArxivSearchService:
         """
         try:
             search = arxiv.Search(id_list=[arxiv_id])
-            results = list(self.client.results(search))
+            results = self._fetch(search)
             
             if results:
-                return self._convert_to_paper_info(results[0])
+                return self._parse(results[:1])[0]
             return None
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"获取论文详情时发生错误: {e}")
             return None
@@ -159,6 +234,15 @@ class ArxivSearchService:
             pdf_url=result.pdf_url
         )
     
+    def get_stats(self) -> Dict:
+        """
+        获取搜索服务的熔断器状态指标
+        
+        Returns:
+            Dict: 熔断器状态
+        """
+        return self.breaker.get_stats()
+    
     def format_paper_info(self, paper: PaperInfo) -> str:
         """
         格式化论文信息为可读字符串
@@ -3,39 +3,113 @@ LLM总结服务模块
 
 该模块使用大语言模型对论文摘要进行智能总结和分析。
 支持多种总结模式：研究贡献总结、技术方法总结、创新点分析等。
+LLM端点全部熔断时各方法直接抛出CircuitOpenError，由调用方决定如何降级。
+
+提示词按"公共系统提示词 → 论文内容 → 任务要求 → 用户问题"的顺序组织，
+同一篇论文的不同总结任务共享最长的稳定前缀，可命中服务商的前缀缓存。
 """
 
 import logging
 from typing import List, Dict, Optional
-from langchain_community.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage
 
-from ..config import config
+from services.routing import ModelRouter, model_router
+from services.circuit_breaker import CircuitOpenError
+from services.deadline import DeadlineExceeded
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 所有总结任务共用的系统提示词（保持不变以命中前缀缓存）
+SYSTEM_PROMPT = """你是一个专业的科研论文分析专家，熟悉机器学习和各类技术方法。
+你将收到一篇或两篇论文的标题和摘要，以及具体的分析任务。
+
+请遵循以下原则：
+1. 基于论文摘要中的信息进行分析，不要添加论文中没有的信息
+2. 如果摘要中没有相关信息，请明确说明
+3. 分析要准确、客观、专业
+4. 用中文回答，结构清晰，重点突出"""
+
+CONTRIBUTIONS_TASK = """任务：总结该论文的主要研究贡献。
+
+请从以下角度进行分析：
+1. 研究问题：该论文要解决什么问题？
+2. 主要贡献：论文提出了什么新的方法、技术或见解？
+3. 创新点：相比现有工作，该论文的创新之处在哪里？
+4. 技术方法：论文采用了什么技术方法？
+5. 实验结果：论文的主要实验结果或结论是什么？"""
+
+METHODS_TASK = """任务：以技术专家的视角总结该论文的技术方法。
+
+请从以下角度进行分析：
+1. 技术框架：论文使用了什么技术框架或架构？
+2. 算法方法：论文提出了什么算法或方法？
+3. 实现细节：论文的技术实现有什么特点？
+4. 技术优势：该技术方法相比传统方法有什么优势？
+5. 应用场景：该技术方法适用于什么场景？
+
+技术细节要准确。"""
+
+QUESTION_TASK = """任务：基于论文摘要回答下面的用户问题。
+
+请确保回答基于论文内容，不要添加论文中没有的信息。"""
+
+COMPARE_TASK = """任务：比较分析论文A和论文B的异同点。
+
+请从以下角度进行比较：
+1. 研究问题：两篇论文要解决的问题是否相同？
+2. 技术方法：两篇论文采用的技术方法有什么不同？
+3. 创新点：两篇论文的创新之处各是什么？
+4. 优缺点：两篇论文各自的优缺点是什么？
+5. 应用场景：两篇论文的应用场景有什么不同？
+
+请客观公正。"""
+
+KEY_POINTS_TASK = """任务：提取该论文的关键信息点，以列表形式返回。
+
+请提取以下类型的关键点：
+1. 研究问题
+2. 主要方法
+3. 创新点
+4. 实验结果
+5. 应用价值
+
+每个关键点用一句话概括，每行一个。"""
+
+def _paper_block(title: str, abstract: str, label: str = "") -> str:
+    """格式化论文内容（位于任务要求之前，作为稳定前缀的一部分）"""
+    return f"论文{label}标题: {title}\n论文{label}摘要: {abstract}"
+
+def _build_messages(paper: str, task: str, question: str = "") -> List[BaseMessage]:
+    """按稳定前缀优先的顺序组装消息：系统提示词、论文内容、任务要求、用户问题"""
+    content = f"{paper}\n\n{task}"
+    if question:
+        content += f"\n\n用户问题: {question}"
+    return [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=content)]
+
+def _has_key_points(content: str) -> bool:
+    """关键点输出校验：至少包含三行非空内容"""
+    return len([line for line in content.split('\n') if line.strip()]) >= 3
+
 class SummarizeService:
     """LLM总结服务类"""
     
-    def __init__(self, model_name: str = "deepseek-chat", temperature: float = 0.3):
+    def __init__(self, model_name: Optional[str] = None, temperature: Optional[float] = None,
+                 router: Optional[ModelRouter] = None, hedge: Optional[bool] = None):
         """
         初始化总结服务
         
         Args:
-            model_name: 使用的LLM模型名称
-            temperature: 生成温度参数
+            model_name: 使用的LLM模型名称，None表示按任务路由表选择
+            temperature: 生成温度参数，None表示使用路由表中的温度
+            router: 模型路由，默认使用全局实例
+            hedge: 是否对冲慢请求，None表示使用全局对冲配置
         """
         self.model_name = model_name
         self.temperature = temperature
-        llm_config = config.get_llm_config("deepseek")
-        self.llm = ChatOpenAI(
-            model=model_name,
-            temperature=temperature,
-            base_url=llm_config["base_url"],
-            api_key=llm_config["api_key"]
-        )
+        self.router = router or model_router
+        self.hedge = hedge
     
     def summarize_research_contributions(self, abstract: str, title: str = "") -> str:
         """
@@ -48,33 +122,15 @@ class SummarizeService:
         Returns:
             str: 研究贡献总结
         """
-        system_prompt = """你是一个专业的科研论文分析专家。请分析给定的论文摘要，总结该论文的主要研究贡献。
-
-请从以下角度进行分析：
-1. 研究问题：该论文要解决什么问题？
-2. 主要贡献：论文提出了什么新的方法、技术或见解？
-3. 创新点：相比现有工作，该论文的创新之处在哪里？
-4. 技术方法：论文采用了什么技术方法？
-5. 实验结果：论文的主要实验结果或结论是什么？
-
-请用中文回答，结构清晰，重点突出。"""
-        
-        user_prompt = f"""
-论文标题: {title}
-论文摘要: {abstract}
-
-请总结该论文的研究贡献。
-"""
+        messages = _build_messages(_paper_block(title, abstract), CONTRIBUTIONS_TASK)
         
         try:
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_prompt)
-            ]
-            
-            response = self.llm.invoke(messages)
+            response = self.router.complete("summarize.contributions", messages, model=self.model_name,
+                                            temperature=self.temperature, hedge=self.hedge)
             return response.content
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"总结研究贡献时发生错误: {e}")
             return f"总结失败: {str(e)}"
@@ -90,33 +146,15 @@ class SummarizeService:
         Returns:
             str: 技术方法总结
         """
-        system_prompt = """你是一个机器学习和技术专家。请分析给定的论文摘要，总结该论文的技术方法。
-
-请从以下角度进行分析：
-1. 技术框架：论文使用了什么技术框架或架构？
-2. 算法方法：论文提出了什么算法或方法？
-3. 实现细节：论文的技术实现有什么特点？
-4. 技术优势：该技术方法相比传统方法有什么优势？
-5. 应用场景：该技术方法适用于什么场景？
-
-请用中文回答，技术细节要准确，结构清晰。"""
-        
-        user_prompt = f"""
-论文标题: {title}
-论文摘要: {abstract}
-
-请总结该论文的技术方法。
-"""
+        messages = _build_messages(_paper_block(title, abstract), METHODS_TASK)
         
         try:
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_prompt)
-            ]
-            
-            response = self.llm.invoke(messages)
+            response = self.router.complete("summarize.methods", messages, model=self.model_name,
+                                            temperature=self.temperature, hedge=self.hedge)
             return response.content
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"总结技术方法时发生错误: {e}")
             return f"总结失败: {str(e)}"
@@ -133,34 +171,15 @@ class SummarizeService:
         Returns:
             str: 问题回答
         """
-        system_prompt = """你是一个专业的科研论文问答专家。请基于给定的论文摘要，回答用户提出的问题。
-
-回答要求：
-1. 基于论文摘要中的信息进行回答
-2. 如果摘要中没有相关信息，请明确说明
-3. 回答要准确、客观、专业
-4. 用中文回答，语言清晰易懂
-
-请确保回答基于论文内容，不要添加论文中没有的信息。"""
-        
-        user_prompt = f"""
-论文标题: {title}
-论文摘要: {abstract}
-
-用户问题: {question}
-
-请基于论文摘要回答上述问题。
-"""
+        messages = _build_messages(_paper_block(title, abstract), QUESTION_TASK, question)
         
         try:
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_prompt)
-            ]
-            
-            response = self.llm.invoke(messages)
+            response = self.router.complete("summarize.question", messages, model=self.model_name,
+                                            temperature=self.temperature, hedge=self.hedge)
             return response.content
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"回答问题时发生错误: {e}")
             return f"回答失败: {str(e)}"
@@ -178,36 +197,18 @@ class SummarizeService:
         Returns:
             str: 论文比较分析
         """
-        system_prompt = """你是一个专业的论文比较分析专家。请比较分析两篇论文的异同点。
-
-请从以下角度进行比较：
-1. 研究问题：两篇论文要解决的问题是否相同？
-2. 技术方法：两篇论文采用的技术方法有什么不同？
-3. 创新点：两篇论文的创新之处各是什么？
-4. 优缺点：两篇论文各自的优缺点是什么？
-5. 应用场景：两篇论文的应用场景有什么不同？
-
-请用中文回答，客观公正，结构清晰。"""
-        
-        user_prompt = f"""
-论文A标题: {title1}
-论文A摘要: {abstract1}
-
-论文B标题: {title2}
-论文B摘要: {abstract2}
-
-请比较分析这两篇论文的异同点。
-"""
+        papers = f"{_paper_block(title1, abstract1, 'A')}\n\n{_paper_block(title2, abstract2, 'B')}"
+        messages = _build_messages(papers, COMPARE_TASK)
         
         try:
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_prompt)
-            ]
-            
-            response = self.llm.invoke(messages)
+            # 空输出时按路由升级模型重试
+            response = self.router.complete("summarize.compare", messages, model=self.model_name,
+                                            temperature=self.temperature, hedge=self.hedge,
+                                            validate=lambda content: bool(content.strip()))
             return response.content
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"比较论文时发生错误: {e}")
             return f"比较失败: {str(e)}"
@@ -223,35 +224,18 @@ class SummarizeService:
         Returns:
             List[str]: 关键点列表
         """
-        system_prompt = """你是一个论文分析专家。请从给定的论文摘要中提取关键信息点。
-
-请提取以下类型的关键点：
-1. 研究问题
-2. 主要方法
-3. 创新点
-4. 实验结果
-5. 应用价值
-
-每个关键点用一句话概括，用中文表达。"""
-        
-        user_prompt = f"""
-论文标题: {title}
-论文摘要: {abstract}
-
-请提取该论文的关键信息点，以列表形式返回。
-"""
+        messages = _build_messages(_paper_block(title, abstract), KEY_POINTS_TASK)
         
         try:
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_prompt)
-            ]
-            
-            response = self.llm.invoke(messages)
+            response = self.router.complete("summarize.key_points", messages, model=self.model_name,
+                                            temperature=self.temperature, hedge=self.hedge,
+                                            validate=_has_key_points)
             # 将响应按行分割，过滤空行
             key_points = [point.strip() for point in response.content.split('\n') if point.strip()]
             return key_points
             
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"生成关键点时发生错误: {e}")
             return [f"生成失败: {str(e)}"]
@@ -0,0 +1,58 @@
+"""
+token估算模块
+
+在不依赖分词器的情况下快速估算文本的token数，用于给提示词中的对话历史、
+注入的上下文等区域设置硬性token预算。估算偏保守（宁多勿少）：
+中日韩字符按每字1个token计算，其余字符按每3个字符1个token计算。
+"""
+
+import re
+
+_CJK = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 2) // 3
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head", marker: str = "...") -> str:
+    """
+    截断文本使其不超过token预算
+
+    Args:
+        text: 文本
+        max_tokens: token预算
+        keep: 保留开头（head）还是结尾（tail）
+        marker: 截断处的标记
+
+    Returns:
+        str: 截断后的文本（未超出预算时原样返回）
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    # 二分查找能放进预算的最长前缀/后缀
+    budget = max_tokens - estimate_tokens(marker)
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        part = text[:middle] if keep == "head" else text[-middle:]
+        if estimate_tokens(part) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    if low == 0:
+        return ""
+    return text[:low] + marker if keep == "head" else marker + text[-low:]
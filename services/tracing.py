@@ -0,0 +1,280 @@
+"""
+调用追踪模块
+
+记录一次Agent运行中每个步骤的耗时：LLM调用（输入/输出token、首token时间、延迟）、
+工具调用（耗时、是否命中备忘录、输入输出大小）、Arxiv请求与结果解析。
+跨度（span）通过调用上下文传递父子关系，经carry_tool_state提交到线程池的任务同样挂在当前运行之下；
+没有父跨度时新建一条追踪（如后台摘要、推测预取）。
+
+结束的跨度写入导出器：JSONL（每行一个跨度）或OpenTelemetry OTLP/JSON（每行一个ExportTraceServiceRequest，
+可由OpenTelemetry Collector的otlpjsonfile接收器读取）。汇总分位数见 trace_report.py。
+"""
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional
+
+from config import TRACING_CONFIG
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 跨度类型
+KIND_AGENT = "agent"
+KIND_LLM = "llm"
+KIND_TOOL = "tool"
+KIND_ARXIV = "arxiv"
+
+@dataclass
+class Span:
+    """一个计时步骤"""
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_time: float = 0.0         # 开始时间（Unix时间戳，秒）
+    duration: float = 0.0           # 耗时（秒）
+    status: str = "ok"              # ok 或 error
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attributes):
+        """设置属性（值为None的属性忽略）"""
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可JSON序列化的字典"""
+        return asdict(self)
+
+class _NoopSpan:
+    """追踪关闭时使用的空跨度"""
+
+    def set(self, **attributes):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class _TraceBuffer:
+    """一条追踪内已结束的跨度（供运行结束时汇总耗时分布）"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def snapshot(self) -> List[Span]:
+        with self._lock:
+            return list(self.spans)
+
+# 当前调用上下文中正在进行的跨度及其所属追踪
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+
+class JsonlExporter:
+    """把跨度逐行写入JSONL文件"""
+
+    def __init__(self, path: str):
+        """
+        初始化导出器
+
+        Args:
+            path: 输出文件路径（追加写入，目录不存在时自动创建）
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def format(self, span: Span) -> str:
+        """单个跨度的输出行"""
+        return json.dumps(span.to_dict(), ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def export(self, span: Span):
+        """写入一个结束的跨度"""
+        line = self.format(span)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        """关闭文件"""
+        with self._lock:
+            self._file.close()
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """属性值的OTLP AnyValue表示"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def to_otlp(spans: List[Dict[str, Any]], service_name: str = "scholar-agent") -> Dict[str, Any]:
+    """
+    把跨度转换为OTLP/JSON格式的ExportTraceServiceRequest
+
+    Args:
+        spans: Span.to_dict() 格式的跨度列表
+        service_name: 资源属性service.name
+
+    Returns:
+        Dict[str, Any]: 可直接POST到Collector /v1/traces 的请求体
+    """
+    otlp_spans = []
+    for span in spans:
+        start_ns = int(span["start_time"] * 1e9)
+        attributes = dict(span.get("attributes") or {}, **{"scholar.kind": span["kind"]})
+        item = {
+            "traceId": span["trace_id"],
+            "spanId": span["span_id"],
+            "name": span["name"],
+            "kind": 3 if span["kind"] in (KIND_LLM, KIND_ARXIV) else 1,  # CLIENT / INTERNAL
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(span["duration"] * 1e9)),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+            "status": {"code": 2, "message": span.get("error") or ""} if span.get("status") == "error" else {"code": 1}
+        }
+        if span.get("parent_id"):
+            item["parentSpanId"] = span["parent_id"]
+        otlp_spans.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "scholar_agent.tracing"}, "spans": otlp_spans}]
+        }]
+    }
+
+class OtlpJsonExporter(JsonlExporter):
+    """把跨度以OTLP/JSON格式逐行写入文件（每行一个ExportTraceServiceRequest）"""
+
+    def format(self, span: Span) -> str:
+        return json.dumps(to_otlp([span.to_dict()]), ensure_ascii=False, separators=(",", ":"))
+
+class Tracer:
+    """跨度的创建与导出"""
+
+    def __init__(self, enabled: bool = True, exporters: Optional[List[JsonlExporter]] = None):
+        """
+        初始化追踪器
+
+        Args:
+            enabled: 是否记录跨度（关闭时span返回空跨度，几乎没有开销）
+            exporters: 结束的跨度写入的导出器
+        """
+        self.enabled = enabled
+        self.exporters: List[JsonlExporter] = list(exporters or [])
+        self.exported = 0
+        self.export_errors = 0
+
+    def add_exporter(self, exporter: JsonlExporter):
+        """添加导出器"""
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def span(self, name: str, kind: str, **attributes):
+        """
+        在with块内记录一个跨度（块内抛出的异常记为error后继续抛出）
+
+        Args:
+            name: 跨度名称，如 llm:agent.react、tool:search_arxiv
+            kind: 跨度类型（agent、llm、tool、arxiv）
+            **attributes: 初始属性
+
+        Yields:
+            Span: 当前跨度，可在块内用set补充属性
+        """
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current.get()
+        if parent is None:
+            trace_id, parent_id, buffer = secrets.token_hex(16), None, _TraceBuffer()
+        else:
+            trace_id, parent_id, buffer = parent[0].trace_id, parent[0].span_id, parent[1]
+        span = Span(name=name, kind=kind, trace_id=trace_id, span_id=secrets.token_hex(8),
+                    parent_id=parent_id, start_time=time.time())
+        span.set(**attributes)
+        token = _current.set((span, buffer))
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current.reset(token)
+            buffer.add(span)
+            self._export(span)
+
+    def _export(self, span: Span):
+        """写入各导出器（导出失败只记录日志）"""
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+                self.exported += 1
+            except Exception as e:
+                self.export_errors += 1
+                logger.warning(f"导出追踪跨度失败: {e}")
+
+    def current_span(self):
+        """当前调用上下文中正在进行的跨度，没有时返回空跨度"""
+        current = _current.get()
+        return current[0] if current is not None else _NOOP_SPAN
+
+    def trace_spans(self) -> List[Span]:
+        """当前追踪中已结束的跨度"""
+        current = _current.get()
+        return current[1].snapshot() if current is not None else []
+
+def breakdown(spans: List[Span]) -> Dict[str, Dict[str, Any]]:
+    """
+    按跨度类型汇总次数与耗时
+
+    Args:
+        spans: 一条追踪中已结束的跨度
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 类型到 {count, seconds, errors} 的映射
+    """
+    result: Dict[str, Dict[str, Any]] = {}
+    for span in spans:
+        entry = result.setdefault(span.kind, {"count": 0, "seconds": 0.0, "errors": 0})
+        entry["count"] += 1
+        entry["seconds"] += span.duration
+        entry["errors"] += span.status == "error"
+    for entry in result.values():
+        entry["seconds"] = round(entry["seconds"], 4)
+    return result
+
+def _create_tracer() -> Tracer:
+    """按配置创建全局追踪器"""
+    tracer = Tracer(enabled=TRACING_CONFIG["enabled"])
+    for path, exporter_class in ((TRACING_CONFIG["jsonl_path"], JsonlExporter),
+                                 (TRACING_CONFIG["otlp_path"], OtlpJsonExporter)):
+        if tracer.enabled and path:
+            try:
+                tracer.add_exporter(exporter_class(path))
+            except OSError as e:
+                logger.warning(f"无法打开追踪输出文件 {path}: {e}")
+    return tracer
+
+# 创建全局实例
+tracer = _create_tracer()
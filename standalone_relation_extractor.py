@@ -1,38 +1,77 @@
 #!/usr/bin/env python3
 """
 独立的关系抽取和描述生成脚本
-可以直接运行，无需依赖其他文件
-支持OpenAI和DeepSeek API
+可以直接运行，LLM调用经由 services/llm_client 的端点池
+支持OpenAI和DeepSeek API，支持多个密钥负载均衡
 """
 
 import asyncio
 import json
 import os
-from typing import Dict, Any, List
-import openai
+import sys
+from typing import Dict, Any, List, Optional
+
+from services.llm_client import LLMClient
+from services.routing import ModelRouter
+from services.packing import PromptPacker, strip_code_fence
+from config import LLM_PACKING_CONFIG, MODEL_TIERS
+from services.circuit_breaker import CircuitOpenError
+from services.metering import BudgetExceeded
+
+def _json_validator(expected_type: type):
+    """生成输出校验函数：清理代码块后能解析为指定类型的JSON"""
+    def validate(content: str) -> bool:
+        try:
+            return isinstance(json.loads(strip_code_fence(content)), expected_type)
+        except json.JSONDecodeError:
+            return False
+    return validate
 
 class StandaloneRelationExtractor:
     """独立的关系抽取器"""
     
-    def __init__(self, api_key: str = "", api_type: str = "deepseek"):
+    def __init__(self, api_key: str = "", api_type: str = "deepseek", client: Optional[LLMClient] = None,
+                 packing: Optional[bool] = None):
         """
         初始化抽取器
-        api_key: API密钥
+        api_key: API密钥，多个密钥用逗号分隔时自动组成端点池
         api_type: API类型 ("openai" 或 "deepseek")
+        client: 共享的LLM调用客户端（多端点池），传入时忽略api_key和api_type
+        packing: 是否把关系描述和表达变体打包为多条目请求，None表示使用config.LLM_PACKING_CONFIG
+        
+        各步骤的模型、max_tokens和温度由模型路由表（config.MODEL_ROUTES中的relation.*）决定，
+        JSON输出无法解析时按路由升级模型重试
         """
         self.api_type = api_type
+        tiers = None
         
-        if api_type == "deepseek":
+        if client is not None:
+            # 使用外部端点池，模型由各端点默认配置决定
+            self.client = client
+            self.model = None
+        elif api_type == "deepseek":
             # DeepSeek API配置
-            self.client = openai.AsyncOpenAI(
-                api_key=api_key,
-                base_url="https://api.deepseek.com/v1"
-            )
             self.model = "deepseek-chat"
+            self.client = LLMClient.from_api_key(api_key, "https://api.deepseek.com/v1",
+                                                 [self.model, "deepseek-reasoner"])
         else:
             # OpenAI API配置
-            self.client = openai.AsyncOpenAI(api_key=api_key)
             self.model = "gpt-3.5-turbo"
+            self.client = LLMClient.from_api_key(api_key, "https://api.openai.com/v1", self.model)
+            # 路由表的模型档位对应DeepSeek模型，OpenAI端点上所有档位都使用该模型
+            tiers = {tier: self.model for tier in MODEL_TIERS}
+        self.router = ModelRouter(self.client, tiers=tiers)
+        
+        if LLM_PACKING_CONFIG["enabled"] if packing is None else packing:
+            # 同一文档的多条关系共享上下文，打包后上下文只需发送一次
+            self.packer = PromptPacker(
+                self.router,
+                window_ms=LLM_PACKING_CONFIG["window_ms"],
+                max_items=LLM_PACKING_CONFIG["max_items"],
+                max_workers=LLM_PACKING_CONFIG["max_workers"]
+            )
+        else:
+            self.packer = None
     
     async def extract_entities(self, text: str) -> Dict[str, List[str]]:
         """抽取实体"""
@@ -66,25 +105,16 @@ class StandaloneRelationExtractor:
 """
         
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2000,
-                temperature=0.7
+            response = await self.router.acomplete(
+                "relation.entities",
+                [{"role": "user", "content": prompt}],
+                validate=_json_validator(dict)
             )
             
-            result = response.choices[0].message.content.strip()
+            result = response.content
             print(f"🔍 API返回的原始内容: {result[:200]}...")
             
-            # 清理Markdown代码块标记
-            if result.startswith("```json"):
-                result = result[7:]  # 移除 ```json
-            if result.startswith("```"):
-                result = result[3:]   # 移除 ```
-            if result.endswith("```"):
-                result = result[:-3]  # 移除结尾的 ```
-            
-            result = result.strip()
+            result = strip_code_fence(result)
             print(f"🔧 清理后的内容: {result[:200]}...")
             
             try:
@@ -95,6 +125,8 @@ class StandaloneRelationExtractor:
                 print(f"📝 完整返回内容: {result}")
                 return {}
                 
+        except (CircuitOpenError, BudgetExceeded):
+            raise
         except Exception as e:
             print(f"实体抽取失败: {e}")
             return {}
@@ -135,25 +167,16 @@ class StandaloneRelationExtractor:
 """
         
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2000,
-                temperature=0.7
+            response = await self.router.acomplete(
+                "relation.relations",
+                [{"role": "user", "content": prompt}],
+                validate=_json_validator(list)
             )
             
-            result = response.choices[0].message.content.strip()
+            result = response.content
             print(f"🔍 关系抽取API返回的原始内容: {result[:200]}...")
             
-            # 清理Markdown代码块标记
-            if result.startswith("```json"):
-                result = result[7:]  # 移除 ```json
-            if result.startswith("```"):
-                result = result[3:]   # 移除 ```
-            if result.endswith("```"):
-                result = result[:-3]  # 移除结尾的 ```
-            
-            result = result.strip()
+            result = strip_code_fence(result)
             print(f"🔧 关系抽取清理后的内容: {result[:200]}...")
             
             try:
@@ -164,6 +187,8 @@ class StandaloneRelationExtractor:
                 print(f"📝 完整返回内容: {result}")
                 return []
                 
+        except (CircuitOpenError, BudgetExceeded):
+            raise
         except Exception as e:
             print(f"关系抽取失败: {e}")
             return []
@@ -173,27 +198,37 @@ class StandaloneRelationExtractor:
         relations: List[Dict[str, str]], 
         context: str = ""
     ) -> List[Dict[str, Any]]:
-        """生成关系描述"""
-        descriptions = []
+        """生成关系描述（启用打包时各关系并发提交，由打包器合并为多条目请求）"""
+        valid_relations = [
+            (relation.get("source", ""), relation.get("target", ""), relation.get("relation_type", ""))
+            for relation in relations
+        ]
+        valid_relations = [relation for relation in valid_relations if all(relation)]
         
-        for relation in relations:
-            source = relation.get("source", "")
-            target = relation.get("target", "")
-            relation_type = relation.get("relation_type", "")
-            
-            if not all([source, target, relation_type]):
-                continue
-            
-            # 生成详细描述
-            detailed_desc = await self._generate_detailed_description(
-                source, target, relation_type, context
-            )
-            
-            # 生成表达变体
-            variations = await self._generate_description_variations(
-                source, target, relation_type, context
-            )
-            
+        if self.packer is not None:
+            results = await asyncio.gather(*[
+                asyncio.gather(
+                    self._generate_detailed_description(source, target, relation_type, context),
+                    self._generate_description_variations(source, target, relation_type, context)
+                )
+                for source, target, relation_type in valid_relations
+            ])
+        else:
+            results = []
+            for source, target, relation_type in valid_relations:
+                # 生成详细描述
+                detailed_desc = await self._generate_detailed_description(
+                    source, target, relation_type, context
+                )
+                
+                # 生成表达变体
+                variations = await self._generate_description_variations(
+                    source, target, relation_type, context
+                )
+                results.append((detailed_desc, variations))
+        
+        descriptions = []
+        for (source, target, relation_type), (detailed_desc, variations) in zip(valid_relations, results):
             descriptions.append({
                 "source": source,
                 "target": target,
@@ -213,6 +248,7 @@ class StandaloneRelationExtractor:
         context: str
     ) -> str:
         """使用LLM生成详细的关系描述"""
+        relation_text = f"源实体：{source}\n目标实体：{target}\n关系类型：{relation_type}"
         prompt = f"""
 请为以下实体关系生成一个详细、完整的自然语言描述句子。
 
@@ -231,14 +267,28 @@ class StandaloneRelationExtractor:
 """
         
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=200,
-                temperature=0.7
+            if self.packer is not None:
+                instruction = f"""请为每个实体关系生成一个详细、完整的自然语言描述句子。
+
+上下文：{context}
+
+要求：
+1. 生成一个完整的句子
+2. 包含技术细节和具体描述
+3. 语言自然流畅
+4. 体现实体间的具体关系
+
+结果为描述句子字符串。"""
+                return await self.packer.acomplete("relation.description", instruction, relation_text, prompt)
+            
+            response = await self.router.acomplete(
+                "relation.description",
+                [{"role": "user", "content": prompt}]
             )
             
-            return response.choices[0].message.content.strip()
+            return response.content
+        except (CircuitOpenError, BudgetExceeded):
+            raise
         except Exception as e:
             print(f"生成详细描述失败: {e}")
             return f"{source}与{target}之间存在{relation_type}关系"
@@ -251,6 +301,7 @@ class StandaloneRelationExtractor:
         context: str
     ) -> List[str]:
         """生成多种表达方式"""
+        relation_text = f"源实体：{source}\n目标实体：{target}\n关系类型：{relation_type}"
         prompt = f"""
 请为以下实体关系生成3-5种不同的自然语言表达方式。
 
@@ -270,20 +321,37 @@ class StandaloneRelationExtractor:
 """
         
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=300,
-                temperature=0.8
-            )
+            if self.packer is not None:
+                instruction = f"""请为每个实体关系生成3-5种不同的自然语言表达方式。
+
+上下文：{context}
+
+要求：
+1. 每种表达都是完整的句子
+2. 表达方式要多样化
+3. 包含不同的句式结构
+4. 语言自然流畅
+
+结果为JSON字符串数组，例如：["描述1", "描述2", "描述3"]"""
+                content = await self.packer.acomplete("relation.variations", instruction, relation_text, prompt,
+                                                      validate=_json_validator(list))
+            else:
+                response = await self.router.acomplete(
+                    "relation.variations",
+                    [{"role": "user", "content": prompt}],
+                    validate=_json_validator(list)
+                )
+                content = response.content
             
-            result = response.choices[0].message.content.strip()
+            result = strip_code_fence(content)
             try:
                 variations = json.loads(result)
                 return variations if isinstance(variations, list) else []
             except json.JSONDecodeError:
                 return []
                 
+        except (CircuitOpenError, BudgetExceeded):
+            raise
         except Exception as e:
             print(f"生成表达变体失败: {e}")
             return []
@@ -340,6 +408,22 @@ class StandaloneRelationExtractor:
                 }
             }
             
+        except CircuitOpenError as e:
+            # LLM端点全部熔断，快速失败，便于批处理稍后恢复
+            print(f"处理失败（熔断）: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "circuit_open": True
+            }
+        except BudgetExceeded as e:
+            # 批处理任务用完预算，快速失败，由批处理暂停并保存进度
+            print(f"处理失败（超出预算）: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "budget_exceeded": True
+            }
         except Exception as e:
             print(f"处理失败: {e}")
             return {
@@ -351,12 +435,12 @@ async def main():
     """主函数"""
     print("🔧 开始初始化...")
     
-    # 使用DeepSeek API密钥
-    api_key = "sk-5783900819b04bee9bc177f7db24edac"
+    # 使用DeepSeek API密钥（DEEPSEEK_API_KEYS可用逗号分隔多个密钥）
+    api_key = os.getenv("DEEPSEEK_API_KEYS") or os.getenv("DEEPSEEK_API_KEY")
     
     if not api_key:
-        print("请设置API密钥")
-        return
+        print("请设置DEEPSEEK_API_KEYS或DEEPSEEK_API_KEY环境变量")
+        sys.exit(1)
     
     print(f"✅ API密钥已设置: {api_key[:10]}...")
     
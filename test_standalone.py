@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 测试独立关系抽取脚本
+
+设置SCHOLAR_REPLAY=replay（及SCHOLAR_CASSETTE）时回放录制的LLM响应，不需要网络和API密钥；
+SCHOLAR_REPLAY=record时实时调用并录制，见 services/replay.py。
 """
 
 import asyncio
@@ -13,17 +16,28 @@ print(f"当前工作目录: {os.getcwd()}")
 
 try:
     from standalone_relation_extractor import StandaloneRelationExtractor
+    from services.replay import install_from_config
     print("✅ 成功导入 StandaloneRelationExtractor")
 except ImportError as e:
     print(f"❌ 导入失败: {e}")
     sys.exit(1)
 
+# 按SCHOLAR_REPLAY启用录制回放
+replay = install_from_config()
+
+def get_api_key() -> str:
+    """API密钥；只回放录制时不访问网络，使用占位密钥"""
+    api_key = os.getenv("DEEPSEEK_API_KEY", "")
+    if not api_key and replay is not None and replay.cassette.mode == "replay":
+        api_key = "replay"
+    return api_key
+
 async def test_basic_functionality():
     """测试基本功能"""
     print("=== 测试独立关系抽取脚本 ===")
     
     # 检查API密钥
-    api_key = os.getenv("DEEPSEEK_API_KEY", "sk-5783900819b04bee9bc177f7db24edac")
+    api_key = get_api_key()
     if not api_key:
         print("❌ 错误：请设置DEEPSEEK_API_KEY环境变量")
         return False
@@ -86,7 +100,7 @@ async def test_custom_text():
     """测试自定义文本"""
     print("\n=== 测试自定义文本 ===")
     
-    api_key = os.getenv("DEEPSEEK_API_KEY", "sk-5783900819b04bee9bc177f7db24edac")
+    api_key = get_api_key()
     if not api_key:
         print("❌ 错误：请设置DEEPSEEK_API_KEY环境变量")
         return False
@@ -144,12 +158,16 @@ async def main():
     if basic_success and custom_success:
         print("🎉 所有测试通过！脚本可以正常使用。")
         print("\n💡 使用建议：")
-        print("   1. 设置OPENAI_API_KEY环境变量")
+        print("   1. 设置DEEPSEEK_API_KEY环境变量")
         print("   2. 运行 python standalone_relation_extractor.py")
         print("   3. 修改脚本中的example_text进行自定义测试")
     else:
         print("❌ 部分测试失败，请检查配置和网络连接。")
     
+    if replay is not None:
+        replay.save()
+        print(f"\n📼 录制回放: {replay.get_stats()['llm']}")
+    
     print("\n📚 更多信息请查看 README_standalone.md")
 
 if __name__ == "__main__":
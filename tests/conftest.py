@@ -0,0 +1,11 @@
+"""
+单元测试公共配置
+
+测试只覆盖不访问网络的纯逻辑，运行方式：在仓库根目录执行 python -m pytest tests
+"""
+
+import os
+import sys
+
+# 测试以仓库根目录为导入根（与各脚本的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
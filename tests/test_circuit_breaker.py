@@ -0,0 +1,89 @@
+"""熔断器（CircuitBreaker）状态转换的单元测试"""
+
+from unittest import mock
+
+import pytest
+
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+class Clock:
+    """可手动推进的 time.monotonic 替身"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    with mock.patch("services.circuit_breaker.time.monotonic", clock):
+        yield clock
+
+def fail(breaker, times):
+    for _ in range(times):
+        with pytest.raises(RuntimeError):
+            breaker.call(mock.Mock(side_effect=RuntimeError("boom")))
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("llm", failure_threshold=3, recovery_timeout=30)
+    fail(breaker, 2)
+    # 成功会清零连续失败计数
+    assert breaker.call(lambda: "ok") == "ok"
+    fail(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    fail(breaker, 1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.open_count == 1
+
+    func = mock.Mock()
+    clock.now += 10
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.call(func)
+    func.assert_not_called()
+    assert excinfo.value.retry_after == pytest.approx(20)
+    assert breaker.rejected_count == 1
+    assert not breaker.can_attempt()
+
+def test_half_open_success_closes(clock):
+    breaker = CircuitBreaker("llm", failure_threshold=1, recovery_timeout=30, half_open_max_calls=1)
+    fail(breaker, 1)
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.retry_after() == 0.0
+
+    # 半开状态只放行一个试探请求
+    breaker.before_call()
+    assert not breaker.can_attempt()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.can_attempt()
+
+def test_half_open_failure_reopens(clock):
+    breaker = CircuitBreaker("arxiv", failure_threshold=5, recovery_timeout=30)
+    fail(breaker, 5)
+    clock.now += 31
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    # 半开状态下一次失败即重新打开，并重新计算冷却期
+    fail(breaker, 1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.open_count == 2
+    assert breaker.retry_after() == pytest.approx(30)
+
+def test_trip_and_reset(clock):
+    breaker = CircuitBreaker("llm")
+    breaker.trip()
+    breaker.trip()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.open_count == 1
+
+    breaker.reset()
+    assert breaker.state == CircuitBreaker.CLOSED
+    stats = breaker.get_stats()
+    assert (stats["state"], stats["retry_after"]) == ("closed", 0.0)
@@ -0,0 +1,44 @@
+"""论文上下文选择（PaperContextSelector）的单元测试"""
+
+from agent.context_selector import PaperContextSelector
+from agent.paper_registry import PaperRegistry
+from services.search import PaperInfo
+
+def make_paper(i, title, abstract=""):
+    return PaperInfo(title=title, authors=["A. Author"], abstract=abstract, arxiv_id=f"2304.{i:05d}v1",
+                     published_date="2023-04-05", categories=["cs.CV"], pdf_url="")
+
+def make_registry():
+    registry = PaperRegistry(fetch_missing=False, max_papers=3)
+    registry.register_results([
+        make_paper(0, "Segment Anything", "promptable segmentation model and dataset"),
+        make_paper(1, "Attention Is All You Need", "transformer architecture based on attention"),
+        make_paper(2, "Deep Residual Learning", "residual networks for image recognition")
+    ])
+    return registry
+
+def titles(papers):
+    return [paper.title for paper in papers]
+
+def test_explicit_references_come_first_then_lexical_matches():
+    selector = PaperContextSelector(make_registry(), top_k=2, recency_weight=0.0)
+    selected, total = selector.select("论文3和transformer attention有什么关系")
+    assert total == 3
+    assert titles(selected) == ["Deep Residual Learning", "Attention Is All You Need"]
+
+def test_lexical_scores_rank_by_relevance():
+    selector = PaperContextSelector(make_registry())
+    papers = selector.registry.papers()
+    scores = selector._lexical_scores("segmentation model", papers)
+    assert scores[0] == 1.0
+    assert scores[1] == scores[2] == 0.0
+    assert selector._lexical_scores("的", papers) == [0.0, 0.0, 0.0]
+
+def test_selecting_context_does_not_change_eviction_order():
+    registry = make_registry()
+    selector = PaperContextSelector(registry)
+    selector.select("总结论文1和2304.00001")
+
+    registry.register(make_paper(3, "Vision Transformer"))
+    # 论文0仍是最久未使用的论文，被淘汰
+    assert titles(registry.papers()) == ["Attention Is All You Need", "Deep Residual Learning", "Vision Transformer"]
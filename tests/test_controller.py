@@ -0,0 +1,57 @@
+"""Agent会话（ScholarAgent）的单元测试"""
+
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
+from agent.controller import ScholarAgent
+from agent.paper_registry import PaperRegistry
+from agent.tools import ToolState
+from services.search import PaperInfo
+
+PAPER = PaperInfo(title="Segment Anything", authors=["Alexander Kirillov"], abstract="We introduce SAM.",
+                  arxiv_id="2304.02643v1", published_date="2023-04-05", categories=["cs.CV"],
+                  pdf_url="http://arxiv.org/pdf/2304.02643v1")
+
+class CallbackOnlyExecutor:
+    """只经回调报告工具调用、返回值不含intermediate_steps的ReAct执行器"""
+
+    def __init__(self, state: ToolState):
+        self.state = state
+
+    def invoke(self, inputs, config=None):
+        # 与AgentExecutor一样以关键字参数传入run_id，所有回调（含用量统计）都会收到
+        action = SimpleNamespace(tool="search_arxiv", tool_input="title:Segment Anything")
+        for callback in config["callbacks"]:
+            callback.on_agent_action(action, run_id=uuid.uuid4())
+        self.state.registry.register_results([PAPER])
+        for callback in config["callbacks"]:
+            callback.on_tool_end("1. Segment Anything [2304.02643]", run_id=uuid.uuid4())
+        return {"output": "找到1篇论文"}
+
+def make_agent(prefetch: bool) -> ScholarAgent:
+    """创建使用假引擎的react模式会话"""
+    state = ToolState(registry=PaperRegistry(fetch_missing=False))
+    engine = SimpleNamespace(
+        model_name="deepseek-chat",
+        temperature=0.3,
+        scholar_tools=mock.Mock(new_state=mock.Mock(return_value=state)),
+        agent_executor=CallbackOnlyExecutor(state),
+        prefetcher=mock.Mock(top_n=1),
+        intent_router=None
+    )
+    return ScholarAgent(mode="react", fast_path=False, engine=engine, prefetch=prefetch)
+
+def test_react_search_turn_reports_tools_and_schedules_prefetch():
+    agent = make_agent(prefetch=True)
+    result = agent.run("请搜索论文 Segment Anything", deadline=0)
+
+    assert result["success"]
+    assert result["tools_used"] == ["search_arxiv"]
+    agent.engine.prefetcher.schedule.assert_called_once_with(agent.tool_state, [PAPER])
+
+def test_react_search_turn_without_prefetch_does_not_schedule():
+    agent = make_agent(prefetch=False)
+    agent.run("请搜索论文 Segment Anything", deadline=0)
+
+    agent.engine.prefetcher.schedule.assert_not_called()
@@ -0,0 +1,57 @@
+"""意图快速通道（IntentRouter.classify）的单元测试"""
+
+from agent.intent_router import IntentRouter
+from agent.paper_registry import PaperRegistry
+from agent.tools import ScholarTools
+from services.search import PaperInfo
+
+def make_router():
+    registry = PaperRegistry(fetch_missing=False)
+    registry.register_results([PaperInfo(
+        title="Segment Anything", authors=["Alexander Kirillov"], abstract="SAM",
+        arxiv_id="2304.02643v1", published_date="2023-04-05", categories=["cs.CV"],
+        pdf_url="http://arxiv.org/pdf/2304.02643v1"
+    )])
+    return IntentRouter(ScholarTools(registry=registry))
+
+def test_search_requests():
+    router = make_router()
+    intent = router.classify("请搜索论文 Segment Anything")
+    assert (intent.name, intent.target, intent.search_type, intent.confidence) == \
+        ("search", "Segment Anything", "title", 1.0)
+
+    intent = router.classify("帮我检索关于图像分割的论文。")
+    assert (intent.name, intent.target, intent.search_type, intent.confidence) == \
+        ("search", "图像分割", "keywords", 0.9)
+
+    intent = router.classify("查找作者 Kirillov 的论文")
+    assert (intent.name, intent.target, intent.search_type) == ("search", "Kirillov", "author")
+
+def test_paper_requests():
+    router = make_router()
+    intent = router.classify("总结这篇论文的研究贡献")
+    assert (intent.name, intent.target) == ("contributions", "")
+
+    intent = router.classify("Segment Anything的技术方法是什么？")
+    assert (intent.name, intent.target) == ("methods", "Segment Anything")
+
+    intent = router.classify("生成论文2的关键点")
+    assert (intent.name, intent.target) == ("key_points", "论文2")
+
+    intent = router.classify("获取 2304.02643 的详细信息")
+    assert (intent.name, intent.target) == ("details", "2304.02643")
+
+def test_open_ended_and_compound_requests_fall_back():
+    router = make_router()
+    assert router.classify("比较论文1和论文2的方法") is None
+    assert router.classify("为什么这篇论文的方法有效") is None
+    assert router.classify("搜索关于图像分割的论文并总结第一篇") is None
+    assert router.classify("总结一下最近的研究进展") is None
+    assert router.classify("") is None
+    assert router.classify("搜索论文 A\n搜索论文 B") is None
+
+def test_mixed_intents_lower_confidence():
+    # 同时命中方法与关键点，需要多个工具，交给Agent
+    router = make_router()
+    assert router.classify("这篇论文的方法和关键点") is None
+    assert router.classify("这篇论文的方法要点") is None
@@ -0,0 +1,77 @@
+"""LLM端点池（EndpointPool）与客户端归还端点时结果记录的单元测试"""
+
+from types import SimpleNamespace
+from unittest import mock
+
+import openai
+import pytest
+
+import config
+from services.llm_client import LLMClient
+from services.llm_pool import EndpointConfig, EndpointPool, NoAvailableEndpointError
+
+def make_pool(**kwargs):
+    return EndpointPool([EndpointConfig("a", "http://a", "key")], **kwargs)
+
+def half_open(pool):
+    endpoint = pool.endpoints[0]
+    endpoint.breaker.trip()
+    endpoint.breaker._opened_at -= pool.eject_seconds
+    assert endpoint.breaker.state == "half_open"
+    return endpoint
+
+def test_abandoned_request_records_no_outcome():
+    pool = make_pool()
+    endpoint = pool.acquire()
+    pool.release(endpoint, success=None)
+    assert (endpoint.outstanding, endpoint.total_failures, list(endpoint.outcomes)) == (0, 0, [])
+    assert endpoint.breaker.success_count == endpoint.breaker.failure_count == 0
+
+def test_abandoned_probe_keeps_breaker_half_open_and_frees_the_slot():
+    pool = make_pool()
+    endpoint = half_open(pool)
+    assert pool.acquire() is endpoint
+    assert not endpoint.breaker.can_attempt()
+
+    pool.release(endpoint, success=None)
+    assert endpoint.breaker.state == "half_open"
+    assert pool.acquire() is endpoint
+    pool.release(endpoint, success=False)
+    assert endpoint.breaker.state == "open"
+
+def timing_out_client(pool):
+    client = LLMClient(pool=pool, request_timeout=60.0, hedging=mock.Mock())
+    create = mock.Mock(side_effect=openai.APITimeoutError(request=None))
+    client._sync_client = mock.Mock(return_value=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    return client
+
+def test_timeout_shortened_by_deadline_does_not_close_half_open_breaker():
+    pool = make_pool()
+    client = timing_out_client(pool)
+    endpoint = half_open(pool)
+
+    pool.acquire()
+    with pytest.raises(openai.APITimeoutError):
+        client._attempt_sync(endpoint, {"model": "deepseek-chat", "messages": [], "timeout": 5.0}, "test")
+    assert endpoint.breaker.state == "half_open"
+    assert endpoint.total_failures == 0
+
+def test_full_timeout_counts_as_failure():
+    pool = make_pool(consecutive_failures=1)
+    client = timing_out_client(pool)
+    endpoint = pool.acquire()
+    with pytest.raises(openai.APITimeoutError):
+        client._attempt_sync(endpoint, {"model": "deepseek-chat", "messages": [], "timeout": 60.0}, "test")
+    assert endpoint.breaker.state == "open"
+    assert endpoint.total_failures == 1
+
+def test_no_api_key_means_no_endpoint_and_a_clear_error():
+    env = {"DEEPSEEK_API_KEYS": "", "OPENAI_API_KEY": "", "LOCAL_LLM_BASE_URL": "", "LLM_ENDPOINTS": ""}
+    with mock.patch.dict("os.environ", env), mock.patch("config.DEEPSEEK_API_KEY", ""):
+        assert config._load_llm_endpoints() == []
+    with mock.patch.dict("os.environ", dict(env, DEEPSEEK_API_KEYS="k1,k2")):
+        assert [ep["api_key"] for ep in config._load_llm_endpoints()] == ["k1", "k2"]
+
+    client = LLMClient(pool=EndpointPool([]), hedging=mock.Mock(enabled=False))
+    with pytest.raises(NoAvailableEndpointError, match="DEEPSEEK_API_KEY"):
+        client.complete([{"role": "user", "content": "你好"}])
@@ -0,0 +1,56 @@
+"""对话记忆（SummarizingMemory）token预算的单元测试"""
+
+from unittest import mock
+
+from agent.memory import SummarizingMemory
+from services.tokens import estimate_tokens
+
+def make_memory(max_tokens, summary="", turns=()):
+    memory = SummarizingMemory(router=mock.Mock(), max_tokens=max_tokens, background=False)
+    memory.summary = summary
+    memory.turns = list(turns)
+    return memory
+
+def test_within_budget_keeps_everything():
+    turns = [("问题一", "回答一"), ("问题二", "回答二")]
+    summary, kept = make_memory(1000, "此前讨论了SAM", turns)._budgeted()
+    assert summary == "此前讨论了SAM"
+    assert kept == turns
+
+def test_drops_oldest_turns_first():
+    turns = [(f"问题{i}", "回答" * 50) for i in range(5)]
+    memory = make_memory(250, "摘要", turns)
+    summary, kept = memory._budgeted()
+    assert summary == "摘要"
+    assert kept == turns[-2:]
+    assert memory.token_count() <= 250
+
+def test_truncates_summary_when_latest_turn_fills_budget():
+    memory = make_memory(120, "早先的摘要内容" * 40, [("旧问题", "旧回答" * 30), ("问题", "回答" * 30)])
+    summary, kept = memory._budgeted()
+    assert kept == [("问题", "回答" * 30)]
+    assert 0 < estimate_tokens(summary) < estimate_tokens(memory.summary)
+    assert memory.token_count() <= 120
+
+def test_oversized_single_turn_keeps_question_and_answer_tail():
+    answer = "开头" * 200 + "最终结论"
+    memory = make_memory(100, "", [("问题", answer)])
+    summary, kept = memory._budgeted()
+    assert summary == ""
+    (user, kept_answer), = kept
+    assert user == "问题"
+    assert kept_answer.endswith("最终结论")
+    assert len(kept_answer) < len(answer)
+    assert memory.token_count() <= 100
+
+def test_folded_turns_are_replaced_by_summary():
+    router = mock.Mock()
+    router.complete.return_value = mock.Mock(content="用户询问了论文0到论文1")
+    memory = SummarizingMemory(router=router, keep_turns=2, background=False)
+    for i in range(5):
+        memory.save_turn(f"问题{i}", f"回答{i}")
+
+    assert router.complete.call_args[0][0] == "memory.summarize"
+    assert memory.summary == "用户询问了论文0到论文1"
+    assert [user for user, _ in memory.turns] == ["问题2", "问题3", "问题4"]
+    assert memory.messages()[0] == {"role": "system", "content": "此前对话摘要：用户询问了论文0到论文1"}
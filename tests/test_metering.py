@@ -0,0 +1,81 @@
+"""用量计量（UsageMeter）预算的单元测试"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from batch_relation_extractor import BatchRelationExtractor
+from services.metering import UsageMeter, BudgetExceeded, meter_scope, usage_meter
+
+PRICING = {"deepseek-chat": {"input": 1.0, "cached_input": 0.5, "output": 2.0}}
+
+def record(meter: UsageMeter, prompt_tokens: int, completion_tokens: int):
+    meter.record("relation.entities", "deepseek-chat", "primary",
+                 {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+
+def test_token_budget_rejects_calls_once_used_up():
+    meter = UsageMeter(pricing=PRICING)
+    meter.set_budget("job-a", max_tokens=100)
+
+    with meter_scope(job="job-a"):
+        meter.check()
+        record(meter, 60, 30)
+        meter.check()
+        record(meter, 10, 0)
+        with pytest.raises(BudgetExceeded):
+            meter.check()
+
+    assert meter.rejected == 1
+    assert meter.get_job_usage("job-a")["exceeded"]
+
+def test_budget_applies_only_to_its_job():
+    meter = UsageMeter(pricing=PRICING)
+    meter.set_budget("job-a", max_cost=0.0001)
+
+    with meter_scope(job="job-a"):
+        record(meter, 100, 0)
+    with meter_scope(job="job-b"):
+        meter.check()
+    meter.check()
+    with meter_scope(job="job-a"), pytest.raises(BudgetExceeded):
+        meter.check()
+
+def test_clearing_budget_allows_calls_again():
+    meter = UsageMeter(pricing=PRICING)
+    meter.set_budget("job-a", max_tokens=10)
+    with meter_scope(job="job-a"):
+        record(meter, 10, 0)
+        meter.set_budget("job-a")
+        meter.check()
+
+def test_restored_usage_counts_towards_budget():
+    meter = UsageMeter(pricing=PRICING)
+    meter.set_budget("job-a", max_tokens=100)
+    meter.restore_job_usage("job-a", {"calls": 3, "prompt_tokens": 80, "completion_tokens": 20, "cost_usd": 0.1})
+
+    assert meter.get_job_usage("job-a")["total_tokens"] == 100
+    with meter_scope(job="job-a"), pytest.raises(BudgetExceeded):
+        meter.check()
+
+def test_batch_resume_keeps_job_and_budget(tmp_path):
+    client = SimpleNamespace(pool=[object()])
+    first = BatchRelationExtractor("", client=client, job="weekly", max_tokens=100, max_cost=0)
+    usage_meter.restore_job_usage("weekly", {"calls": 2, "prompt_tokens": 90, "completion_tokens": 10})
+    partial = {
+        "summary": first._build_summary([{"text": "a"}, {"text": "b"}], [{"success": True}], "1/2"),
+        "results": [{"success": True}],
+        "is_partial": True
+    }
+    partial_file = tmp_path / "batch_results_partial_1_of_2.json"
+    partial_file.write_text(json.dumps(partial, ensure_ascii=False), encoding="utf-8")
+
+    # 模拟新进程中恢复：默认任务名称不同，计量器中没有此前的用量
+    usage_meter.restore_job_usage("weekly", {})
+    resumed = BatchRelationExtractor("", client=client, max_tokens=100, max_cost=0)
+    results, processed = resumed.load_partial_results(str(partial_file))
+
+    assert processed == 1
+    assert resumed.job == "weekly"
+    with meter_scope(job=resumed.job), pytest.raises(BudgetExceeded):
+        usage_meter.check()
@@ -0,0 +1,130 @@
+"""小任务打包（services/packing.py）的单元测试"""
+
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from services.deadline import Deadline, use_deadline, current_deadline
+from services.metering import UsageMeter, BudgetExceeded, meter_scope, current_labels, usage_meter
+from services.packing import PromptPacker, parse_packed_results, strip_code_fence
+
+def test_strip_code_fence():
+    assert strip_code_fence('```json\n[1, 2]\n```') == "[1, 2]"
+    assert strip_code_fence('```\n{"a": 1}\n```  ') == '{"a": 1}'
+    assert strip_code_fence(' [1] ') == "[1]"
+
+def test_parse_packed_results_by_id_and_position():
+    content = '```json\n[{"id": 2, "result": "第二"}, {"id": 1, "result": ["a", "b"]}, "第三"]\n```'
+    assert parse_packed_results(content, 3) == {1: '["a", "b"]', 2: "第二", 3: "第三"}
+
+def test_parse_packed_results_drops_invalid_entries():
+    content = json.dumps([{"id": 1, "result": None}, {"id": 5, "result": "越界"}, {"id": "2", "result": "非整数"},
+                          {"id": 3, "result": "有效"}], ensure_ascii=False)
+    assert parse_packed_results(content, 3) == {3: "有效"}
+
+def test_parse_packed_results_rejects_non_list_or_invalid_json():
+    assert parse_packed_results('{"id": 1, "result": "x"}', 1) == {}
+    assert parse_packed_results("抱歉，我无法完成", 2) == {}
+
+class RecordingRouter:
+    """记录每次调用所在上下文的假路由"""
+
+    def __init__(self, *contents: str):
+        self.contents = list(contents)
+        self.calls = []
+        self.meter = UsageMeter(pricing={"deepseek-chat": {"input": 1.0, "output": 2.0}})
+        self.lock = threading.Lock()
+
+    def resolve(self, task):
+        return SimpleNamespace(max_tokens=100)
+
+    def complete(self, task, messages, max_tokens=None, validate=None, **kwargs):
+        # 与LLMClient一样在调用上下文中记录用量
+        self.meter.record(task, "deepseek-chat", "fake", {"prompt_tokens": 101, "completion_tokens": 40})
+        with self.lock:
+            self.calls.append((task, current_deadline(), current_labels(), validate))
+            content = self.contents.pop(0) if len(self.contents) > 1 else self.contents[0]
+        return SimpleNamespace(content=content)
+
+def test_packed_call_runs_in_submitter_context():
+    router = RecordingRouter('[{"id": 1, "result": "甲"}, {"id": 2, "result": "乙"}]')
+    packer = PromptPacker(router, window_ms=1000, max_items=2)
+    deadline = Deadline(30)
+
+    with use_deadline(deadline), meter_scope(job="job-a", item=0):
+        first = packer.submit("relation.description", "描述关系", "A->B")
+    second = packer.submit("relation.description", "描述关系", "C->D")
+
+    assert (first.result(timeout=5), second.result(timeout=5)) == ("甲", "乙")
+    task, call_deadline, labels, _ = router.calls[0]
+    assert task == "relation.description.packed"
+    assert call_deadline is deadline
+    # 打包请求不归属于第一个条目，用量按条目拆分
+    assert labels == {}
+    job_a = router.meter.get_totals("job")["job-a"]
+    assert (job_a["calls"], job_a["prompt_tokens"], job_a["completion_tokens"]) == (1, 51, 20)
+    assert job_a["cost_usd"] == pytest.approx(181 / 2 / 1_000_000, abs=1e-6)
+    assert router.meter.totals.prompt_tokens == 101 and router.meter.totals.completion_tokens == 40
+
+def test_packed_usage_is_split_across_each_items_job():
+    router = RecordingRouter(json.dumps([{"id": i, "result": str(i)} for i in range(1, 5)]))
+    packer = PromptPacker(router, window_ms=1000, max_items=4)
+
+    submitted = []
+    for i in range(4):
+        with meter_scope(job=f"job-{i % 2}", item=i):
+            submitted.append(packer.submit("relation.description", "描述关系", f"条目{i}"))
+    assert [future.result(timeout=5) for future in submitted] == ["1", "2", "3", "4"]
+
+    jobs = router.meter.get_totals("job")
+    assert {job: usage["total_tokens"] for job, usage in jobs.items()} == {"job-0": 71, "job-1": 70}
+
+def test_items_over_budget_fail_before_the_packed_call():
+    usage_meter.set_budget("packing-over-budget", max_tokens=10)
+    usage_meter.restore_job_usage("packing-over-budget", {"prompt_tokens": 10})
+    try:
+        router = RecordingRouter(json.dumps([{"id": 1, "result": "甲"}, {"id": 2, "result": "乙"}]))
+        packer = PromptPacker(router, window_ms=1000, max_items=3)
+        with meter_scope(job="packing-over-budget"):
+            rejected = packer.submit("relation.description", "描述关系", "A->B")
+        accepted = [packer.submit("relation.description", "描述关系", item) for item in ("C->D", "E->F")]
+
+        with pytest.raises(BudgetExceeded):
+            rejected.result(timeout=5)
+        assert [future.result(timeout=5) for future in accepted] == ["甲", "乙"]
+        assert [call[0] for call in router.calls] == ["relation.description.packed"]
+    finally:
+        usage_meter.set_budget("packing-over-budget")
+        usage_meter.restore_job_usage("packing-over-budget", {})
+
+def test_invalid_packed_results_fall_back_with_validation():
+    router = RecordingRouter('[{"id": 1, "result": ["甲"]}, {"id": 2, "result": "不是数组"}]', '["乙"]')
+    packer = PromptPacker(router, window_ms=1000, max_items=2)
+
+    def validate(content):
+        return content.startswith("[")
+
+    submitted = [packer.submit("relation.variations", "生成变体", item, validate=validate) for item in ("A", "B")]
+    assert [future.result(timeout=5) for future in submitted] == ['["甲"]', '["乙"]']
+    task, _, _, single_validate = router.calls[1]
+    assert task == "relation.variations"
+    assert single_validate is validate
+
+def test_fallback_single_calls_keep_each_submitter_context():
+    router = RecordingRouter("无法解析的输出")
+    packer = PromptPacker(router, window_ms=1000, max_items=2)
+    deadlines = [Deadline(30), Deadline(60)]
+
+    submitted = []
+    for i, deadline in enumerate(deadlines):
+        with use_deadline(deadline), meter_scope(item=i):
+            submitted.append(packer.submit("relation.description", "描述关系", f"条目{i}"))
+    for future in submitted:
+        assert future.result(timeout=5) == "无法解析的输出"
+
+    single = {labels["item"]: call_deadline for task, call_deadline, labels, _ in router.calls
+              if task == "relation.description"}
+    assert single == {"0": deadlines[0], "1": deadlines[1]}
+    assert packer.get_stats()["fallback_items"] == 2
@@ -0,0 +1,54 @@
+"""会话论文注册表（PaperRegistry）LRU淘汰与索引的单元测试"""
+
+from agent.paper_registry import PaperRegistry
+from services.search import PaperInfo
+
+def make_paper(i, authors=("A. Author",)):
+    return PaperInfo(title=f"Paper {i}", authors=list(authors), abstract="Abstract", arxiv_id=f"2304.{i:05d}v1",
+                     published_date="2023-04-05", categories=["cs.CV"], pdf_url="")
+
+def test_evicts_least_recently_used_paper():
+    registry = PaperRegistry(fetch_missing=False, max_papers=3)
+    for i in range(3):
+        registry.register(make_paper(i))
+    # 访问论文0后，最久未使用的是论文1
+    assert registry.lookup("2304.00000").title == "Paper 0"
+    registry.register(make_paper(3))
+
+    assert len(registry) == 3
+    assert registry.evictions == 1
+    assert [paper.title for paper in registry.papers()] == ["Paper 2", "Paper 0", "Paper 3"]
+    assert registry.lookup("2304.00001") is None
+
+def test_eviction_cleans_title_and_author_indexes():
+    registry = PaperRegistry(fetch_missing=False, max_papers=2)
+    registry.register(make_paper(0, authors=["Solo Author"]))
+    registry.register(make_paper(1))
+    registry.register(make_paper(2))
+
+    assert registry.lookup("Paper 0") is None
+    assert registry.by_author("solo author") == []
+    assert "solo author" not in registry._by_author
+    assert [paper.title for paper in registry.by_author("A. Author")] == ["Paper 1", "Paper 2"]
+
+def test_reregistering_refreshes_without_evicting():
+    registry = PaperRegistry(fetch_missing=False, max_papers=2)
+    registry.register(make_paper(0))
+    registry.register(make_paper(1))
+    registry.register(make_paper(0))
+    assert registry.evictions == 0
+    registry.register(make_paper(2))
+    assert [paper.title for paper in registry.papers()] == ["Paper 0", "Paper 2"]
+
+def test_index_references_skip_evicted_results():
+    registry = PaperRegistry(fetch_missing=False, max_papers=3)
+    registry.register_results([make_paper(i) for i in range(3)])
+    assert registry.lookup("论文2").title == "Paper 1"
+    assert registry.current().title == "Paper 0"
+
+    registry.register(make_paper(3))
+    registry.register(make_paper(4))
+    # 论文0、论文2被淘汰（论文1刚被访问过），序号引用与当前论文不再指向它们
+    assert registry.lookup("论文1") is None
+    assert [paper.title for paper in registry.last_results()] == ["Paper 1"]
+    assert registry.current().title == "Paper 4"
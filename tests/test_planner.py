@@ -0,0 +1,109 @@
+"""规划结果解析（parse_plan）的单元测试"""
+
+import json
+from unittest import mock
+
+import pytest
+
+from agent.planner import PlanAndExecuteAgent, PlanError, parse_plan
+
+TOOLS = ["search_arxiv", "summarize_contributions", "compare_papers"]
+
+def plan(*steps, **extra):
+    return json.dumps(dict(steps=list(steps), **extra), ensure_ascii=False)
+
+def test_parses_dag_with_placeholder_dependencies():
+    content = "```json\n" + plan(
+        {"id": "s1", "tool": "search_arxiv", "input": "title: Segment Anything"},
+        {"id": "s2", "tool": "search_arxiv", "input": "title: Mask R-CNN"},
+        {"id": "s3", "tool": "compare_papers", "input": "{s1.1},{s2.1}", "depends_on": ["s1"]},
+        final="s3"
+    ) + "\n```"
+    result = parse_plan(content, TOOLS)
+    assert [step.id for step in result.steps] == ["s1", "s2", "s3"]
+    assert result.steps[0].depends_on == []
+    # 显式依赖与输入中引用的步骤合并且不重复
+    assert result.steps[2].depends_on == ["s1", "s2"]
+    assert result.final == "s3"
+
+def test_non_string_input_is_serialized():
+    result = parse_plan(plan({"id": 1, "tool": "search_arxiv", "input": {"query": "SAM"}}), TOOLS)
+    assert result.steps[0].id == "1"
+    assert json.loads(result.steps[0].input) == {"query": "SAM"}
+
+def test_answer_without_steps():
+    result = parse_plan(plan(answer="你好"), TOOLS)
+    assert result.steps == [] and result.answer == "你好"
+
+def test_cycles_are_rejected():
+    content = plan(
+        {"id": "s1", "tool": "search_arxiv", "input": "{s3}"},
+        {"id": "s2", "tool": "summarize_contributions", "input": "{s1.1}"},
+        {"id": "s3", "tool": "compare_papers", "input": "{s2}"},
+    )
+    with pytest.raises(PlanError, match="环"):
+        parse_plan(content, TOOLS)
+
+    with pytest.raises(PlanError, match="环"):
+        parse_plan(plan({"id": "s1", "tool": "search_arxiv", "input": "x", "depends_on": ["s1"]}), TOOLS)
+
+def test_missing_dependencies_are_rejected():
+    content = plan({"id": "s2", "tool": "summarize_contributions", "input": "{s1.1}"})
+    with pytest.raises(PlanError, match="不存在的步骤s1"):
+        parse_plan(content, TOOLS)
+    # 重新规划时可以引用已成功执行的步骤
+    assert parse_plan(content, TOOLS, known_ids=["s1"]).steps[0].depends_on == ["s1"]
+
+@pytest.mark.parametrize("content, message", [
+    ("不是JSON", "不是有效的JSON"),
+    (json.dumps({"steps": "s1"}), "缺少steps"),
+    (plan({"id": "s1", "input": "x"}), "步骤格式错误"),
+    (plan({"id": "s1", "tool": "run_shell", "input": "x"}), "未知工具"),
+    (plan({"id": "s1", "tool": "search_arxiv"}, {"id": "s1", "tool": "search_arxiv"}), "ID重复"),
+    (plan({"id": "s1", "tool": "search_arxiv"}, final="s9"), "final"),
+    (plan(), "既没有步骤也没有回答"),
+])
+def test_invalid_plans(content, message):
+    with pytest.raises(PlanError, match=message):
+        parse_plan(content, TOOLS)
+
+def make_agent(calls):
+    def tool(name):
+        def run(tool_input):
+            calls.append((name, tool_input))
+            return f"{name}({tool_input})"
+        return run
+    tool_funcs = {name: tool(name) for name in TOOLS}
+    return PlanAndExecuteAgent(mock.Mock(get_available_tools=mock.Mock(return_value=[])), tool_funcs=tool_funcs)
+
+def test_replan_reuses_only_unchanged_steps():
+    calls = []
+    agent = make_agent(calls)
+    results = {}
+    agent.execute(parse_plan(plan(
+        {"id": "s1", "tool": "summarize_contributions", "input": "2304.02643"},
+        {"id": "s2", "tool": "summarize_contributions", "input": "1706.03762"},
+        {"id": "s3", "tool": "compare_papers", "input": "{s1},{s2}"},
+    ), TOOLS), results)
+    assert len(calls) == 3
+
+    # 重新规划：s1不变，s2复用ID但换了输入，依赖s2的s3也要重新执行
+    calls.clear()
+    executed = agent.execute(parse_plan(plan(
+        {"id": "s1", "tool": "summarize_contributions", "input": "2304.02643"},
+        {"id": "s2", "tool": "summarize_contributions", "input": "1512.03385"},
+        {"id": "s3", "tool": "compare_papers", "input": "{s1},{s2}"},
+    ), TOOLS), results)
+    assert [step.id for step in executed] == ["s2", "s3"]
+    assert calls[0] == ("summarize_contributions", "1512.03385")
+    assert results["s3"].output == ("compare_papers(summarize_contributions(2304.02643),"
+                                    "summarize_contributions(1512.03385))")
+
+def test_replan_reruns_a_reused_id_with_a_different_tool():
+    calls = []
+    agent = make_agent(calls)
+    results = {}
+    agent.execute(parse_plan(plan({"id": "s1", "tool": "summarize_contributions", "input": "2304.02643"}), TOOLS), results)
+    agent.execute(parse_plan(plan({"id": "s1", "tool": "compare_papers", "input": "2304.02643"}), TOOLS), results)
+    assert [name for name, _ in calls] == ["summarize_contributions", "compare_papers"]
+    assert results["s1"].output == "compare_papers(2304.02643)"
@@ -0,0 +1,64 @@
+"""模型路由（ModelRouter）的单元测试"""
+
+from services.llm_client import LLMResponse
+from services.routing import ModelRouter
+
+TIERS = {"small": "small-model", "standard": "standard-model", "strong": "strong-model"}
+
+class ScriptedClient:
+    """按顺序返回预设输出的假LLM客户端"""
+
+    def __init__(self, *contents: str):
+        self.contents = list(contents)
+        self.models = []
+
+    def complete(self, messages, call_site=None, model=None, **kwargs):
+        self.models.append(model)
+        return LLMResponse(content=self.contents.pop(0), model=model, endpoint="fake", latency=0.01)
+
+def test_compare_defaults_to_standard_tier_with_strong_escalation():
+    route = ModelRouter(ScriptedClient(), tiers=TIERS).resolve("summarize.compare")
+    assert route.model == "standard-model"
+    assert route.escalate_to == "strong-model"
+
+def test_escalates_only_when_validation_fails():
+    client = ScriptedClient("", "比较结果")
+    router = ModelRouter(client, tiers=TIERS, escalate=True)
+
+    response = router.complete("summarize.compare", [{"role": "user", "content": "比较"}],
+                               validate=lambda content: bool(content.strip()))
+    assert response.content == "比较结果"
+    assert client.models == ["standard-model", "strong-model"]
+    assert router.get_stats()["summarize.compare"]["escalations"] == 1
+
+    client = ScriptedClient("比较结果")
+    router = ModelRouter(client, tiers=TIERS, escalate=True)
+    router.complete("summarize.compare", [{"role": "user", "content": "比较"}],
+                    validate=lambda content: bool(content.strip()))
+    assert client.models == ["standard-model"]
+
+def test_prefix_match_and_default_route():
+    router = ModelRouter(ScriptedClient(), tiers=TIERS)
+    assert router.resolve("hallucination.factual_consistency").task == "hallucination"
+    assert router.resolve("unknown.task").task == "default"
+
+def test_agent_chat_model_follows_the_route_unless_a_model_is_set():
+    from agent.paper_registry import PaperRegistry
+    from agent.tools import ScholarTools
+    from services.chat_model import PooledChatModel
+
+    assert ScholarTools(registry=PaperRegistry(fetch_missing=False)).llm.model_name is None
+
+    client = ScriptedClient("回答", "回答")
+    router = ModelRouter(client, tiers=dict(TIERS, standard="routed-model"))
+    PooledChatModel(router=router)._generate([])
+    PooledChatModel(router=router, model_name="pinned-model")._generate([])
+    assert client.models == ["routed-model", "pinned-model"]
+
+def test_openai_relation_extractor_maps_every_tier_to_its_model():
+    from standalone_relation_extractor import StandaloneRelationExtractor
+
+    extractor = StandaloneRelationExtractor("sk-test", api_type="openai", packing=False)
+    route = extractor.router.resolve("relation.relations")
+    assert (route.model, route.escalate_to) == ("gpt-3.5-turbo", "gpt-3.5-turbo")
+    assert extractor.router.resolve("relation.entities").model == "gpt-3.5-turbo"
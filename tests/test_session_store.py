@@ -0,0 +1,65 @@
+"""会话快照（agent/session_store.py）的单元测试"""
+
+import json
+from unittest import mock
+
+import pytest
+
+from agent.paper_registry import PaperRegistry
+from agent.session_store import (pack_snapshot, unpack_snapshot, write_snapshot, read_snapshot,
+                                 SnapshotError, SNAPSHOT_VERSION)
+from services.search import PaperInfo
+
+ABSTRACT = "We introduce the Segment Anything (SA) project: a new task, model, and dataset for image segmentation. " * 3
+
+def make_state():
+    registry = PaperRegistry(fetch_missing=False)
+    registry.register_results([
+        PaperInfo(title=f"Paper {i}", authors=["A. Author"], abstract=ABSTRACT, arxiv_id=f"2304.0264{i}v1",
+                  published_date="2023-04-05", categories=["cs.CV"], pdf_url="")
+        for i in range(3)
+    ])
+    return {
+        "conversation_history": [{"role": "assistant", "content": ABSTRACT}],
+        "papers": registry.export_state()
+    }
+
+def test_pack_stores_repeated_long_text_once():
+    state = make_state()
+    snapshot = pack_snapshot(state)
+
+    assert snapshot["version"] == SNAPSHOT_VERSION
+    assert list(snapshot["blobs"].values()) == [ABSTRACT]
+    assert unpack_snapshot(snapshot) == state
+
+def test_round_trip_restores_registry(tmp_path):
+    state = make_state()
+    path = str(tmp_path / "session.json.gz")
+    write_snapshot(state, path)
+
+    restored = read_snapshot(path)
+    registry = PaperRegistry(fetch_missing=False)
+    registry.import_state(restored["papers"])
+    assert restored == state
+    assert [paper.title for paper in registry.last_results()] == ["Paper 0", "Paper 1", "Paper 2"]
+    assert registry.lookup("2304.02641").title == "Paper 1"
+
+def test_unpack_rejects_foreign_or_newer_snapshots():
+    with pytest.raises(SnapshotError):
+        unpack_snapshot({"format": "other"})
+    snapshot = pack_snapshot({})
+    snapshot["version"] = SNAPSHOT_VERSION + 1
+    with pytest.raises(SnapshotError):
+        unpack_snapshot(snapshot)
+
+def test_interrupted_write_keeps_previous_snapshot(tmp_path):
+    path = str(tmp_path / "session.json")
+    write_snapshot({"turn": 1}, path)
+
+    with mock.patch("agent.session_store.os.fsync", side_effect=KeyboardInterrupt):
+        with pytest.raises(KeyboardInterrupt):
+            write_snapshot({"turn": 2}, path)
+
+    assert read_snapshot(path) == {"turn": 1}
+    assert list(tmp_path.iterdir()) == [tmp_path / "session.json"]
+    assert json.loads((tmp_path / "session.json").read_text(encoding="utf-8"))["state"] == {"turn": 1}
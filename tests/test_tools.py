@@ -0,0 +1,57 @@
+"""Agent工具（ScholarTools）备忘录的单元测试"""
+
+import threading
+from unittest import mock
+
+from agent.paper_registry import PaperRegistry
+from agent.prefetch import SpeculativePrefetcher
+from agent.tools import ScholarTools, ToolMemo, use_tool_state, _is_uncacheable
+from services.search import PaperInfo
+
+def test_failure_outputs_are_uncacheable():
+    assert _is_uncacheable("未找到论文: 论文9")
+    assert _is_uncacheable("服务暂时不可用（arxiv 熔断中），请约 30 秒后重试，无需重复调用该工具。")
+    # 关键点工具把服务的失败列表格式化为 "• 生成失败: ..."
+    assert _is_uncacheable("• 生成失败: Request timed out.")
+    assert not _is_uncacheable("• 提出了可提示的分割模型SAM")
+
+def test_memo_skips_failed_key_points_and_caches_success():
+    tools = ScholarTools(registry=PaperRegistry(fetch_missing=False))
+    state = tools.new_state(PaperRegistry(fetch_missing=False))
+    func = mock.Mock(side_effect=["• 生成失败: Request timed out.", "• 要点一\n• 要点二"])
+    wrapped = tools._memoized("generate_key_points", func)
+
+    with use_tool_state(state):
+        assert wrapped("2304.02643") == "• 生成失败: Request timed out."
+        assert wrapped("2304.02643") == "• 要点一\n• 要点二"
+        assert wrapped("2304.02643") == "• 要点一\n• 要点二"
+
+    assert func.call_count == 2
+
+def test_import_state_drops_previous_speculative_keys():
+    memo = ToolMemo()
+    memo.put(("generate_key_points", "2304.02643"), "• 要点", speculative=True)
+    state = memo.export_state()
+
+    memo.import_state(state)
+    assert memo.get(("generate_key_points", "2304.02643")) == "• 要点"
+    assert memo.get_stats()["speculative_hits"] == 0
+
+def test_prefetch_budget_holds_under_concurrent_schedules():
+    tools = ScholarTools(registry=PaperRegistry(fetch_missing=False))
+    prefetcher = SpeculativePrefetcher(tools, facets=["summarize_contributions"], top_n=10,
+                                       max_calls_per_session=5, busy_fn=lambda: 0)
+    prefetcher._executor = mock.Mock()
+    state = tools.new_state(PaperRegistry(fetch_missing=False))
+    papers = [PaperInfo(title=f"Paper {i}", authors=[], abstract="", arxiv_id=f"2304.{i:05d}",
+                        published_date="", categories=[], pdf_url="") for i in range(40)]
+
+    threads = [threading.Thread(target=prefetcher.schedule, args=(state, papers[i::4])) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert state.speculative_calls == 5
+    assert prefetcher._executor.submit.call_count == 5
+    assert prefetcher.get_stats()["scheduled"] == 5
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+追踪汇总脚本
+
+读取Agent运行写出的追踪文件（AGENT_TRACE_FILE的JSONL，或AGENT_TRACE_OTLP_FILE的OTLP/JSON），
+按跨度类型（或名称）汇总次数、错误数、p50/p95延迟与总耗时，并给出各类步骤占Agent运行总时长的比例。
+也可以把JSONL追踪转换为OTLP/JSON，导入OpenTelemetry Collector或Jaeger等后端。
+
+用法：
+    python trace_report.py traces/agent_trace.jsonl
+    python trace_report.py traces/agent_trace.jsonl --by name --kind llm
+    python trace_report.py traces/agent_trace.jsonl --otlp traces/agent_trace.otlp.json
+"""
+
+import argparse
+import json
+from typing import List, Dict, Any, Optional
+
+from services.hedging import percentile
+from services.tracing import to_otlp, KIND_AGENT
+
+def _from_otlp_value(value: Dict[str, Any]) -> Any:
+    """OTLP AnyValue还原为Python值"""
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "doubleValue" in value:
+        return value["doubleValue"]
+    if "boolValue" in value:
+        return value["boolValue"]
+    return value.get("stringValue")
+
+def _from_otlp(request: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """把一个OTLP/JSON请求还原为跨度字典列表"""
+    spans = []
+    for resource_spans in request.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for item in scope_spans.get("spans", []):
+                attributes = {attr["key"]: _from_otlp_value(attr["value"]) for attr in item.get("attributes", [])}
+                start_ns = int(item["startTimeUnixNano"])
+                status = item.get("status", {})
+                spans.append({
+                    "name": item["name"],
+                    "kind": attributes.pop("scholar.kind", "unknown"),
+                    "trace_id": item["traceId"],
+                    "span_id": item["spanId"],
+                    "parent_id": item.get("parentSpanId"),
+                    "start_time": start_ns / 1e9,
+                    "duration": (int(item["endTimeUnixNano"]) - start_ns) / 1e9,
+                    "status": "error" if status.get("code") == 2 else "ok",
+                    "error": status.get("message") or None,
+                    "attributes": attributes
+                })
+    return spans
+
+def load_spans(paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    读取追踪文件（JSONL与OTLP/JSON行格式均可，格式按行自动识别）
+
+    Args:
+        paths: 追踪文件路径列表
+
+    Returns:
+        List[Dict[str, Any]]: 跨度字典列表
+    """
+    spans = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"跳过无法解析的行 {path}:{line_no}")
+                    continue
+                spans.extend(_from_otlp(record) if "resourceSpans" in record else [record])
+    return spans
+
+def summarize(spans: List[Dict[str, Any]], by: str = "kind",
+              agent_total: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    按跨度类型或名称汇总延迟
+
+    Args:
+        spans: 跨度字典列表
+        by: 分组字段，kind或name
+        agent_total: Agent运行总时长（秒），None表示按spans中的agent跨度计算
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 分组到 {count, errors, p50, p95, mean, total, share} 的映射，
+            share为总耗时占Agent运行总时长的比例（没有Agent运行时为None；嵌套步骤会重复计入）
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for span in spans:
+        groups.setdefault(span[by], []).append(span)
+    if agent_total is None:
+        agent_total = sum(span["duration"] for span in spans if span["kind"] == KIND_AGENT)
+
+    report = {}
+    for key, items in sorted(groups.items(), key=lambda entry: -sum(span["duration"] for span in entry[1])):
+        durations = sorted(span["duration"] for span in items)
+        total = sum(durations)
+        report[key] = {
+            "count": len(items),
+            "errors": sum(span.get("status") == "error" for span in items),
+            "p50": percentile(durations, 0.50),
+            "p95": percentile(durations, 0.95),
+            "mean": total / len(durations),
+            "total": total,
+            "share": total / agent_total if agent_total else None
+        }
+    return report
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="汇总Agent追踪文件中各类步骤的延迟分位数")
+    parser.add_argument("paths", nargs="+", help="追踪文件（JSONL或OTLP/JSON）")
+    parser.add_argument("--by", choices=("kind", "name"), default="kind", help="按跨度类型或名称分组")
+    parser.add_argument("--kind", help="只统计指定类型的跨度（agent、llm、tool、arxiv）")
+    parser.add_argument("--json", action="store_true", help="以JSON输出汇总结果")
+    parser.add_argument("--otlp", help="把读取的跨度转换为OTLP/JSON写入该文件")
+    args = parser.parse_args()
+
+    spans = load_spans(args.paths)
+    if args.otlp:
+        with open(args.otlp, 'w', encoding='utf-8') as f:
+            json.dump(to_otlp(spans), f, ensure_ascii=False)
+        print(f"已将 {len(spans)} 个跨度转换为OTLP/JSON: {args.otlp}")
+
+    agent_spans = [span for span in spans if span["kind"] == KIND_AGENT]
+    if args.kind:
+        spans = [span for span in spans if span["kind"] == args.kind]
+    report = summarize(spans, args.by, sum(span["duration"] for span in agent_spans))
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    width = max([len(key) for key in report] + [10]) + 2
+    print(f"共 {len(spans)} 个跨度，Agent运行 {len(agent_spans)} 次")
+    print("=" * (width + 62))
+    print(f"{'分组':<{width}}{'次数':>8}{'错误':>6}{'p50':>10}{'p95':>10}{'平均':>10}{'总耗时':>10}{'占比':>8}")
+    print("-" * (width + 62))
+    for key, s in report.items():
+        share = f"{s['share']:.0%}" if s["share"] is not None else "-"
+        print(f"{key:<{width}}{s['count']:>8}{s['errors']:>6}{s['p50']:>9.3f}s{s['p95']:>9.3f}s"
+              f"{s['mean']:>9.3f}s{s['total']:>9.2f}s{share:>8}")
+    print("\n占比为该组总耗时占Agent运行总时长的比例；工具内的LLM调用同时计入tool与llm，占比之和可能超过100%。")
+
+if __name__ == "__main__":
+    main()
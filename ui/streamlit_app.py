@@ -15,6 +15,8 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agent.controller import create_scholar_agent
+from agent.session_store import SnapshotError
+from config import AGENT_SESSION_CONFIG
 
 # 页面配置
 st.set_page_config(
@@ -103,7 +105,7 @@ def display_sidebar():
         if st.session_state.agent:
             agent_info = st.session_state.agent.get_agent_info()
             st.subheader("Agent信息")
-            st.write(f"模型: {agent_info['model_name']}")
+            st.write(f"模型: {agent_info['model_name'] or '按路由表选择'}")
             st.write(f"对话次数: {agent_info['conversation_count']}")
             st.write(f"可用工具: {', '.join(agent_info['available_tools'])}")
         
@@ -122,6 +124,25 @@ def display_sidebar():
             st.session_state.conversation_history = []
             st.rerun()
         
+        session_file = AGENT_SESSION_CONFIG['path'] or "scholar_session.json.gz"
+        if st.button("💾 保存会话") and st.session_state.agent:
+            saved = st.session_state.agent.save_session(session_file)
+            st.success(f"会话已保存到 {session_file}（{saved['bytes'] / 1024:.1f} KB）")
+        
+        if st.button("📂 恢复会话") and st.session_state.agent:
+            try:
+                restored = st.session_state.agent.load_session(session_file)
+                # 与页面一致，只显示成功的对话轮次
+                history = st.session_state.agent.conversation_history
+                st.session_state.conversation_history = [
+                    turn for i, turn in enumerate(history)
+                    if not turn.get("error") and not (i + 1 < len(history) and history[i + 1].get("error"))
+                ]
+                st.success(f"已恢复 {restored['turns']} 轮对话，{restored['papers']} 篇论文")
+                st.rerun()
+            except (OSError, SnapshotError) as e:
+                st.error(f"恢复会话失败: {e}")
+        
         # 示例问题
         st.subheader("💡 示例问题")
         example_questions = [
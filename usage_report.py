@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+LLM用量汇总脚本
+
+读取LLM_USAGE_FILE写出的JSONL用量记录，按调用点、模型、端点、会话、批处理任务或条目汇总
+调用次数、输入/缓存命中/输出token与成本，可按时间窗口分组，找出消耗配额最多的流程。
+
+用法：
+    python usage_report.py usage/llm_usage.jsonl
+    python usage_report.py usage/llm_usage.jsonl --by job
+    python usage_report.py usage/llm_usage.jsonl --by call_site --window 3600 --job batch_relation-20250101-120000
+"""
+
+import argparse
+import json
+
+from services.metering import load_usage, aggregate
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="汇总LLM用量记录")
+    parser.add_argument("paths", nargs="+", help="用量记录文件（JSONL）")
+    parser.add_argument("--by", choices=("call_site", "model", "endpoint", "session", "job", "item"),
+                        default="call_site", help="分组维度")
+    parser.add_argument("--window", type=float, help="按时间窗口分组（秒），如3600表示每小时")
+    parser.add_argument("--job", help="只统计指定批处理任务")
+    parser.add_argument("--session", help="只统计指定会话")
+    parser.add_argument("--top", type=int, default=0, help="只显示前N组")
+    parser.add_argument("--json", action="store_true", help="以JSON输出汇总结果")
+    args = parser.parse_args()
+
+    records = load_usage(args.paths)
+    if args.job:
+        records = [record for record in records if record.job == args.job]
+    if args.session:
+        records = [record for record in records if record.session == args.session]
+    report = aggregate(records, args.by, args.window)
+    if args.top:
+        report = dict(list(report.items())[:args.top])
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    total_cost = sum(record.cost for record in records)
+    width = max([len(key) for key in report] + [10]) + 2
+    print(f"共 {len(records)} 次调用，{sum(record.total_tokens for record in records)} token，${total_cost:.4f}")
+    print("=" * (width + 66))
+    print(f"{'分组':<{width}}{'调用':>8}{'输入token':>12}{'缓存命中':>12}{'输出token':>12}{'成本(USD)':>12}{'占比':>8}")
+    print("-" * (width + 66))
+    for key, s in report.items():
+        share = f"{s['cost_usd'] / total_cost:.0%}" if total_cost else "-"
+        print(f"{key:<{width}}{s['calls']:>8}{s['prompt_tokens']:>12}{s['cached_tokens']:>12}"
+              f"{s['completion_tokens']:>12}{s['cost_usd']:>12.4f}{share:>8}")
+
+if __name__ == "__main__":
+    main()